@@ -0,0 +1,301 @@
+import os
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("AC-Agent.ContentScanner")
+
+SCAN_CACHE_FORMAT = 1
+SECTIONS = ("cars", "tracks")
+
+
+# Folder parsing is dominated by filesystem latency (network shares, cold disks),
+# so a small thread pool overlaps it; the GIL is released during the syscalls.
+SCAN_WORKERS = max(1, int(os.getenv("SCAN_WORKERS", "8")))
+
+# os.path.exists() follows the platform's case rules; the dirent name sets must too
+_CASE_INSENSITIVE = os.path.normcase("A") == "a"
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _list_dir(path: str) -> Optional[Dict[str, os.DirEntry]]:
+    """One scandir() per directory; the entries answer later exists/isdir checks without extra stats"""
+    try:
+        with os.scandir(path) as it:
+            return {(entry.name.lower() if _CASE_INSENSITIVE else entry.name): entry for entry in it}
+    except OSError:
+        return None
+
+
+def _has(entries: Optional[Dict[str, os.DirEntry]], name: str) -> bool:
+    return bool(entries) and (name.lower() if _CASE_INSENSITIVE else name) in entries
+
+
+def _is_dir(entry: os.DirEntry) -> bool:
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
+
+
+def _find_image_url(proxy_base: str, content_path: str, base_path: str, entries, *filenames) -> Optional[str]:
+    """First existing image among filenames, as an image proxy URL relative to content/"""
+    for fname in filenames:
+        if _has(entries, fname):
+            full_path = os.path.join(base_path, fname)
+            rel_path = os.path.relpath(full_path, content_path).replace("\\", "/")
+            return f"{proxy_base}/{rel_path}"
+    return None
+
+
+def _load_ui_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def scan_car(car_dir: str, car_folder: str, content_path: str, proxy_base: str, car_entries=None) -> dict:
+    if car_entries is None:
+        car_entries = _list_dir(car_dir)
+    ui_dir = os.path.join(car_dir, "ui")
+    ui_entries = _list_dir(ui_dir) if _has(car_entries, "ui") else None
+    name = car_folder
+    brand = ""
+    specs = {}
+    if _has(ui_entries, "ui_car.json"):
+        ui_data = _load_ui_json(os.path.join(ui_dir, "ui_car.json"))
+        if ui_data is not None:
+            try:
+                name = ui_data.get("name", car_folder)
+                brand = ui_data.get("brand", "")
+                specs = ui_data.get("specs", {})
+            except Exception:
+                pass
+
+    # Preview of the first alphabetical skin wins over the generic ui preview
+    image_url = None
+    if _has(car_entries, "skins"):
+        skins_path = os.path.join(car_dir, "skins")
+        skin_entries = _list_dir(skins_path)
+        if skin_entries:
+            skins = sorted(entry.name for entry in skin_entries.values() if _is_dir(entry))
+            if skins:
+                first_skin_dir = os.path.join(skins_path, skins[0])
+                image_url = _find_image_url(
+                    proxy_base, content_path, first_skin_dir, _list_dir(first_skin_dir), "preview.jpg", "preview.png"
+                )
+
+    if not image_url:
+        image_url = (
+            _find_image_url(proxy_base, content_path, ui_dir, ui_entries, "preview.png", "preview.jpg") or
+            _find_image_url(proxy_base, content_path, car_dir, car_entries, "logo.png") or
+            _find_image_url(proxy_base, content_path, ui_dir, ui_entries, "badge.png")
+        )
+
+    return {
+        "id": car_folder,
+        "name": name,
+        "brand": brand,
+        "image_url": image_url,
+        "specs": specs
+    }
+
+
+def scan_track(track_dir: str, track_folder: str, content_path: str, proxy_base: str, track_entries=None) -> dict:
+    if track_entries is None:
+        track_entries = _list_dir(track_dir)
+    ui_dir = os.path.join(track_dir, "ui")
+    ui_entries = _list_dir(ui_dir) if _has(track_entries, "ui") else None
+    name = track_folder
+    layout = ""
+    geotags = []
+    if _has(ui_entries, "ui_track.json"):
+        ui_data = _load_ui_json(os.path.join(ui_dir, "ui_track.json"))
+        if ui_data is not None:
+            try:
+                name = ui_data.get("name", track_folder)
+                layout = ui_data.get("description", "")
+                geotags = ui_data.get("geotags", [])
+            except Exception:
+                pass
+
+    return {
+        "id": track_folder,
+        "name": name,
+        "layout": layout,
+        "image_url": _find_image_url(proxy_base, content_path, ui_dir, ui_entries, "preview.png"),
+        "map_url": _find_image_url(proxy_base, content_path, ui_dir, ui_entries, "outline.png", "map.png"),
+        "geotags": geotags
+    }
+
+
+def _signature(folder_entry: os.DirEntry, *relative_paths: str) -> List[Optional[int]]:
+    # Adding/removing files bumps the parent dir mtime; editing a ui json bumps its own
+    try:
+        sig = [folder_entry.stat().st_mtime_ns]
+    except OSError:
+        sig = [None]
+    sig.extend(_mtime(os.path.join(folder_entry.path, rel)) for rel in relative_paths)
+    return sig
+
+
+def _first_skin_signature(car_dir: str) -> List[Optional[int]]:
+    # A preview added to or replaced in a skin only bumps that skin's folder and file, not skins/
+    skins_path = os.path.join(car_dir, "skins")
+    skin_entries = _list_dir(skins_path)
+    skins = sorted(entry.name for entry in skin_entries.values() if _is_dir(entry)) if skin_entries else []
+    if not skins:
+        return []
+    first_skin_dir = os.path.join(skins_path, skins[0])
+    return [_mtime(first_skin_dir)] + [_mtime(os.path.join(first_skin_dir, name)) for name in ("preview.jpg", "preview.png")]
+
+
+# section -> (scanner, paths whose mtimes form the signature, extra signature or None)
+SCANNERS = {
+    "cars": (scan_car, ("ui", os.path.join("ui", "ui_car.json"), "skins"), _first_skin_signature),
+    "tracks": (scan_track, ("ui", os.path.join("ui", "ui_track.json")), None),
+}
+
+
+def _scan_folder(section: str, folder_entry: os.DirEntry, old: Optional[dict], content_path: str, proxy_base: str):
+    """Worker: returns (folder, sig, item) with item None when the cached entry is still valid"""
+    scan_entry, sig_paths, extra_sig = SCANNERS[section]
+    sig = _signature(folder_entry, *sig_paths)
+    if extra_sig:
+        sig.extend(extra_sig(folder_entry.path))
+    if old and old.get("sig") == sig:
+        return folder_entry.name, sig, None
+    return folder_entry.name, sig, scan_entry(folder_entry.path, folder_entry.name, content_path, proxy_base)
+
+
+class ContentScanner:
+    """
+    Incremental scanner for an AC install. Parsed cars/tracks are cached per folder
+    together with the mtimes of the files that feed them, so a rescan only re-parses
+    folders that changed and can report a diff against the previous scan version.
+    The cache is persisted to `cache_file` so agent restarts stay incremental.
+    """
+
+    def __init__(self, cache_file: Optional[Path] = None, workers: int = SCAN_WORKERS):
+        self.cache_file = Path(cache_file) if cache_file else None
+        self.workers = max(1, workers)
+        self.state = self._load()
+
+    def _empty_state(self, ac_path: Optional[str] = None, proxy_base: Optional[str] = None, version: int = 0) -> dict:
+        return {
+            "format": SCAN_CACHE_FORMAT,
+            "ac_path": ac_path,
+            "proxy_base": proxy_base,
+            "version": version,
+            "cars": {},
+            "tracks": {},
+        }
+
+    def _load(self) -> dict:
+        if not self.cache_file or not self.cache_file.exists():
+            return self._empty_state()
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get("format") == SCAN_CACHE_FORMAT:
+                return state
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable scan cache {self.cache_file}: {e}")
+        return self._empty_state()
+
+    def _save(self) -> None:
+        if not self.cache_file:
+            return
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_file.with_suffix(self.cache_file.suffix + ".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            logger.warning(f"Could not persist scan cache: {e}")
+
+    @property
+    def version(self) -> int:
+        return self.state.get("version", 0)
+
+    def content(self) -> dict:
+        """Full scan result in the content_scan_result format, tagged with its version"""
+        result = {section: [entry["item"] for entry in self.state[section].values()] for section in SECTIONS}
+        result["scan_version"] = self.version
+        return result
+
+    def scan(self, ac_path: str, proxy_base: str) -> Optional[dict]:
+        """
+        Rescans `ac_path` and returns the diff against the previous scan:
+        {"base_version", "version", "cars": {"added", "changed", "removed"}, "tracks": {...}}.
+        base_version is None when the previous scan can't serve as a base (first scan,
+        different install or proxy host); the caller should then send content() instead.
+        Returns None when the AC path doesn't exist.
+        """
+        if not ac_path or not os.path.exists(ac_path):
+            logger.warning(f"AC path not found or not configured: {ac_path}")
+            return None
+
+        previous = self.state
+        base_version = previous.get("version", 0)
+        if previous.get("ac_path") != ac_path or previous.get("proxy_base") != proxy_base or not base_version:
+            previous = self._empty_state()
+            base_version = None
+
+        content_path = os.path.join(ac_path, "content")
+        state = self._empty_state(ac_path, proxy_base, self.version)
+        diff = {"base_version": base_version}
+        reparsed = 0
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scan") as pool:
+            for section in SECTIONS:
+                old_entries = previous[section]
+                entries = state[section]
+                changes = {"added": [], "changed": [], "removed": []}
+                listing = _list_dir(os.path.join(content_path, section)) or {}
+                folders = [entry for entry in listing.values() if _is_dir(entry)]
+
+                # map() keeps directory order, so results match a sequential scan
+                results = pool.map(
+                    lambda entry: _scan_folder(section, entry, old_entries.get(entry.name), content_path, proxy_base),
+                    folders
+                )
+                for folder, sig, item in results:
+                    old = old_entries.get(folder)
+                    if item is None:
+                        entries[folder] = old
+                        continue
+                    reparsed += 1
+                    entries[folder] = {"sig": sig, "item": item}
+                    if old is None:
+                        changes["added"].append(item)
+                    elif old.get("item") != item:
+                        changes["changed"].append(item)
+
+                changes["removed"] = [folder for folder in old_entries if folder not in entries]
+                diff[section] = changes
+
+        dirty = base_version is None or any(diff[s]["added"] or diff[s]["changed"] or diff[s]["removed"] for s in SECTIONS)
+        if dirty:
+            state["version"] = self.version + 1
+        diff["version"] = state["version"]
+        self.state = state
+        self._save()
+
+        logger.info(
+            f"Scanned AC content: {len(state['cars'])} cars, {len(state['tracks'])} tracks "
+            f"({reparsed} re-parsed, version {state['version']})"
+        )
+        return diff
+
@@ -0,0 +1,221 @@
+import os
+import random
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+try:
+    import hashing
+except ImportError:
+    from . import hashing
+
+logger = logging.getLogger("AC-Agent.ContentSync")
+
+
+class ChunkCache:
+    """
+    Local content-addressed cache of file chunks (same layout as the server store:
+    <root>/<h[:2]>/<h>). Chunks from the previous version of a file are seeded here
+    so only the chunks that actually changed have to be downloaded.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, chunk_hash: str) -> Path:
+        return self.root / chunk_hash[:2] / chunk_hash
+
+    def has(self, chunk_hash: str) -> bool:
+        return self.path(chunk_hash).exists()
+
+    def get(self, chunk_hash: str) -> Optional[bytes]:
+        try:
+            with open(self.path(chunk_hash), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if hashlib.sha256(data).hexdigest() != chunk_hash:
+            # Corrupted on disk, drop it so it gets fetched again
+            logger.warning(f"Discarding corrupt cached chunk {chunk_hash}")
+            self.discard(chunk_hash)
+            return None
+        return data
+
+    def put(self, chunk_hash: str, data: bytes) -> None:
+        path = self.path(chunk_hash)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=".tmp_")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def discard(self, chunk_hash: str) -> None:
+        try:
+            os.remove(self.path(chunk_hash))
+        except FileNotFoundError:
+            pass
+
+    def seed_from_file(self, file_path: Path, wanted: Set[str]) -> int:
+        """Chunks an existing local file and keeps the pieces that the target still uses."""
+        if not wanted or not Path(file_path).exists():
+            return 0
+        seeded = 0
+        with open(file_path, "rb") as f:
+            for data in hashing.iter_chunks(f):
+                digest = hashlib.sha256(data).hexdigest()
+                if digest in wanted and not self.has(digest):
+                    self.put(digest, data)
+                    seeded += 1
+        return seeded
+
+    def hashes(self) -> List[str]:
+        if not self.root.exists():
+            return []
+        return [
+            entry.name
+            for bucket in self.root.iterdir() if bucket.is_dir()
+            for entry in bucket.iterdir() if not entry.name.startswith(".")
+        ]
+
+    def prune(self, keep: Iterable[str]) -> int:
+        """Removes every cached chunk not in `keep`. Returns the number removed."""
+        keep = set(keep)
+        removed = 0
+        for bucket in self.root.iterdir():
+            if not bucket.is_dir():
+                continue
+            for entry in bucket.iterdir():
+                if entry.name not in keep:
+                    try:
+                        entry.unlink()
+                        removed += 1
+                    except OSError:
+                        pass
+        return removed
+
+
+def referenced_chunks(manifest: Dict[str, Dict]) -> Set[str]:
+    return {c["hash"] for info in manifest.values() for c in info.get("chunks") or []}
+
+
+def missing_chunks(manifest_items: Iterable[Dict], cache: ChunkCache) -> List[str]:
+    missing = []
+    seen = set()
+    for info in manifest_items:
+        for chunk in info.get("chunks") or []:
+            chunk_hash = chunk["hash"]
+            if chunk_hash not in seen and not cache.has(chunk_hash):
+                seen.add(chunk_hash)
+                missing.append(chunk_hash)
+    return missing
+
+
+def prefetch_chunks(
+    hashes: List[str],
+    cache: ChunkCache,
+    fetch_from_server: Callable[[str], bytes],
+    fetch_from_peer: Callable[[str, str], bytes],
+    lookup_peers: Callable[[List[str]], Dict[str, List[str]]],
+    announce: Callable[[List[str]], None],
+    batch_size: int = 32,
+) -> Dict[str, int]:
+    """
+    Pulls chunks into the cache, preferring sibling stations over the server.
+    Each station walks the list in a random order and announces every batch it
+    completes, so during a fleet-wide rollout the rigs fetch different chunks from
+    the server and then swap them among themselves over the LAN.
+    Returns byte counters: {'peer': ..., 'server': ...}.
+    """
+    order = list(hashes)
+    random.shuffle(order)
+    stats = {"peer": 0, "server": 0}
+    for start in range(0, len(order), batch_size):
+        batch = [h for h in order[start:start + batch_size] if not cache.has(h)]
+        if not batch:
+            continue
+        try:
+            peers = lookup_peers(batch) or {}
+        except Exception as e:
+            logger.debug(f"Peer lookup failed, using server only: {e}")
+            peers = {}
+        fetched = []
+        for chunk_hash in batch:
+            data = None
+            candidates = list(peers.get(chunk_hash) or [])
+            random.shuffle(candidates)
+            for peer_url in candidates[:2]:
+                try:
+                    data = fetch_from_peer(peer_url, chunk_hash)
+                except Exception as e:
+                    logger.debug(f"Peer {peer_url} failed for {chunk_hash}: {e}")
+                    data = None
+                if data is not None and hashlib.sha256(data).hexdigest() == chunk_hash:
+                    stats["peer"] += len(data)
+                    break
+                data = None
+            if data is None:
+                data = fetch_from_server(chunk_hash)
+                if hashlib.sha256(data).hexdigest() != chunk_hash:
+                    raise ValueError(f"Chunk {chunk_hash} failed verification")
+                stats["server"] += len(data)
+            cache.put(chunk_hash, data)
+            fetched.append(chunk_hash)
+        try:
+            announce(fetched)
+        except Exception as e:
+            logger.debug(f"Chunk announce failed: {e}")
+    return stats
+
+
+def sync_chunked_file(
+    local_path: Path,
+    info: Dict,
+    cache: ChunkCache,
+    fetch_chunk: Callable[[str], bytes],
+) -> int:
+    """
+    Rebuilds `local_path` from the chunk list in `info`, downloading only chunks that are
+    neither in the cache nor in the current local copy. The file is assembled next to the
+    target and swapped in atomically once the whole-file hash checks out.
+    Returns the number of bytes downloaded. Raises on any failure.
+    """
+    local_path = Path(local_path)
+    chunks = info["chunks"]
+    wanted = {c["hash"] for c in chunks if not cache.has(c["hash"])}
+    cache.seed_from_file(local_path, wanted)
+
+    downloaded = 0
+    local_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=str(local_path.parent), prefix=".sync_")
+    try:
+        file_hash = hashlib.sha256()
+        with os.fdopen(fd, "wb") as out:
+            for chunk in chunks:
+                chunk_hash = chunk["hash"]
+                data = cache.get(chunk_hash)
+                if data is None:
+                    data = fetch_chunk(chunk_hash)
+                    if hashlib.sha256(data).hexdigest() != chunk_hash:
+                        raise ValueError(f"Chunk {chunk_hash} failed verification")
+                    cache.put(chunk_hash, data)
+                    downloaded += len(data)
+                file_hash.update(data)
+                out.write(data)
+        if file_hash.hexdigest() != info["hash"]:
+            raise ValueError(f"Assembled file hash mismatch for {local_path.name}")
+        os.replace(tmp_path, local_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return downloaded
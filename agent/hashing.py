@@ -1,8 +1,27 @@
 import hashlib
 import os
-from typing import Dict, List
+from typing import Dict, List, Iterator, Tuple, BinaryIO
 from pathlib import Path
 
+try:
+    import numpy as np
+except ImportError:  # Optional: without numpy cut points are found byte by byte (same boundaries, slower)
+    np = None
+
+# Content-defined chunking parameters (shared by server and agents so both
+# sides cut identical chunk boundaries for identical bytes).
+CHUNK_MIN_SIZE = 256 * 1024
+CHUNK_AVG_BITS = 20  # ~1 MiB average chunk
+CHUNK_MAX_SIZE = 4 * 1024 * 1024
+_READ_SIZE = 8 * 1024 * 1024
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+# Bytes hashed per vectorized step while looking for a cut point
+_SCAN_BLOCK = 64 * 1024
+
+# Deterministic "gear" table for the rolling hash.
+_GEAR = [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:8], "little") for i in range(256)]
+_GEAR_NP = np.array(_GEAR, dtype=np.uint64) if np is not None else None
+
 def calculate_file_hash(file_path: str, chunk_size: int = 8192) -> str:
     """Calculates SHA-256 hash of a file."""
     sha256_hash = hashlib.sha256()
@@ -14,6 +33,87 @@ def calculate_file_hash(file_path: str, chunk_size: int = 8192) -> str:
     except FileNotFoundError:
         return ""
 
+def _find_cut_point(data, start: int, end: int, min_size: int, max_size: int, mask: int) -> int:
+    """Returns the (exclusive) end offset of the chunk starting at `start`."""
+    length = end - start
+    if length <= min_size:
+        return end
+    limit = start + min(length, max_size)
+    if _GEAR_NP is not None:
+        return _scan_numpy(data, start + min_size, limit, mask)
+    gear = _GEAR
+    h = 0
+    for i in range(start + min_size, limit):
+        h = ((h << 1) + gear[data[i]]) & _MASK64
+        if not (h & mask):
+            return i + 1
+    return limit
+
+def _scan_numpy(data, begin: int, limit: int, mask: int) -> int:
+    """
+    Vectorized form of the loop above. A byte's gear value is shifted out of the
+    64-bit hash after 64 steps, so the hash at i is sum(gear[data[i - k]] << k) over
+    the last 64 bytes since `begin`; six shift-and-add passes build it for a whole block.
+    """
+    view = np.frombuffer(data, dtype=np.uint8)
+    mask = np.uint64(mask)
+    pos = begin
+    while pos < limit:
+        stop = min(pos + _SCAN_BLOCK, limit)
+        # 63 bytes of context from the previous block; the hash starts from zero at `begin`
+        context = max(begin, pos - 63)
+        h = _GEAR_NP[view[context:stop]]
+        for shift in (1, 2, 4, 8, 16, 32):
+            h[shift:] += h[:-shift] << np.uint64(shift)
+        hits = np.flatnonzero((h[pos - context:] & mask) == 0)
+        if hits.size:
+            return pos + int(hits[0]) + 1
+        pos = stop
+    return limit
+
+def iter_chunks(
+    stream: BinaryIO,
+    min_size: int = CHUNK_MIN_SIZE,
+    avg_bits: int = CHUNK_AVG_BITS,
+    max_size: int = CHUNK_MAX_SIZE,
+) -> Iterator[bytes]:
+    """
+    Splits a binary stream into content-defined chunks (gear rolling hash).
+    Boundaries depend only on nearby content, so inserting or removing bytes
+    in one place leaves the other chunks of the file unchanged.
+    """
+    mask = ((1 << avg_bits) - 1) << (64 - avg_bits)
+    buffer = b""
+    pos = 0
+    eof = False
+    while True:
+        if not eof and len(buffer) - pos < max_size:
+            data = stream.read(_READ_SIZE)
+            if data:
+                buffer = buffer[pos:] + data
+                pos = 0
+            else:
+                eof = True
+            continue
+        if pos >= len(buffer):
+            return
+        cut = _find_cut_point(buffer, pos, len(buffer), min_size, max_size, mask)
+        yield buffer[pos:cut]
+        pos = cut
+
+def chunk_file(file_path: str, **chunk_params) -> Tuple[str, List[Dict]]:
+    """
+    Chunks a file and hashes it in the same read pass.
+    Returns: (file_sha256, [{'hash': '...', 'size': 123}, ...])
+    """
+    file_hash = hashlib.sha256()
+    chunks = []
+    with open(file_path, "rb") as f:
+        for chunk in iter_chunks(f, **chunk_params):
+            file_hash.update(chunk)
+            chunks.append({"hash": hashlib.sha256(chunk).hexdigest(), "size": len(chunk)})
+    return file_hash.hexdigest(), chunks
+
 def generate_manifest(directory_path: str) -> Dict[str, Dict]:
     """
     Generates a manifest of all files in a directory.
@@ -0,0 +1,233 @@
+import os
+import re
+import sys
+import logging
+import threading
+import urllib.parse
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional, Tuple
+
+try:
+    import content_sync
+except ImportError:
+    from . import content_sync
+
+# Rendering and the fixed widths are shared with the server (shared/thumbnails.py)
+sys.path.append(str(Path(__file__).resolve().parents[1] / "shared"))
+try:
+    import thumbnails
+except ImportError:  # Thumbnails are optional; originals are served without them
+    thumbnails = None
+
+logger = logging.getLogger("AC-Agent.ImageProxy")
+
+IMAGE_TYPES = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+}
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single `bytes=` range into an inclusive (start, end).
+    Returns None when the header is absent or not something we honour (multi-range),
+    raises ValueError when the range can't be satisfied.
+    """
+    if not header:
+        return None
+    match = re.fullmatch(r'\s*bytes=(\d*)-(\d*)\s*', header)
+    if not match or (not match.group(1) and not match.group(2)):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def make_handler(content_root: str, chunk_cache: Optional["content_sync.ChunkCache"], thumb_cache_dir: Optional[Path]):
+    content_root = os.path.realpath(content_root) if content_root else ""
+
+    class ImageHandler(SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=content_root, **kwargs)
+
+        def do_HEAD(self):
+            self._handle(send_body=False)
+
+        def do_GET(self):
+            self._handle(send_body=True)
+
+        def _handle(self, send_body: bool):
+            # URL: /cars/ferrari_458/ui/badge.png?w=192 -> content/cars/ferrari_458/ui/badge.png
+            try:
+                parsed = urllib.parse.urlsplit(self.path)
+                path = urllib.parse.unquote(parsed.path).lstrip('/')
+
+                # Sibling stations pull synced chunks from us: /_chunks/<sha256>
+                if path.startswith('_chunks/'):
+                    self._serve_chunk(path[len('_chunks/'):], send_body)
+                    return
+
+                full_path = os.path.realpath(os.path.join(content_root, path))
+                # Security: ensure we stay within content folder
+                if not content_root or os.path.commonpath([full_path, content_root]) != content_root:
+                    self.send_error(403, "Forbidden")
+                    return
+                if not os.path.isfile(full_path):
+                    self.send_error(404, "File not found")
+                    return
+
+                content_type = IMAGE_TYPES.get(os.path.splitext(full_path)[1].lower(), 'application/octet-stream')
+                width = urllib.parse.parse_qs(parsed.query).get('w', [None])[0]
+                if width is not None and content_type != 'application/octet-stream':
+                    thumb = self._thumbnail(full_path, width)
+                    if thumb:
+                        full_path, content_type = thumb, 'image/webp'
+                self._serve_file(full_path, content_type, send_body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            except Exception as e:
+                logger.error(f"ImageProxy error: {e}")
+                self.send_error(500, str(e))
+
+        def _thumbnail(self, source: str, width: str) -> Optional[str]:
+            if not thumb_cache_dir or thumbnails is None:
+                return None
+            try:
+                requested = int(width)
+            except ValueError:
+                return None
+            try:
+                thumb = thumbnails.make_thumbnail(source, requested, thumb_cache_dir)
+                return str(thumb) if thumb else None
+            except Exception as e:
+                logger.warning(f"Thumbnail failed for {source}: {e}")
+                return None
+
+        def _not_modified(self, etag: str, mtime: float) -> bool:
+            if_none_match = self.headers.get('If-None-Match')
+            if if_none_match:
+                return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+            if_modified_since = self.headers.get('If-Modified-Since')
+            if if_modified_since:
+                try:
+                    return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+                except (TypeError, ValueError):
+                    return False
+            return False
+
+        def _serve_file(self, full_path: str, content_type: str, send_body: bool):
+            stat = os.stat(full_path)
+            size = stat.st_size
+            etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+
+            common_headers = [
+                ('ETag', etag),
+                ('Last-Modified', formatdate(stat.st_mtime, usegmt=True)),
+                ('Access-Control-Allow-Origin', '*'),
+                ('Cache-Control', 'max-age=86400'),  # Cache for 1 day
+                ('Accept-Ranges', 'bytes'),
+            ]
+
+            if self._not_modified(etag, stat.st_mtime):
+                self.send_response(304)
+                for name, value in common_headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                return
+
+            try:
+                byte_range = parse_range(self.headers.get('Range'), size)
+                if byte_range and self.headers.get('If-Range') not in (None, etag):
+                    byte_range = None  # Resource changed since the client's partial copy
+            except ValueError:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            start, end = byte_range or (0, size - 1)
+            length = max(end - start + 1, 0)
+            self.send_response(206 if byte_range else 200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(length))
+            if byte_range:
+                self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+            for name, value in common_headers:
+                self.send_header(name, value)
+            self.end_headers()
+            if not send_body or not length:
+                return
+
+            with open(full_path, 'rb') as f:
+                # sendfile() where the OS supports it, chunked send() otherwise
+                self.connection.sendfile(f, offset=start, count=length)
+
+        def _serve_chunk(self, chunk_hash: str, send_body: bool):
+            if not re.fullmatch(r'[0-9a-f]{64}', chunk_hash or ''):
+                self.send_error(400, "Invalid chunk hash")
+                return
+            if chunk_cache is None or not chunk_cache.has(chunk_hash):
+                self.send_error(404, "Chunk not found")
+                return
+            # Chunks are content-addressed: the hash is a perfect validator
+            self._serve_file(str(chunk_cache.path(chunk_hash)), 'application/octet-stream', send_body)
+
+        def log_message(self, format, *args):
+            # Suppress default logging
+            pass
+
+    return ImageHandler
+
+
+class ImageProxyServer:
+    """
+    Simple HTTP server to serve local AC content images to the frontend.
+    Runs on port 8081 by default. Files are streamed with sendfile, conditional
+    (ETag / If-Modified-Since) and Range requests are honoured, and `?w=<px>`
+    returns a cached WebP thumbnail when Pillow is installed.
+    """
+    def __init__(self, port=8081, chunk_cache_dir: Optional[Path] = None, thumb_cache_dir: Optional[Path] = None):
+        self.port = port
+        self.server = None
+        self._thread = None
+        self.ac_path = None  # Will be set when station registers
+        self.chunk_cache_dir = chunk_cache_dir
+        self.thumb_cache_dir = thumb_cache_dir
+
+    def start(self, ac_path: str):
+        """Start the image proxy server"""
+        self.ac_path = ac_path
+        if not ac_path:
+            logger.warning("ImageProxy: No ac_path provided, not starting")
+            return
+        if self._thread and self._thread.is_alive():
+            logger.info("ImageProxy already running")
+            return
+
+        self._thread = threading.Thread(target=self._run_server, daemon=True)
+        self._thread.start()
+        logger.info(f"Image proxy server started on port {self.port}")
+
+    def _run_server(self):
+        """Run the HTTP server"""
+        chunk_cache = content_sync.ChunkCache(self.chunk_cache_dir) if self.chunk_cache_dir else None
+        handler = make_handler(os.path.join(self.ac_path, "content"), chunk_cache, self.thumb_cache_dir)
+        try:
+            # use ThreadingHTTPServer for parallel processing
+            self.server = ThreadingHTTPServer(('0.0.0.0', self.port), handler)
+            self.server.serve_forever()
+        except Exception as e:
+            logger.error(f"ImageProxy server error: {e}")
@@ -7,6 +7,7 @@ import requests
 import uuid
 import datetime
 import json
+import re
 from datetime import datetime, timezone
 import subprocess
 
@@ -14,6 +15,9 @@ import asyncio
 import threading
 import websockets
 import ac_telemetry
+import content_sync
+from content_scanner import ContentScanner
+from image_proxy import ImageProxyServer
 
 class JSONFormatter(logging.Formatter):
     def format(self, record):
@@ -88,6 +92,11 @@ AGENT_TOKEN = os.getenv("AGENT_TOKEN", "")
 STEAM_EXE = os.getenv("STEAM_EXE", "")
 STEAM_APP_ID = os.getenv("STEAM_APP_ID", "244210")
 LAUNCH_VIA_STEAM = os.getenv("AC_LAUNCH_VIA_STEAM", "false").lower() in {"1", "true", "yes"}
+CHUNK_CACHE_DIR = Path(os.getenv("CHUNK_CACHE_DIR", "chunk_cache"))
+SCAN_CACHE_FILE = Path(os.getenv("SCAN_CACHE_FILE", "content_scan_cache.json"))
+THUMB_CACHE_DIR = Path(os.getenv("THUMB_CACHE_DIR", "thumb_cache"))
+CHUNK_ANNOUNCE_INTERVAL = 300
+PEER_TIMEOUT = 5
 
 def _is_truthy(value):
     if isinstance(value, bool):
@@ -128,6 +137,12 @@ for config_path in config_paths:
                 STEAM_APP_ID = str(config.get("steam_app_id"))
             if "launch_via_steam" in config:
                 LAUNCH_VIA_STEAM = _is_truthy(config.get("launch_via_steam"))
+            if config.get("chunk_cache_dir"):
+                CHUNK_CACHE_DIR = Path(config["chunk_cache_dir"])
+            if config.get("scan_cache_file"):
+                SCAN_CACHE_FILE = Path(config["scan_cache_file"])
+            if config.get("thumb_cache_dir"):
+                THUMB_CACHE_DIR = Path(config["thumb_cache_dir"])
             logger.info(f"Loaded config from {config_path}. Server URL: {SERVER_URL}")
         break
     except Exception as e:
@@ -242,122 +257,28 @@ def get_system_info():
 
 
 # --- CONTENT SCANNER ---
+content_scanner = None
+
+def _content_proxy_base(station_ip: str = None) -> str:
+    # Use station IP for image proxy URL, fallback to detected IP
+    proxy_host = station_ip or get_ip_address() or "localhost"
+    return f"http://{proxy_host}:8081"
+
+def get_content_scanner():
+    global content_scanner
+    if content_scanner is None:
+        content_scanner = ContentScanner(SCAN_CACHE_FILE)
+    return content_scanner
+
 def scan_ac_content(ac_path: str, station_ip: str = None) -> dict:
     """
     Scan the Assetto Corsa content folder for installed cars and tracks.
     Returns a dict with 'cars' and 'tracks' lists, including proxy image URLs.
     """
-    result = {"cars": [], "tracks": []}
-    
-    if not ac_path or not os.path.exists(ac_path):
-        logger.warning(f"AC path not found or not configured: {ac_path}")
-        return result
-    
-    content_path = os.path.join(ac_path, "content")
-    
-    # Use station IP for image proxy URL, fallback to detected IP
-    proxy_host = station_ip or get_ip_address() or "localhost"
-    proxy_base = f"http://{proxy_host}:8081"
-    
-    # Helper to find first existing image and return proxy URL
-    def find_image_url(base_path, content_path_root, *filenames):
-        for fname in filenames:
-            full_path = os.path.join(base_path, fname)
-            if os.path.exists(full_path):
-                # Convert to relative path from content folder
-                rel_path = os.path.relpath(full_path, content_path_root).replace("\\", "/")
-                return f"{proxy_base}/{rel_path}"
-        return None
-    
-    # Scan Cars
-    cars_path = os.path.join(content_path, "cars")
-    if os.path.exists(cars_path):
-        for car_folder in os.listdir(cars_path):
-            car_dir = os.path.join(cars_path, car_folder)
-            if os.path.isdir(car_dir):
-                ui_dir = os.path.join(car_dir, "ui")
-                ui_json = os.path.join(ui_dir, "ui_car.json")
-                name = car_folder
-                brand = ""
-                
-                specs = {}
-                if os.path.exists(ui_json):
-                    try:
-                        with open(ui_json, 'r', encoding='utf-8', errors='ignore') as f:
-                            ui_data = json.load(f)
-                            name = ui_data.get("name", car_folder)
-                            brand = ui_data.get("brand", "")
-                            specs = ui_data.get("specs", {})
-                    except Exception:
-                        pass
-                
-                # Find preview image and generate proxy URL
-                image_url = None
-                
-                # Check for skin preview first (Requested behavior)
-                skins_path = os.path.join(car_dir, "skins")
-                if os.path.exists(skins_path):
-                    try:
-                        # Get first alphabetical skin folder
-                        skins = sorted([d for d in os.listdir(skins_path) if os.path.isdir(os.path.join(skins_path, d))])
-                        if skins:
-                            first_skin_dir = os.path.join(skins_path, skins[0])
-                            image_url = find_image_url(first_skin_dir, content_path, "preview.jpg", "preview.png")
-                    except Exception:
-                        pass
-                
-                if not image_url:
-                    image_url = (
-                        find_image_url(ui_dir, content_path, "preview.png", "preview.jpg") or
-                        find_image_url(car_dir, content_path, "logo.png") or
-                        find_image_url(ui_dir, content_path, "badge.png")
-                    )
-                
-                result["cars"].append({
-                    "id": car_folder,
-                    "name": name,
-                    "brand": brand,
-                    "image_url": image_url,
-                    "specs": specs
-                })
-    
-    # Scan Tracks
-    tracks_path = os.path.join(content_path, "tracks")
-    if os.path.exists(tracks_path):
-        for track_folder in os.listdir(tracks_path):
-            track_dir = os.path.join(tracks_path, track_folder)
-            if os.path.isdir(track_dir):
-                ui_dir = os.path.join(track_dir, "ui")
-                ui_json = os.path.join(ui_dir, "ui_track.json")
-                name = track_folder
-                layout = ""
-                geotags = []
-                
-                if os.path.exists(ui_json):
-                    try:
-                        with open(ui_json, 'r', encoding='utf-8', errors='ignore') as f:
-                            ui_data = json.load(f)
-                            name = ui_data.get("name", track_folder)
-                            layout = ui_data.get("description", "")
-                            geotags = ui_data.get("geotags", [])
-                    except Exception:
-                        pass
-                
-                # Find preview image and generate proxy URL
-                image_url = find_image_url(ui_dir, content_path, "preview.png")
-                map_url = find_image_url(ui_dir, content_path, "outline.png", "map.png")
-                
-                result["tracks"].append({
-                    "id": track_folder,
-                    "name": name,
-                    "layout": layout,
-                    "image_url": image_url,
-                    "map_url": map_url,
-                    "geotags": geotags
-                })
-    
-    logger.info(f"Scanned AC content: {len(result['cars'])} cars, {len(result['tracks'])} tracks")
-    return result
+    scanner = get_content_scanner()
+    if scanner.scan(ac_path, _content_proxy_base(station_ip)) is None:
+        return {"cars": [], "tracks": []}
+    return scanner.content()
 
 
 # --- PROCESS WATCHDOG ---
@@ -462,100 +383,8 @@ session_stop_event = threading.Event()
 
 
 # --- IMAGE PROXY SERVER ---
-class ImageProxyServer:
-    """
-    Simple HTTP server to serve local AC content images to the frontend.
-    Runs on port 8081 by default.
-    """
-    def __init__(self, port=8081):
-        self.port = port
-        self.server = None
-        self._thread = None
-        self.ac_path = None  # Will be set when station registers
-    
-    def start(self, ac_path: str):
-        """Start the image proxy server"""
-        self.ac_path = ac_path
-        if not ac_path:
-            logger.warning("ImageProxy: No ac_path provided, not starting")
-            return
-        if self._thread and self._thread.is_alive():
-            logger.info("ImageProxy already running")
-            return
-        
-        self._thread = threading.Thread(target=self._run_server, daemon=True)
-        self._thread.start()
-        logger.info(f"Image proxy server started on port {self.port}")
-    
-    def _run_server(self):
-        """Run the HTTP server"""
-        from http.server import HTTPServer, SimpleHTTPRequestHandler, ThreadingHTTPServer
-        import urllib.parse
-        
-        ac_path = self.ac_path
-        
-        class ImageHandler(SimpleHTTPRequestHandler):
-            def __init__(self, *args, **kwargs):
-                # Don't call super().__init__ here, we override directory
-                self.ac_content_path = os.path.join(ac_path, "content") if ac_path else ""
-                super().__init__(*args, directory=self.ac_content_path, **kwargs)
-            
-            def do_GET(self):
-                # Parse the path and serve images from AC content folder
-                # URL: /cars/ferrari_458/ui/badge.png -> content/cars/ferrari_458/ui/badge.png
-                try:
-                    # Clean path
-                    path = urllib.parse.unquote(self.path)
-                    if path.startswith('/'):
-                        path = path[1:]
-                    
-                    full_path = os.path.join(self.ac_content_path, path)
-                    
-                    # Security: ensure we stay within content folder
-                    if not os.path.realpath(full_path).startswith(os.path.realpath(self.ac_content_path)):
-                        self.send_error(403, "Forbidden")
-                        return
-                    
-                    if os.path.exists(full_path) and os.path.isfile(full_path):
-                        # Determine content type
-                        ext = os.path.splitext(full_path)[1].lower()
-                        content_type = {
-                            '.png': 'image/png',
-                            '.jpg': 'image/jpeg',
-                            '.jpeg': 'image/jpeg',
-                            '.gif': 'image/gif',
-                            '.webp': 'image/webp',
-                        }.get(ext, 'application/octet-stream')
-                        
-                        # Serve the file
-                        self.send_response(200)
-                        self.send_header('Content-Type', content_type)
-                        self.send_header('Access-Control-Allow-Origin', '*')
-                        self.send_header('Cache-Control', 'max-age=86400')  # Cache for 1 day
-                        self.end_headers()
-                        
-                        with open(full_path, 'rb') as f:
-                            self.wfile.write(f.read())
-                    else:
-                        self.send_error(404, "File not found")
-                except Exception as e:
-                    logger.error(f"ImageProxy error: {e}")
-                    self.send_error(500, str(e))
-            
-            def log_message(self, format, *args):
-                # Suppress default logging
-                pass
-        
-        try:
-            # use ThreadingHTTPServer for parallel processing
-            self.server = ThreadingHTTPServer(('0.0.0.0', self.port), ImageHandler)
-            self.server.serve_forever()
-        except Exception as e:
-            logger.error(f"ImageProxy server error: {e}")
-
-
 # Global image proxy instance
-image_proxy = ImageProxyServer()
+image_proxy = ImageProxyServer(chunk_cache_dir=CHUNK_CACHE_DIR, thumb_cache_dir=THUMB_CACHE_DIR)
 
 def register_agent():
     info = get_system_info()
@@ -608,6 +437,52 @@ def download_file(url, local_path):
         logger.error(f"Failed to download {url}: {e}")
         return False
 
+def fetch_chunk(chunk_hash):
+    resp = requests.get(
+        f"{SERVER_URL}/mods/chunks/{chunk_hash}",
+        headers=get_agent_headers(),
+        timeout=30
+    )
+    resp.raise_for_status()
+    return resp.content
+
+def fetch_chunk_from_peer(peer_url, chunk_hash):
+    resp = requests.get(f"{peer_url}/_chunks/{chunk_hash}", timeout=PEER_TIMEOUT)
+    resp.raise_for_status()
+    return resp.content
+
+def lookup_chunk_peers(station_id, hashes):
+    resp = requests.post(
+        f"{SERVER_URL}/stations/{station_id}/chunks/peers",
+        json={"hashes": hashes},
+        headers=get_agent_headers(),
+        timeout=REQUEST_TIMEOUT
+    )
+    resp.raise_for_status()
+    return resp.json().get("peers", {})
+
+def announce_chunks(station_id, hashes, replace=False):
+    """Tell the server which chunks this station can serve to its siblings."""
+    requests.post(
+        f"{SERVER_URL}/stations/{station_id}/chunks",
+        json={"hashes": hashes, "replace": replace, "port": image_proxy.port},
+        headers=get_agent_headers(),
+        timeout=REQUEST_TIMEOUT
+    )
+
+_last_full_announce = 0.0
+
+def _announce_chunk_cache(station_id, chunk_cache):
+    # Full re-announce now and then so a restarted server relearns who holds what
+    global _last_full_announce
+    if time.time() - _last_full_announce < CHUNK_ANNOUNCE_INTERVAL:
+        return
+    try:
+        announce_chunks(station_id, chunk_cache.hashes(), replace=True)
+        _last_full_announce = time.time()
+    except Exception as e:
+        logger.debug(f"Chunk announce failed: {e}")
+
 def synchronize_content(station_id):
     logger.info("Starting synchronization check...")
 
@@ -636,6 +511,9 @@ def synchronize_content(station_id):
         logger.info("No active profile/manifest. Skipping sync.")
         return "online"
 
+    chunk_cache = content_sync.ChunkCache(CHUNK_CACHE_DIR)
+    _announce_chunk_cache(station_id, chunk_cache)
+
     # 2. Get Local Manifest
     local_manifest = hashing.generate_manifest(str(AC_CONTENT_DIR))
     
@@ -679,13 +557,47 @@ def synchronize_content(station_id):
     #     except Exception as e:
     #         logger.error(f"Failed to delete {file_path}: {e}")
 
+    # Reuse what we already have, then pull the rest from sibling stations or the server
+    chunked = [(file_path, info) for file_path, info in files_to_download if info.get('chunks')]
+    for file_path, info in chunked:
+        wanted = {c['hash'] for c in info['chunks'] if not chunk_cache.has(c['hash'])}
+        try:
+            chunk_cache.seed_from_file(AC_CONTENT_DIR / file_path, wanted)
+        except Exception as e:
+            logger.warning(f"Could not reuse local copy of {file_path}: {e}")
+    missing = content_sync.missing_chunks((info for _, info in chunked), chunk_cache)
+    if missing:
+        try:
+            stats = content_sync.prefetch_chunks(
+                missing,
+                chunk_cache,
+                fetch_chunk,
+                fetch_chunk_from_peer,
+                lambda hashes: lookup_chunk_peers(station_id, hashes),
+                lambda hashes: announce_chunks(station_id, hashes),
+            )
+            logger.info(f"Fetched chunks: {stats['peer']} bytes from peers, {stats['server']} bytes from server")
+        except Exception as e:
+            logger.warning(f"Chunk prefetch incomplete: {e}")
+
     for file_path, info in files_to_download:
         local_path = AC_CONTENT_DIR / file_path
+        if info.get('chunks'):
+            # Big files: only fetch the chunks that changed
+            try:
+                downloaded = content_sync.sync_chunked_file(local_path, info, chunk_cache, fetch_chunk)
+                logger.info(f"Synced: {file_path} ({downloaded} of {info['size']} bytes downloaded)")
+                continue
+            except Exception as e:
+                logger.warning(f"Chunked sync failed for {file_path}, falling back to full download: {e}")
         if download_file(info['url'], local_path):
             logger.info(f"Downloaded: {file_path}")
         else:
             logger.error(f"Failed to download: {file_path}")
             return "error" # Stop if download fails
+
+    # Keep only chunks the current content set still references
+    chunk_cache.prune(content_sync.referenced_chunks(target_manifest))
             
     return "online"
 
@@ -1310,7 +1222,18 @@ CLOUD_SPEED=0.2
                     ac_path = data.get("ac_path") or get_system_info().get("ac_path")
                     station_ip = data.get("station_ip") or data.get("ip_address")
                     logger.info(f"Received SCAN_CONTENT command for: {ac_path}")
-                    content = scan_ac_content(ac_path, station_ip=station_ip)
+                    scanner = get_content_scanner()
+                    diff = scanner.scan(ac_path, _content_proxy_base(station_ip))
+                    if diff is not None and diff.get("base_version") is not None and not data.get("full"):
+                        # Only what changed since the version the server already holds
+                        await websocket.send(json.dumps({
+                            "type": "content_scan_diff",
+                            "data": diff
+                        }))
+                        logger.info(f"Sent content scan diff {diff['base_version']} -> {diff['version']}")
+                        continue
+
+                    content = scanner.content() if diff is not None else {"cars": [], "tracks": []}
                     # Send response back
                     await websocket.send(json.dumps({
                         "type": "content_scan_result",
@@ -25,7 +25,7 @@ if not exist ".venv" (
 :: 3. Install Deps
 echo [2/3] Installing Dependencies...
 call .venv\Scripts\activate
-pip install requests websockets psutil
+pip install requests websockets psutil Pillow numpy
 :: psutil might be needed for process management later
 
 :: 4. Configuration
@@ -0,0 +1,208 @@
+import json
+import os
+import time
+
+from agent.content_scanner import ContentScanner
+
+PROXY = "http://10.0.0.5:8081"
+
+
+def _write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data) if isinstance(data, dict) else data)
+
+
+def _make_install(root):
+    content = root / "content"
+    _write(content / "cars" / "ks_f40" / "ui" / "ui_car.json", {"name": "Ferrari F40", "brand": "Ferrari"})
+    _write(content / "cars" / "ks_f40" / "skins" / "red" / "preview.jpg", "jpg")
+    _write(content / "cars" / "ks_m3" / "ui" / "ui_car.json", {"name": "BMW M3"})
+    _write(content / "tracks" / "monza" / "ui" / "ui_track.json", {"name": "Monza", "description": "GP"})
+    _write(content / "tracks" / "monza" / "ui" / "outline.png", "png")
+    return root
+
+
+def _bump(path):
+    # Filesystems with coarse mtimes would otherwise hide the edit
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000_000))
+
+
+def test_first_scan_is_full_then_diffs_only_changes(tmp_path):
+    install = _make_install(tmp_path / "ac")
+    scanner = ContentScanner(tmp_path / "cache.json")
+
+    first = scanner.scan(str(install), PROXY)
+    assert first["base_version"] is None
+    content = scanner.content()
+    assert content["scan_version"] == first["version"] == 1
+    f40 = next(c for c in content["cars"] if c["id"] == "ks_f40")
+    assert f40["image_url"] == f"{PROXY}/cars/ks_f40/skins/red/preview.jpg"
+    assert content["tracks"][0]["map_url"] == f"{PROXY}/tracks/monza/ui/outline.png"
+
+    unchanged = scanner.scan(str(install), PROXY)
+    assert unchanged["base_version"] == 1 and unchanged["version"] == 1
+    assert not any(unchanged["cars"].values()) and not any(unchanged["tracks"].values())
+
+    # Edit one car, drop another, add a track; a fresh scanner reuses the persisted cache
+    ui_json = install / "content" / "cars" / "ks_m3" / "ui" / "ui_car.json"
+    _write(ui_json, {"name": "BMW M3 E30"})
+    _bump(ui_json)
+    for path in sorted((install / "content" / "tracks" / "monza").rglob("*"), reverse=True):
+        path.unlink() if path.is_file() else path.rmdir()
+    (install / "content" / "tracks" / "monza").rmdir()
+    _write(install / "content" / "tracks" / "spa" / "ui" / "ui_track.json", {"name": "Spa"})
+
+    diff = ContentScanner(tmp_path / "cache.json").scan(str(install), PROXY)
+    assert diff["base_version"] == 1 and diff["version"] == 2
+    assert [c["name"] for c in diff["cars"]["changed"]] == ["BMW M3 E30"]
+    assert diff["cars"]["added"] == [] and diff["cars"]["removed"] == []
+    assert [t["id"] for t in diff["tracks"]["added"]] == ["spa"]
+    assert diff["tracks"]["removed"] == ["monza"]
+
+
+def test_new_skin_preview_is_picked_up(tmp_path):
+    install = _make_install(tmp_path / "ac")
+    scanner = ContentScanner()
+    scanner.scan(str(install), PROXY)
+
+    # Only the skin folder changes: car, ui and skins/ keep their mtimes
+    skin = install / "content" / "cars" / "ks_f40" / "skins" / "red"
+    (skin / "preview.jpg").unlink()
+    _write(skin / "preview.png", "png")
+    _bump(skin)
+    diff = scanner.scan(str(install), PROXY)
+    assert [c["image_url"] for c in diff["cars"]["changed"]] == [f"{PROXY}/cars/ks_f40/skins/red/preview.png"]
+
+
+def test_changed_proxy_host_forces_full_scan(tmp_path):
+    install = _make_install(tmp_path / "ac")
+    scanner = ContentScanner()
+    scanner.scan(str(install), PROXY)
+    diff = scanner.scan(str(install), "http://10.0.0.9:8081")
+    assert diff["base_version"] is None
+    assert diff["version"] == 2
+    assert all(c["image_url"].startswith("http://10.0.0.9:8081/") for c in scanner.content()["cars"] if c["image_url"])
+
+
+def test_missing_install_returns_none(tmp_path):
+    assert ContentScanner().scan(str(tmp_path / "nope"), PROXY) is None
+
+
+def _legacy_scan(ac_path, proxy_base):
+    """Sequential listdir/exists scanner the agent shipped before scandir + worker pool"""
+    result = {"cars": [], "tracks": []}
+    content_path = os.path.join(ac_path, "content")
+
+    def find_image_url(base_path, *filenames):
+        for fname in filenames:
+            full_path = os.path.join(base_path, fname)
+            if os.path.exists(full_path):
+                return f"{proxy_base}/{os.path.relpath(full_path, content_path).replace(os.sep, '/')}"
+        return None
+
+    cars_path = os.path.join(content_path, "cars")
+    for car_folder in os.listdir(cars_path):
+        car_dir = os.path.join(cars_path, car_folder)
+        if not os.path.isdir(car_dir):
+            continue
+        ui_dir = os.path.join(car_dir, "ui")
+        ui_json = os.path.join(ui_dir, "ui_car.json")
+        name, brand, specs = car_folder, "", {}
+        if os.path.exists(ui_json):
+            try:
+                with open(ui_json, 'r', encoding='utf-8', errors='ignore') as f:
+                    ui_data = json.load(f)
+                    name = ui_data.get("name", car_folder)
+                    brand = ui_data.get("brand", "")
+                    specs = ui_data.get("specs", {})
+            except Exception:
+                pass
+        image_url = None
+        skins_path = os.path.join(car_dir, "skins")
+        if os.path.exists(skins_path):
+            skins = sorted([d for d in os.listdir(skins_path) if os.path.isdir(os.path.join(skins_path, d))])
+            if skins:
+                image_url = find_image_url(os.path.join(skins_path, skins[0]), "preview.jpg", "preview.png")
+        if not image_url:
+            image_url = (
+                find_image_url(ui_dir, "preview.png", "preview.jpg") or
+                find_image_url(car_dir, "logo.png") or
+                find_image_url(ui_dir, "badge.png")
+            )
+        result["cars"].append({"id": car_folder, "name": name, "brand": brand, "image_url": image_url, "specs": specs})
+
+    tracks_path = os.path.join(content_path, "tracks")
+    for track_folder in os.listdir(tracks_path):
+        track_dir = os.path.join(tracks_path, track_folder)
+        if not os.path.isdir(track_dir):
+            continue
+        ui_dir = os.path.join(track_dir, "ui")
+        ui_json = os.path.join(ui_dir, "ui_track.json")
+        name, layout, geotags = track_folder, "", []
+        if os.path.exists(ui_json):
+            try:
+                with open(ui_json, 'r', encoding='utf-8', errors='ignore') as f:
+                    ui_data = json.load(f)
+                    name = ui_data.get("name", track_folder)
+                    layout = ui_data.get("description", "")
+                    geotags = ui_data.get("geotags", [])
+            except Exception:
+                pass
+        result["tracks"].append({
+            "id": track_folder, "name": name, "layout": layout,
+            "image_url": find_image_url(ui_dir, "preview.png"),
+            "map_url": find_image_url(ui_dir, "outline.png", "map.png"),
+            "geotags": geotags,
+        })
+    return result
+
+
+def _make_synthetic_install(root, cars=400, tracks=60):
+    content = root / "content"
+    for i in range(cars):
+        car = content / "cars" / f"mod_car_{i:04d}"
+        if i % 7:
+            _write(car / "ui" / "ui_car.json", {"name": f"Car {i}", "brand": f"Brand {i % 13}", "specs": {"bhp": f"{300 + i}bhp"}})
+        elif i % 2:
+            _write(car / "ui" / "ui_car.json", "{ not json")
+        for skin in range(i % 4):
+            _write(car / "skins" / f"skin_{skin:02d}" / ("preview.jpg" if (i + skin) % 3 else "livery.png"), "img")
+        if i % 5 == 0:
+            _write(car / "ui" / "badge.png", "img")
+        if i % 9 == 0:
+            _write(car / "logo.png", "img")
+    _write(content / "cars" / "readme.txt", "not a car")
+    for i in range(tracks):
+        track = content / "tracks" / f"mod_track_{i:03d}"
+        _write(track / "ui" / "ui_track.json", {"name": f"Track {i}", "description": "GP", "geotags": ["45N", "9E"]})
+        if i % 2:
+            _write(track / "ui" / "preview.png", "img")
+        _write(track / "ui" / ("outline.png" if i % 3 else "map.png"), "img")
+    return root
+
+
+def test_parallel_scan_matches_legacy_output_within_budget(tmp_path):
+    install = str(_make_synthetic_install(tmp_path / "ac"))
+
+    started = time.perf_counter()
+    expected = _legacy_scan(install, PROXY)
+    legacy_elapsed = time.perf_counter() - started
+
+    scanner = ContentScanner(workers=8)
+    started = time.perf_counter()
+    scanner.scan(install, PROXY)
+    full_elapsed = time.perf_counter() - started
+    content = scanner.content()
+    assert content["cars"] == expected["cars"]
+    assert content["tracks"] == expected["tracks"]
+
+    started = time.perf_counter()
+    diff = scanner.scan(install, PROXY)
+    rescan_elapsed = time.perf_counter() - started
+    assert diff["version"] == diff["base_version"]
+
+    # Generous absolute budgets so slow CI disks don't flake; the incremental
+    # rescan only stats folders and must beat a from-scratch sequential scan.
+    assert full_elapsed < 5.0, f"full scan took {full_elapsed:.2f}s"
+    assert rescan_elapsed < max(legacy_elapsed, 0.5), f"rescan {rescan_elapsed:.3f}s vs legacy {legacy_elapsed:.3f}s"
@@ -0,0 +1,97 @@
+import io
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from agent import image_proxy
+
+
+@pytest.fixture
+def proxy(tmp_path):
+    content = tmp_path / "content"
+    (content / "cars" / "ks_f40" / "ui").mkdir(parents=True)
+    (content / "cars" / "ks_f40" / "ui" / "badge.png").write_bytes(bytes(range(256)) * 4)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), image_proxy.make_handler(str(content), None, tmp_path / "thumbs"))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", content
+    server.shutdown()
+    server.server_close()
+
+
+def _get(url, headers=None):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {})) as resp:
+            return resp.status, resp.headers, resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_streams_file_and_answers_conditional_requests(proxy):
+    base, _ = proxy
+    status, headers, body = _get(f"{base}/cars/ks_f40/ui/badge.png")
+    assert status == 200
+    assert body == bytes(range(256)) * 4
+    assert headers["Content-Type"] == "image/png"
+
+    status, _, body = _get(f"{base}/cars/ks_f40/ui/badge.png", {"If-None-Match": headers["ETag"]})
+    assert status == 304 and body == b""
+    status, _, _ = _get(f"{base}/cars/ks_f40/ui/badge.png", {"If-Modified-Since": headers["Last-Modified"]})
+    assert status == 304
+
+
+def test_range_requests(proxy):
+    base, _ = proxy
+    status, headers, body = _get(f"{base}/cars/ks_f40/ui/badge.png", {"Range": "bytes=10-19"})
+    assert status == 206
+    assert body == bytes(range(10, 20))
+    assert headers["Content-Range"] == "bytes 10-19/1024"
+
+    status, _, body = _get(f"{base}/cars/ks_f40/ui/badge.png", {"Range": "bytes=-4"})
+    assert status == 206 and body == bytes(range(252, 256))
+    status, headers, _ = _get(f"{base}/cars/ks_f40/ui/badge.png", {"Range": "bytes=5000-"})
+    assert status == 416
+    assert headers["Content-Range"] == "bytes */1024"
+
+
+def test_rejects_paths_outside_content(proxy):
+    base, _ = proxy
+    assert _get(f"{base}/../secret.txt")[0] in (403, 404)
+    assert _get(f"{base}/%2e%2e/secret.txt")[0] == 403
+
+
+def test_serves_cached_webp_thumbnails(proxy):
+    Image = pytest.importorskip("PIL.Image")
+    base, content = proxy
+    buffer = io.BytesIO()
+    Image.new("RGB", (1280, 720), (200, 20, 20)).save(buffer, "JPEG")
+    preview = content / "cars" / "ks_f40" / "ui" / "preview.jpg"
+    preview.write_bytes(buffer.getvalue())
+
+    status, headers, body = _get(f"{base}/cars/ks_f40/ui/preview.jpg?w=150")
+    assert status == 200
+    assert headers["Content-Type"] == "image/webp"
+    assert len(body) < len(buffer.getvalue())
+    with Image.open(io.BytesIO(body)) as thumb:
+        assert thumb.size == (192, 108)
+
+    status, _, _ = _get(f"{base}/cars/ks_f40/ui/preview.jpg?w=150", {"If-None-Match": headers["ETag"]})
+    assert status == 304
+
+
+def test_failed_thumbnail_render_leaves_no_temp_file(tmp_path, monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+    source = tmp_path / "preview.png"
+    Image.new("RGB", (400, 200)).save(source)
+
+    def broken_save(self, fp, *args, **kwargs):
+        with open(fp, "wb") as f:
+            f.write(b"partial")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(Image.Image, "save", broken_save)
+    with pytest.raises(OSError):
+        image_proxy.thumbnails.make_thumbnail(str(source), 100, tmp_path / "thumbs")
+    assert [p for p in (tmp_path / "thumbs").rglob("*") if p.is_file()] == []
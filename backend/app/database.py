@@ -89,6 +89,139 @@ def ensure_station_schema(db_engine):
                 )
             logger.info("Added missing column stations.%s", name)
 
+def drop_track_key_schema(db_engine):
+    """Drops the old normalized track_key columns; track_id (services.content_catalog) replaced them."""
+    inspector = inspect(db_engine)
+    tables = set(inspector.get_table_names())
+    indexes = {
+        "events": "ix_events_track_key",
+        "session_results": "idx_session_track_key_date",
+    }
+
+    for table, index in indexes.items():
+        if table not in tables:
+            continue
+        if "track_key" not in {col["name"] for col in inspector.get_columns(table)}:
+            continue
+        with db_engine.begin() as conn:
+            # SQLite refuses to drop an indexed column
+            conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN track_key"))
+        logger.info("Dropped %s.track_key", table)
+
+def ensure_content_id_schema(db_engine):
+    """Adds the track_id/car_id columns (filled by services.content_catalog.backfill) and merge tombstones to older databases."""
+    inspector = inspect(db_engine)
+    tables = set(inspector.get_table_names())
+    columns = {
+        "tracks": {"merged_into_id": "tracks"},
+        "cars": {"merged_into_id": "cars"},
+        "session_results": {"track_id": "tracks", "car_id": "cars"},
+        "events": {"track_id": "tracks"},
+        "lobbies": {"track_id": "tracks", "car_id": "cars"},
+        "elimination_races": {"track_id": "tracks"},
+    }
+    indexes = [
+        "CREATE INDEX IF NOT EXISTS idx_session_track_car_date ON session_results (track_id, car_id, date)",
+        "CREATE INDEX IF NOT EXISTS idx_session_car_date ON session_results (car_id, date)",
+        "CREATE INDEX IF NOT EXISTS ix_events_track_id ON events (track_id)",
+    ]
+
+    added = False
+    with db_engine.begin() as conn:
+        for table, specs in columns.items():
+            if table not in tables:
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table)}
+            for name, target in specs.items():
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} INTEGER REFERENCES {target}(id)"))
+                    logger.info("Added missing column %s.%s", table, name)
+                    added = True
+        if added:
+            for statement in indexes:
+                conn.execute(text(statement))
+
+def ensure_job_schema(db_engine):
+    """Adds the jobs.heartbeat_at lease column to databases created before it existed."""
+    inspector = inspect(db_engine)
+    if "jobs" not in inspector.get_table_names():
+        return
+    if "heartbeat_at" in {col["name"] for col in inspector.get_columns("jobs")}:
+        return
+    with db_engine.begin() as conn:
+        conn.execute(text("ALTER TABLE jobs ADD COLUMN heartbeat_at TIMESTAMP"))
+    logger.info("Added missing column jobs.heartbeat_at")
+
+def ensure_driver_stats_schema(db_engine):
+    """
+    Adds the per-track lap time accumulators to driver_track_stats. Existing rollups
+    lack them, so they are dropped; each driver is rebuilt from the raw laps on their
+    next read (services.driver_stats.get_stats).
+    """
+    inspector = inspect(db_engine)
+    if "driver_track_stats" not in inspector.get_table_names():
+        return
+    if "lap_m2" in {col["name"] for col in inspector.get_columns("driver_track_stats")}:
+        return
+    with db_engine.begin() as conn:
+        conn.execute(text("ALTER TABLE driver_track_stats ADD COLUMN valid_laps INTEGER DEFAULT 0"))
+        conn.execute(text("ALTER TABLE driver_track_stats ADD COLUMN lap_mean FLOAT DEFAULT 0"))
+        conn.execute(text("ALTER TABLE driver_track_stats ADD COLUMN lap_m2 FLOAT DEFAULT 0"))
+        for table in ("driver_car_stats", "driver_track_stats", "driver_active_days", "driver_stats"):
+            conn.execute(text(f"DELETE FROM {table}"))
+    logger.info("Added per-track lap accumulators; driver stats will be rebuilt on read")
+
+def ensure_analytics_rollup_schema(db_engine):
+    """
+    Recreates the analytics rollup tables when they predate their unique bucket keys.
+    They only hold derived rows, so dropping them and clearing the backfill marker
+    is enough: the scheduler rebuilds them from the sessions on startup.
+    """
+    from .services.analytics_rollup import BACKFILL_SETTING
+
+    inspector = inspect(db_engine)
+    if "analytics_hourly" not in inspector.get_table_names():
+        return
+    if "bucket_key" in {col["name"] for col in inspector.get_columns("analytics_hourly")}:
+        return
+    rollup_tables = [Base.metadata.tables["analytics_hourly"], Base.metadata.tables["analytics_daily_popularity"]]
+    with db_engine.begin() as conn:
+        Base.metadata.drop_all(bind=conn, tables=rollup_tables)
+        Base.metadata.create_all(bind=conn, tables=rollup_tables)
+        conn.execute(text("DELETE FROM settings WHERE key = :key"), {"key": BACKFILL_SETTING})
+    logger.info("Recreated analytics rollup tables with unique bucket keys")
+
+# Indexes made redundant by a wider composite one (name -> replacement)
+SUPERSEDED_INDEXES = {
+    "idx_session_valid": "idx_laptime_session_valid_time",
+    "idx_analytics_popularity_day": "uq_analytics_popularity_bucket",
+    "ix_session_results_driver_name": "idx_session_driver_date",
+    # Reads filter on track_id/car_id now, not on the free-text names
+    "idx_track_car_date": "idx_session_track_car_date",
+}
+
+def ensure_model_indexes(db_engine):
+    """
+    Creates indexes declared on the models but missing from existing tables
+    (create_all only indexes the tables it creates), then drops superseded ones.
+    """
+    inspector = inspect(db_engine)
+    tables = set(inspector.get_table_names())
+
+    with db_engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    # Another worker starting up at the same time may have just created it
+                    index.create(bind=conn, checkfirst=True)
+                    logger.info("Created missing index %s on %s", index.name, table.name)
+        for name in SUPERSEDED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
 def get_db():
     db = SessionLocal()
     try:
@@ -1,7 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from .database import engine, Base, ensure_station_schema
+from .database import engine, Base, ensure_station_schema, drop_track_key_schema, ensure_content_id_schema, ensure_model_indexes, ensure_job_schema, ensure_analytics_rollup_schema, ensure_driver_stats_schema
 from .routers import stations, mods, telemetry, websockets, settings, profiles, events, config_manager, championships, integrations, tournament, logs, ads, auth, backup, exports, loyalty, bookings, analytics, push, elimination, elo, hardware, control, drivers, payments, tables, tracks
 
 # ...
@@ -9,10 +9,18 @@ from .routers import stations, mods, telemetry, websockets, settings, profiles,
 
 from .routers.logs import MemoryLogHandler
 from .services.scheduler import start_scheduler, stop_scheduler
+from .services import jobs as job_runner
+from .services import universal_content, content_catalog
 
 # Create Tables
 Base.metadata.create_all(bind=engine)
 ensure_station_schema(engine)
+drop_track_key_schema(engine)
+ensure_content_id_schema(engine)
+ensure_job_schema(engine)
+ensure_analytics_rollup_schema(engine)
+ensure_driver_stats_schema(engine)
+ensure_model_indexes(engine)
 
 from fastapi.staticfiles import StaticFiles
 import os
@@ -33,6 +41,26 @@ def _validate_runtime_config():
     if missing:
         raise RuntimeError(f"Missing required environment variables: {', '.join(missing)}")
 
+def _backfill_station_content():
+    from .database import SessionLocal
+    db = SessionLocal()
+    try:
+        universal_content.backfill_from_cache(db)
+    except Exception as e:
+        logger.error(f"station_content backfill failed: {e}")
+    finally:
+        db.close()
+
+def _backfill_content_catalog():
+    from .database import SessionLocal
+    db = SessionLocal()
+    try:
+        content_catalog.backfill(db)
+    except Exception as e:
+        logger.error(f"track/car id backfill failed: {e}")
+    finally:
+        db.close()
+
 # Lifecycle events
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -43,9 +71,14 @@ async def lifespan(app: FastAPI):
         start_scheduler()
     else:
         logger.info("Scheduler disabled by ENABLE_SCHEDULER")
+    # Resume background jobs interrupted by a restart
+    job_runner.recover_jobs()
+    _backfill_station_content()
+    _backfill_content_catalog()
     yield
     # Shutdown
     stop_scheduler()
+    job_runner.shutdown()
 
 
 app = FastAPI(
@@ -178,6 +211,10 @@ app.include_router(lobby.router)
 # Track Layout Parser
 app.include_router(tracks.router)
 
+# Canonical track/car identities
+from .routers import catalog
+app.include_router(catalog.router)
+
 # Scenarios
 # Scenarios
 from .routers import scenarios
@@ -187,6 +224,9 @@ app.include_router(scenarios.router)
 from .routers import leaderboard
 app.include_router(leaderboard.router)
 
+from .routers import jobs
+app.include_router(jobs.router)
+
 
 # @app.get("/")
 # async def root():
@@ -1,8 +1,14 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Table, JSON, Index
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, DateTime, Boolean, ForeignKey, Table, JSON, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .database import Base
 from datetime import datetime, timezone
 
+
+def normalize_track_key(track_name):
+    """Normalized (trimmed, lowercase) name; the alias key of a track or car (services/content_catalog.py)."""
+    key = track_name.strip().lower() if track_name else ""
+    return key or None
+
 # Association Tables
 profile_mods = Table(
     "profile_mods",
@@ -89,6 +95,21 @@ class Station(Base):
     active_profile = relationship("Profile")
 
 
+class StationContent(Base):
+    """One installed car/track per station, normalized from the agent's content scan"""
+    __tablename__ = "station_content"
+
+    id = Column(Integer, primary_key=True, index=True)
+    station_id = Column(Integer, ForeignKey("stations.id"), nullable=False, index=True)
+    item_type = Column(String(10), nullable=False)  # car, track
+    item_id = Column(String, nullable=False)  # AC folder name
+
+    __table_args__ = (
+        UniqueConstraint('station_id', 'item_type', 'item_id', name='uq_station_content_item'),
+        Index('idx_station_content_item', 'item_type', 'item_id'),
+    )
+
+
 class Lobby(Base):
     """Multiplayer lobby for coordinating multi-station races"""
     __tablename__ = "lobbies"
@@ -104,6 +125,8 @@ class Lobby(Base):
     # Race configuration
     track = Column(String)
     car = Column(String)  # Single car model for equal races
+    track_id = Column(Integer, ForeignKey("tracks.id"), nullable=True)
+    car_id = Column(Integer, ForeignKey("cars.id"), nullable=True)
     max_players = Column(Integer, default=8)
     laps = Column(Integer, default=5)
     duration_minutes = Column(Integer, default=15)
@@ -132,7 +155,7 @@ class Mod(Base):
     source_path = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
     preview_url = Column(String, nullable=True) # Optimized image path
-    size_bytes = Column(Integer, default=0)
+    size_bytes = Column(BigInteger, default=0) # Content + archive, recorded at ingest
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     
     tags = relationship("Tag", secondary=mod_tags, backref="mods")
@@ -143,11 +166,29 @@ class Mod(Base):
         secondaryjoin=id==mod_dependencies.c.child_mod_id,
         backref="required_by"
     )
+    assets = relationship("ModAsset", cascade="all, delete-orphan")
 
     @property
     def image_url(self):
         return self.preview_url
 
+
+class ModAsset(Base):
+    """Preview/outline/map/badge/logo file of a car or track inside a stored mod, indexed at ingest"""
+    __tablename__ = "mod_assets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    mod_id = Column(Integer, ForeignKey("mods.id"), nullable=False, index=True)
+    item_type = Column(String(10), nullable=True)  # car, track
+    item_key = Column(String, nullable=False)  # lowercased AC folder name
+    layout = Column(String, nullable=True)  # track layout, None for the base item
+    kind = Column(String(20), nullable=False)  # preview, outline, map, badge, logo, ui_json
+    rel_path = Column(String, nullable=False)  # relative to STORAGE_DIR (served under /static)
+
+    __table_args__ = (
+        Index('idx_mod_asset_item', 'item_type', 'item_key', 'kind'),
+    )
+
 class Tag(Base):
     __tablename__ = "tags"
     id = Column(Integer, primary_key=True, index=True)
@@ -165,14 +206,49 @@ class Profile(Base):
     
     mods = relationship("Mod", secondary=profile_mods, backref="profiles")
 
+class Track(Base):
+    """Canonical track identity; free-text track names resolve to it through TrackAlias"""
+    __tablename__ = "tracks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String, unique=True, nullable=False)  # normalize_track_key of the first name seen
+    name = Column(String, nullable=False)
+    # Set when merged into another track; kept so ids cached by other workers stay valid
+    merged_into_id = Column(Integer, ForeignKey("tracks.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+class TrackAlias(Base):
+    __tablename__ = "track_aliases"
+
+    alias_key = Column(String, primary_key=True)
+    track_id = Column(Integer, ForeignKey("tracks.id"), nullable=False, index=True)
+
+class Car(Base):
+    """Canonical car identity; free-text car models resolve to it through CarAlias"""
+    __tablename__ = "cars"
+
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String, unique=True, nullable=False)
+    name = Column(String, nullable=False)
+    merged_into_id = Column(Integer, ForeignKey("cars.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+class CarAlias(Base):
+    __tablename__ = "car_aliases"
+
+    alias_key = Column(String, primary_key=True)
+    car_id = Column(Integer, ForeignKey("cars.id"), nullable=False, index=True)
+
 class SessionResult(Base):
     __tablename__ = "session_results"
     
     id = Column(Integer, primary_key=True, index=True)
     station_id = Column(Integer, ForeignKey("stations.id"), nullable=True)
-    driver_name = Column(String, index=True)
+    driver_name = Column(String)
     car_model = Column(String, index=True)
     track_name = Column(String, index=True)
+    track_id = Column(Integer, ForeignKey("tracks.id"), nullable=True)
+    car_id = Column(Integer, ForeignKey("cars.id"), nullable=True)
     best_lap = Column(Integer) # In milliseconds
     sectors = Column(JSON, nullable=True) 
     date = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), index=True)
@@ -186,7 +262,14 @@ class SessionResult(Base):
     station = relationship("Station")
 
     __table_args__ = (
-        Index('idx_track_car_date', 'track_name', 'car_model', 'date'),
+        Index('idx_session_track_car_date', 'track_id', 'car_id', 'date'),
+        Index('idx_session_car_date', 'car_id', 'date'),
+        # Leaderboards / driver analysis: one track+car, grouped or filtered by driver
+        Index('idx_session_track_car_driver', 'track_id', 'car_id', 'driver_name'),
+        Index('idx_session_track_driver', 'track_id', 'driver_name'),
+        Index('idx_session_driver_date', 'driver_name', 'date'),
+        # Event leaderboards and championship standings: best lap per driver per event
+        Index('idx_session_event_driver_lap', 'event_id', 'driver_name', 'best_lap'),
     )
 
 class Event(Base):
@@ -198,6 +281,7 @@ class Event(Base):
     start_date = Column(DateTime(timezone=True))
     end_date = Column(DateTime(timezone=True))
     track_name = Column(String, nullable=True)
+    track_id = Column(Integer, ForeignKey("tracks.id"), nullable=True, index=True)
     allowed_cars = Column(JSON, nullable=True) 
     status = Column(String, default="upcoming") 
     rules = Column(JSON, nullable=True) 
@@ -207,7 +291,7 @@ class Event(Base):
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime(timezone=True), onupdate=lambda: datetime.now(timezone.utc))
     
-    championship_id = Column(Integer, ForeignKey("championships.id"), nullable=True)
+    championship_id = Column(Integer, ForeignKey("championships.id"), nullable=True, index=True)
 
 class LapTime(Base):
     __tablename__ = "laptimes"
@@ -223,7 +307,8 @@ class LapTime(Base):
     session = relationship("SessionResult")
 
     __table_args__ = (
-        Index('idx_session_valid', 'session_id', 'valid'),
+        # Covers the per-session best valid lap (and replaces the old (session_id, valid) index)
+        Index('idx_laptime_session_valid_time', 'session_id', 'valid', 'time'),
         Index('idx_valid_time', 'valid', 'time'),
     )
 
@@ -363,6 +448,10 @@ class Booking(Base):
     
     station = relationship("Station")
 
+    __table_args__ = (
+        Index('idx_booking_status_date', 'status', 'date'),
+    )
+
 
 class PushSubscription(Base):
     """Stores Web Push notification subscriptions"""
@@ -385,6 +474,7 @@ class EliminationRace(Base):
     name = Column(String(100), nullable=False)
     event_id = Column(Integer, ForeignKey("events.id"), nullable=True)
     track_name = Column(String(100), nullable=True)
+    track_id = Column(Integer, ForeignKey("tracks.id"), nullable=True)
     status = Column(String(20), default="waiting")  # waiting, racing, paused, finished
     current_lap = Column(Integer, default=0)
     warmup_laps = Column(Integer, default=1)  # Laps before elimination starts
@@ -556,3 +646,127 @@ class WheelProfile(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
+
+class Job(Base):
+    """Background job (mod ingest, maintenance...). Persisted so restarts can resume them."""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), index=True)
+    status = Column(String(20), default="queued", index=True) # queued, running, completed, failed, cancelled
+    stage = Column(String(50), nullable=True)
+    progress = Column(Float, default=0.0) # 0-1
+    payload = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    cancel_requested = Column(Boolean, default=False)
+    attempts = Column(Integer, default=0)
+    created_by = Column(String, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # Refreshed while a worker runs the job; a stale one means that worker is gone
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class AnalyticsHourly(Base):
+    """Sessions rolled up per hour, station and payment method (see services/analytics_rollup.py)"""
+    __tablename__ = "analytics_hourly"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # "hour|station|method|paid"; unique, since NULL station/method would slip past a composite key
+    bucket_key = Column(String, nullable=False)
+    bucket_start = Column(DateTime, nullable=False) # UTC hour, naive
+    day = Column(Date, nullable=False)
+    hour = Column(Integer, nullable=False) # 0-23, so hour-of-day charts need no dialect functions
+    station_id = Column(Integer, nullable=True)
+    payment_method = Column(String(50), nullable=True)
+    is_paid = Column(Boolean, default=False)
+    sessions = Column(Integer, default=0)
+    revenue = Column(Float, default=0.0)
+    minutes = Column(Integer, default=0)
+
+    __table_args__ = (
+        Index('idx_analytics_hourly_bucket', 'bucket_start'),
+        Index('uq_analytics_hourly_key', 'bucket_key', unique=True),
+    )
+
+
+class AnalyticsDailyPopularity(Base):
+    """Session results per day for each track, car and driver"""
+    __tablename__ = "analytics_daily_popularity"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    kind = Column(String(10), nullable=False) # track, car, driver
+    name = Column(String, nullable=False)
+    sessions = Column(Integer, default=0)
+    best_lap = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index('uq_analytics_popularity_bucket', 'day', 'kind', 'name', unique=True),
+    )
+
+
+class DriverStats(Base):
+    """Running totals behind the pilot profile, updated on each session upload (see services/driver_stats.py)"""
+    __tablename__ = "driver_stats"
+
+    driver_name = Column(String, primary_key=True)
+    total_laps = Column(Integer, default=0)
+    valid_laps = Column(Integer, default=0)
+    active_days = Column(Integer, default=0)
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+
+class DriverCarStats(Base):
+    __tablename__ = "driver_car_stats"
+
+    driver_name = Column(String, primary_key=True)
+    car_model = Column(String, primary_key=True)
+    laps = Column(Integer, default=0)
+
+
+class DriverTrackStats(Base):
+    __tablename__ = "driver_track_stats"
+
+    driver_name = Column(String, primary_key=True)
+    track_name = Column(String, primary_key=True)
+    laps = Column(Integer, default=0)
+    best_lap = Column(Integer, nullable=True) # Best valid lap (ms)
+    best_car = Column(String, nullable=True)
+    best_date = Column(DateTime(timezone=True), nullable=True)
+    # Welford accumulators over this track's valid lap times (variance = lap_m2 / valid_laps)
+    valid_laps = Column(Integer, default=0)
+    lap_mean = Column(Float, default=0.0)
+    lap_m2 = Column(Float, default=0.0)
+
+
+class DriverActiveDay(Base):
+    """One row per (driver, UTC day) with a session; backs the distinct-days counter"""
+    __tablename__ = "driver_active_days"
+
+    driver_name = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+
+
+class EloHistory(Base):
+    """Append-only ledger of rating changes, one row per driver per processed event"""
+    __tablename__ = "elo_history"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # By name like session results (no FK): history survives driver re-imports
+    driver_name = Column(String, nullable=False)
+    driver_id = Column(Integer, nullable=True)
+    event_id = Column(Integer, nullable=True, index=True)
+    position = Column(Integer, nullable=True)
+    field_size = Column(Integer, nullable=True)
+    rating_before = Column(Float, nullable=False)
+    rating_after = Column(Float, nullable=False)
+    change = Column(Float, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        Index('idx_elo_history_driver', 'driver_name', 'created_at'),
+    )
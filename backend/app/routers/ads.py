@@ -4,6 +4,7 @@ from typing import List, Optional
 from .. import models, database
 from ..paths import STORAGE_DIR
 from ..routers.auth import require_admin
+from ..services import response_cache
 import shutil
 import os
 import uuid
@@ -36,8 +37,10 @@ def list_ads(db: Session = Depends(database.get_db)):
     return db.query(models.AdCampaign).all()
 
 @router.get("/active", response_model=List[AdCampaignOut])
+@response_cache.cached(tags=("ads",))
 def list_active_ads(db: Session = Depends(database.get_db)):
-    return db.query(models.AdCampaign).filter(models.AdCampaign.is_active == True).all()
+    ads = db.query(models.AdCampaign).filter(models.AdCampaign.is_active == True).all()
+    return [AdCampaignOut.model_validate(ad) for ad in ads]
 
 @router.post("/", response_model=AdCampaignOut, dependencies=[Depends(require_admin)])
 def create_ad(
@@ -70,6 +73,7 @@ def create_ad(
     db.add(new_ad)
     db.commit()
     db.refresh(new_ad)
+    response_cache.invalidate("ads")
     
     return new_ad
 
@@ -91,6 +95,7 @@ def delete_ad(ad_id: int, db: Session = Depends(database.get_db)):
 
     db.delete(ad)
     db.commit()
+    response_cache.invalidate("ads")
     return {"status": "deleted"}
 
 @router.put("/{ad_id}/toggle", dependencies=[Depends(require_admin)])
@@ -101,4 +106,5 @@ def toggle_ad(ad_id: int, db: Session = Depends(database.get_db)):
         
     ad.is_active = not ad.is_active
     db.commit()
+    response_cache.invalidate("ads")
     return {"status": "toggled", "is_active": ad.is_active}
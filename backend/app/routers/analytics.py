@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, case, and_
 from typing import List, Optional
 from datetime import datetime, timedelta, timezone
 from ..database import get_db
-from .. import models
+from .. import models, schemas
 from ..models import Session as SessionModel, SessionResult
+from ..services import analytics_rollup, response_cache
+from ..services import jobs as job_runner
+from .auth import require_admin
 
 router = APIRouter(
     prefix="/analytics",
@@ -13,8 +16,48 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+def _count_if(*conditions):
+    """Conditional aggregate: rows matching all `conditions`, so one query can return several counts."""
+    return func.coalesce(func.sum(case((and_(*conditions), 1), else_=0)), 0)
+
+
+def _popular(db: Session, first_day, limit: int = 5) -> dict:
+    """Top `limit` names per kind (track/car/driver) by session results since `first_day`, in one query."""
+    Popularity = models.AnalyticsDailyPopularity
+    totals = db.query(
+        Popularity.kind,
+        Popularity.name,
+        func.sum(Popularity.sessions).label("sessions"),
+        func.min(Popularity.best_lap).label("best_lap")
+    ).filter(Popularity.day >= first_day).group_by(Popularity.kind, Popularity.name).subquery()
+    ranked = db.query(
+        totals,
+        func.row_number().over(
+            partition_by=totals.c.kind,
+            order_by=(totals.c.sessions.desc(), totals.c.name)
+        ).label("rank")
+    ).subquery()
+    rows = db.query(ranked).filter(ranked.c.rank <= limit).order_by(ranked.c.kind, ranked.c.rank).all()
+    popular = {"track": [], "car": [], "driver": []}
+    for row in rows:
+        popular.setdefault(row.kind, []).append(row)
+    return popular
+
+
+def _hour_histogram(db: Session, range_start: datetime, paid_only: bool = False) -> dict:
+    """Sessions per UTC hour of day (0-23) since `range_start`."""
+    Hourly = models.AnalyticsHourly
+    query = db.query(Hourly.hour, func.sum(Hourly.sessions)).filter(Hourly.bucket_start >= range_start)
+    if paid_only:
+        query = query.filter(Hourly.is_paid == True)
+    counts = {h: 0 for h in range(24)}
+    for hour, sessions in query.group_by(Hourly.hour).all():
+        counts[hour] = sessions or 0
+    return counts
+
 @router.get("/overview")
-async def get_analytics_overview(range_days: int = 30, db: Session = Depends(get_db)):
+@response_cache.cached(tags=("analytics",), ttl=analytics_rollup.MAX_AGE_SECONDS)
+def get_analytics_overview(range_days: int = 30, db: Session = Depends(get_db)):
     """
     High-level analytics summary used by dashboards.
     """
@@ -24,119 +67,76 @@ async def get_analytics_overview(range_days: int = 30, db: Session = Depends(get
     week_start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
     month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
 
-    total_sessions = db.query(func.count(SessionModel.id)).scalar() or 0
-    sessions_today = db.query(func.count(SessionModel.id)).filter(SessionModel.start_time >= today_start).scalar() or 0
-    sessions_this_week = db.query(func.count(SessionModel.id)).filter(SessionModel.start_time >= week_start).scalar() or 0
-    sessions_this_month = db.query(func.count(SessionModel.id)).filter(SessionModel.start_time >= month_start).scalar() or 0
-
-    total_drivers = db.query(func.count(models.Driver.id)).scalar() or 0
-    active_drivers_week = db.query(func.count(func.distinct(SessionModel.driver_name))).filter(
-        SessionModel.start_time >= week_start,
-        SessionModel.driver_name.isnot(None)
-    ).scalar() or 0
+    # One conditional-aggregate pass per table instead of one query per number
+    session_stats = db.query(
+        func.count(SessionModel.id).label("total"),
+        _count_if(SessionModel.start_time >= today_start).label("today"),
+        _count_if(SessionModel.start_time >= week_start).label("week"),
+        _count_if(SessionModel.start_time >= month_start).label("month"),
+        func.count(func.distinct(case((SessionModel.start_time >= week_start, SessionModel.driver_name)))).label("active_drivers")
+    ).one()
 
-    bookings_total = db.query(func.count(models.Booking.id)).scalar() or 0
-    bookings_pending = db.query(func.count(models.Booking.id)).filter(models.Booking.status == "pending").scalar() or 0
-    bookings_confirmed = db.query(func.count(models.Booking.id)).filter(models.Booking.status == "confirmed").scalar() or 0
-    bookings_today = db.query(func.count(models.Booking.id)).filter(
-        models.Booking.date >= today_start,
-        models.Booking.date < (today_start + timedelta(days=1))
-    ).scalar() or 0
-
-    total_points_issued = db.query(func.coalesce(func.sum(models.Driver.total_points_earned), 0)).scalar() or 0
-    total_points_redeemed = db.query(func.coalesce(func.sum(models.RewardRedemption.points_spent), 0)).scalar() or 0
+    booking_stats = db.query(
+        func.count(models.Booking.id).label("total"),
+        _count_if(models.Booking.status == "pending").label("pending"),
+        _count_if(models.Booking.status == "confirmed").label("confirmed"),
+        _count_if(models.Booking.date >= today_start, models.Booking.date < today_start + timedelta(days=1)).label("today")
+    ).one()
 
-    tier_counts = db.query(
+    tier_rows = db.query(
         models.Driver.membership_tier,
-        func.count(models.Driver.id)
+        func.count(models.Driver.id),
+        func.coalesce(func.sum(models.Driver.total_points_earned), 0)
     ).group_by(models.Driver.membership_tier).all()
-    tier_distribution = {tier or "unknown": count for tier, count in tier_counts}
+    total_drivers = sum(count for _, count, _ in tier_rows)
+    total_points_issued = sum(points for _, _, points in tier_rows)
+    total_points_redeemed = db.query(func.coalesce(func.sum(models.RewardRedemption.points_spent), 0)).scalar() or 0
+
+    tier_distribution = {}
+    for tier, count, _ in tier_rows:
+        tier_distribution[tier or "unknown"] = tier_distribution.get(tier or "unknown", 0) + count
     for tier in ("bronze", "silver", "gold", "platinum"):
         tier_distribution.setdefault(tier, 0)
 
-    top_drivers_rows = db.query(
-        SessionResult.driver_name,
-        func.count(SessionResult.id).label("sessions"),
-        func.min(SessionResult.best_lap).label("best_lap")
-    ).filter(
-        SessionResult.date >= start_date,
-        SessionResult.driver_name.isnot(None)
-    ).group_by(SessionResult.driver_name).order_by(desc("sessions")).limit(5).all()
+    # Range-based breakdowns come from the rollups, so a long range costs the same as a short one
+    analytics_rollup.ensure_fresh(db)
+    popular = _popular(db, start_date.date())
     top_drivers = [
-        {"name": row.driver_name, "sessions": row.sessions or 0, "best_lap": row.best_lap or 0}
-        for row in top_drivers_rows
-        if row.driver_name
-    ]
-
-    popular_tracks_rows = db.query(
-        SessionResult.track_name,
-        func.count(SessionResult.id).label("sessions")
-    ).filter(
-        SessionResult.date >= start_date,
-        SessionResult.track_name.isnot(None)
-    ).group_by(SessionResult.track_name).order_by(desc("sessions")).limit(5).all()
-    popular_tracks = [
-        {"name": row.track_name, "sessions": row.sessions or 0}
-        for row in popular_tracks_rows
-        if row.track_name
-    ]
-
-    popular_cars_rows = db.query(
-        SessionResult.car_model,
-        func.count(SessionResult.id).label("sessions")
-    ).filter(
-        SessionResult.date >= start_date,
-        SessionResult.car_model.isnot(None)
-    ).group_by(SessionResult.car_model).order_by(desc("sessions")).limit(5).all()
-    popular_cars = [
-        {"name": row.car_model, "sessions": row.sessions or 0}
-        for row in popular_cars_rows
-        if row.car_model
+        {"name": row.name, "sessions": row.sessions or 0, "best_lap": row.best_lap or 0}
+        for row in popular["driver"]
     ]
+    popular_tracks = [{"name": row.name, "sessions": row.sessions or 0} for row in popular["track"]]
+    popular_cars = [{"name": row.name, "sessions": row.sessions or 0} for row in popular["car"]]
 
+    range_start = analytics_rollup.range_start(range_days, now)
     session_counts = db.query(
-        func.date(SessionModel.start_time).label("date"),
-        func.count(SessionModel.id).label("sessions")
-    ).filter(
-        SessionModel.start_time >= start_date,
-        SessionModel.start_time.isnot(None)
-    ).group_by(func.date(SessionModel.start_time)).order_by(func.date(SessionModel.start_time)).all()
+        models.AnalyticsHourly.day,
+        func.sum(models.AnalyticsHourly.sessions).label("sessions")
+    ).filter(models.AnalyticsHourly.bucket_start >= range_start).group_by(models.AnalyticsHourly.day).all()
 
-    session_map = {str(row.date): row.sessions for row in session_counts}
-    sessions_per_day = []
-    for i in range(range_days):
-        day_dt = now - timedelta(days=range_days - 1 - i)
-        day_key = day_dt.strftime("%Y-%m-%d")
-        sessions_per_day.append({
-            "date": day_key,
-            "day": day_dt.strftime("%d/%m"),
-            "sessions": session_map.get(day_key, 0)
-        })
+    session_map = {analytics_rollup.as_date(row.day): row.sessions or 0 for row in session_counts}
+    sessions_per_day = [
+        {"date": day.strftime("%Y-%m-%d"), "day": day.strftime("%d/%m"), "sessions": session_map.get(day, 0)}
+        for day in analytics_rollup.day_keys(range_days, now)
+    ]
 
-    hourly_counts = {h: 0 for h in range(24)}
-    recent_sessions = db.query(SessionModel.start_time).filter(
-        SessionModel.start_time >= start_date,
-        SessionModel.start_time.isnot(None)
-    ).all()
-    for (start_time,) in recent_sessions:
-        if start_time:
-            hourly_counts[start_time.hour] += 1
+    hourly_counts = _hour_histogram(db, range_start)
     peak_hours = [{"hour": f"{h:02d}:00", "bookings": hourly_counts[h]} for h in range(24)]
 
     return {
         "summary": {
-            "total_sessions": total_sessions,
-            "sessions_today": sessions_today,
-            "sessions_this_week": sessions_this_week,
-            "sessions_this_month": sessions_this_month,
+            "total_sessions": session_stats.total or 0,
+            "sessions_today": session_stats.today or 0,
+            "sessions_this_week": session_stats.week or 0,
+            "sessions_this_month": session_stats.month or 0,
             "total_drivers": total_drivers,
-            "active_drivers_week": active_drivers_week
+            "active_drivers_week": session_stats.active_drivers or 0
         },
         "bookings": {
-            "total": bookings_total,
-            "pending": bookings_pending,
-            "confirmed": bookings_confirmed,
-            "today": bookings_today
+            "total": booking_stats.total or 0,
+            "pending": booking_stats.pending or 0,
+            "confirmed": booking_stats.confirmed or 0,
+            "today": booking_stats.today or 0
         },
         "loyalty": {
             "total_points_issued": total_points_issued,
@@ -151,119 +151,108 @@ async def get_analytics_overview(range_days: int = 30, db: Session = Depends(get
     }
 
 @router.get("/revenue")
-async def get_revenue_analytics(range_days: int = 30, db: Session = Depends(get_db)):
+@response_cache.cached(tags=("analytics",), ttl=analytics_rollup.MAX_AGE_SECONDS)
+def get_revenue_analytics(range_days: int = 30, db: Session = Depends(get_db)):
     """
     Get daily revenue for the specified range.
     """
-    start_date = datetime.now(timezone.utc) - timedelta(days=range_days)
-    
-    # query daily revenue
+    analytics_rollup.ensure_fresh(db)
+    now = datetime.now(timezone.utc)
+    Hourly = models.AnalyticsHourly
+
     daily_revenue = db.query(
-        func.date(SessionModel.start_time).label('date'),
-        func.sum(SessionModel.price).label('revenue'),
-        func.count(SessionModel.id).label('sessions')
+        Hourly.day,
+        func.sum(Hourly.revenue).label('revenue'),
+        func.sum(Hourly.sessions).label('sessions')
     ).filter(
-        SessionModel.start_time >= start_date,
-        SessionModel.is_paid == True
-    ).group_by(
-        func.date(SessionModel.start_time)
-    ).order_by(
-        func.date(SessionModel.start_time)
-    ).all()
-    
+        Hourly.bucket_start >= analytics_rollup.range_start(range_days, now),
+        Hourly.is_paid == True
+    ).group_by(Hourly.day).all()
+
     # Fill missing days with 0
+    totals = {analytics_rollup.as_date(d.day): d for d in daily_revenue}
     result = []
-    revenue_map = {str(d.date): d.revenue for d in daily_revenue}
-    
-    for i in range(range_days):
-        d = (datetime.now(timezone.utc) - timedelta(days=range_days - 1 - i)).strftime("%Y-%m-%d")
+    for day in analytics_rollup.day_keys(range_days, now):
+        row = totals.get(day)
         result.append({
-            "date": d,
-            "revenue": revenue_map.get(d, 0),
-            "sessions": next((r.sessions for r in daily_revenue if str(r.date) == d), 0)
+            "date": day.strftime("%Y-%m-%d"),
+            "revenue": (row.revenue or 0) if row else 0,
+            "sessions": (row.sessions or 0) if row else 0
         })
-        
+
     return result
 
 @router.get("/utilization")
-async def get_utilization_analytics(range_days: int = 30, db: Session = Depends(get_db)):
+@response_cache.cached(tags=("analytics",), ttl=analytics_rollup.MAX_AGE_SECONDS)
+def get_utilization_analytics(range_days: int = 30, db: Session = Depends(get_db)):
     """
-    Get average sessions per hour of day to identify peak times.
+    Get sessions per hour of day (UTC) to identify peak times.
     """
-    start_date = datetime.now(timezone.utc) - timedelta(days=range_days)
-    
-    # Extract hour from start_time (SQLite specific: strftime('%H', ...))
-    # Postgre: extract('hour', ...)
-    # Let's try to be generic if possible, or use SQLite syntax as we are likely on SQLite dev
-    
-    # Assuming SQLite for this project based on standard setups, but let's check.
-    # The user mentioned "Migrating... to Supabase (PostgreSQL)" in history, but current state might be mixed.
-    # Inspecting models.py might give a hint or we can do python-side aggregation for safety if volume is low.
-    # Given "Revenue Dashboard" implies low volume (hundreds of sessions), Python aggregation is safe and db-agnostic.
-    
-    sessions = db.query(SessionModel).filter(
-        SessionModel.start_time >= start_date
-    ).all()
-    
-    # Initialize 0-23 hours
-    hourly_counts = {h: 0 for h in range(24)}
-    
-    for s in sessions:
-        if s.start_time:
-            # excessive logic isn't needed, just simplest peak hour estimation
-            h = s.start_time.hour # UTC... we might want local time?
-            # Ideally frontend handles timezone or we store localized.
-            # Let's send UTC hour and frontend shifts it, or assume server local time.
-            # Actually models say `start_time = Column(DateTime(timezone=True)`
-            # So .hour will be correct if timezone aware.
-            
-            # If we want simple local time of the "shop", we might simply just take the hour.
-            hourly_counts[h] += 1
-            
+    analytics_rollup.ensure_fresh(db)
+    hourly_counts = _hour_histogram(db, analytics_rollup.range_start(range_days))
     return [{"hour": h, "count": c} for h, c in hourly_counts.items()]
 
 @router.get("/kpi")
-async def get_kpi_stats(range_days: int = 30, db: Session = Depends(get_db)):
+@response_cache.cached(tags=("analytics",), ttl=analytics_rollup.MAX_AGE_SECONDS)
+def get_kpi_stats(range_days: int = 30, db: Session = Depends(get_db)):
     """
     Get top-level KPIs
     """
-    start_date = datetime.now(timezone.utc) - timedelta(days=range_days)
-    
+    analytics_rollup.ensure_fresh(db)
+    Hourly = models.AnalyticsHourly
+
     stats = db.query(
-        func.sum(SessionModel.price).label('total_revenue'),
-        func.avg(SessionModel.price).label('avg_ticket'),
-        func.count(SessionModel.id).label('total_sessions')
+        func.sum(Hourly.revenue).label('total_revenue'),
+        func.sum(Hourly.sessions).label('total_sessions')
     ).filter(
-        SessionModel.start_time >= start_date,
-        SessionModel.is_paid == True
+        Hourly.bucket_start >= analytics_rollup.range_start(range_days),
+        Hourly.is_paid == True
     ).first()
-    
+
+    total_revenue = stats.total_revenue or 0
+    total_sessions = stats.total_sessions or 0
+    avg_ticket = total_revenue / total_sessions if total_sessions else 0
     return {
-        "total_revenue": stats.total_revenue or 0,
-        "avg_ticket": round(stats.avg_ticket or 0, 2),
-        "total_sessions": stats.total_sessions or 0,
-        "revenue_per_session": round((stats.total_revenue or 0) / (stats.total_sessions or 1), 2)
+        "total_revenue": total_revenue,
+        "avg_ticket": round(avg_ticket, 2),
+        "total_sessions": total_sessions,
+        "revenue_per_session": round(total_revenue / (total_sessions or 1), 2)
     }
 
 @router.get("/payment-methods")
-async def get_payment_method_stats(range_days: int = 30, db: Session = Depends(get_db)):
+@response_cache.cached(tags=("analytics",), ttl=analytics_rollup.MAX_AGE_SECONDS)
+def get_payment_method_stats(range_days: int = 30, db: Session = Depends(get_db)):
     """
     Get revenue breakdown by payment method.
     """
-    start_date = datetime.now(timezone.utc) - timedelta(days=range_days)
-    
+    analytics_rollup.ensure_fresh(db)
+    Hourly = models.AnalyticsHourly
+
     stats = db.query(
-        SessionModel.payment_method,
-        func.sum(SessionModel.price).label('revenue'),
-        func.count(SessionModel.id).label('count')
+        Hourly.payment_method,
+        func.sum(Hourly.revenue).label('revenue'),
+        func.sum(Hourly.sessions).label('count')
     ).filter(
-        SessionModel.start_time >= start_date,
-        SessionModel.is_paid == True
+        Hourly.bucket_start >= analytics_rollup.range_start(range_days),
+        Hourly.is_paid == True
     ).group_by(
-        SessionModel.payment_method
+        Hourly.payment_method
     ).all()
-    
+
     return [
-        {"method": s.payment_method or "unknown", "revenue": s.revenue or 0, "count": s.count}
+        {"method": s.payment_method or "unknown", "revenue": s.revenue or 0, "count": s.count or 0}
         for s in stats
     ]
+
+@router.post("/rollups/rebuild", response_model=schemas.Job, status_code=202)
+def rebuild_rollups(db: Session = Depends(get_db), current_user: models.User = Depends(require_admin)):
+    """
+    Rebuild the analytics rollups from the raw sessions (after imports or manual edits).
+    Runs as a background job.
+    """
+    return job_runner.enqueue(db, "analytics_rollup_backfill", created_by=current_user.username)
+
+@job_runner.handler("analytics_rollup_backfill")
+def _rollup_backfill_job(ctx, payload, db: Session):
+    ctx.report("rebuilding", force=True)
+    return analytics_rollup.backfill(db)
@@ -3,6 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from .. import database, models, schemas
+from ..services import active_events, driver_stats, elo_ranking, response_cache
 from .auth import get_current_active_user
 import json
 from datetime import datetime
@@ -170,8 +171,13 @@ async def import_database(
         for r in data["data"].get("results", []):
             if isinstance(r.get("date"), str): r["date"] = datetime.fromisoformat(r["date"])
             db.add(models.SessionResult(**r))
-            
+
+        # Pilot stats are rebuilt from the restored results on their next read
+        driver_stats.reset(db)
         db.commit()
+        elo_ranking.invalidate()
+        active_events.invalidate(db)
+        response_cache.invalidate("laps", "events", "drivers", "championships")
         return {"status": "success", "message": "Database restored successfully"}
         
     except Exception as e:
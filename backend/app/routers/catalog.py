@@ -0,0 +1,47 @@
+"""
+Track/Car Catalog API Router
+Canonical identities behind the free-text track and car names, and their aliases.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from pydantic import BaseModel
+
+from ..database import get_db
+from ..routers.auth import require_admin
+from ..services import active_events, content_catalog, response_cache
+
+router = APIRouter(
+    prefix="/catalog",
+    tags=["catalog"]
+)
+
+
+class AliasCreate(BaseModel):
+    alias: str
+    canonical: str
+
+
+def _kind(kind: str) -> str:
+    kind = kind.rstrip("s")
+    if kind not in content_catalog.KINDS:
+        raise HTTPException(status_code=404, detail="Unknown catalog (use tracks or cars)")
+    return kind
+
+
+@router.get("/{kind}")
+def list_catalog(kind: str, db: Session = Depends(get_db)):
+    """Canonical tracks or cars with every alias that resolves to them."""
+    return content_catalog.list_entries(db, _kind(kind))
+
+
+@router.post("/{kind}/aliases", dependencies=[Depends(require_admin)])
+def add_catalog_alias(kind: str, payload: AliasCreate, db: Session = Depends(get_db)):
+    """Point an alias (e.g. "Monza") at a canonical name (e.g. "ks_monza"), merging their history."""
+    try:
+        target_id = content_catalog.add_alias(db, _kind(kind), payload.alias, payload.canonical)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    response_cache.invalidate("laps", "championships", "analytics")
+    active_events.invalidate(db)
+    return {"id": target_id, "alias": content_catalog.normalize(payload.alias)}
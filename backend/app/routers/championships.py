@@ -1,8 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import Float, Integer, case, func, literal, select, union_all
 from typing import List, Dict, Any
 from .. import models, schemas, database
+from ..services import active_events, content_catalog, response_cache
+
+# Default F1 scoring: 25, 18, 15, 12, 10, 8, 6, 4, 2, 1
+DEFAULT_POINTS = {1: 25, 2: 18, 3: 15, 4: 12, 5: 10, 6: 8, 7: 6, 8: 4, 9: 2, 10: 1}
 
 router = APIRouter(
     prefix="/championships",
@@ -33,6 +37,8 @@ def add_event_to_championship(championship_id: int, event_id: int, db: Session =
     
     event.championship_id = championship_id
     db.commit()
+    active_events.invalidate(db)
+    response_cache.invalidate("championships")
     return {"message": "Event added to championship"}
 
 @router.post("/{championship_id}/events/{event_id}/link-session/{session_id}")
@@ -47,8 +53,7 @@ def link_session_to_event(championship_id: int, event_id: int, session_id: int,
     
     session_result.event_id = event_id
     db.commit()
-    session_result.event_id = event_id
-    db.commit()
+    response_cache.invalidate("championships", "laps")
     return {"message": "Session linked to event", "session_id": session_id, "event_id": event_id}
 
 @router.post("/{championship_id}/events/{event_id}/auto-detect")
@@ -61,9 +66,9 @@ def auto_detect_matches(championship_id: int, event_id: int, db: Session = Depen
          raise HTTPException(status_code=400, detail="Event must have start_date, end_date and track_name defined")
 
     # Find matching sessions that are NOT yet linked to this event
-    # We use ILIKE for track name to be safe/flexible
+    # Track match on the canonical id (case-insensitive, alias-aware, indexed)
     query = db.query(models.SessionResult).filter(
-        func.lower(models.SessionResult.track_name) == event.track_name.lower(),
+        content_catalog.matches(db, models.SessionResult.track_id, "track", event.track_name),
         models.SessionResult.date >= event.start_date,
         models.SessionResult.date <= event.end_date,
         (models.SessionResult.event_id == None) | (models.SessionResult.event_id != event_id) # Optional: Re-link or only link orphans? Let's link orphans or steal from others? Let's just link anything in window.
@@ -76,58 +81,80 @@ def auto_detect_matches(championship_id: int, event_id: int, db: Session = Depen
         count += 1
         
     db.commit()
+    response_cache.invalidate("championships", "laps")
     return {"message": f"Auto-detected and linked {count} sessions", "count": count}
 
+def _scoring_table(scoring_rules):
+    """
+    The points-per-position table as a derived table, so standings can join it
+    (a UNION ALL of literal rows: SQLite has no column aliases on VALUES).
+    """
+    # Keys come back as strings from JSON
+    points = {int(k): v for k, v in (scoring_rules or DEFAULT_POINTS).items()} or {1: 0}
+    points_type = Integer if all(isinstance(v, int) for v in points.values()) else Float
+    rows = [
+        select(literal(position, Integer).label("position"), literal(value, points_type).label("points"))
+        for position, value in sorted(points.items())
+    ]
+    return (union_all(*rows) if len(rows) > 1 else rows[0]).subquery("scoring")
+
+
 @router.get("/{championship_id}/standings")
+@response_cache.cached(tags=("championships",))
 def get_championship_standings(championship_id: int, db: Session = Depends(database.get_db)):
     """
     Calculate championship standings based on linked event results.
     Uses scoring_rules if defined, otherwise F1 standard.
+    One ranked query over every event: best lap per driver and event, ranked within
+    the event, joined to the scoring table and summed per driver.
     """
     champ = db.query(models.Championship).filter(models.Championship.id == championship_id).first()
     if not champ:
         raise HTTPException(status_code=404, detail="Championship not found")
-    
-    # Default F1 scoring: 25, 18, 15, 12, 10, 8, 6, 4, 2, 1
-    POINTS_SYSTEM = champ.scoring_rules or {1: 25, 2: 18, 3: 15, 4: 12, 5: 10, 6: 8, 7: 6, 8: 4, 9: 2, 10: 1}
-    # Ensure keys are integers if they come from JSON as strings
-    POINTS_SYSTEM = {int(k): v for k, v in POINTS_SYSTEM.items()}
-    
-    driver_stats: Dict[str, Dict[str, Any]] = {}
 
-    # Get all events for this championship
-    events = db.query(models.Event).filter(models.Event.championship_id == championship_id).all()
-    
-    for event in events:
-        # Each event can have multiple session results linked (from different days/stations)
-        # We take the best lap for each driver across ALL results for THIS event
-        results = db.query(
-            models.SessionResult.driver_name,
-            func.min(models.SessionResult.best_lap).label('best_lap')
-        ).filter(models.SessionResult.event_id == event.id).group_by(models.SessionResult.driver_name).order_by('best_lap').all()
-        
-        for rank, row in enumerate(results, 1):
-             driver = row.driver_name
-             points = POINTS_SYSTEM.get(rank, 0)
-             
-             if driver not in driver_stats:
-                 driver_stats[driver] = {
-                     "driver_name": driver,
-                     "total_points": 0,
-                     "events_participated": 0,
-                     "wins": 0,
-                     "podiums": 0,
-                     "best_lap_ever": row.best_lap
-                 }
-             
-             driver_stats[driver]["total_points"] += points
-             driver_stats[driver]["events_participated"] += 1
-             driver_stats[driver]["best_lap_ever"] = min(driver_stats[driver]["best_lap_ever"], row.best_lap)
-             if rank == 1: driver_stats[driver]["wins"] += 1
-             if rank <= 3: driver_stats[driver]["podiums"] += 1
-
-    # Convert to list and sort
-    standings = list(driver_stats.values())
-    standings.sort(key=lambda x: x["total_points"], reverse=True)
-    
-    return standings
+    # Each event can have multiple session results linked (from different days/stations):
+    # a driver's result for the event is their best lap across all of them
+    per_event = db.query(
+        models.SessionResult.event_id,
+        models.SessionResult.driver_name,
+        func.min(models.SessionResult.best_lap).label("best_lap")
+    ).join(
+        models.Event, models.Event.id == models.SessionResult.event_id
+    ).filter(
+        models.Event.championship_id == championship_id
+    ).group_by(models.SessionResult.event_id, models.SessionResult.driver_name).subquery()
+
+    ranked = db.query(
+        per_event,
+        func.row_number().over(
+            partition_by=per_event.c.event_id,
+            order_by=(per_event.c.best_lap.is_(None), per_event.c.best_lap, per_event.c.driver_name)
+        ).label("position")
+    ).subquery()
+
+    scoring = _scoring_table(champ.scoring_rules)
+    total_points = func.coalesce(func.sum(scoring.c.points), 0)
+    rows = db.query(
+        ranked.c.driver_name,
+        total_points.label("total_points"),
+        func.count().label("events_participated"),
+        func.sum(case((ranked.c.position == 1, 1), else_=0)).label("wins"),
+        func.sum(case((ranked.c.position <= 3, 1), else_=0)).label("podiums"),
+        func.min(ranked.c.best_lap).label("best_lap_ever")
+    ).outerjoin(
+        scoring, scoring.c.position == ranked.c.position
+    ).group_by(ranked.c.driver_name).order_by(
+        total_points.desc(), ranked.c.driver_name
+    ).all()
+
+    return [
+        {
+            "driver_name": row.driver_name,
+            "total_points": row.total_points or 0,
+            "events_participated": row.events_participated,
+            "wins": row.wins or 0,
+            "podiums": row.podiums or 0,
+            "best_lap_ever": row.best_lap_ever
+        }
+        for row in rows
+    ]
@@ -8,7 +8,8 @@ from sqlalchemy import desc
 from typing import List, Optional
 
 from ..database import get_db
-from ..models import Driver
+from ..models import Driver, EloHistory
+from ..services import elo_ranking, response_cache
 from ..services.elo import (
     get_elo_tier, 
     get_elo_color, 
@@ -24,6 +25,7 @@ router = APIRouter(
 
 
 @router.get("/rankings")
+@response_cache.cached(tags=("drivers",), ttl=30)
 def get_elo_rankings(
     limit: int = 50,
     tier: Optional[str] = None,
@@ -75,11 +77,8 @@ def get_driver_elo(driver_name: str, db: Session = Depends(get_db)):
     elo = driver.elo_rating or DEFAULT_RATING
     tier = get_elo_tier(elo)
     
-    # Get ranking position
-    rank = db.query(Driver).filter(
-        Driver.elo_rating > elo,
-        Driver.total_races > 0
-    ).count() + 1
+    # Get ranking position (binary search in the maintained rank index)
+    rank = elo_ranking.rank_of(db, elo)
     
     return {
         "name": driver.name,
@@ -93,6 +92,31 @@ def get_driver_elo(driver_name: str, db: Session = Depends(get_db)):
     }
 
 
+@router.get("/driver/{driver_name}/history")
+def get_driver_elo_history(driver_name: str, limit: int = 100, db: Session = Depends(get_db)):
+    """Get a driver's rating changes from the ledger, oldest first (the last `limit` events)."""
+    entries = db.query(EloHistory).filter(
+        EloHistory.driver_name == driver_name
+    ).order_by(desc(EloHistory.created_at), desc(EloHistory.id)).limit(limit).all()
+
+    if not entries and not db.query(Driver.id).filter(Driver.name == driver_name).first():
+        raise HTTPException(status_code=404, detail="Driver not found")
+
+    return [
+        {
+            "event_id": e.event_id,
+            "date": e.created_at,
+            "position": e.position,
+            "field_size": e.field_size,
+            "rating_before": round(e.rating_before, 1),
+            "elo_rating": round(e.rating_after, 1),
+            "change": round(e.change, 1),
+            "tier": get_elo_tier(e.rating_after),
+        }
+        for e in reversed(entries)
+    ]
+
+
 @router.get("/tiers")
 def get_tier_info():
     """Get information about all ELO tiers."""
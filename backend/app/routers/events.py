@@ -1,13 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func, and_, or_
-from typing import List, Optional
+from sqlalchemy import desc, func
+from typing import Dict, List, Optional
 import logging
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 from .. import models, schemas, database
+from ..services import active_events, driver_stats, elo_ranking, response_cache
 from . import tournament
 from .auth import get_current_active_user
 
@@ -58,6 +59,7 @@ def create_event(event: schemas.EventCreate, db: Session = Depends(database.get_
         )
         db.add(new_event)
         db.commit()
+        active_events.invalidate(db)
         db.refresh(new_event)
         logger.info(f"Successfully created event: ID={new_event.id}, Name='{new_event.name}'")
         return new_event
@@ -83,6 +85,9 @@ def update_event(event_id: int, event_update: schemas.EventCreate, db: Session =
     event.is_active = event_update.status == "active"
     
     db.commit()
+    active_events.invalidate(db)
+    # Event leaderboards and championship standings read the event's track and window
+    response_cache.invalidate("events", "championships")
     db.refresh(event)
     logger.info(f"Updated event {event_id}: {event.name}")
     return event
@@ -114,6 +119,8 @@ def delete_event(event_id: int, db: Session = Depends(database.get_db), current_
         
     db.delete(event)
     db.commit()
+    active_events.invalidate(db)
+    response_cache.invalidate("events", "championships")
     logger.info(f"Deleted event {event_id}")
     return {"message": "Event deleted successfully"}
 
@@ -134,8 +141,9 @@ def submit_manual_results(event_id: int, results: schemas.EventResultManual, db:
     # Create synthetic results for the podium to ensure Championship points are awarded
     current_time = datetime.now()
     
+    podium = []
     # 1. Winner (Best Time = 1ms)
-    db.add(models.SessionResult(
+    podium.append(models.SessionResult(
         event_id=event.id,
         driver_name=results.winner_name,
         best_lap=1,
@@ -147,7 +155,7 @@ def submit_manual_results(event_id: int, results: schemas.EventResultManual, db:
 
     # 2. Second Place (Best Time = 2ms)
     if results.second_name:
-        db.add(models.SessionResult(
+        podium.append(models.SessionResult(
             event_id=event.id,
             driver_name=results.second_name,
             best_lap=2,
@@ -159,7 +167,7 @@ def submit_manual_results(event_id: int, results: schemas.EventResultManual, db:
 
     # 3. Third Place (Best Time = 3ms)
     if results.third_name:
-        db.add(models.SessionResult(
+        podium.append(models.SessionResult(
             event_id=event.id,
             driver_name=results.third_name,
             best_lap=3,
@@ -168,29 +176,22 @@ def submit_manual_results(event_id: int, results: schemas.EventResultManual, db:
             session_type="RACE_MANUAL",
             date=current_time
         ))
+
+    for result in podium:
+        db.add(result)
+        driver_stats.record_session(db, result, [])
     
     db.commit()
+    active_events.invalidate(db)
+    response_cache.invalidate("laps", "championships")
     db.refresh(event)
     return event
 
 @router.get("/active", response_model=Optional[schemas.Event])
 def get_active_event(db: Session = Depends(database.get_db)):
-    # Find event where current time is between start and end
-    now = datetime.now()
-    active_filter = or_(
-        models.Event.is_active == True,
-        and_(
-            models.Event.status == "active",
-            or_(models.Event.start_date == None, models.Event.start_date <= now),
-            or_(models.Event.end_date == None, models.Event.end_date >= now),
-        ),
-    )
-    return (
-        db.query(models.Event)
-        .filter(active_filter)
-        .order_by(models.Event.start_date.desc())
-        .first()
-    )
+    # Find event where current time is between start and end (from the in-memory window index)
+    event_id = active_events.current_event_id(db, datetime.now())
+    return db.get(models.Event, event_id) if event_id is not None else None
 
 @router.post("/{event_id}/generate_bracket")
 def generate_bracket(event_id: int, size: int = 8, db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_active_user)):
@@ -290,6 +291,8 @@ def add_event_to_championship(championship_id: int, event_id: int, db: Session =
         
         event.championship_id = championship_id
         db.commit()
+        active_events.invalidate(db)
+        response_cache.invalidate("championships")
         logger.info(f"Linked event {event_id} to championship {championship_id}")
         return {"message": "Event added to championship"}
     except Exception as e:
@@ -298,6 +301,7 @@ def add_event_to_championship(championship_id: int, event_id: int, db: Session =
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{event_id}/leaderboard", response_model=List[schemas.LeaderboardEntry])
+@response_cache.cached(tags=("laps", "events"), ttl=60)
 def get_event_leaderboard(
     event_id: int,
     limit: int = 50,
@@ -349,6 +353,69 @@ def get_event_leaderboard(
     return leaderboard
 
 
+def _event_finishing_order(db: Session, event_id: int) -> List[str]:
+    """Drivers of an event by best lap (one entry per driver, fastest first)."""
+    rows = db.query(
+        models.SessionResult.driver_name,
+        func.min(models.SessionResult.best_lap).label('min_lap')
+    ).filter(
+        models.SessionResult.event_id == event_id,
+        models.SessionResult.best_lap > 0,
+        models.SessionResult.driver_name.isnot(None)
+    ).group_by(models.SessionResult.driver_name).order_by('min_lap', models.SessionResult.driver_name).all()
+    return [row.driver_name for row in rows]
+
+
+def _apply_event_results(db: Session, event: models.Event, ratings: Dict[int, float]) -> Optional[dict]:
+    """
+    Updates ELO and pilot stats for one event, without committing. Drivers are
+    loaded (or created) in one batch and the pairwise ELO is a single matrix pass.
+    Every change is appended to the rating ledger and the new ratings are
+    collected in `ratings` (driver id -> rating) for the rank index.
+    Returns None when the event has no results.
+    """
+    from ..services.elo import calculate_race_elo_changes, get_or_create_drivers, DEFAULT_RATING
+
+    order = _event_finishing_order(db, event.id)
+    if not order:
+        return None
+    drivers = get_or_create_drivers(db, order)
+
+    elo_input = []
+    for idx, name in enumerate(order):
+        driver = drivers[name]
+        driver.total_races = (driver.total_races or 0) + 1
+        if idx == 0:
+            driver.total_wins = (driver.total_wins or 0) + 1
+        if idx < 3:
+            driver.total_podiums = (driver.total_podiums or 0) + 1 # 1st, 2nd, 3rd
+        elo_input.append({
+            'driver_id': driver.id,
+            'rating': float(driver.elo_rating) if driver.elo_rating else DEFAULT_RATING,
+            'position': idx + 1
+        })
+
+    changes = calculate_race_elo_changes(elo_input)
+    drivers_by_id = {d.id: d for d in drivers.values()}
+    positions = {entry['driver_id']: entry['position'] for entry in elo_input}
+    ledger = []
+    for driver_id, change in changes.items():
+        driver = drivers_by_id[driver_id]
+        current = float(driver.elo_rating) if driver.elo_rating else DEFAULT_RATING
+        driver.elo_rating = current + change
+        ratings[driver_id] = driver.elo_rating
+        ledger.append(models.EloHistory(
+            driver_name=driver.name, driver_id=driver_id, event_id=event.id,
+            position=positions[driver_id], field_size=len(order),
+            rating_before=current, rating_after=driver.elo_rating, change=change
+        ))
+        logger.info(f"Driver {driver.name}: {current} -> {driver.elo_rating} (Change: {change})")
+    db.add_all(ledger)
+
+    event.status = "completed"
+    return {"participants": len(order), "elo_changes": changes}
+
+
 @router.post("/{event_id}/process_results")
 def process_event_results(event_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_active_user)):
     """
@@ -357,8 +424,6 @@ def process_event_results(event_id: int, db: Session = Depends(database.get_db),
     2. Update Pilot Stats (Wins, Podiums, Races).
     3. Mark event as completed.
     """
-    from ..services.elo import calculate_race_elo_changes, DEFAULT_RATING
-
     event = db.query(models.Event).filter(models.Event.id == event_id).first()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -366,70 +431,62 @@ def process_event_results(event_id: int, db: Session = Depends(database.get_db),
     if event.status == "completed":
         raise HTTPException(status_code=400, detail="Event already processed")
 
-    # Get Leaderboard (Sorted by position i.e. Best Lap Ascending)
-    subquery = db.query(
-        models.SessionResult.driver_name,
-        func.min(models.SessionResult.best_lap).label('min_lap')
-    ).filter(
-        models.SessionResult.event_id == event_id,
-        models.SessionResult.best_lap > 0
-    ).group_by(models.SessionResult.driver_name).subquery()
-    
-    results = db.query(models.SessionResult).join(
-        subquery,
-        (models.SessionResult.driver_name == subquery.c.driver_name) &
-        (models.SessionResult.best_lap == subquery.c.min_lap)
-    ).filter(
-        models.SessionResult.event_id == event_id
-    ).order_by(models.SessionResult.best_lap.asc()).all()
-    
-    if not results:
+    ratings = {}
+    processed = _apply_event_results(db, event, ratings)
+    if processed is None:
+        db.rollback()
         return {"message": "No results to process"}
 
-    # 1. Prepare Data & Update Stats
-    elo_input = []
-    drivers_by_id = {}
-
-    for idx, result in enumerate(results):
-        driver = db.query(models.Driver).filter(models.Driver.name == result.driver_name).first()
-        if not driver:
-            driver = models.Driver(name=result.driver_name, elo_rating=DEFAULT_RATING)
-            db.add(driver)
-            db.commit()
-            db.refresh(driver)
-        
-        drivers_by_id[driver.id] = driver
-        
-        # Stats Update
-        driver.total_races += 1
-        if idx == 0: driver.total_wins += 1
-        if idx < 3: driver.total_podiums += 1 # 1st, 2nd, 3rd
-        
-        elo_input.append({
-            'driver_id': driver.id,
-            'rating': float(driver.elo_rating) if driver.elo_rating else DEFAULT_RATING,
-            'position': idx + 1
-        })
-
-    # 2. Calculate ELO Changes
-    changes = calculate_race_elo_changes(elo_input)
-    
-    # 3. Apply ELO Changes
-    for driver_id, change in changes.items():
-        if driver_id in drivers_by_id:
-            driver = drivers_by_id[driver_id]
-            current = float(driver.elo_rating) if driver.elo_rating else DEFAULT_RATING
-            driver.elo_rating = current + change
-            
-            # Log for debugging
-            logger.info(f"Driver {driver.name}: {current} -> {driver.elo_rating} (Change: {change})")
-        
-    event.status = "completed"
     db.commit()
+    active_events.invalidate(db)
+    elo_ranking.update(ratings.items())
+    response_cache.invalidate("drivers")
     
     return {
         "message": "Results processed", 
-        "participants": len(results),
-        "elo_changes": changes
+        **processed
+    }
+
+
+@router.post("/process_results/batch")
+def process_event_results_batch(
+    event_ids: List[int] = Body(..., embed=True),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Finalize several events (a league night) in one transaction. Events are
+    processed in start order so each race uses the ratings left by the previous one.
+    """
+    events = db.query(models.Event).filter(models.Event.id.in_(event_ids)).all()
+    missing = set(event_ids) - {e.id for e in events}
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Events not found: {sorted(missing)}")
+    completed = sorted(e.id for e in events if e.status == "completed")
+    if completed:
+        raise HTTPException(status_code=400, detail=f"Events already processed: {completed}")
+
+    far_past = datetime.min
+    events.sort(key=lambda e: ((e.start_date.replace(tzinfo=None) if e.start_date else far_past), e.id))
+    results = {}
+    ratings = {}
+    try:
+        for event in events:
+            results[event.id] = _apply_event_results(db, event, ratings)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Batch event processing failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    active_events.invalidate(db)
+    elo_ranking.update(ratings.items())
+    response_cache.invalidate("drivers")
+
+    return {
+        "message": "Results processed",
+        "events": [
+            {"event_id": event_id, **(processed or {"participants": 0, "elo_changes": {}})}
+            for event_id, processed in results.items()
+        ]
     }
 
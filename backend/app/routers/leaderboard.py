@@ -4,6 +4,7 @@ from sqlalchemy import func, desc, asc
 from typing import List, Optional
 from ..database import get_db
 from ..models import SessionResult, Driver, Scenario
+from ..services import content_catalog, response_cache
 
 router = APIRouter(
     prefix="/leaderboard",
@@ -21,6 +22,7 @@ def format_lap_time(ms: int) -> str:
     return f"{minutes}:{seconds:02d}.{milliseconds:03d}"
 
 @router.get("/top")
+@response_cache.cached(tags=("laps",), ttl=60)
 async def get_top_times(
     track: str,
     car: Optional[str] = None,
@@ -31,12 +33,12 @@ async def get_top_times(
     Get top lap times for a specific track (and optional car).
     """
     query = db.query(SessionResult).filter(
-        SessionResult.track_name == track,
+        content_catalog.matches(db, SessionResult.track_id, "track", track),
         SessionResult.best_lap > 0
     )
     
     if car:
-        query = query.filter(SessionResult.car_model == car)
+        query = query.filter(content_catalog.matches(db, SessionResult.car_id, "car", car))
         
     # Get distinct best times per driver (optional: show all times or just best per driver?)
     # Usually leaderboards show best per driver.
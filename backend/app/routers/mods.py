@@ -1,5 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
+from sqlalchemy import func
 from typing import List
 from .auth import get_current_active_user
 import shutil
@@ -9,8 +11,11 @@ import json
 import patoolib
 from pathlib import Path
 import re
+import uuid
 from ..paths import STORAGE_DIR
 from .. import models, schemas, database
+from ..services import asset_index, auto_library, chunk_store, dependency_graph, mod_ingest, mod_search, thumbnails, universal_content
+from ..services import jobs as job_runner
 # Import shared hashing module (needs sys path adjustment or package install, using relative import for now if possible or dynamic)
 import logging
 import sys
@@ -58,20 +63,30 @@ def get_station_content(station_id: int, db: Session = Depends(database.get_db))
             "message": "Content not scanned yet. Trigger scan via /control/station/{id}/content"
         }
 
+@router.get("/chunks/{chunk_hash}")
+def get_chunk(chunk_hash: str):
+    """
+    Serve a single content-addressed chunk. Agents use these to rebuild only the
+    parts of a file that changed. Chunks never change, so they can be cached forever.
+    """
+    chunk_hash = chunk_hash.lower()
+    if not chunk_store.is_valid_chunk_hash(chunk_hash):
+        raise HTTPException(status_code=400, detail="Invalid chunk hash")
+    path = chunk_store.chunk_path(chunk_hash)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Chunk not found")
+    return FileResponse(
+        path,
+        media_type="application/octet-stream",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
 def _sanitize_name(value: str, fallback: str) -> str:
     cleaned = re.sub(r"[^A-Za-z0-9._-]+", "_", value.strip())
     cleaned = cleaned.strip("._-")
     return cleaned or fallback
 
-def _safe_extract_zip(zip_ref: zipfile.ZipFile, extract_dir: Path) -> None:
-    extract_root = extract_dir.resolve()
-    for member in zip_ref.infolist():
-        member_path = (extract_root / member.filename).resolve()
-        if not str(member_path).startswith(str(extract_root)):
-            raise HTTPException(status_code=400, detail="Invalid archive contents")
-    zip_ref.extractall(extract_root)
-
-def process_mod_file(file_path: Path, original_filename: str, db: Session, user_provided_name: str = None, user_provided_type: str = None, user_provided_version: str = None):
+def process_mod_file(file_path: Path, original_filename: str, db: Session, user_provided_name: str = None, user_provided_type: str = None, user_provided_version: str = None, report=None):
     # Validar extensión
     filename_lower = original_filename.lower()
     
@@ -112,39 +127,68 @@ def process_mod_file(file_path: Path, original_filename: str, db: Session, user_
     extract_dir = mod_dir / "content"
     extract_dir.mkdir(exist_ok=True)
     
+    def on_progress(done, total):
+        if report:
+            report("extracting", done, total)
+
     try:
         if filename_lower.endswith('.zip'):
+            # Streaming path: identify the content from the central directory, then
+            # extract + hash + chunk every member in a single pass
             with zipfile.ZipFile(final_archive_path, 'r') as zip_ref:
-                _safe_extract_zip(zip_ref, extract_dir)
+                detected = mod_ingest.detect_zip_content(zip_ref)
+                remap = None
+                if detected:
+                    remap = mod_ingest.restructure_prefix(detected, zip_ref.namelist())
+                    detected_type = detected["type"]
+                    if "name" in detected["data"]:
+                        detected_name = detected["data"]["name"]
+                    if "version" in detected["data"] and not user_provided_version:
+                        detected_version = detected["data"]["version"]
+                try:
+                    manifest = mod_ingest.extract_zip_with_manifest(
+                        zip_ref, extract_dir, on_progress=on_progress, remap=remap
+                    )
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
         else:
             # RAR / 7Z via patool
+            if report:
+                report("extracting")
             try:
                 patoolib.extract_archive(str(final_archive_path), outdir=str(extract_dir), verbosity=-1)
             except Exception as e:
                 logger.error(f"Extraction failed: {e}")
                 raise Exception(f"Error al descomprimir: {str(e)}")
             
-        # --- SMART DETECTION START ---
-        # Recursively search for ui_car.json or ui_track.json to identify content
-        
-        # Walk through extracted files
-        for root, dirs, files in os.walk(extract_dir):
-            if "ui_car.json" in files:
-                detect_result = _handle_smart_detection(root, extract_dir, "car", files, detected_name, detected_version, user_provided_version)
-                detected_name, detected_type, detected_version = detect_result
-                break
-                
-            elif "ui_track.json" in files:
-                detect_result = _handle_smart_detection(root, extract_dir, "track", files, detected_name, detected_version, user_provided_version)
-                detected_name, detected_type, detected_version = detect_result
-                break
-        # --- SMART DETECTION END ---
+            # --- SMART DETECTION START ---
+            # Recursively search for ui_car.json or ui_track.json to identify content
+            
+            # Walk through extracted files
+            for root, dirs, files in os.walk(extract_dir):
+                if "ui_car.json" in files:
+                    detect_result = _handle_smart_detection(root, extract_dir, "car", files, detected_name, detected_version, user_provided_version)
+                    detected_name, detected_type, detected_version = detect_result
+                    break
+                    
+                elif "ui_track.json" in files:
+                    detect_result = _handle_smart_detection(root, extract_dir, "track", files, detected_name, detected_version, user_provided_version)
+                    detected_name, detected_type, detected_version = detect_result
+                    break
+            # --- SMART DETECTION END ---
 
-        # 3. Generate Manifest (Integrity Check)
-        manifest = hashing.generate_manifest(str(extract_dir))
+            # 3. Generate Manifest (Integrity Check) + split big files into the chunk store
+            if report:
+                report("hashing")
+            manifest = chunk_store.build_chunked_manifest(str(extract_dir))
 
-        # --- PREVIEW URL PRE-CALCULATION ---
-        preview_url = _find_preview_url(extract_dir, detected_name, detected_type)
+        if report:
+            # Last cancellation point: nothing below may undo a committed mod
+            report("registering", force=True)
+
+        # --- ASSET INDEX: previews/outlines/badges located once, looked up by id later ---
+        asset_records = asset_index.scan_assets(extract_dir, detected_type)
+        preview_url = asset_index.preview_url(asset_records)
 
         # 4. Create DB Entry
         new_mod = models.Mod(
@@ -154,21 +198,20 @@ def process_mod_file(file_path: Path, original_filename: str, db: Session, user_
             source_path=str(extract_dir),
             manifest=json.dumps(manifest),
             status="approved",
-            preview_url=preview_url
+            preview_url=preview_url,
+            # Footprint in the library: the extracted content (the archive is dropped below)
+            size_bytes=_manifest_size(manifest)
         )
         
         # Check if mod with same name exists? 
         # For now, just add.
         
         db.add(new_mod)
-        db.commit()
+        db.flush()
+        # Commits the mod together with its asset rows
+        asset_index.store_assets(db, new_mod.id, asset_records)
         db.refresh(new_mod)
 
-        # 5. AUTO-TAGGING
-        _apply_auto_tags(db, new_mod, detected_type, detected_name)
-        
-        return new_mod
-
     except zipfile.BadZipFile:
         shutil.rmtree(mod_dir, ignore_errors=True)
         raise HTTPException(status_code=400, detail="Invalid zip file")
@@ -177,6 +220,80 @@ def process_mod_file(file_path: Path, original_filename: str, db: Session, user_
         # Re-raise to caller
         raise e
 
+    # The mod is committed: failures from here on are logged, its files stay in place
+    # Stations sync the extracted files and chunks; the uploaded archive is never read again
+    try:
+        final_archive_path.unlink(missing_ok=True)
+    except OSError as e:
+        logger.warning(f"Could not remove the archive of mod {new_mod.id}: {e}")
+
+    # Warm the thumbnail cache so the library grid never renders full-size previews
+    preview_file = asset_index.primary_asset(asset_records, "preview")
+    if preview_file:
+        try:
+            thumbnails.pregenerate(preview_file)
+        except Exception as e:
+            logger.warning(f"Thumbnail pregeneration failed for mod {new_mod.id}: {e}")
+
+    # 5. AUTO-TAGGING
+    _apply_auto_tags(db, new_mod, detected_type, detected_name)
+    try:
+        mod_search.refresh_mods(db, [new_mod.id])
+    except Exception as e:
+        logger.error(f"Search index refresh failed for mod {new_mod.id}: {e}")
+
+    return new_mod
+
+def _manifest_size(manifest) -> int:
+    if isinstance(manifest, str):
+        try:
+            manifest = json.loads(manifest)
+        except ValueError:
+            return 0
+    if not isinstance(manifest, dict):
+        return 0
+    return sum(int(info.get("size") or 0) for info in manifest.values() if isinstance(info, dict))
+
+def _mod_storage_dir(mod) -> Path:
+    """Folder a library mod owns under MODS_DIR (None for auto-scanned/external mods)."""
+    if not mod.source_path or mod.source_path.startswith("auto_scan::"):
+        return None
+    mod_path = Path(mod.source_path).resolve()
+    storage_root = MODS_DIR.resolve()
+    if not str(mod_path).startswith(str(storage_root)) or mod_path == storage_root:
+        return None
+    # source_path is <mod_dir>/content; the archive lives in <mod_dir>
+    return mod_path.parent if mod_path.name == "content" else mod_path
+
+def _release_chunks(db: Session, manifests) -> None:
+    """Deletes the chunks of removed mods that no remaining mod references."""
+    candidates = set()
+    for manifest in manifests:
+        candidates |= chunk_store.manifest_chunks(manifest)
+    if not candidates:
+        return
+    referenced = set()
+    for (manifest,) in db.query(models.Mod.manifest).filter(models.Mod.manifest.isnot(None)):
+        referenced |= chunk_store.manifest_chunks(manifest)
+    try:
+        freed = chunk_store.release_chunks(candidates, referenced)
+    except OSError as e:
+        logger.error(f"Chunk cleanup failed: {e}")
+        return
+    if freed:
+        logger.info(f"Released {freed} bytes of unreferenced chunks")
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        for f in filenames:
+            # slip past if unopenable
+            try:
+                total += os.path.getsize(os.path.join(dirpath, f))
+            except OSError:
+                continue
+    return total
+
 def _handle_smart_detection(root, extract_dir, type_str, files, current_name, current_version, user_version_override):
     detected_name = current_name
     detected_version = current_version
@@ -195,12 +312,13 @@ def _handle_smart_detection(root, extract_dir, type_str, files, current_name, cu
         logger.error(f"Error reading {json_filename}: {e}")
     
     # RESTRUCTURING
-    ui_dir = Path(root)
-    content_dir = ui_dir.parent
+    content_dir = Path(mod_ingest.content_folder(Path(root) / json_filename))
     
     target_base = Path(extract_dir) / "content" / (type_str + "s") # cars or tracks
+    # Only the layout inside the archive matters (extract_dir itself is <mod>/content)
+    relative_parts = content_dir.relative_to(extract_dir).parts
     
-    if "content" not in content_dir.parts and (type_str + "s") not in content_dir.parts:
+    if relative_parts and "content" not in relative_parts and (type_str + "s") not in relative_parts:
         target_base.mkdir(parents=True, exist_ok=True)
         target_path = target_base / content_dir.name
         
@@ -215,125 +333,28 @@ def _handle_smart_detection(root, extract_dir, type_str, files, current_name, cu
 
 def _apply_auto_tags(db, mod, type_str, name):
     try:
-        tags_to_add = []
-        
-        if type_str == "car":
-            tags_to_add.append(("Car", "#3b82f6")) 
-        elif type_str == "track":
-            tags_to_add.append(("Track", "#10b981")) 
-
-        name_lower = name.lower()
-        brands = [
-            ("Ferrari", "#ef4444"), ("Porsche", "#eab308"), ("BMW", "#3b82f6"),
-            ("Mercedes", "#06b6d4"), ("Audi", "#64748b"), ("Lamborghini", "#fbbf24"),
-            ("Honda", "#ef4444"), ("Toyota", "#ef4444"), ("Nissan", "#ef4444"),
-            ("McLaren", "#f97316"), ("F1", "#ef4444"), ("GT3", "#ec4899"),
-            ("Drift", "#8b5cf6"), ("JDM", "#ec4899")
-        ]
-        
-        for brand, color in brands:
-            if brand.lower() in name_lower:
-                tags_to_add.append((brand, color))
-                
-        for tag_name, tag_color in tags_to_add:
-            tag = db.query(models.Tag).filter(models.Tag.name == tag_name).first()
-            if not tag:
-                tag = models.Tag(name=tag_name, color=tag_color)
-                db.add(tag)
-                db.commit()
-                db.refresh(tag)
-            
-            if tag not in mod.tags:
-                mod.tags.append(tag)
-        
-        db.commit()
+        auto_library.apply_auto_tags(db, [(mod.id, type_str, name)])
     except Exception as e:
+        db.rollback()
         logger.error(f"Auto-tagging failed: {e}")
 
-
-    except Exception as e:
-        logger.error(f"Auto-tagging failed: {e}")
-
-# --- HELPER: Find Preview URL ---
-def _find_preview_url(mod_path: Path, mod_name: str, mod_type: str) -> str:
-    """
-    Helper to find the best preview image for a mod and return its static URL.
-    This logic was previously in get_mod_metadata but is now pre-calculated.
-    """
-    try:
-        storage_root = STORAGE_DIR.resolve()
-        
-        # Determine likely UI path
-        # Try finding 'ui' folder first
-        ui_path = None
-        for root, dirs, files in os.walk(mod_path):
-            if "ui" in dirs:
-                ui_path = Path(root) / "ui"
-                break
-        
-        if not ui_path and (mod_path / "ui").exists():
-             ui_path = mod_path / "ui"
-             
-        if not ui_path:
-            return None
-
-        # Logic copied/adapted from get_mod_metadata
-        image_url = None
-        
-        # 1. Skin Check (Cars only)
-        if mod_type == "car":
-            car_root = ui_path.parent
-            skins_dir = car_root / "skins"
-            if skins_dir.exists() and skins_dir.is_dir():
-                skins = [d for d in skins_dir.iterdir() if d.is_dir()]
-                if skins:
-                    skins.sort(key=lambda x: x.name)
-                    first_skin = skins[0]
-                    skin_preview = first_skin / "preview.jpg"
-                    if skin_preview.exists():
-                        try:
-                            skin_rel = skin_preview.resolve().relative_to(storage_root)
-                            image_url = f"/static/{str(skin_rel).replace(os.sep, '/')}"
-                        except: pass
-
-        # 2. UI Folder Fallbacks
-        if not image_url:
-            try:
-                rel_path = ui_path.resolve().relative_to(storage_root)
-                base_url = f"/static/{str(rel_path).replace(os.sep, '/')}"
-                
-                if (ui_path / "preview.png").exists():
-                    image_url = f"{base_url}/preview.png"
-                elif (ui_path / "preview.jpg").exists():
-                    image_url = f"{base_url}/preview.jpg"
-                else:
-                    parent_dir = ui_path.parent
-                    if (parent_dir / "logo.png").exists():
-                         parent_rel = parent_dir.resolve().relative_to(storage_root)
-                         parent_base = f"/static/{str(parent_rel).replace(os.sep, '/')}"
-                         image_url = f"{parent_base}/logo.png"
-                    elif (ui_path / "badge.png").exists():
-                          image_url = f"{base_url}/badge.png"
-            except: pass
-            
-        return image_url
-
-    except Exception as e:
-        logger.error(f"Error finding preview for {mod_name}: {e}")
-        return None
-
 # --- MAINTENANCE: Migrate Previews ---
-@router.post("/maintenance/migrate_previews")
+@router.post("/maintenance/migrate_previews", response_model=schemas.Job, status_code=202)
 def migrate_mod_previews(db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_active_user)):
     """
-    Scans all mods in DB and populates the 'preview_url' column.
-    Use this once after updating the schema.
+    Rebuilds the asset index of every stored mod and refreshes its 'preview_url'.
+    Use this once after updating the schema. Runs as a background job.
     """
+    return job_runner.enqueue(db, "mod_migrate_previews", created_by=current_user.username)
+
+@job_runner.handler("mod_migrate_previews")
+def _migrate_previews_job(ctx, payload, db: Session):
     mods = db.query(models.Mod).all()
     count = 0
     errors = 0
     
-    for mod in mods:
+    for index, mod in enumerate(mods):
+        ctx.report("scanning", index, len(mods))
         try:
             if not mod.source_path:
                 continue
@@ -342,8 +363,8 @@ def migrate_mod_previews(db: Session = Depends(database.get_db), current_user: m
             if not path.exists():
                 continue
                 
-            # Re-calculate
-            new_url = _find_preview_url(path, mod.name, mod.type)
+            # Re-index
+            new_url = asset_index.preview_url(asset_index.index_mod(db, mod))
             
             if new_url and new_url != mod.preview_url:
                 mod.preview_url = new_url
@@ -353,10 +374,28 @@ def migrate_mod_previews(db: Session = Depends(database.get_db), current_user: m
             errors += 1
             
     db.commit()
+    # UI metadata may have moved with the re-index
+    mod_search.invalidate()
     return {"migrated": count, "errors": errors, "total_scanned": len(mods)}
 
 
-@router.post("/upload", response_model=schemas.Mod)
+@job_runner.handler("mod_upload")
+def _mod_upload_job(ctx, payload, db: Session):
+    temp_path = Path(payload["temp_path"])
+    if not temp_path.exists():
+        raise Exception("Uploaded archive is no longer available, upload it again")
+    try:
+        mod = process_mod_file(
+            temp_path, payload["filename"], db,
+            payload.get("name"), payload.get("type"), payload.get("version"),
+            report=ctx.report
+        )
+        return {"mod_id": mod.id, "name": mod.name, "type": mod.type, "version": mod.version}
+    finally:
+        if temp_path.exists():
+            os.remove(temp_path)
+
+@router.post("/upload", response_model=schemas.Job, status_code=202)
 def upload_mod(
     file: UploadFile = File(...), 
     name: str = Form(None), 
@@ -365,6 +404,10 @@ def upload_mod(
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
+    """
+    Stores the archive and queues a 'mod_upload' job. Poll /jobs/{id} for progress;
+    the created mod id is in `result` once the job is completed.
+    """
     # Validation logic
     filename_lower = file.filename.lower()
     if not (filename_lower.endswith('.zip') or filename_lower.endswith('.rar') or filename_lower.endswith('.7z')):
@@ -379,17 +422,14 @@ def upload_mod(
     temp_dir.mkdir(exist_ok=True)
     temp_path = temp_dir / _sanitize_name(Path(file.filename).name, "upload")
     
+    # Unique temp name so parallel uploads of the same file don't clobber each other
+    temp_path = temp_path.with_name(f"{uuid.uuid4().hex[:8]}_{temp_path.name}")
+    
     with open(temp_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
-    try:
-        mod = process_mod_file(temp_path, file.filename, db, name, type, version)
-        # Cleanup temp dir parent if empty? No, just leave dir.
-        return mod
-    except Exception as e:
-        if temp_path.exists():
-            os.remove(temp_path)
-        raise HTTPException(status_code=500, detail=str(e))
+        shutil.copyfileobj(file.file, buffer, 1024 * 1024)
+
+    payload = {"temp_path": str(temp_path), "filename": file.filename, "name": name, "type": type, "version": version}
+    return job_runner.enqueue(db, "mod_upload", payload, created_by=current_user.username)
 
 @router.delete("/{mod_id}")
 def delete_mod(mod_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_active_user)):
@@ -410,8 +450,12 @@ def delete_mod(mod_id: int, db: Session = Depends(database.get_db), current_user
         # We continue to delete from DB even if file deletion fails/partial
         
     # 2. Delete from DB
+    manifest = mod.manifest
     db.delete(mod)
     db.commit()
+    dependency_graph.invalidate(db)
+    mod_search.remove_mods([mod_id])
+    _release_chunks(db, [manifest])
     
     return {"status": "deleted", "id": mod_id}
 
@@ -438,76 +482,30 @@ def list_mods(
     db: Session = Depends(database.get_db)
 ):
     query = db.query(models.Mod)
+
+    if search:
+        # Ranked ids from the in-memory index (prefix + typo tolerant), type/tag applied there too
+        ranked = mod_search.search(db, search, None if type == "all" else type, tag)
+        if only_universal:
+            allowed_items = universal_content.get_universal_ids(db)
+            allowed = {
+                mod_id for (mod_id,) in db.query(models.Mod.id).filter(universal_content.mod_filter(allowed_items)).all()
+            } if allowed_items and ranked else set()
+            ranked = [mod_id for mod_id in ranked if mod_id in allowed]
+        page = ranked[skip:skip + limit]
+        mods_by_id = {mod.id: mod for mod in query.filter(models.Mod.id.in_(page)).all()} if page else {}
+        return [mods_by_id[mod_id] for mod_id in page if mod_id in mods_by_id]
     
     if only_universal:
-        # --- CACHING LOGIC ---
-        # Cache key based on "universal_content_ids"
-        import time
-        current_time = time.time()
-        
-        # Simple global cache variable (in-memory)
-        # We need to access it from global scope. 
-        # Since I can't easily modify global scope here without imports, 
-        # I'll use a function attribute or similar hack, or just re-calc if it's cheap enough?
-        # No, the JSON parsing is the heavy part.
-        
-        # Let's attach cache to the router object or use a global dict
-        if not hasattr(list_mods, "cache"):
-            list_mods.cache = {"data": None, "timestamp": 0}
-            
-        # 60 seconds TTL
-        if list_mods.cache["data"] and (current_time - list_mods.cache["timestamp"] < 60):
-             allowed_items = list_mods.cache["data"]
-        else:
-            # Get all active and online stations
-            active_stations = db.query(models.Station).filter(
-                models.Station.is_active == True,
-                models.Station.is_online == True,
-                models.Station.status != "archived"
-            ).all()
-            
-            allowed_items = []
-            if active_stations:
-                common_cars = None
-                common_tracks = None
-                
-                for s in active_stations:
-                    if not s.content_cache:
-                        continue
-                    
-                    s_cars = {c.get("id") or c.get("name") for c in s.content_cache.get("cars", []) if c.get("id") or c.get("name")}
-                    s_tracks = {t.get("id") or t.get("name") for t in s.content_cache.get("tracks", []) if t.get("id") or t.get("name")}
-                    
-                    if common_cars is None:
-                        common_cars = s_cars
-                        common_tracks = s_tracks
-                    else:
-                        common_cars &= s_cars
-                        common_tracks &= s_tracks
-                
-                if common_cars is not None:
-                     allowed_items = list(common_cars) + list(common_tracks)
-
-            # Update cache
-            list_mods.cache = {"data": allowed_items, "timestamp": current_time}
-        
-        # Apply filter
+        # Indexed lookup over station_content; recomputed only when the online
+        # station set changes or a station reports a new content scan.
+        allowed_items = universal_content.get_universal_ids(db)
         if allowed_items:
-            from sqlalchemy import or_
-            query = query.filter(or_(
-                models.Mod.name.in_(allowed_items),
-                # Check auto_scan::id format
-                or_(*[models.Mod.source_path.like(f"%::{item}") for item in allowed_items[:100]]) if allowed_items else False
-            ))
+            query = query.filter(universal_content.mod_filter(allowed_items))
         else:
-            # If no intersection or no stations, return empty?
-            # Or return nothing if we requested universal.
+            # No intersection or no stations: a universal-only request returns nothing
             query = query.filter(models.Mod.id == -1) # Impossible ID
 
-    if search:
-        search_filter = f"%{search}%"
-        query = query.filter(models.Mod.name.ilike(search_filter))
-        
     if type and type != "all":
         query = query.filter(models.Mod.type == type)
         
@@ -527,19 +525,29 @@ def add_mod_dependency(
     mod = db.query(models.Mod).filter(models.Mod.id == mod_id).first()
     if not mod:
         raise HTTPException(status_code=404, detail="Mod not found")
-        
+
+    found = {m.id: m for m in db.query(models.Mod).filter(models.Mod.id.in_(dependency_ids)).all()}
+    added = []
     for dep_id in dependency_ids:
         if dep_id == mod_id:
             continue # Avoid self-dependency
             
-        dependency = db.query(models.Mod).filter(models.Mod.id == dep_id).first()
+        dependency = found.get(dep_id)
         if not dependency:
             continue # Skip invalid IDs or raise error
             
         if dependency not in mod.dependencies:
+            try:
+                dependency_graph.check_new_dependency(db, mod_id, dep_id)
+            except dependency_graph.DependencyCycleError as e:
+                db.rollback()
+                raise HTTPException(status_code=400, detail=f"Dependency cycle: {e}")
             mod.dependencies.append(dependency)
+            added.append(dep_id)
             
     db.commit()
+    for dep_id in added:
+        dependency_graph.record_dependency(db, mod_id, dep_id)
     db.refresh(mod)
     return mod
 
@@ -548,135 +556,112 @@ def get_mod_metadata(mod_id: int, db: Session = Depends(database.get_db)):
     mod = db.query(models.Mod).filter(models.Mod.id == mod_id).first()
     if not mod:
         raise HTTPException(status_code=404, detail="Mod not found")
-        
-    # We need to find the ui folder within source_path
-    # source_path points to extract_dir.
-    # Structure is usually: extract_dir/content/cars/{car_name}/ui
-    
-    source_path = Path(mod.source_path)
-    ui_path = None
-    
-    # Simple search for 'ui' folder
-    for root, dirs, files in os.walk(source_path):
-        if "ui" in dirs:
-            ui_path = Path(root) / "ui"
-            break
-            
-    if not ui_path:
-        # Fallback: maybe source_path IS the root for some reason?
-        if (source_path / "ui").exists():
-            ui_path = source_path / "ui"
-            
-    if not ui_path:
+
+    # Asset locations come from the index built at ingest (no tree walk per request)
+    asset_index.ensure_indexed(db, mod)
+    assets = asset_index.get_mod_assets(db, mod.id)
+    if not assets:
         return {"error": "UI data not found"}
 
     metadata = {}
-    
-    # Try reading ui_car.json
-    if (ui_path / "ui_car.json").exists():
+    ui_json = asset_index.absolute_path(assets.get("ui_json"))
+    if ui_json:
         try:
-            with open(ui_path / "ui_car.json", 'r', encoding='utf-8') as f:
-                metadata = json.load(f)
-        except:
-            pass
-            
-    # Try reading ui_track.json
-    elif (ui_path / "ui_track.json").exists():
-         try:
-            with open(ui_path / "ui_track.json", 'r', encoding='utf-8') as f:
+            with open(ui_json, 'r', encoding='utf-8') as f:
                 metadata = json.load(f)
-         except:
+        except Exception:
             pass
 
-    # Construct Image URLs
-    # Access via Static Mount.
-    # We need relative path from "backend/storage" to ui_path
-    # storage_root is "backend/storage"
-    
-    storage_root = STORAGE_DIR.resolve()
-    try:
-        # Try to calculate relative path. If ui_path is outside storage (dev mode?), this might fail.
-        # But mod.source_path is usually inside storage/mods/...
-        
-        # --- NEW LOGIC: SKIN PREVIEW PRIORITY ---
-        # User requested: cars/{car_name}/skins/{first_skin}/preview.jpg
-        # ui_path is usually .../content/cars/{car_name}/ui
-        # So car_root is ui_path.parent
-        
-        image_url = None
-        car_root = ui_path.parent
-        
-        # Check if it's a car by looking for 'skins' folder
-        skins_dir = car_root / "skins"
-        if skins_dir.exists() and skins_dir.is_dir():
-            # Get first skin folder
-            skins = [d for d in skins_dir.iterdir() if d.is_dir()]
-            if skins:
-                # Sort to ensure deterministic result (e.g. alphabetical)
-                skins.sort(key=lambda x: x.name)
-                first_skin = skins[0]
-                skin_preview = first_skin / "preview.jpg"
-                
-                if skin_preview.exists():
-                     try:
-                        skin_rel_path = skin_preview.resolve().relative_to(storage_root)
-                        image_url = f"/static/{str(skin_rel_path).replace(os.sep, '/')}"
-                     except Exception as e:
-                         # Fallback if path resolution fails
-                         logger.warning(f"Failed to resolve skin path for {mod.name}: {e}")
-
-        # If no skin preview found, fall back to standard UI logic
-        if not image_url:
-            rel_path = ui_path.resolve().relative_to(storage_root)
-            base_url = f"/static/{str(rel_path).replace(os.sep, '/')}"
-            
-            # Image Fallbacks
-            if (ui_path / "preview.png").exists():
-                 image_url = f"{base_url}/preview.png"
-            elif (ui_path / "preview.jpg").exists():
-                 image_url = f"{base_url}/preview.jpg"
-            else:
-                # Check for logo.png in parent directory (car root)
-                parent_dir = ui_path.parent
-                if (parent_dir / "logo.png").exists():
-                    try:
-                        parent_rel_path = parent_dir.resolve().relative_to(storage_root)
-                        parent_base_url = f"/static/{str(parent_rel_path).replace(os.sep, '/')}"
-                        image_url = f"{parent_base_url}/logo.png"
-                    except:
-                        pass
-                # Final fallback: badge
-                if not image_url and (ui_path / "badge.png").exists():
-                      image_url = f"{base_url}/badge.png"
-
-        metadata["image_url"] = image_url
-        
-        # Map/Outline logic remains similar, rooted at UI path usually
-        rel_path_ui = ui_path.resolve().relative_to(storage_root)
-        base_url_ui = f"/static/{str(rel_path_ui).replace(os.sep, '/')}"
-        
-        metadata["map_url"] = f"{base_url_ui}/map.png" if (ui_path / "map.png").exists() else None
-        metadata["outline_url"] = f"{base_url_ui}/outline.png" if (ui_path / "outline.png").exists() else None
-        
-    except ValueError as e:
-        logger.error(f"Path resolution error for mod {mod_id}: {e}")
-        pass # Path issue
-
+    metadata["image_url"] = asset_index.static_url(assets.get("preview"))
+    metadata["map_url"] = asset_index.static_url(assets.get("map"))
+    metadata["outline_url"] = asset_index.static_url(assets.get("outline"))
     return metadata
 
+@router.get("/{mod_id}/thumbnail")
+def get_mod_thumbnail(mod_id: int, size: int = 192, kind: str = "preview", db: Session = Depends(database.get_db)):
+    """Resized WebP of a mod asset (preview by default); the original file if Pillow is unavailable."""
+    mod = db.query(models.Mod).filter(models.Mod.id == mod_id).first()
+    if not mod:
+        raise HTTPException(status_code=404, detail="Mod not found")
+    asset_index.ensure_indexed(db, mod)
+    source = asset_index.absolute_path(asset_index.get_mod_assets(db, mod.id).get(kind))
+    if not source or not source.is_file():
+        raise HTTPException(status_code=404, detail="Asset not found")
+    # Thumbnail paths are keyed by source mtime, so clients can cache aggressively
+    headers = {"Cache-Control": "public, max-age=604800"}
+    thumb = thumbnails.get_thumbnail(source, size)
+    if thumb:
+        return FileResponse(thumb, media_type="image/webp", headers=headers)
+    return FileResponse(source, headers=headers)
+
+# Size of the shared chunk store as last measured by the reconcile job
+CHUNK_STORE_SETTING = "chunk_store_bytes"
+
 @router.get("/disk_usage")
 def get_disk_usage(db: Session = Depends(database.get_db)):
-    total_size = 0
-    for dirpath, dirnames, filenames in os.walk(MODS_DIR):
-        for f in filenames:
-            fp = os.path.join(dirpath, f)
-            # slip past if unopenable
+    # Per-mod sizes are recorded at ingest, so the library total is a single aggregate
+    mods_size = int(db.query(func.coalesce(func.sum(models.Mod.size_bytes), 0)).scalar() or 0)
+    chunks_size = db.query(models.GlobalSettings.value).filter(models.GlobalSettings.key == CHUNK_STORE_SETTING).scalar()
+    chunks_size = int(chunks_size) if chunks_size and chunks_size.isdigit() else 0
+    total_size = mods_size + chunks_size
+    return {
+        "total_size_bytes": total_size,
+        "mods_size_bytes": mods_size,
+        "chunk_store_bytes": chunks_size,
+        "pretty": f"{total_size / (1024*1024*1024):.2f} GB",
+    }
+
+@router.post("/maintenance/reconcile_disk_usage", response_model=schemas.Job, status_code=202)
+def reconcile_disk_usage(db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_active_user)):
+    """Re-measures every mod folder (and the chunk store) and fixes recorded sizes that drifted. Runs as a background job."""
+    return job_runner.enqueue(db, "mod_disk_reconcile", created_by=current_user.username)
+
+@job_runner.handler("mod_disk_reconcile")
+def _disk_reconcile_job(ctx, payload, db: Session):
+    mods = db.query(models.Mod).all()
+    owned_dirs = set()
+    corrected = []
+    drift_bytes = 0
+    for index, mod in enumerate(mods):
+        ctx.report("measuring", index, len(mods))
+        mod_dir = _mod_storage_dir(mod)
+        if mod_dir is None:
+            continue
+        owned_dirs.add(mod_dir)
+        actual = _dir_size(mod_dir) if mod_dir.exists() else 0
+        recorded = mod.size_bytes or 0
+        if actual != recorded:
+            drift_bytes += actual - recorded
+            corrected.append({"id": mod.id, "recorded": recorded, "actual": actual})
+            mod.size_bytes = actual
+
+    # Chunks are shared between mods, so the store is measured once and recorded on its own
+    ctx.report("measuring chunks", force=True)
+    chunks_size = _dir_size(chunk_store.CHUNKS_DIR) if chunk_store.CHUNKS_DIR.exists() else 0
+    db.merge(models.GlobalSettings(key=CHUNK_STORE_SETTING, value=str(chunks_size)))
+    db.commit()
+
+    # Anything in the library folder that no mod owns (failed uploads, temp files...)
+    orphan_bytes = 0
+    if MODS_DIR.exists():
+        for entry in MODS_DIR.iterdir():
+            if entry.resolve() in owned_dirs:
+                continue
             try:
-                total_size += os.path.getsize(fp)
+                orphan_bytes += _dir_size(entry) if entry.is_dir() else entry.stat().st_size
             except OSError:
                 continue
-                
-    return {"total_size_bytes": total_size, "pretty": f"{total_size / (1024*1024*1024):.2f} GB"}
+
+    if corrected:
+        logger.warning(f"Disk usage drift corrected for {len(corrected)} mods ({drift_bytes} bytes)")
+    return {
+        "mods_checked": len(mods),
+        "mods_corrected": len(corrected),
+        "drift_bytes": drift_bytes,
+        "orphan_bytes": orphan_bytes,
+        "chunk_store_bytes": chunks_size,
+        "corrections": corrected[:100],
+    }
 
 # --- TAGS ENDPOINTS ---
 
@@ -709,6 +694,7 @@ def add_tag_to_mod(mod_id: int, tag_id: int, db: Session = Depends(database.get_
         mod.tags.append(tag)
         db.commit()
         db.refresh(mod)
+        mod_search.refresh_mods(db, [mod_id])
         
     return mod
 
@@ -724,31 +710,49 @@ def remove_tag_from_mod(mod_id: int, tag_id: int, db: Session = Depends(database
         mod.tags.remove(tag)
         db.commit()
         db.refresh(mod)
+        mod_search.refresh_mods(db, [mod_id])
         
     return mod
 
-@router.post("/bulk/delete")
+@router.post("/bulk/delete", response_model=schemas.Job, status_code=202)
 def bulk_delete_mods(mod_ids: List[int], db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_active_user)):
+    return job_runner.enqueue(db, "mod_bulk_delete", {"mod_ids": mod_ids}, created_by=current_user.username)
+
+@job_runner.handler("mod_bulk_delete")
+def _bulk_delete_job(ctx, payload, db: Session):
+    mod_ids = payload.get("mod_ids", [])
     deleted = []
     failed = []
-    for mod_id in mod_ids:
-        mod = db.query(models.Mod).filter(models.Mod.id == mod_id).first()
-        if not mod:
-            failed.append({"id": mod_id, "error": "not_found"})
-            continue
-        try:
-            mod_path = Path(mod.source_path).resolve()
-            storage_root = MODS_DIR.resolve()
-            if str(mod_path).startswith(str(storage_root)):
-                shutil.rmtree(mod_path.parent, ignore_errors=True)
-            else:
-                shutil.rmtree(mod_path, ignore_errors=True)
-            db.delete(mod)
-            deleted.append(mod_id)
-        except Exception as e:
-            failed.append({"id": mod_id, "error": str(e)})
-
-    db.commit()
+    manifests = []
+    try:
+        for index, mod_id in enumerate(mod_ids):
+            ctx.report("deleting", index, len(mod_ids))
+            mod = db.query(models.Mod).filter(models.Mod.id == mod_id).first()
+            if not mod:
+                failed.append({"id": mod_id, "error": "not_found"})
+                continue
+            try:
+                mod_path = Path(mod.source_path).resolve()
+                storage_root = MODS_DIR.resolve()
+                if str(mod_path).startswith(str(storage_root)):
+                    shutil.rmtree(mod_path.parent, ignore_errors=True)
+                else:
+                    shutil.rmtree(mod_path, ignore_errors=True)
+                manifest = mod.manifest
+                db.delete(mod)
+                # Commit per mod so a cancelled job never leaves rows pointing at deleted files
+                db.commit()
+                deleted.append(mod_id)
+                manifests.append(manifest)
+            except Exception as e:
+                db.rollback()
+                failed.append({"id": mod_id, "error": str(e)})
+    finally:
+        # Also when cancelled: the mods deleted so far are gone
+        if deleted:
+            dependency_graph.invalidate(db)
+            mod_search.remove_mods(deleted)
+            _release_chunks(db, manifests)
     return {"deleted": deleted, "failed": failed}
 
 @router.post("/bulk/toggle")
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, Body
 from sqlalchemy.orm import Session
 from typing import List, Any
 from .. import models, schemas, database
+from ..services import dependency_graph
 
 router = APIRouter(
     prefix="/profiles",
@@ -15,21 +16,13 @@ def create_profile(profile: schemas.ProfileCreate, db: Session = Depends(databas
     db.add(new_profile)
     db.commit()
     
-    # 2. Assign Mods with Recursive Dependency Resolution
+    # 2. Assign Mods plus everything they depend on (precomputed closure, one query)
     if profile.mod_ids:
-        requested_mods = db.query(models.Mod).filter(models.Mod.id.in_(profile.mod_ids)).all()
-        
-        final_mod_list = set()
-        
-        def resolve_dependencies(mods_list):
-            for mod in mods_list:
-                if mod.id in final_mod_list:
-                    continue
-                final_mod_list.add(mod.id)
-                new_profile.mods.append(mod)
-                resolve_dependencies(mod.dependencies)
-                
-        resolve_dependencies(requested_mods)
+        requested_ids = [
+            mod_id for (mod_id,) in db.query(models.Mod.id).filter(models.Mod.id.in_(profile.mod_ids)).all()
+        ]
+        final_mod_ids = dependency_graph.resolve(db, requested_ids)
+        new_profile.mods = db.query(models.Mod).filter(models.Mod.id.in_(final_mod_ids)).all()
         db.commit()
         
     db.refresh(new_profile)
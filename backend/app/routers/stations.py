@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from typing import List
 from pathlib import Path
@@ -12,6 +12,7 @@ from ..routers.auth import require_admin, require_agent_token, require_admin_or_
 from ..paths import STORAGE_DIR
 from ..utils.wol import send_magic_packet
 from .websockets import manager as ws_manager
+from ..services import dependency_graph, peer_registry
 
 router = APIRouter(
     prefix="/stations",
@@ -41,6 +42,14 @@ class ArchiveGhostsRequest(BaseModel):
     include_never_seen: bool = True
     dry_run: bool = False
 
+class ChunkAnnounceRequest(BaseModel):
+    hashes: List[str] = []
+    replace: bool = False
+    port: int = 8081
+
+class ChunkPeersRequest(BaseModel):
+    hashes: List[str] = []
+
 @router.post("/", response_model=schemas.Station, dependencies=[Depends(require_agent_token)])
 def register_station(station: schemas.StationCreate, db: Session = Depends(database.get_db)):
     now = datetime.now(timezone.utc)
@@ -168,6 +177,9 @@ def archive_ghost_stations(payload: ArchiveGhostsRequest, db: Session = Depends(
                 continue
             is_ghost = True
         else:
+            if last_seen.tzinfo is None:
+                # SQLite hands back naive UTC timestamps
+                last_seen = last_seen.replace(tzinfo=timezone.utc)
             is_ghost = last_seen < cutoff
         if not is_ghost:
             continue
@@ -217,9 +229,18 @@ def get_target_manifest(station_id: int, db: Session = Depends(database.get_db))
     if not station.active_profile:
         return {}
     
+    # Profile mods plus their dependencies (including ones added after the profile was made)
+    profile_mod_ids = [
+        mod_id for (mod_id,) in db.query(models.profile_mods.c.mod_id).filter(
+            models.profile_mods.c.profile_id == station.active_profile.id
+        ).all()
+    ]
+    mod_ids = dependency_graph.resolve(db, profile_mod_ids)
+    mods_by_id = {mod.id: mod for mod in db.query(models.Mod).filter(models.Mod.id.in_(mod_ids)).all()}
+
     master_manifest = {}
     storage_root = STORAGE_DIR.resolve()
-    for mod in station.active_profile.mods:
+    for mod in (mods_by_id[mod_id] for mod_id in mod_ids if mod_id in mods_by_id):
         if not mod.manifest:
             continue
         if not mod.source_path:
@@ -250,6 +271,23 @@ def get_target_manifest(station_id: int, db: Session = Depends(database.get_db))
             
     return master_manifest
 
+@router.post("/{station_id}/chunks", dependencies=[Depends(require_agent_token)])
+def announce_station_chunks(station_id: int, payload: ChunkAnnounceRequest, request: Request, db: Session = Depends(database.get_db)):
+    """Agent reports the content chunks it holds and can serve to sibling stations."""
+    station = db.query(models.Station).filter(models.Station.id == station_id).first()
+    if not station:
+        raise HTTPException(status_code=404, detail="Station not found")
+    host = station.ip_address or (request.client.host if request.client else None)
+    if not host:
+        raise HTTPException(status_code=400, detail="Station address unknown")
+    held = peer_registry.announce(station_id, f"http://{host}:{payload.port}", payload.hashes, replace=payload.replace)
+    return {"status": "ok", "chunks": held}
+
+@router.post("/{station_id}/chunks/peers", dependencies=[Depends(require_agent_token)])
+def get_chunk_peers(station_id: int, payload: ChunkPeersRequest):
+    """Which sibling stations can serve these chunks. Missing hashes come from the server."""
+    return {"peers": peer_registry.lookup(payload.hashes, exclude_station_id=station_id)}
+
 @router.post("/{station_id}/shutdown")
 async def shutdown_station(station_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(require_admin)):
     station = db.query(models.Station).filter(models.Station.id == station_id).first()
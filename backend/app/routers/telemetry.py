@@ -4,14 +4,17 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, asc, desc
 from typing import List, Optional, Union, Any
 from .. import models, schemas, database
+from ..services import active_events, asset_index, content_catalog, driver_stats, response_cache, track_geometry
 from ..paths import STORAGE_DIR, REPO_ROOT
 from datetime import datetime, timezone, timedelta
 import os
 import json
 import math
 import logging
+from functools import lru_cache
 from .auth import require_agent_token, require_admin
 from . import tournament
+from . import tracks as tracks_router
 import io
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
@@ -111,12 +114,7 @@ def upload_session_result(
             # 1. Track matches
             # 2. Current time matches event window
             # 3. Championship is active
-            active_event = db.query(models.Event).join(models.Championship).filter(
-                models.Championship.is_active == True,
-                func.lower(models.Event.track_name) == session_data.track_name.lower(),
-                models.Event.start_date <= new_session.date,
-                models.Event.end_date >= new_session.date
-            ).first()
+            active_event = active_events.find_event_for_session(db, session_data.track_name, new_session.date)
             
             if active_event:
                 new_session.event_id = active_event.id
@@ -126,6 +124,7 @@ def upload_session_result(
         db.flush() # Get ID without committing
         
         # 2. Process Laps
+        new_laps = []
         for idx, lap in enumerate(session_data.laps, start=1):
             if not lap.is_valid:
                 continue # We only store valid laps for leaderboards to save space? Or store all?
@@ -142,8 +141,13 @@ def upload_session_result(
                 valid=lap.is_valid
             )
             db.add(new_lap)
-        
+            new_laps.append(new_lap)
+
+        driver_stats.record_session(db, new_session, new_laps)
         db.commit()
+        response_cache.invalidate("laps")
+        if new_session.event_id:
+            response_cache.invalidate("championships")
 
         # 3. Tournament Auto-Advance Logic
         if new_session.session_type == 'race' and new_session.event_id:
@@ -200,6 +204,7 @@ def upload_session_result(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/leaderboard", response_model=List[schemas.LeaderboardEntry])
+@response_cache.cached(tags=("laps",), ttl=60)
 def get_leaderboard(
     track_name: Optional[str] = None, 
     car_model: Optional[str] = None, 
@@ -217,7 +222,7 @@ def get_leaderboard(
     ]
 
     if track_name and track_name != "all":
-        filters.append(func.lower(models.SessionResult.track_name) == track_name.lower())
+        filters.append(content_catalog.matches(db, models.SessionResult.track_id, "track", track_name))
     
     today = datetime.now(timezone.utc).date()
     
@@ -231,7 +236,7 @@ def get_leaderboard(
         filters.append(models.SessionResult.date >= start_date)
 
     if car_model:
-        filters.append(func.lower(models.SessionResult.car_model) == car_model.lower())
+        filters.append(content_catalog.matches(db, models.SessionResult.car_id, "car", car_model))
 
     # 2. Subquery: Find the BEST Time (MIN time) for each driver
     # We must join LapTime -> SessionResult to get Driver Name
@@ -283,6 +288,7 @@ def get_leaderboard(
     return leaderboard
 
 @router.get("/combinations", response_model=List[dict])
+@response_cache.cached(tags=("laps",))
 def get_active_combinations(db: Session = Depends(database.get_db)):
     """
     Returns unique Active Tracks that have at least one valid lap.
@@ -302,6 +308,26 @@ def get_active_combinations(db: Session = Depends(database.get_db)):
     
     return [{"track_name": row.track_name, "car_model": row.car_model} for row in results]
 
+@lru_cache(maxsize=8)
+def _layout_geometry(layout: tuple) -> track_geometry.TrackGeometry:
+    """Track geometry for a mock layout of ('straight', length) / ('turn', angle_deg, radius) pieces."""
+    x, z, rot = 0.0, 0.0, 0.0
+    path_points = [(x, z)]
+    for segment in layout:
+        if segment[0] == 'straight':
+            steps, angle_step = int(segment[1] / 10), 0.0  # 1 point every 10m
+        else:
+            angle = math.radians(segment[1])
+            steps = int(abs(angle * segment[2]) / 10)
+            angle_step = angle / steps
+        for _ in range(steps):
+            rot += angle_step
+            x += math.sin(rot) * 10
+            z += math.cos(rot) * 10
+            path_points.append((x, z))
+    # The mock layouts are not closed loops; the lap ends where the last piece does
+    return track_geometry.TrackGeometry(path_points, closed=False)
+
 @router.get("/lap/{lap_id}/telemetry")
 def get_lap_telemetry(lap_id: int, db: Session = Depends(database.get_db)):
     """
@@ -351,50 +377,22 @@ def get_lap_telemetry(lap_id: int, db: Session = Depends(database.get_db)):
                  ('straight', 200)
             ]
 
-        # Generate Points from Layout
-        points = []
-        import math
-        x, z, rot = 0, 0, 0
-        total_dist = 0
-        
-        # 1. First pass: Calculate total distance to normalize time
-        # And generate raw path points
-        path_points = []
-        
-        for segment in layout:
-            type = segment[0]
-            if type == 'straight':
-                dist = segment[1]
-                steps = int(dist / 10) # 1 point every 10m
-                for _ in range(steps):
-                    x += math.sin(rot) * 10 
-                    z += math.cos(rot) * 10
-                    path_points.append({'x': x, 'z': z, 'rot': rot, 'type': 'straight'})
-                    total_dist += 10
-            elif type == 'turn':
-                angle_deg = segment[1]
-                radius = segment[2]
-                match_dist = abs(math.radians(angle_deg) * radius)
-                steps = int(match_dist / 10)
-                
-                angle_step = math.radians(angle_deg) / steps
-                for _ in range(steps):
-                    rot += angle_step
-                    x += math.sin(rot) * 10
-                    z += math.cos(rot) * 10
-                    path_points.append({'x': x, 'z': z, 'rot': rot, 'type': 'turn'})
-                    total_dist += 10
-                    
-        # 2. Resample to num_points and add speed profile
+        # Real AI line when the track is installed, else the simplified layout above.
+        # Either way positions and corner/straight typing come from the shared geometry
+        geometry = tracks_router.load_track_geometry(lap.session.track_name if lap.session else None)
+        if geometry is None:
+            geometry = _layout_geometry(tuple(layout))
+
+        # Resample by distance along the line and add a speed profile
         real_lap_time = lap.time if lap.time else 100000
-        
-        path_len = len(path_points)
+
         for i in range(num_points):
-            idx = int((i / num_points) * path_len)
-            p = path_points[min(idx, path_len-1)]
-            
-            # Speed logic: Straight = Fast, Turn = Slow
-            base_speed = 280 if p['type'] == 'straight' else 120
+            distance = geometry.length * i / num_points
+            x, z, rot = geometry.position_at(distance)
+            segment = geometry.segment_at(distance)
+
+            # Speed logic: Straight = Fast, Corner = Slow
+            base_speed = 280 if segment and segment['type'] == 'straight' else 120
             noise = (i % 10) - 5
             speed = base_speed + noise
             
@@ -407,10 +405,10 @@ def get_lap_telemetry(lap_id: int, db: Session = Depends(database.get_db)):
                 "r": rpm,
                 "g": min(8, gear),
                 "n": round(i / num_points, 3),
-                "x": round(p['x'], 2),
+                "x": round(x, 2),
                 "y": 0,
-                "z": round(p['z'], 2),
-                "rot": round(p['rot'], 2)
+                "z": round(z, 2),
+                "rot": round(rot, 2)
             })
             
         return telemetry_trace
@@ -495,8 +493,8 @@ def get_session_pdf(session_id: int, db: Session = Depends(database.get_db)):
 
     # Local Record Comparison
     local_record = db.query(func.min(models.SessionResult.best_lap))\
-        .filter(models.SessionResult.track_name == session.track_name, 
-                models.SessionResult.car_model == session.car_model)\
+        .filter(models.SessionResult.track_id == session.track_id, 
+                models.SessionResult.car_id == session.car_id)\
         .scalar()
 
     # Telemetry for charts (Best Lap)
@@ -557,21 +555,12 @@ def get_session_pdf(session_id: int, db: Session = Depends(database.get_db)):
             [Paragraph(str(value), style)]
         ], colWidths=[4.2*cm])
 
-    # Find Track Map
+    # Find Track Map (asset index built at mod ingest)
     track_map_img = None
-    mods_dir = STORAGE_DIR / "mods"
-    if mods_dir.exists():
-        for mod_folder in os.listdir(mods_dir):
-            if session.track_name.lower() in mod_folder.lower():
-                mod_path = mods_dir / mod_folder
-                for root, dirs, files in os.walk(mod_path):
-                    for file in files:
-                        if file.lower() in ["map.png", "map.jpg"]:
-                            try: track_map_img = Image(os.path.join(root, file), width=3*cm, height=3*cm, kind='proportional')
-                            except: pass
-                            break
-                    if track_map_img: break
-            if track_map_img: break
+    map_path = asset_index.find_track_asset(db, session.track_name, ("map",))
+    if map_path:
+        try: track_map_img = Image(str(map_path), width=3*cm, height=3*cm, kind='proportional')
+        except: pass
 
     info_cards = Table([
         [make_card("Piloto", session.driver_name), make_card("Vehículo", session.car_model), make_card("Mejor Vuelta", format_ms(session.best_lap), True)],
@@ -714,11 +703,11 @@ def get_driver_details(
         HTTPException: 404 if no telemetry data found for driver
     """
     filters = [
-        models.SessionResult.track_name == track_name,
+        content_catalog.matches(db, models.SessionResult.track_id, "track", track_name),
         models.SessionResult.driver_name == driver_name
     ]
     if car_model:
-        filters.append(models.SessionResult.car_model == car_model)
+        filters.append(content_catalog.matches(db, models.SessionResult.car_id, "car", car_model))
 
     # Get all laps for this driver
     laps = db.query(models.LapTime).join(models.SessionResult).filter(*filters).order_by(desc(models.SessionResult.date)).all()
@@ -786,64 +775,34 @@ def get_pilot_profile(driver_name: str, db: Session = Depends(database.get_db)):
     Get global profile for a driver across all tracks and sessions.
     The "Racing Passport".
     """
-    # 1. Total Laps
-    total_laps = db.query(models.LapTime).join(models.SessionResult).filter(models.SessionResult.driver_name == driver_name).count()
+    # 1-6. Totals, favourite car, records, consistency and active days come from the driver_stats rollup
+    stats = driver_stats.get_stats(db, driver_name)
+    total_laps = stats.total_laps if stats else 0
     if total_laps == 0:
         raise HTTPException(status_code=404, detail="Pilot profile not found")
 
-    # 2. Favorite Car (Most used)
-    fav_car_row = db.query(
-        models.SessionResult.car_model, 
-        func.count(models.LapTime.id).label('count')
-    ).join(models.LapTime).filter(models.SessionResult.driver_name == driver_name).group_by(models.SessionResult.car_model).order_by(desc('count')).first()
-    favorite_car = fav_car_row[0] if fav_car_row else "Unknown"
+    car_rows = db.query(models.DriverCarStats).filter(models.DriverCarStats.driver_name == driver_name).all()
+    favorite_car = max(car_rows, key=lambda c: (c.laps or 0)).car_model if car_rows else "Unknown"
 
-    # 3. Best Records per Track
-    subq = db.query(
-        models.SessionResult.track_name,
-        func.min(models.LapTime.time).label('best_time')
-    ).join(models.LapTime).filter(
-        models.SessionResult.driver_name == driver_name,
-        models.LapTime.valid == True
-    ).group_by(models.SessionResult.track_name).subquery()
+    track_rows = db.query(models.DriverTrackStats).filter(
+        models.DriverTrackStats.driver_name == driver_name,
+        models.DriverTrackStats.best_lap.isnot(None)
+    ).all()
+    track_records = [
+        schemas.TrackRecord(
+            track_name=t.track_name,
+            best_lap=t.best_lap,
+            car_model=t.best_car or "Unknown",
+            date=t.best_date
+        )
+        for t in track_rows
+    ]
 
-    records_query = db.query(models.LapTime, models.SessionResult).join(
-        models.SessionResult
-    ).join(
-        subq,
-        (models.SessionResult.track_name == subq.c.track_name) &
-        (models.LapTime.time == subq.c.best_time)
-    ).filter(models.SessionResult.driver_name == driver_name)
-
-    track_records = []
-    for lap, session in records_query.all():
-        track_records.append(schemas.TrackRecord(
-            track_name=session.track_name,
-            best_lap=lap.time,
-            car_model=session.car_model,
-            date=session.date
-        ))
+    avg_consistency = driver_stats.consistency_score(track_rows)
 
-    # 4. Global Consistency (Avg of consistency scores)
-    recent_laps = db.query(models.LapTime.time).join(models.SessionResult).filter(
-        models.SessionResult.driver_name == driver_name,
-        models.LapTime.valid == True
-    ).order_by(desc(models.SessionResult.date)).limit(50).all()
-    
-    avg_consistency = 100.0
-    if len(recent_laps) > 1:
-        times = [l[0] for l in recent_laps]
-        avg = sum(times) / len(times)
-        variance = sum((t - avg)**2 for t in times) / len(times)
-        std_dev = math.sqrt(variance)
-        avg_consistency = max(0, min(100, 100 - (std_dev / 100)))
-
-    # 5. Total KM (approx 5km per lap)
+    # Total KM (approx 5km per lap)
     total_km = total_laps * DEFAULT_LAP_LENGTH_KM
-
-    # 6. Active Days (Count unique dates)
-    dates_query = db.query(models.SessionResult.date).filter(models.SessionResult.driver_name == driver_name).all()
-    active_days = len(set([d[0].date() for d in dates_query]))
+    active_days = stats.active_days or 0
 
     # 7. Recent Sessions (Optimized N+1)
     recent_sessions_db = db.query(
@@ -860,42 +819,41 @@ def get_pilot_profile(driver_name: str, db: Session = Depends(database.get_db)):
         desc(models.SessionResult.date)
     ).limit(10).all()
 
-    recent_sessions = []
-    for s, laps_count in recent_sessions_db:
-        # Find the actual ID of the best lap for this session
-        best_lap_obj = db.query(models.LapTime).filter(
-            models.LapTime.session_id == s.id,
+    # Best valid lap of each of those sessions in one query (fastest first, so the first seen wins)
+    best_lap_ids = {}
+    session_ids = [s.id for s, _ in recent_sessions_db]
+    if session_ids:
+        for lap_id, session_id in db.query(models.LapTime.id, models.LapTime.session_id).filter(
+            models.LapTime.session_id.in_(session_ids),
             models.LapTime.valid == True
-        ).order_by(asc(models.LapTime.time)).first()
+        ).order_by(asc(models.LapTime.time), asc(models.LapTime.id)).all():
+            best_lap_ids.setdefault(session_id, lap_id)
 
+    recent_sessions = []
+    for s, laps_count in recent_sessions_db:
         recent_sessions.append(schemas.SessionSummary(
             session_id=s.id,
             track_name=s.track_name,
             car_model=s.car_model,
             date=s.date,
             best_lap=s.best_lap,
-            best_lap_id=best_lap_obj.id if best_lap_obj else None,
+            best_lap_id=best_lap_ids.get(s.id),
             laps_count=laps_count or 0
         ))
 
-    # 8. Get Driver Stats
+    # 8. Get Driver Stats (a driver without a Driver row yet gets the defaults, nothing is created here)
     driver_obj = db.query(models.Driver).filter(models.Driver.name == driver_name).first()
-    
-    if not driver_obj:
-        driver_obj = models.Driver(name=driver_name, elo_rating=1200.0)
-        db.add(driver_obj)
-        db.commit()
-        db.refresh(driver_obj)
+    total_wins = (driver_obj.total_wins or 0) if driver_obj else 0
 
     from pathlib import Path
     photo_url = None
-    if driver_obj.photo_path:
+    if driver_obj and driver_obj.photo_path:
         photo_url = f"/static/drivers/{Path(driver_obj.photo_path).name}"
 
-    xp_points = total_laps * 10 + (driver_obj.total_wins * 100)
+    xp_points = total_laps * 10 + (total_wins * 100)
     level = int(1 + (xp_points / 500))
     badges = []
-    if driver_obj.total_wins > 0:
+    if total_wins > 0:
         badges.append({"id": "winner", "label": "Ganador", "icon": "🏆", "desc": "Ha ganado al menos una carrera"})
     if total_laps > 100:
         badges.append({"id": "veteran", "label": "Veterano", "icon": "🎖️", "desc": "Más de 100 vueltas completadas"})
@@ -909,12 +867,12 @@ def get_pilot_profile(driver_name: str, db: Session = Depends(database.get_db)):
         active_days=active_days,
         records=track_records,
         recent_sessions=recent_sessions,
-        total_wins=driver_obj.total_wins,
-        total_podiums=driver_obj.total_podiums,
-        elo_rating=driver_obj.elo_rating,
+        total_wins=total_wins,
+        total_podiums=(driver_obj.total_podiums or 0) if driver_obj else 0,
+        elo_rating=(driver_obj.elo_rating or 1200.0) if driver_obj else 1200.0,
         photo_url=photo_url,
-        phone=driver_obj.phone,
-        driver_id=driver_obj.id,
+        phone=driver_obj.phone if driver_obj else None,
+        driver_id=driver_obj.id if driver_obj else None,
         badges=badges,
         xp_points=xp_points,
         level=level
@@ -957,6 +915,7 @@ def seed_data(
         
         # Create 5 laps for this session
         best_of_session = base_lap_time
+        new_laps = []
         for i in range(5):
             # Variance for consistency testing: +/- 1.5 seconds
             lap_time = base_lap_time + random.randint(-500, 1000)
@@ -1016,10 +975,13 @@ def seed_data(
                 valid=random.random() > 0.1, # 90% valid
             )
             db.add(new_lap)
+            new_laps.append(new_lap)
         
         new_session.best_lap = best_of_session
+        driver_stats.record_session(db, new_session, new_laps)
         
     db.commit()
+    response_cache.invalidate("laps")
     return {"message": f"Seeded {count} random laps with sectors across sessions"}
 
 @router.get("/drivers", response_model=List[schemas.DriverSummary])
@@ -1076,12 +1038,13 @@ def get_recent_sessions(
     db: Session = Depends(database.get_db)
 ):
     query = db.query(models.SessionResult)
+    # Track/car substrings are matched against the in-memory alias catalog, then filtered by id
     if track_name:
-        query = query.filter(models.SessionResult.track_name.ilike(f"%{track_name}%"))
+        query = query.filter(models.SessionResult.track_id.in_(content_catalog.search(db, "track", track_name)))
     if driver_name:
         query = query.filter(models.SessionResult.driver_name.ilike(f"%{driver_name}%"))
     if car_model:
-        query = query.filter(models.SessionResult.car_model.ilike(f"%{car_model}%"))
+        query = query.filter(models.SessionResult.car_id.in_(content_catalog.search(db, "car", car_model)))
     
     sessions = query.order_by(desc(models.SessionResult.date)).limit(limit).all()
     
@@ -1103,6 +1066,7 @@ def get_recent_sessions(
     return results
 
 @router.get("/stats", response_model=schemas.LeaderboardStats)
+@response_cache.cached(tags=("laps",))
 def get_teleboard_stats(db: Session = Depends(database.get_db)):
     """
     Get Global Stats for the news ticker.
@@ -1139,6 +1103,7 @@ def get_teleboard_stats(db: Session = Depends(database.get_db)):
     )
 
 @router.get("/hall_of_fame", response_model=List[schemas.HallOfFameCategory])
+@response_cache.cached(tags=("laps",))
 def get_hall_of_fame(db: Session = Depends(database.get_db)):
     # 1. Get unique Track/Car combinations
     combinations = db.query(
@@ -1201,6 +1166,7 @@ def _classify_car_category(car_model: str) -> str:
     return "Road Cars" # Default fallback
 
 @router.get("/hall_of_fame/categories", response_model=List[schemas.HallOfFameCategory])
+@response_cache.cached(tags=("laps",))
 def get_hall_of_fame_categories(db: Session = Depends(database.get_db)):
     """
     Aggregated Hall of Fame for TV Mode.
@@ -1295,10 +1261,10 @@ def get_driver_comparison(
             # Case insensitive filtering for strings
             filters = [
                 func.lower(models.SessionResult.driver_name) == driver.lower(),
-                func.lower(models.SessionResult.track_name) == track.lower()
+                content_catalog.matches(db, models.SessionResult.track_id, "track", track)
             ]
             if car:
-                filters.append(func.lower(models.SessionResult.car_model) == car.lower())
+                filters.append(content_catalog.matches(db, models.SessionResult.car_id, "car", car))
                 
             laps = db.query(models.LapTime).join(models.SessionResult).filter(*filters).all()
             
@@ -1367,10 +1333,10 @@ def compare_multi_drivers(
         def get_stats(driver_name):
             filters = [
                 func.lower(models.SessionResult.driver_name) == driver_name.lower(),
-                func.lower(models.SessionResult.track_name) == payload.track.lower()
+                content_catalog.matches(db, models.SessionResult.track_id, "track", payload.track)
             ]
             if payload.car:
-                filters.append(func.lower(models.SessionResult.car_model) == payload.car.lower())
+                filters.append(content_catalog.matches(db, models.SessionResult.car_id, "car", payload.car))
                 
             laps = db.query(models.LapTime).join(models.SessionResult).filter(*filters).all()
             
@@ -1448,30 +1414,22 @@ def compare_multi_drivers(
 @router.get("/map/{track_name}")
 def get_track_map(track_name: str, db: Session = Depends(database.get_db)):
     
-    # Search for a mod that matches the track name (case-insensitive)
-    mods_dir = STORAGE_DIR / "mods"
-    if not mods_dir.exists():
-        raise HTTPException(status_code=404, detail="Mods directory not found")
-        
-    for mod_folder in os.listdir(mods_dir):
-        if track_name.lower() in mod_folder.lower():
-            mod_path = mods_dir / mod_folder
-            
-            # Possible map filenames
-            candidates = [
-                "map.png", "map.jpg", 
-                "preview.png", "preview.jpg",
-                "ui/map.png", "ui/preview.png",
-                "content/tracks/" + track_name + "/map.png"
-            ]
-            
-            # Recursive search for anything named map or preview
-            for root, dirs, files in os.walk(mod_path):
-                for file in files:
-                    if file.lower() in ["map.png", "map.jpg", "preview.png", "preview.jpg"]:
-                        return FileResponse(os.path.join(root, file))
-    
-    raise HTTPException(status_code=404, detail="Map not found for track")
+    # Indexed lookup of the track's map (or preview) among library mods
+    map_path = asset_index.find_track_asset(db, track_name, ("map", "preview"))
+    if not map_path:
+        raise HTTPException(status_code=404, detail="Map not found for track")
+    return FileResponse(map_path, headers={"Cache-Control": "public, max-age=86400"})
+
+
+def _fill_lap_positions(trace: list, geometry: track_geometry.TrackGeometry) -> list:
+    """Adds the normalised lap position `n` to samples that only carry x/z."""
+    filled = []
+    for p in trace:
+        if 'n' not in p and 'x' in p and 'z' in p:
+            p = {**p, 'n': round(geometry.progress(p['x'], p['z']), 4)}
+        filled.append(p)
+    return filled
+
 @router.get("/coach/{lap_id}", response_model=schemas.CoachAnalysis)
 def get_lap_coach_analysis(lap_id: int, db: Session = Depends(database.get_db)):
     """
@@ -1485,8 +1443,8 @@ def get_lap_coach_analysis(lap_id: int, db: Session = Depends(database.get_db)):
     # 2. Get Best Reference Lap (Ghost)
     # Filter by track and car, grab the fastest valid one excluding the current lap
     ghost_lap = db.query(models.LapTime).join(models.SessionResult).filter(
-        models.SessionResult.track_name == user_lap.session.track_name,
-        models.SessionResult.car_model == user_lap.session.car_model,
+        models.SessionResult.track_id == user_lap.session.track_id,
+        models.SessionResult.car_id == user_lap.session.car_id,
         models.LapTime.valid == True,
         models.LapTime.id != user_lap.id
     ).order_by(asc(models.LapTime.time)).first()
@@ -1517,6 +1475,13 @@ def get_lap_coach_analysis(lap_id: int, db: Session = Depends(database.get_db)):
             ghost_telemetry=[]
         )
 
+    # Samples without a lap position (older agents) are snapped onto the AI line by x/z
+    if any('n' not in p for p in user_tel + ghost_tel):
+        geometry = tracks_router.load_track_geometry(user_lap.session.track_name)
+        if geometry is not None:
+            user_tel = _fill_lap_positions(user_tel, geometry)
+            ghost_tel = _fill_lap_positions(ghost_tel, geometry)
+
     # 4. Normalize and Analysis
     # Divide track into 100 buckets by 'n' (0.0 to 1.0)
     NUM_BUCKETS = 100
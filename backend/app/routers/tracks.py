@@ -2,15 +2,16 @@
 Track Layout Parser for Assetto Corsa
 
 This module provides endpoints to extract track layouts from Assetto Corsa track files.
-It parses the fast_lane.ai binary file to generate SVG path data for visualization.
+It parses the fast_lane.ai binary file to generate SVG path data for visualization
+(see services/track_outline.py for parsing, simplification and caching).
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Body
 from pathlib import Path
-from typing import Optional, List, Dict, Any
-import struct
+from typing import List, Optional
 import os
 import logging
+from ..services import track_outline, track_geometry
 
 logger = logging.getLogger("api.tracks")
 
@@ -24,144 +25,48 @@ router = APIRouter(
 AC_TRACKS_PATH = Path(os.environ.get("AC_TRACKS_PATH", r"C:\Program Files (x86)\Steam\steamapps\common\assettocorsa\content\tracks"))
 
 
-def parse_fast_lane_ai(file_path: Path) -> List[Dict[str, float]]:
-    """
-    Parse the fast_lane.ai binary file to extract track coordinates.
-    
-    The fast_lane.ai file format (simplified):
-    - Header: 4 bytes (int) - number of points
-    - For each point:
-        - x: 4 bytes (float)
-        - y: 4 bytes (float) 
-        - z: 4 bytes (float)
-        - ... additional data (speed hints, etc.)
-    
-    Returns a list of {x, y, z} coordinates.
-    """
-    points = []
-    
-    try:
-        with open(file_path, 'rb') as f:
-            # Read header - first 4 bytes contain version or count
-            header = f.read(4)
-            if len(header) < 4:
-                return points
-            
-            # Try to determine format by reading first few values
-            f.seek(0)
-            
-            # Format 1: starts with count (int32)
-            count_bytes = f.read(4)
-            count = struct.unpack('<i', count_bytes)[0]
-            
-            # Sanity check - count should be reasonable (1-50000 points)
-            if 1 <= count <= 50000:
-                # Read points (each point is 48 bytes in full format, but we only need first 12 for x,y,z)
-                for i in range(min(count, 10000)):  # Limit to 10k points for performance
-                    try:
-                        # Read x, y, z as floats (12 bytes)
-                        point_data = f.read(12)
-                        if len(point_data) < 12:
-                            break
-                        
-                        x, y, z = struct.unpack('<fff', point_data)
-                        
-                        # Skip remaining bytes of the point record (speed, etc.)
-                        # Full record is typically 48 bytes, so skip 36 more
-                        f.read(36)
-                        
-                        # Only add valid points (not NaN or extreme values)
-                        if abs(x) < 100000 and abs(z) < 100000:
-                            points.append({"x": x, "y": y, "z": z})
-                    except struct.error:
-                        break
-            else:
-                # Alternative format - try reading raw floats
-                f.seek(0)
-                file_size = file_path.stat().st_size
-                num_floats = file_size // 4
-                
-                floats = []
-                for _ in range(min(num_floats, 30000)):
-                    try:
-                        data = f.read(4)
-                        if len(data) < 4:
-                            break
-                        floats.append(struct.unpack('<f', data)[0])
-                    except:
-                        break
-                
-                # Group into xyz triplets
-                for i in range(0, len(floats) - 2, 3):
-                    x, y, z = floats[i], floats[i+1], floats[i+2]
-                    if abs(x) < 100000 and abs(z) < 100000:
-                        points.append({"x": x, "y": y, "z": z})
-                        
-    except Exception as e:
-        logger.error(f"Error parsing fast_lane.ai: {e}")
-    
-    return points
+def find_ai_file(track_path: Path, layout: Optional[str] = None) -> Optional[Path]:
+    """fast_lane.ai for the layout (or the base track), else the first layout that has one."""
+    candidates = []
+    if layout:
+        candidates.append(track_path / layout / "ai" / "fast_lane.ai")
+    candidates.append(track_path / "ai" / "fast_lane.ai")
+    for ai_file in candidates:
+        if ai_file.exists():
+            return ai_file
 
+    # Try to find any fast_lane.ai in subdirectories
+    for subdir in track_path.iterdir():
+        if subdir.is_dir():
+            potential_ai = subdir / "ai" / "fast_lane.ai"
+            if potential_ai.exists():
+                return potential_ai
+    return None
 
-def points_to_svg_path(points: List[Dict[str, float]], width: int = 1000, height: int = 800) -> Dict[str, Any]:
-    """
-    Convert a list of 3D points to an SVG path string.
-    Uses X and Z coordinates (horizontal plane in 3D space).
-    """
-    if not points or len(points) < 3:
-        return {"path": "", "viewBox": f"0 0 {width} {height}", "error": "Not enough points"}
-    
-    # Extract X and Z (we use Z as Y in 2D since it's the horizontal plane)
-    xs = [p["x"] for p in points]
-    zs = [p["z"] for p in points]
-    
-    # Calculate bounds
-    min_x, max_x = min(xs), max(xs)
-    min_z, max_z = min(zs), max(zs)
-    
-    # Add padding
-    padding = 50
-    range_x = max_x - min_x or 1
-    range_z = max_z - min_z or 1
-    
-    # Scale to fit in viewBox
-    scale = min((width - 2 * padding) / range_x, (height - 2 * padding) / range_z)
-    
-    # Center offset
-    offset_x = padding + (width - 2 * padding - range_x * scale) / 2
-    offset_z = padding + (height - 2 * padding - range_z * scale) / 2
-    
-    # Build SVG path
-    path_parts = []
-    
-    # Simplify path by sampling every Nth point for performance
-    sample_rate = max(1, len(points) // 500)
-    sampled_points = points[::sample_rate]
-    
-    for i, p in enumerate(sampled_points):
-        screen_x = (p["x"] - min_x) * scale + offset_x
-        screen_y = (p["z"] - min_z) * scale + offset_z
-        
-        if i == 0:
-            path_parts.append(f"M {screen_x:.1f},{screen_y:.1f}")
-        else:
-            path_parts.append(f"L {screen_x:.1f},{screen_y:.1f}")
-    
-    # Close the path (tracks are loops)
-    path_parts.append("Z")
-    
-    return {
-        "path": " ".join(path_parts),
-        "viewBox": f"0 0 {width} {height}",
-        "pointCount": len(points),
-        "sampledCount": len(sampled_points)
-    }
+
+def load_track_geometry(track_id: str, layout: Optional[str] = None) -> Optional[track_geometry.TrackGeometry]:
+    """Cached geometry of a track's AI line, or None when the track or its fast_lane.ai isn't installed."""
+    if not track_id:
+        return None
+    track_path = AC_TRACKS_PATH / track_id
+    if not track_path.is_dir():
+        return None
+    ai_file = find_ai_file(track_path, layout)
+    if not ai_file:
+        return None
+    try:
+        return track_geometry.get_track_geometry(ai_file)
+    except Exception as e:
+        logger.error(f"Track geometry failed for {track_id}: {e}")
+        return None
 
 
 @router.get("/list")
-async def list_available_tracks():
+def list_available_tracks(include_outlines: bool = False):
     """
     List all available tracks in the Assetto Corsa content folder.
+    With include_outlines, each track carries its cached small outline (200x160)
+    so a track grid renders without one request per card.
     """
     if not AC_TRACKS_PATH.exists():
         raise HTTPException(status_code=404, detail=f"AC tracks path not found: {AC_TRACKS_PATH}")
@@ -179,18 +84,24 @@ async def list_available_tracks():
                 map_file = track_dir / "ui" / "map.png"
             has_map = map_file.exists()
             
-            tracks.append({
+            track = {
                 "id": track_dir.name,
                 "name": track_dir.name.replace("_", " ").title(),
                 "hasAiLine": has_ai,
                 "hasMapImage": has_map
-            })
+            }
+            if include_outlines and has_ai:
+                try:
+                    track["outline"] = track_outline.get_outline(ai_file, 200, 160)
+                except Exception as e:
+                    logger.error(f"Outline failed for {track_dir.name}: {e}")
+            tracks.append(track)
     
     return tracks
 
 
 @router.get("/{track_id}/outline")
-async def get_track_outline(
+def get_track_outline(
     track_id: str,
     width: int = Query(1000, ge=100, le=4000),
     height: int = Query(800, ge=100, le=3000),
@@ -209,34 +120,20 @@ async def get_track_outline(
     if not track_path.exists():
         raise HTTPException(status_code=404, detail=f"Track not found: {track_id}")
     
-    # Check for layout-specific ai file
-    if layout:
-        ai_file = track_path / layout / "ai" / "fast_lane.ai"
-        if not ai_file.exists():
-            ai_file = track_path / "ai" / "fast_lane.ai"
-    else:
-        ai_file = track_path / "ai" / "fast_lane.ai"
-    
-    if not ai_file.exists():
-        # Try to find any fast_lane.ai in subdirectories
-        for subdir in track_path.iterdir():
-            if subdir.is_dir():
-                potential_ai = subdir / "ai" / "fast_lane.ai"
-                if potential_ai.exists():
-                    ai_file = potential_ai
-                    break
-    
-    if not ai_file.exists():
+    ai_file = find_ai_file(track_path, layout)
+    if not ai_file:
         raise HTTPException(status_code=404, detail=f"AI line file not found for track: {track_id}")
     
-    # Parse the AI file
-    points = parse_fast_lane_ai(ai_file)
+    # Parsed once per file version, then served from the outline cache
+    try:
+        result = track_outline.get_outline(ai_file, width, height)
+    except Exception as e:
+        logger.error(f"Error parsing fast_lane.ai: {e}")
+        result = None
     
-    if not points:
+    if not result or not result.get("pointCount"):
         raise HTTPException(status_code=500, detail="Failed to parse AI line file")
     
-    # Convert to SVG path
-    result = points_to_svg_path(points, width, height)
     result["trackId"] = track_id
     result["trackName"] = track_id.replace("_", " ").title()
     
@@ -272,3 +169,47 @@ async def get_track_map_image(track_id: str, layout: Optional[str] = None):
             return FileResponse(img_path, media_type="image/png")
     
     raise HTTPException(status_code=404, detail=f"Map image not found for track: {track_id}")
+
+
+@router.get("/{track_id}/geometry")
+def get_track_geometry(track_id: str, layout: Optional[str] = None):
+    """
+    Length of the AI line and its corner/straight segments (distances in metres).
+    """
+    geometry = load_track_geometry(track_id, layout)
+    if geometry is None:
+        raise HTTPException(status_code=404, detail=f"AI line file not found for track: {track_id}")
+    result = geometry.summary()
+    result["trackId"] = track_id
+    return result
+
+
+@router.post("/{track_id}/project")
+def project_positions(
+    track_id: str,
+    positions: List[List[float]] = Body(..., max_length=5000),
+    layout: Optional[str] = None,
+    sectors: int = Query(3, ge=1, le=10)
+):
+    """
+    Snaps world [x, z] positions onto the AI line: distance, lap fraction `n`,
+    sector and the segment each position falls in.
+    """
+    geometry = load_track_geometry(track_id, layout)
+    if geometry is None:
+        raise HTTPException(status_code=404, detail=f"AI line file not found for track: {track_id}")
+
+    results = []
+    for position in positions:
+        if len(position) < 2:
+            raise HTTPException(status_code=422, detail="Positions must be [x, z] pairs")
+        distance, offset = geometry.project(position[0], position[1])
+        segment = geometry.segment_at(distance)
+        results.append({
+            "distance": round(distance, 1),
+            "n": round(distance / geometry.length, 4),
+            "offset": round(offset, 1),
+            "sector": geometry.sector_at(distance, sectors),
+            "segment": segment["type"] if segment else None,
+        })
+    return results
@@ -6,6 +6,7 @@ import os
 from sqlalchemy.orm import Session
 from ..database import SessionLocal
 from .. import models
+from ..services import auto_library, driver_stats, peer_registry, response_cache, universal_content
 from datetime import datetime, timezone
 
 
@@ -74,6 +75,7 @@ class ConnectionManager:
             if websocket in self.agent_states:
                 del self.agent_states[websocket]
             logger.info(f"Agent Disconnected: Station {station_id}")
+            peer_registry.forget(station_id)
             db = SessionLocal()
             try:
                 station = db.query(models.Station).filter(models.Station.id == station_id).first()
@@ -127,6 +129,18 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+def _store_station_content(db: Session, station: models.Station, content_data: dict):
+    station.content_cache = content_data
+    station.content_cache_updated = datetime.now(timezone.utc)
+    db.commit()
+    universal_content.replace_station_content(db, station.id, content_data)
+
+
+def _ensure_library_mods(db: Session, cars: List[dict], tracks: List[dict]):
+    """Creates "Auto Detected" library mods for scanned content that isn't in the library yet"""
+    auto_library.ensure_library_mods(db, cars, tracks)
+
+
 @router.websocket("/ws/telemetry/client")
 async def websocket_client_endpoint(websocket: WebSocket):
     logger.info("Attempting to connect a new client...")
@@ -218,43 +232,44 @@ async def websocket_agent_endpoint(websocket: WebSocket):
                         try:
                             station = db.query(models.Station).filter(models.Station.id == station_id).first()
                             if station:
-                                station.content_cache = content_data
-                                station.content_cache_updated = datetime.now(timezone.utc)
-                                db.commit()
+                                _store_station_content(db, station, content_data)
                                 logger.info(f"Cached content for Station {station_id}: {len(content_data.get('cars',[]))} cars, {len(content_data.get('tracks',[]))} tracks")
 
                                 # --- AUTO-POPULATE GLOBAL LIBRARY ---
-                                def ensure_mod_exists(item, mod_type):
-                                    mod_name = item.get("name") or item.get("id")
-                                    mod_id = item.get("id")
-                                    if not mod_name: return
-                                    
-                                    # Create "Auto Detected" mod if not exists
-                                    existing = db.query(models.Mod).filter(models.Mod.name == mod_name).first()
-                                    if not existing:
-                                        new_mod = models.Mod(
-                                            name=mod_name,
-                                            type=mod_type,
-                                            version="1.0",
-                                            source_path=f"auto_scan::{mod_id}", 
-                                            is_active=True,
-                                            status="detected"
-                                        )
-                                        db.add(new_mod)
-                                        db.commit()
-                                        db.refresh(new_mod)
-                                        
-                                        # Auto-tag
-                                        from .mods import _apply_auto_tags
-                                        _apply_auto_tags(db, new_mod, mod_type, mod_name)
-                                        logger.info(f"Auto-added to Library: {mod_name} ({mod_type})")
-                                
-                                for car in content_data.get("cars", []):
-                                    ensure_mod_exists(car, "car")
-                                    
-                                for track in content_data.get("tracks", []):
-                                    ensure_mod_exists(track, "track")
+                                _ensure_library_mods(db, content_data.get("cars", []), content_data.get("tracks", []))
+                        finally:
+                            db.close()
+                    continue
 
+                # Incremental scan: only cars/tracks that changed since the version we hold
+                if data.get("type") == "content_scan_diff":
+                    station_id = manager.ws_to_station.get(websocket)
+                    if station_id:
+                        diff = data.get("data", {})
+                        db = SessionLocal()
+                        try:
+                            station = db.query(models.Station).filter(models.Station.id == station_id).first()
+                            if station:
+                                content_data = universal_content.apply_scan_diff(station.content_cache, diff)
+                                if content_data is None:
+                                    # Our copy doesn't match the agent's base version: ask for everything
+                                    logger.info(f"Scan version mismatch for Station {station_id}, requesting full scan")
+                                    await websocket.send_text(json.dumps({
+                                        "command": "scan_content",
+                                        "full": True,
+                                        "ac_path": station.ac_path,
+                                        "station_ip": station.ip_address
+                                    }))
+                                else:
+                                    _store_station_content(db, station, content_data)
+                                    cars = diff.get("cars", {})
+                                    tracks = diff.get("tracks", {})
+                                    logger.info(
+                                        f"Applied content diff for Station {station_id} (v{diff.get('version')}): "
+                                        f"cars +{len(cars.get('added', []))}/~{len(cars.get('changed', []))}/-{len(cars.get('removed', []))}, "
+                                        f"tracks +{len(tracks.get('added', []))}/~{len(tracks.get('changed', []))}/-{len(tracks.get('removed', []))}"
+                                    )
+                                    _ensure_library_mods(db, cars.get("added", []), tracks.get("added", []))
                         finally:
                             db.close()
                     continue
@@ -288,8 +303,10 @@ async def websocket_agent_endpoint(websocket: WebSocket):
                                 track_config=None
                             )
                             db.add(new_session)
+                            driver_stats.record_session(db, new_session, [])
                             db.commit()
                             db.refresh(new_session)
+                            response_cache.invalidate("laps")
                             
                             logger.info(f"Auto-saved lap for {driver_name}: {lap_time}ms")
                         finally:
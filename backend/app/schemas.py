@@ -535,3 +535,19 @@ class MassLaunchRequest(BaseModel):
     duration_minutes: int = 15
     laps: int = 5
     name: Optional[str] = "Mass Launch"
+
+class Job(BaseModel):
+    id: int
+    kind: str
+    status: str
+    stage: Optional[str] = None
+    progress: float = 0.0
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    attempts: int = 0
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,116 @@
+"""
+Active Events - In-memory interval index of event windows.
+Session uploads auto-link to the event of an active championship running on the
+same track, and kiosks poll /events/active. Both are answered from a snapshot
+keyed by canonical track id (services/content_catalog.py), so the hot paths
+cost a dictionary lookup and a scan of that track's few windows instead of a
+query. Routers call invalidate(db) after committing event or championship changes,
+which also stores a new generation token in settings; every worker compares its
+snapshot against that token (a primary-key lookup, see services/cached_index.py)
+before serving it, so writes made through another worker are picked up on the next
+read. The snapshot is still rebuilt every REFRESH_SECONDS for writes that bypass
+invalidate().
+"""
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from .. import models
+from . import content_catalog
+from .cached_index import CachedIndex
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = 300
+VERSION_SETTING = "active_events_generation"
+
+
+@dataclass
+class EventWindow:
+    id: int
+    name: str
+    start: Optional[datetime]
+    end: Optional[datetime]
+
+    def contains(self, when: datetime) -> bool:
+        return (self.start is None or self.start <= when) and (self.end is None or self.end >= when)
+
+
+@dataclass
+class Snapshot:
+    # Events of active championships with a full window, per track id, earliest start first
+    by_track: Dict[int, List[EventWindow]] = field(default_factory=dict)
+    # Events flagged active, latest start first; is_active ones match outside their window too
+    current: List[Tuple[EventWindow, bool]] = field(default_factory=list)
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _build(db: Session) -> Snapshot:
+    rows = db.query(
+        models.Event.id, models.Event.name, models.Event.track_id,
+        models.Event.start_date, models.Event.end_date,
+        models.Event.is_active, models.Event.status, models.Championship.is_active
+    ).outerjoin(models.Championship, models.Event.championship_id == models.Championship.id).filter(
+        or_(models.Championship.is_active == True, models.Event.is_active == True, models.Event.status == "active")
+    ).all()
+
+    snapshot = Snapshot()
+    for event_id, name, track_id, start, end, is_active, status, championship_active in rows:
+        window = EventWindow(event_id, name, _naive_utc(start), _naive_utc(end))
+        if championship_active and track_id and window.start and window.end:
+            # Keyed like resolve() answers, even for an event still linked to a merged track
+            snapshot.by_track.setdefault(content_catalog.canonical(db, "track", track_id), []).append(window)
+        if is_active or status == "active":
+            snapshot.current.append((window, bool(is_active)))
+
+    for windows in snapshot.by_track.values():
+        windows.sort(key=lambda w: (w.start, w.id))
+    # Same order as ORDER BY start_date DESC on SQLite: undated events last
+    snapshot.current.sort(key=lambda c: (c[0].start is not None, c[0].start or datetime.min, c[0].id), reverse=True)
+    return snapshot
+
+
+_snapshot: CachedIndex[Snapshot] = CachedIndex("active events", _build, REFRESH_SECONDS, version_key=VERSION_SETTING)
+
+
+def get_snapshot(db: Session) -> Snapshot:
+    return _snapshot.get(db)
+
+
+def find_event_for_session(db: Session, track_name: Optional[str], when: Optional[datetime]) -> Optional[EventWindow]:
+    """The active-championship event on this track whose window contains `when`."""
+    if when is None:
+        return None
+    track_id = content_catalog.resolve(db, "track", track_name, create=False)
+    if track_id is None:
+        return None
+    when = _naive_utc(when)
+    for window in get_snapshot(db).by_track.get(track_id, ()):
+        if window.start > when:
+            break
+        if window.contains(when):
+            return window
+    return None
+
+
+def current_event_id(db: Session, now: datetime) -> Optional[int]:
+    """The latest-starting event that is_active, or has status "active" and a window containing `now`."""
+    now = _naive_utc(now)
+    for window, is_active in get_snapshot(db).current:
+        if is_active or window.contains(now):
+            return window.id
+    return None
+
+
+def invalidate(db: Session) -> None:
+    """Drops this worker's snapshot and publishes a new generation token for the others."""
+    _snapshot.invalidate(db)
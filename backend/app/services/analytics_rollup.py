@@ -0,0 +1,222 @@
+"""
+Analytics Rollup - Hourly and daily pre-aggregates behind the dashboards.
+`analytics_hourly` holds session counts, revenue and minutes per UTC hour,
+station and payment method; `analytics_daily_popularity` holds session results
+per day for each track, car and driver. Buckets are rebuilt for a trailing
+window (the only data that still changes: sessions get paid or closed late),
+so a dashboard reads a few small rows whatever its date range. The rebuild
+groups in SQL, with per-dialect UTC hour/day bucketing (date_trunc on
+Postgres, strftime on SQLite, which stores the UTC wall time as text).
+Every worker's scheduler refreshes the window, so a rebuild holds a transaction
+level advisory lock on Postgres (SQLite already allows a single writer) and the
+bucket keys are unique. The full-history backfill only runs from the scheduler
+or the rebuild job; dashboard reads never trigger it.
+"""
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import case, func, text
+from sqlalchemy.orm import Session
+
+from .. import models
+from . import response_cache
+
+logger = logging.getLogger(__name__)
+
+# Days rebuilt by a routine refresh (late payments, sessions closed after midnight)
+REFRESH_DAYS = 2
+# Nightly catch-up for anything edited further back
+NIGHTLY_DAYS = 35
+# Dashboard reads refresh the recent window at most this often
+MAX_AGE_SECONDS = 60
+BACKFILL_SETTING = "analytics_rollup_backfilled"
+# pg_advisory_xact_lock key shared by every worker ("rollup")
+ROLLUP_LOCK_KEY = 0x726F6C6C7570
+
+_lock = threading.Lock()
+_last_refresh = 0.0
+
+
+def _utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _day_start(value: datetime) -> datetime:
+    return _utc_naive(value).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def bucket(db: Session, column, unit: str):
+    """SQL expression truncating a timestamp column to its UTC `unit` ("hour" or "day")."""
+    if db.get_bind().dialect.name == "postgresql":
+        truncated = func.date_trunc(unit, func.timezone("UTC", column))
+        return func.date(truncated) if unit == "day" else truncated
+    return func.strftime("%Y-%m-%d %H:00:00" if unit == "hour" else "%Y-%m-%d", column)
+
+
+def _as_datetime(value) -> datetime:
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+def hourly_key(hour_start: datetime, station_id: Optional[int], method: Optional[str], paid: bool) -> str:
+    """Unique key of an hourly bucket (NULL station/method included)."""
+    return f"{hour_start:%Y-%m-%d %H}|{station_id if station_id is not None else ''}|{method or ''}|{int(bool(paid))}"
+
+
+def _lock_rollups(db: Session) -> None:
+    """Serializes rollup writes across worker processes until the transaction ends."""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ROLLUP_LOCK_KEY})
+
+
+def _rebuild(db: Session, since: Optional[datetime] = None) -> Dict[str, int]:
+    """Replaces the buckets from the day of `since` on (everything when None); the caller commits."""
+    since = _day_start(since) if since is not None else None
+    # Raw tables store timezone-aware timestamps, rollups naive UTC
+    since_utc = since.replace(tzinfo=timezone.utc) if since is not None else None
+
+    Sessions = models.Session
+    hour = bucket(db, Sessions.start_time, "hour")
+    is_paid = func.coalesce(Sessions.is_paid, False)
+    sessions_query = db.query(
+        hour, Sessions.station_id, Sessions.payment_method, is_paid,
+        func.count(Sessions.id), func.coalesce(func.sum(Sessions.price), 0.0),
+        func.coalesce(func.sum(Sessions.duration_minutes), 0)
+    ).filter(Sessions.start_time.isnot(None))
+    if since is not None:
+        sessions_query = sessions_query.filter(Sessions.start_time >= since_utc)
+    hourly = []
+    for hour_start, station_id, method, paid, count, revenue, minutes in sessions_query.group_by(
+        hour, Sessions.station_id, Sessions.payment_method, is_paid
+    ).all():
+        hour_start = _as_datetime(hour_start)
+        hourly.append({
+            "bucket_key": hourly_key(hour_start, station_id, method, paid),
+            "bucket_start": hour_start, "day": hour_start.date(), "hour": hour_start.hour,
+            "station_id": station_id, "payment_method": method, "is_paid": bool(paid),
+            "sessions": count, "revenue": float(revenue), "minutes": int(minutes),
+        })
+
+    Results = models.SessionResult
+    day = bucket(db, Results.date, "day")
+    popularity = []
+    for kind, column in (("track", Results.track_name), ("car", Results.car_model), ("driver", Results.driver_name)):
+        results_query = db.query(
+            day, column, func.count(Results.id),
+            func.min(case((Results.best_lap > 0, Results.best_lap)))
+        ).filter(Results.date.isnot(None), column.isnot(None), column != "")
+        if since is not None:
+            results_query = results_query.filter(Results.date >= since_utc)
+        for result_day, name, count, best_lap in results_query.group_by(day, column).all():
+            popularity.append({
+                "day": as_date(result_day), "kind": kind, "name": name, "sessions": count, "best_lap": best_lap,
+            })
+
+    hourly_delete = db.query(models.AnalyticsHourly)
+    popularity_delete = db.query(models.AnalyticsDailyPopularity)
+    if since is not None:
+        hourly_delete = hourly_delete.filter(models.AnalyticsHourly.bucket_start >= since)
+        popularity_delete = popularity_delete.filter(models.AnalyticsDailyPopularity.day >= since.date())
+    hourly_delete.delete(synchronize_session=False)
+    popularity_delete.delete(synchronize_session=False)
+
+    if hourly:
+        db.bulk_insert_mappings(models.AnalyticsHourly, hourly)
+    if popularity:
+        db.bulk_insert_mappings(models.AnalyticsDailyPopularity, popularity)
+    return {"hourly_rows": len(hourly), "popularity_rows": len(popularity)}
+
+
+def rebuild(db: Session, since: Optional[datetime] = None) -> Dict[str, int]:
+    """Recomputes every rollup bucket from the day of `since` on (everything when None)."""
+    _lock_rollups(db)
+    counts = _rebuild(db, since)
+    db.commit()
+    response_cache.invalidate("analytics")
+    return counts
+
+
+def _is_backfilled(db: Session) -> bool:
+    return db.query(models.GlobalSettings.key).filter(models.GlobalSettings.key == BACKFILL_SETTING).first() is not None
+
+
+def _mark_backfilled(db: Session) -> None:
+    # Checked under the rollup lock, so concurrent backfills can't both insert the key
+    if not _is_backfilled(db):
+        db.add(models.GlobalSettings(key=BACKFILL_SETTING, value=datetime.now(timezone.utc).isoformat()))
+
+
+def backfill(db: Session) -> Dict[str, int]:
+    """Full rebuild from all history; records that the rollups are complete."""
+    _lock_rollups(db)
+    counts = _rebuild(db)
+    _mark_backfilled(db)
+    db.commit()
+    response_cache.invalidate("analytics")
+    logger.info(f"Analytics rollups rebuilt: {counts}")
+    return counts
+
+
+def refresh(
+    db: Session, days: int = REFRESH_DAYS, max_age: Optional[float] = None, backfill_missing: bool = True
+) -> Optional[Dict[str, int]]:
+    """
+    Rebuilds the trailing `days`, or everything the first time unless `backfill_missing`
+    is False (then nothing happens until the backfill ran). With `max_age`, does nothing
+    when this process refreshed within that many seconds.
+    """
+    global _last_refresh
+    with _lock:
+        if max_age is not None and time.monotonic() - _last_refresh < max_age:
+            return None
+        _lock_rollups(db)
+        # Another worker may have backfilled while we waited for the lock
+        if not _is_backfilled(db):
+            if not backfill_missing:
+                db.rollback()
+                return None
+            counts = _rebuild(db)
+            _mark_backfilled(db)
+            logger.info(f"Analytics rollups rebuilt: {counts}")
+        else:
+            counts = _rebuild(db, datetime.now(timezone.utc) - timedelta(days=days - 1))
+        db.commit()
+        response_cache.invalidate("analytics")
+        _last_refresh = time.monotonic()
+    return counts
+
+
+def ensure_fresh(db: Session, max_age: float = MAX_AGE_SECONDS) -> None:
+    """
+    Called by dashboard reads: refreshes the recent window if it's older than `max_age`
+    seconds. Never backfills; the scheduler does that on startup.
+    """
+    if time.monotonic() - _last_refresh < max_age:
+        return
+    try:
+        refresh(db, max_age=max_age, backfill_missing=False)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Analytics rollup refresh failed: {e}")
+
+
+def range_start(range_days: int, now: Optional[datetime] = None) -> datetime:
+    """First hour bucket of a `range_days` dashboard range (naive UTC)."""
+    now = _utc_naive(now or datetime.now(timezone.utc))
+    return (now - timedelta(days=range_days)).replace(minute=0, second=0, microsecond=0)
+
+
+def day_keys(range_days: int, now: Optional[datetime] = None) -> list:
+    now = _utc_naive(now or datetime.now(timezone.utc))
+    return [(now - timedelta(days=range_days - 1 - i)).date() for i in range(range_days)]
+
+
+def as_date(value) -> date:
+    """Date columns come back as date objects on Postgres and, via some drivers, as strings."""
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
@@ -0,0 +1,212 @@
+"""
+Asset Index - Where each library mod keeps its preview, outline, map, badge and logo.
+The extracted content is walked once at ingest and every car/track folder
+(a folder with a `ui/` subfolder) is recorded in `mod_assets`, so metadata,
+preview and track-map requests become indexed lookups instead of os.walk
+calls over the mod storage on every request.
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..paths import STORAGE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Candidate files per asset kind, relative to the car/track folder, in priority order
+ASSET_CANDIDATES = {
+    "outline": ("ui/outline.png",),
+    "map": ("ui/map.png", "map.png", "map.jpg"),
+    "badge": ("ui/badge.png",),
+    "logo": ("logo.png",),
+    "ui_json": ("ui/ui_car.json", "ui/ui_track.json"),
+}
+# Per-layout track assets, relative to the track folder
+LAYOUT_CANDIDATES = {
+    "preview": ("ui/{layout}/preview.png", "ui/{layout}/preview.jpg"),
+    "outline": ("ui/{layout}/outline.png",),
+    "map": ("{layout}/map.png",),
+    "ui_json": ("ui/{layout}/ui_track.json",),
+}
+
+# Mods we already tried to index lazily in this process (avoids re-walking mods without
+# assets): mod id -> content folder mtime, so a changed folder is tried again
+MAX_LAZY_ATTEMPTS = 4096
+_lazy_attempted: "OrderedDict[int, Optional[int]]" = OrderedDict()
+_lazy_lock = threading.Lock()
+
+
+def _first_existing(item_dir: Path, candidates: Iterable[str]) -> Optional[Path]:
+    for rel in candidates:
+        path = item_dir / rel
+        if path.is_file():
+            return path
+    return None
+
+
+def _preview(item_dir: Path, item_type: Optional[str]) -> Optional[Path]:
+    # Same priority the library has always used: first skin's preview for cars,
+    # then the ui preview, the car logo and finally the badge
+    if item_type == "car":
+        skins_dir = item_dir / "skins"
+        if skins_dir.is_dir():
+            skins = sorted(d for d in skins_dir.iterdir() if d.is_dir())
+            if skins and (skins[0] / "preview.jpg").is_file():
+                return skins[0] / "preview.jpg"
+    return _first_existing(item_dir, ("ui/preview.png", "ui/preview.jpg", "logo.png", "ui/badge.png"))
+
+
+def scan_assets(content_dir: Path, default_type: Optional[str] = None) -> List[dict]:
+    """Walks extracted mod content once and returns its asset records, shallowest item first."""
+    records = []
+    for root, dirs, files in os.walk(content_dir):
+        dirs.sort()
+        if "ui" not in dirs:
+            continue
+        dirs.remove("ui")  # ui/ holds assets, not more items
+        item_dir = Path(root)
+        ui_dir = item_dir / "ui"
+        layouts = sorted(d.name for d in ui_dir.iterdir() if d.is_dir() and (d / "ui_track.json").is_file())
+        if (ui_dir / "ui_car.json").is_file():
+            item_type = "car"
+        elif (ui_dir / "ui_track.json").is_file() or layouts:
+            item_type = "track"
+        else:
+            item_type = default_type
+
+        def add(kind, path, layout=None):
+            if path:
+                records.append({
+                    "item_type": item_type, "item_key": item_dir.name.lower(), "layout": layout,
+                    "kind": kind, "path": path
+                })
+
+        add("preview", _preview(item_dir, item_type))
+        for kind, candidates in ASSET_CANDIDATES.items():
+            add(kind, _first_existing(item_dir, candidates))
+        for layout in layouts:
+            for kind, candidates in LAYOUT_CANDIDATES.items():
+                add(kind, _first_existing(item_dir, [c.format(layout=layout) for c in candidates]), layout)
+    return records
+
+
+def relative_path(path: Path) -> Optional[str]:
+    try:
+        return Path(path).resolve().relative_to(STORAGE_DIR.resolve()).as_posix()
+    except ValueError:
+        return None
+
+
+def absolute_path(rel_path: Optional[str]) -> Optional[Path]:
+    return STORAGE_DIR / rel_path if rel_path else None
+
+
+def static_url(rel_path: Optional[str]) -> Optional[str]:
+    return f"/static/{rel_path}" if rel_path else None
+
+
+def primary_asset(records: List[dict], kind: str) -> Optional[Path]:
+    """File of `kind` for the mod's primary (shallowest) item, base layout."""
+    if not records:
+        return None
+    first = records[0]
+    for record in records:
+        if record["item_key"] == first["item_key"] and record["layout"] is None and record["kind"] == kind:
+            return record["path"]
+    return None
+
+
+def preview_url(records: List[dict]) -> Optional[str]:
+    """Static URL of the primary item's preview, as stored in Mod.preview_url."""
+    preview = primary_asset(records, "preview")
+    return static_url(relative_path(preview)) if preview else None
+
+
+def store_assets(db: Session, mod_id: int, records: List[dict]) -> int:
+    """Replaces the mod's asset rows with `records` (files outside STORAGE_DIR are skipped)."""
+    db.query(models.ModAsset).filter(models.ModAsset.mod_id == mod_id).delete(synchronize_session=False)
+    count = 0
+    for record in records:
+        rel_path = relative_path(record["path"])
+        if not rel_path:
+            continue
+        db.add(models.ModAsset(
+            mod_id=mod_id, item_type=record["item_type"], item_key=record["item_key"],
+            layout=record["layout"], kind=record["kind"], rel_path=rel_path
+        ))
+        count += 1
+    db.commit()
+    return count
+
+
+def index_mod(db: Session, mod: models.Mod) -> List[dict]:
+    """(Re)builds the index for a stored mod from its extracted content."""
+    if not mod.source_path or mod.source_path.startswith("auto_scan::"):
+        return []
+    content_dir = Path(mod.source_path)
+    if not content_dir.is_dir():
+        return []
+    records = scan_assets(content_dir, mod.type)
+    store_assets(db, mod.id, records)
+    return records
+
+
+def ensure_indexed(db: Session, mod: models.Mod) -> None:
+    """Indexes mods ingested before the index existed, once per process and content version."""
+    try:
+        stamp = os.stat(mod.source_path).st_mtime_ns
+    except (OSError, TypeError, ValueError):
+        stamp = None
+    with _lazy_lock:
+        if mod.id in _lazy_attempted and _lazy_attempted[mod.id] == stamp:
+            _lazy_attempted.move_to_end(mod.id)
+            return
+        _lazy_attempted[mod.id] = stamp
+        _lazy_attempted.move_to_end(mod.id)
+        while len(_lazy_attempted) > MAX_LAZY_ATTEMPTS:
+            _lazy_attempted.popitem(last=False)
+    if db.query(models.ModAsset.id).filter(models.ModAsset.mod_id == mod.id).first() is None:
+        index_mod(db, mod)
+
+
+def get_mod_assets(db: Session, mod_id: int) -> Dict[str, str]:
+    """kind -> rel_path for the mod's primary item (base layout)."""
+    rows = db.query(models.ModAsset).filter(models.ModAsset.mod_id == mod_id).order_by(models.ModAsset.id).all()
+    if not rows:
+        return {}
+    primary = rows[0].item_key
+    assets = {}
+    for row in rows:
+        if row.item_key == primary and row.layout is None:
+            assets.setdefault(row.kind, row.rel_path)
+    return assets
+
+
+def find_track_asset(db: Session, track_name: str, kinds=("map", "preview")) -> Optional[Path]:
+    """Best asset for a track by folder name; falls back to a partial name match like the old walk did."""
+    key = (track_name or "").lower()
+    if not key:
+        return None
+    # Track folders are full of underscores: match them literally, not as wildcards
+    pattern = key.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    for match in (models.ModAsset.item_key == key, models.ModAsset.item_key.like(f"%{pattern}%", escape="\\")):
+        rows = db.query(models.ModAsset).filter(
+            models.ModAsset.item_type == "track",
+            models.ModAsset.kind.in_(kinds),
+            match
+        ).order_by(models.ModAsset.id).all()
+        for kind in kinds:
+            for row in rows:
+                # Base layout first, then any layout
+                if row.kind == kind and row.layout is None and absolute_path(row.rel_path).is_file():
+                    return absolute_path(row.rel_path)
+            for row in rows:
+                if row.kind == kind and absolute_path(row.rel_path).is_file():
+                    return absolute_path(row.rel_path)
+    return None
@@ -0,0 +1,142 @@
+"""
+Auto Library - "Auto Detected" library mods and auto-tags for scanned content.
+A station scan can report hundreds of cars at once, so everything here is
+set-based: existing names are loaded with a few IN queries, missing mods and
+tags are inserted as one batch each, and tag links are written with a single
+executemany, all in one transaction.
+"""
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from .. import models
+from . import mod_search
+
+logger = logging.getLogger(__name__)
+
+TYPE_TAGS = {
+    "car": ("Car", "#3b82f6"),
+    "track": ("Track", "#10b981"),
+}
+BRAND_TAGS = [
+    ("Ferrari", "#ef4444"), ("Porsche", "#eab308"), ("BMW", "#3b82f6"),
+    ("Mercedes", "#06b6d4"), ("Audi", "#64748b"), ("Lamborghini", "#fbbf24"),
+    ("Honda", "#ef4444"), ("Toyota", "#ef4444"), ("Nissan", "#ef4444"),
+    ("McLaren", "#f97316"), ("F1", "#ef4444"), ("GT3", "#ec4899"),
+    ("Drift", "#8b5cf6"), ("JDM", "#ec4899")
+]
+
+# Stays well below SQLite's bound-parameter limit
+IN_CHUNK = 500
+
+
+def _chunks(values: Sequence, size: int = IN_CHUNK) -> Iterable[Sequence]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def tags_for(type_str: Optional[str], name: str) -> List[Tuple[str, str]]:
+    """(tag name, colour) pairs a mod gets from its type and name."""
+    tags = [TYPE_TAGS[type_str]] if type_str in TYPE_TAGS else []
+    name_lower = (name or "").lower()
+    tags.extend((brand, color) for brand, color in BRAND_TAGS if brand.lower() in name_lower)
+    return tags
+
+
+def apply_auto_tags(db: Session, mods: Iterable[Tuple[int, Optional[str], str]], commit: bool = True) -> int:
+    """
+    Tags every (mod_id, type, name) in one pass: missing tags are created in a
+    batch and only links that don't exist yet are inserted. Returns the number of new links.
+    """
+    wanted: Dict[int, List[Tuple[str, str]]] = {}
+    for mod_id, type_str, name in mods:
+        tags = tags_for(type_str, name)
+        if tags:
+            wanted.setdefault(mod_id, []).extend(tags)
+    if not wanted:
+        return 0
+
+    colors = {}
+    for tags in wanted.values():
+        for tag_name, color in tags:
+            colors.setdefault(tag_name, color)
+    tag_ids = dict(db.query(models.Tag.name, models.Tag.id).filter(models.Tag.name.in_(list(colors))).all())
+    new_tags = [models.Tag(name=tag_name, color=color) for tag_name, color in colors.items() if tag_name not in tag_ids]
+    if new_tags:
+        db.add_all(new_tags)
+        db.flush()
+        tag_ids.update((tag.name, tag.id) for tag in new_tags)
+
+    mod_ids = list(wanted)
+    existing = set()
+    for chunk in _chunks(mod_ids):
+        existing.update(db.query(models.mod_tags.c.mod_id, models.mod_tags.c.tag_id).filter(
+            models.mod_tags.c.mod_id.in_(chunk)
+        ).all())
+    links = []
+    for mod_id, tags in wanted.items():
+        for tag_name, _ in tags:
+            pair = (mod_id, tag_ids[tag_name])
+            if pair not in existing:
+                existing.add(pair)
+                links.append({"mod_id": pair[0], "tag_id": pair[1]})
+    if links:
+        db.execute(models.mod_tags.insert(), links)
+    if commit:
+        db.commit()
+    return len(links)
+
+
+def ensure_library_mods(db: Session, cars: List[dict], tracks: List[dict]) -> int:
+    """
+    Creates "Auto Detected" library mods for scanned content that isn't in the library yet.
+    Returns the number of mods added.
+    """
+    candidates: Dict[str, Tuple[str, Optional[str]]] = {}
+    for items, mod_type in ((cars, "car"), (tracks, "track")):
+        for item in items or []:
+            mod_name = item.get("name") or item.get("id")
+            if mod_name and mod_name not in candidates:
+                candidates[mod_name] = (mod_type, item.get("id"))
+    if not candidates:
+        return 0
+
+    names = list(candidates)
+    existing = set()
+    for chunk in _chunks(names):
+        existing.update(name for (name,) in db.query(models.Mod.name).filter(models.Mod.name.in_(chunk)).all())
+
+    rows = [
+        {
+            "name": name,
+            "type": mod_type,
+            "version": "1.0",
+            "source_path": f"auto_scan::{mod_id}",
+            "is_active": True,
+            "status": "detected",
+        }
+        for name, (mod_type, mod_id) in candidates.items() if name not in existing
+    ]
+    if not rows:
+        return 0
+
+    try:
+        # A single executemany INSERT (the ORM unit of work would issue one per row
+        # on backends without batched RETURNING), then ids back by name
+        db.execute(insert(models.Mod), rows)
+        added = []
+        for chunk in _chunks([row["name"] for row in rows]):
+            added.extend(db.query(models.Mod.id, models.Mod.type, models.Mod.name).filter(
+                models.Mod.name.in_(chunk),
+                models.Mod.status == "detected"
+            ).all())
+        apply_auto_tags(db, added, commit=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    mod_search.refresh_mods(db, [mod_id for mod_id, _, _ in added])
+    logger.info(f"Auto-added {len(rows)} items to Library")
+    return len(rows)
@@ -0,0 +1,135 @@
+"""
+Cached Index - Per-process cache of a structure built from the database.
+Several services keep an in-memory index (dependency closure, search index,
+active events, catalog aliases, rating ranks) that is built with a few queries,
+patched in place after their own committed writes and rebuilt every
+refresh_seconds to pick up writes made by other workers. CachedIndex holds that
+template: every patch() and invalidate() bumps a generation counter and a build
+only installs its result if the generation didn't move meanwhile, so a rebuild
+that raced with a write never overwrites it. With a version_key, invalidate(db)
+and patch(..., db=db) also store a new token in settings, and a worker whose
+value was built against an older token rebuilds it on the next read (a
+primary-key lookup per read). With background=True a stale value keeps being
+served while a thread rebuilds it; only the first build runs in the caller.
+"""
+import logging
+import threading
+import time
+import uuid
+from typing import Callable, Generic, Optional, TypeVar
+
+from sqlalchemy.orm import Session
+
+from .. import database, models
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CachedIndex(Generic[T]):
+    def __init__(self, name: str, build: Callable[[Session], T], refresh_seconds: float,
+                 version_key: Optional[str] = None, background: bool = False):
+        self.name = name
+        self.build = build
+        self.refresh_seconds = refresh_seconds
+        self.version_key = version_key
+        self.background = background
+        # Callers that read or mutate the value outside patch() hold this lock
+        self.lock = threading.Lock()
+        self._value: Optional[T] = None
+        self._built_at = 0.0
+        self._generation = 0
+        # settings token the value was built against
+        self._version: Optional[str] = None
+        self._rebuild_thread: Optional[threading.Thread] = None
+
+    def _db_version(self, db: Session) -> Optional[str]:
+        if not self.version_key:
+            return None
+        return db.query(models.GlobalSettings.value).filter(models.GlobalSettings.key == self.version_key).scalar()
+
+    def _build(self, db: Session, generation: int, version: Optional[str]) -> T:
+        value = self.build(db)
+        with self.lock:
+            # Don't install a value that missed a patch or invalidate() made while it was built
+            if generation == self._generation:
+                self._value, self._built_at, self._version = value, time.monotonic(), version
+        return value
+
+    def _rebuild(self, generation: int) -> None:
+        db = database.SessionLocal()
+        try:
+            # Read before the build, so a write that lands meanwhile changes the token again
+            self._build(db, generation, self._db_version(db))
+        except Exception as e:
+            logger.error(f"Failed to rebuild {self.name}: {e}")
+        finally:
+            db.close()
+            with self.lock:
+                self._rebuild_thread = None
+
+    def get(self, db: Session) -> T:
+        """The cached value, (re)built when missing, stale or built against an older token."""
+        version = self._db_version(db)
+        with self.lock:
+            value = self._value
+            if value is not None and self._version == version:
+                if time.monotonic() - self._built_at < self.refresh_seconds:
+                    return value
+                if self.background:
+                    if self._rebuild_thread is None:
+                        self._rebuild_thread = threading.Thread(
+                            target=self._rebuild, args=(self._generation,), name=f"{self.name}-rebuild", daemon=True
+                        )
+                        self._rebuild_thread.start()
+                    return value
+            generation = self._generation
+        return self._build(db, generation, version)
+
+    def peek(self) -> Optional[T]:
+        """The cached value without building it (None when nothing is cached)."""
+        with self.lock:
+            return self._value
+
+    def patch(self, apply: Callable[[T], Optional[T]], db: Optional[Session] = None) -> None:
+        """
+        Applies a committed change to the cached value under the lock (no-op when
+        nothing is cached); `apply` mutates the value or returns its replacement.
+        With `db`, a new token is published so the other workers rebuild theirs.
+        """
+        current = token = None
+        if db is not None and self.version_key:
+            current = self._db_version(db)
+            token = self.publish(db)
+        with self.lock:
+            self._generation += 1
+            if self._value is None:
+                return
+            replacement = apply(self._value)
+            if replacement is not None:
+                self._value = replacement
+            if token is not None:
+                # Only keep patching in place while no other worker's write was missed
+                self._version = token if self._version == current else None
+
+    def invalidate(self, db: Optional[Session] = None) -> None:
+        """Drops the cached value; with `db`, other workers drop theirs too (call after committing)."""
+        with self.lock:
+            self._value = None
+            self._generation += 1
+        if db is not None and self.version_key:
+            self.publish(db)
+
+    def publish(self, db: Session) -> str:
+        """Stores and commits a new token under version_key."""
+        if db.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        token = uuid.uuid4().hex
+        db.execute(insert(models.GlobalSettings).values(key=self.version_key, value=token).on_conflict_do_update(
+            index_elements=["key"], set_={"value": token}
+        ))
+        db.commit()
+        return token
@@ -0,0 +1,188 @@
+"""
+Chunk Store - Content-addressed storage for mod file chunks.
+Files are split with content-defined chunking (see shared/hashing.py) and each
+chunk is stored once under its SHA-256, so identical data shared between mods
+(or between versions of the same mod) is only kept and transferred once.
+Deleting a mod releases the chunks no other mod's manifest references; chunks
+written or reused within GC_GRACE_SECONDS are kept, since an ingest still running
+may reference them before its mod is committed.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterable, Optional, Set
+
+from ..paths import STORAGE_DIR, REPO_ROOT
+
+sys.path.append(str(REPO_ROOT / "shared"))
+import hashing
+
+logger = logging.getLogger(__name__)
+
+CHUNKS_DIR = STORAGE_DIR / "chunks"
+
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+_COPY_SIZE = 1024 * 1024
+GC_GRACE_SECONDS = 3600
+
+
+def is_valid_chunk_hash(chunk_hash: str) -> bool:
+    return bool(chunk_hash) and bool(_HASH_RE.match(chunk_hash))
+
+
+def chunk_path(chunk_hash: str, root: Optional[Path] = None) -> Path:
+    """Chunks are fanned out by the first two hex chars to keep directories small."""
+    base = root or CHUNKS_DIR
+    return base / chunk_hash[:2] / chunk_hash
+
+
+def store_chunk(chunk_hash: str, data: bytes, root: Optional[Path] = None) -> bool:
+    """
+    Writes a chunk if it is not stored yet. Returns True when new data was written.
+    Writes go to a temp file first so a crash never leaves a truncated chunk behind.
+    """
+    path = chunk_path(chunk_hash, root)
+    if path.exists():
+        # Reused: refresh its mtime so a concurrent GC leaves it alone
+        try:
+            os.utime(path)
+            return False
+        except FileNotFoundError:
+            pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True
+
+
+def store_file(file_path: Path, root: Optional[Path] = None, **chunk_params) -> Dict:
+    """
+    Chunks a single file into the store in one read pass.
+    Returns the manifest entry: { 'hash', 'size', 'last_modified', 'chunks': [...] }
+    """
+    file_hash = hashlib.sha256()
+    chunks = []
+    with open(file_path, "rb") as f:
+        for data in hashing.iter_chunks(f, **chunk_params):
+            file_hash.update(data)
+            digest = hashlib.sha256(data).hexdigest()
+            store_chunk(digest, data, root)
+            chunks.append({"hash": digest, "size": len(data)})
+    stat = file_path.stat()
+    return {
+        "hash": file_hash.hexdigest(),
+        "size": stat.st_size,
+        "last_modified": stat.st_mtime,
+        "chunks": chunks,
+    }
+
+
+def extract_stream(source: BinaryIO, dest_path: Path, chunked: bool, root: Optional[Path] = None,
+                   on_bytes: Optional[Callable[[int], None]] = None, **chunk_params) -> Dict:
+    """
+    Writes `source` to `dest_path` while hashing it (and chunking it into the store when
+    `chunked`), so an archive member is extracted, hashed and chunked in a single pass.
+    Returns the manifest entry for the written file.
+    """
+    file_hash = hashlib.sha256()
+    chunks = []
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    blocks = hashing.iter_chunks(source, **chunk_params) if chunked else iter(lambda: source.read(_COPY_SIZE), b"")
+    with open(dest_path, "wb") as out:
+        for data in blocks:
+            out.write(data)
+            file_hash.update(data)
+            if chunked:
+                digest = hashlib.sha256(data).hexdigest()
+                store_chunk(digest, data, root)
+                chunks.append({"hash": digest, "size": len(data)})
+            if on_bytes:
+                on_bytes(len(data))
+    stat = dest_path.stat()
+    entry = {
+        "hash": file_hash.hexdigest(),
+        "size": stat.st_size,
+        "last_modified": stat.st_mtime,
+    }
+    if chunked:
+        entry["chunks"] = chunks
+    return entry
+
+
+def build_chunked_manifest(directory_path: str, root: Optional[Path] = None, **chunk_params) -> Dict[str, Dict]:
+    """
+    Same shape as hashing.generate_manifest(), plus a 'chunks' list for files big
+    enough to be split. Small files are sent whole, so they only get the file hash.
+    """
+    min_size = chunk_params.get("min_size", hashing.CHUNK_MIN_SIZE)
+    manifest = {}
+    root_dir = Path(directory_path)
+    if not root_dir.exists():
+        return {}
+
+    for file_path in root_dir.rglob("*"):
+        if not file_path.is_file():
+            continue
+        relative_path = str(file_path.relative_to(root_dir)).replace("\\", "/")
+        stat = file_path.stat()
+        if stat.st_size > min_size:
+            manifest[relative_path] = store_file(file_path, root, **chunk_params)
+        else:
+            manifest[relative_path] = {
+                "hash": hashing.calculate_file_hash(str(file_path)),
+                "size": stat.st_size,
+                "last_modified": stat.st_mtime,
+            }
+    return manifest
+
+
+def manifest_chunks(manifest) -> Set[str]:
+    """Chunk hashes a mod manifest (dict or JSON string) references."""
+    if isinstance(manifest, str):
+        try:
+            manifest = json.loads(manifest)
+        except ValueError:
+            return set()
+    if not isinstance(manifest, dict):
+        return set()
+    return {
+        chunk["hash"]
+        for info in manifest.values() if isinstance(info, dict)
+        for chunk in info.get("chunks") or () if isinstance(chunk, dict) and "hash" in chunk
+    }
+
+
+def release_chunks(candidates: Iterable[str], referenced: Set[str], root: Optional[Path] = None,
+                   grace_seconds: float = GC_GRACE_SECONDS) -> int:
+    """
+    Deletes the `candidates` no manifest in `referenced` still uses (and that were not
+    written or reused within `grace_seconds`). Returns the bytes freed.
+    """
+    freed = 0
+    cutoff = time.time() - grace_seconds
+    for chunk_hash in set(candidates) - referenced:
+        if not is_valid_chunk_hash(chunk_hash):
+            continue
+        path = chunk_path(chunk_hash, root)
+        try:
+            stat = path.stat()
+            if stat.st_mtime > cutoff:
+                continue
+            path.unlink()
+            freed += stat.st_size
+        except FileNotFoundError:
+            continue
+    return freed
@@ -0,0 +1,273 @@
+"""
+Content Catalog - Canonical track and car identities.
+Tracks and cars arrive as free text (session uploads, events, lobbies). Every
+spelling is normalized (models.normalize_track_key) and registered as an alias
+of one integer identity in tracks/cars, and the track_id/car_id columns are
+filled at flush time, so hot filters and joins compare integers on composite
+indexes instead of lower()/ILIKE string scans. The alias -> id maps are small
+and cached in memory (services/cached_index.py); new identities are published
+to the cache once their transaction commits. Merging an identity keeps its row as a tombstone
+(merged_into_id) because other workers may still hold its id for up to
+REFRESH_SECONDS: their writes stay valid, resolve() follows tombstones, matches()
+and search() include them, and backfill() relinks the stragglers on startup.
+"""
+import logging
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import event, false, inspect, or_, select
+from sqlalchemy.orm import Session
+
+from .. import models
+from .cached_index import CachedIndex
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = 600
+
+KINDS = {
+    "track": (models.Track, models.TrackAlias, models.TrackAlias.track_id),
+    "car": (models.Car, models.CarAlias, models.CarAlias.car_id),
+}
+
+# (model, name attribute, id attribute, kind) kept in sync on flush and backfilled on startup
+LINKED_COLUMNS = (
+    (models.SessionResult, "track_name", "track_id", "track"),
+    (models.SessionResult, "car_model", "car_id", "car"),
+    (models.Event, "track_name", "track_id", "track"),
+    (models.Lobby, "track", "track_id", "track"),
+    (models.Lobby, "car", "car_id", "car"),
+    (models.EliminationRace, "track_name", "track_id", "track"),
+)
+_LINKED_BY_MODEL: Dict[type, list] = {}
+for _model, _name_attr, _id_attr, _kind in LINKED_COLUMNS:
+    _LINKED_BY_MODEL.setdefault(_model, []).append((_name_attr, _id_attr, _kind))
+
+
+class Catalog(NamedTuple):
+    # Per kind: alias key -> id
+    aliases: Dict[str, Dict[str, int]]
+    # Per kind: tombstone id -> id it was merged into
+    merged: Dict[str, Dict[int, int]]
+
+
+def normalize(name: Optional[str]) -> Optional[str]:
+    return models.normalize_track_key(name)
+
+
+def _build(db: Session) -> Catalog:
+    # On the session's connection: this also runs inside before_flush
+    conn = db.connection()
+    catalog = Catalog({}, {})
+    for kind, (model, alias_model, target_column) in KINDS.items():
+        catalog.aliases[kind] = dict(conn.execute(select(alias_model.alias_key, target_column)).all())
+        catalog.merged[kind] = dict(conn.execute(
+            select(model.id, model.merged_into_id).where(model.merged_into_id.isnot(None))
+        ).all())
+    return catalog
+
+
+_catalog: CachedIndex[Catalog] = CachedIndex("content catalog", _build, REFRESH_SECONDS)
+
+
+def _load(db: Session) -> Catalog:
+    return _catalog.get(db)
+
+
+def _canonical(catalog: Catalog, kind: str, target_id: int) -> int:
+    # Merges repoint earlier tombstones, so one hop reaches the live identity
+    return catalog.merged[kind].get(target_id, target_id)
+
+
+def canonical(db: Session, kind: str, target_id: int) -> int:
+    """The live identity behind a stored id (itself unless it was merged)."""
+    return _canonical(_load(db), kind, target_id)
+
+
+def _with_tombstones(catalog: Catalog, kind: str, ids) -> List[int]:
+    ids = set(ids)
+    return sorted(ids | {old_id for old_id, new_id in catalog.merged[kind].items() if new_id in ids})
+
+
+def _insert_ignore(db: Session, model):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
+def _pending(db: Session) -> Dict[str, Dict[str, int]]:
+    return db.info.setdefault("content_catalog_pending", {"track": {}, "car": {}})
+
+
+def _create(db: Session, kind: str, key: str, name: str) -> int:
+    """Registers a new identity on the session's connection (safe inside a flush, idempotent across workers)."""
+    model, alias_model, target_column = KINDS[kind]
+    conn = db.connection()
+    conn.execute(_insert_ignore(db, model).values(key=key, name=name).on_conflict_do_nothing(index_elements=["key"]))
+    target_id = conn.execute(select(model.id).where(model.key == key)).scalar_one()
+    conn.execute(_insert_ignore(db, alias_model).values(
+        {"alias_key": key, target_column.key: target_id}
+    ).on_conflict_do_nothing(index_elements=["alias_key"]))
+    target_id = conn.execute(select(target_column).where(alias_model.alias_key == key)).scalar_one()
+    logger.info(f"Registered {kind} '{name}' as id {target_id}")
+    return target_id
+
+
+def resolve(db: Session, kind: str, name: Optional[str], create: bool = True) -> Optional[int]:
+    """Id of the track/car a free-text name refers to; unknown names are registered unless create=False."""
+    key = normalize(name)
+    if not key:
+        return None
+    catalog = _load(db)
+    target_id = catalog.aliases[kind].get(key) or _pending(db)[kind].get(key)
+    if target_id is not None:
+        return _canonical(catalog, kind, target_id)
+
+    _, alias_model, target_column = KINDS[kind]
+    target_id = db.connection().execute(select(target_column).where(alias_model.alias_key == key)).scalar()
+    if target_id is not None:
+        # Committed by another worker since the cache was loaded
+        _catalog.patch(lambda cached: cached.aliases[kind].update({key: target_id}))
+        return target_id
+    if not create:
+        return None
+    target_id = _create(db, kind, key, name.strip())
+    _pending(db)[kind][key] = target_id
+    return target_id
+
+
+def matches(db: Session, column, kind: str, name: Optional[str]):
+    """Filter clause comparing an id column with the identity of `name` (false when it is unknown)."""
+    target_id = resolve(db, kind, name, create=False)
+    if target_id is None:
+        return false()
+    ids = _with_tombstones(_load(db), kind, [target_id])
+    return column == target_id if len(ids) == 1 else column.in_(ids)
+
+
+def search(db: Session, kind: str, fragment: str) -> List[int]:
+    """Ids with any alias containing `fragment`, matched in memory (replaces ILIKE '%x%' scans)."""
+    needle = normalize(fragment)
+    if not needle:
+        return []
+    catalog = _load(db)
+    return _with_tombstones(catalog, kind, (target_id for key, target_id in catalog.aliases[kind].items() if needle in key))
+
+
+def list_entries(db: Session, kind: str) -> List[dict]:
+    model, alias_model, target_column = KINDS[kind]
+    aliases = {}
+    for key, target_id in db.query(alias_model.alias_key, target_column).order_by(alias_model.alias_key):
+        aliases.setdefault(target_id, []).append(key)
+    return [
+        {"id": entry.id, "key": entry.key, "name": entry.name, "aliases": aliases.get(entry.id, [])}
+        for entry in db.query(model).filter(model.merged_into_id.is_(None)).order_by(model.name)
+    ]
+
+
+def add_alias(db: Session, kind: str, alias: str, canonical: str) -> int:
+    """
+    Makes `alias` resolve to `canonical`. When the alias already had an identity
+    of its own, that identity is merged: its aliases and linked rows move over and
+    it stays behind as a tombstone.
+    """
+    model, alias_model, target_column = KINDS[kind]
+    target_id = resolve(db, kind, canonical)
+    key = normalize(alias)
+    if not key:
+        raise ValueError("Alias is empty")
+
+    old_id = db.query(target_column).filter(alias_model.alias_key == key).scalar()
+    if old_id == target_id:
+        return target_id
+    if old_id is None:
+        db.add(alias_model(**{"alias_key": key, target_column.key: target_id}))
+    else:
+        db.query(alias_model).filter(target_column == old_id).update(
+            {target_column: target_id}, synchronize_session=False
+        )
+        _relink(db, kind, [old_id], target_id)
+        db.query(model).filter(or_(model.id == old_id, model.merged_into_id == old_id)).update(
+            {model.merged_into_id: target_id}, synchronize_session=False
+        )
+        logger.info(f"Merged {kind} {old_id} into {target_id} via alias '{key}'")
+    db.commit()
+    invalidate()
+    return target_id
+
+
+def _relink(db: Session, kind: str, old_ids: List[int], target_id: int) -> int:
+    updated = 0
+    for linked, _, id_attr, linked_kind in LINKED_COLUMNS:
+        if linked_kind == kind:
+            id_column = getattr(linked, id_attr)
+            updated += db.query(linked).filter(id_column.in_(old_ids)).update(
+                {id_column: target_id}, synchronize_session=False
+            )
+    return updated
+
+
+def backfill(db: Session) -> int:
+    """
+    Fills missing track_id/car_id on existing rows, one UPDATE per distinct name,
+    and moves rows still linked to a merged identity over to its replacement.
+    """
+    updated = 0
+    for kind, (model, _, _) in KINDS.items():
+        merged = {}
+        for old_id, new_id in db.query(model.id, model.merged_into_id).filter(model.merged_into_id.isnot(None)):
+            merged.setdefault(new_id, []).append(old_id)
+        for new_id, old_ids in merged.items():
+            updated += _relink(db, kind, old_ids, new_id)
+    for model, name_attr, id_attr, kind in LINKED_COLUMNS:
+        name_column, id_column = getattr(model, name_attr), getattr(model, id_attr)
+        names = db.query(name_column).filter(id_column.is_(None), name_column.isnot(None)).distinct().all()
+        for (name,) in names:
+            target_id = resolve(db, kind, name)
+            if target_id is None:
+                continue
+            updated += db.query(model).filter(id_column.is_(None), name_column == name).update(
+                {id_column: target_id}, synchronize_session=False
+            )
+    db.commit()
+    if updated:
+        logger.info(f"Linked {updated} rows to canonical tracks/cars")
+    return updated
+
+
+def invalidate() -> None:
+    _catalog.invalidate()
+
+
+@event.listens_for(Session, "before_flush")
+def _link_new_names(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty):
+        columns = _LINKED_BY_MODEL.get(type(obj))
+        if not columns:
+            continue
+        is_new = obj in session.new
+        state = inspect(obj)
+        for name_attr, id_attr, kind in columns:
+            if is_new or state.attrs[name_attr].history.has_changes():
+                name = getattr(obj, name_attr)
+                if name is not None or not is_new:
+                    setattr(obj, id_attr, resolve(session, kind, name))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session):
+    pending = session.info.pop("content_catalog_pending", None)
+    if not pending:
+        return
+
+    def publish(cached: Catalog) -> None:
+        for kind, entries in pending.items():
+            cached.aliases[kind].update(entries)
+
+    _catalog.patch(publish)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session):
+    session.info.pop("content_catalog_pending", None)
@@ -0,0 +1,171 @@
+"""
+Dependency Graph - Transitive closure of mod dependencies.
+The `mod_dependencies` edges are read with one query and closed with Tarjan's
+SCC algorithm, so mods in a dependency cycle (legacy data) share one closure
+instead of recursing forever. The closure is kept in memory, extended in
+place when a dependency is added and rebuilt lazily after mods are deleted;
+profile creation and manifest compilation resolve a whole mod list with a
+dict lookup per mod instead of walking lazy-loaded relationships. Every write
+stores a new generation token in settings, so other workers rebuild their
+closure on the next read (services/cached_index.py); it is also rebuilt every
+REFRESH_SECONDS. Cycle checks use that closure plus the new edge instead of
+reloading the edge table.
+"""
+import logging
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from .. import models
+from .cached_index import CachedIndex
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = 300
+VERSION_SETTING = "dependency_graph_version"
+
+
+class DependencyCycleError(ValueError):
+    """Adding the edge would make a mod (indirectly) depend on itself."""
+
+
+def _load_edges(db: Session) -> Dict[int, Set[int]]:
+    edges: Dict[int, Set[int]] = {}
+    rows = db.query(models.mod_dependencies.c.parent_mod_id, models.mod_dependencies.c.child_mod_id).all()
+    for parent, child in rows:
+        if parent is not None and child is not None:
+            edges.setdefault(parent, set()).add(child)
+    return edges
+
+
+def compute_closure(edges: Dict[int, Set[int]]) -> Dict[int, FrozenSet[int]]:
+    """
+    Everything each mod depends on, directly or not (the mod itself excluded unless
+    it sits on a cycle). Iterative Tarjan: components come out in reverse topological
+    order, so every dependency's closure is ready when its dependents need it.
+    """
+    index: Dict[int, int] = {}
+    low: Dict[int, int] = {}
+    on_stack: Set[int] = set()
+    stack: List[int] = []
+    closure: Dict[int, FrozenSet[int]] = {}
+    counter = 0
+
+    for root in list(edges):
+        if root in index:
+            continue
+        work = [(root, iter(edges.get(root, ())))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, children = work[-1]
+            advanced = False
+            for child in children:
+                if child not in index:
+                    index[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(edges.get(child, ()))))
+                    advanced = True
+                    break
+                if child in on_stack:
+                    low[node] = min(low[node], index[child])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] != index[node]:
+                continue
+
+            # `node` roots a strongly connected component
+            component = []
+            while True:
+                member = stack.pop()
+                on_stack.discard(member)
+                component.append(member)
+                if member == node:
+                    break
+            reach: Set[int] = set()
+            cyclic = len(component) > 1 or node in edges.get(node, ())
+            members = set(component)
+            for member in component:
+                for child in edges.get(member, ()):
+                    if child not in members:
+                        reach.add(child)
+                        reach |= closure[child]
+            if cyclic:
+                logger.warning(f"Mod dependency cycle between mods {sorted(component)}")
+                reach |= members
+            frozen = frozenset(reach)
+            for member in component:
+                closure[member] = frozen
+    return closure
+
+
+def _build(db: Session) -> Dict[int, FrozenSet[int]]:
+    return compute_closure(_load_edges(db))
+
+
+_closure: CachedIndex[Dict[int, FrozenSet[int]]] = CachedIndex(
+    "dependency closure", _build, REFRESH_SECONDS, version_key=VERSION_SETTING
+)
+
+
+def get_closure(db: Session) -> Dict[int, FrozenSet[int]]:
+    return _closure.get(db)
+
+
+def invalidate(db: Optional[Session] = None) -> None:
+    """Drops the cached closure; with `db`, other workers drop theirs too (call after committing)."""
+    _closure.invalidate(db)
+
+
+def dependencies_of(db: Session, mod_id: int) -> FrozenSet[int]:
+    return get_closure(db).get(mod_id, frozenset())
+
+
+def resolve(db: Session, mod_ids: Iterable[int]) -> List[int]:
+    """The requested mods followed by everything they need, without duplicates."""
+    closure = get_closure(db)
+    resolved = list(dict.fromkeys(mod_ids))
+    seen = set(resolved)
+    for mod_id in list(resolved):
+        for dep_id in sorted(closure.get(mod_id, ())):
+            if dep_id not in seen:
+                seen.add(dep_id)
+                resolved.append(dep_id)
+    return resolved
+
+
+def check_new_dependency(db: Session, mod_id: int, dependency_id: int) -> None:
+    """
+    Raises DependencyCycleError when `mod_id` -> `dependency_id` would close a cycle,
+    i.e. when `dependency_id` already depends on `mod_id`. Reads the closure, which
+    is rebuilt first if another worker changed the edges since it was cached.
+    """
+    if dependency_id == mod_id:
+        raise DependencyCycleError(f"Mod {mod_id} cannot depend on itself")
+    if mod_id in get_closure(db).get(dependency_id, ()):
+        raise DependencyCycleError(f"Mod {dependency_id} already depends on mod {mod_id}")
+
+
+def record_dependency(db: Session, mod_id: int, dependency_id: int) -> None:
+    """
+    Extends the cached closure with a committed edge (no-op when nothing is cached)
+    and publishes a new generation token for the other workers.
+    """
+    def add_edge(cached: Dict[int, FrozenSet[int]]) -> Dict[int, FrozenSet[int]]:
+        added = {dependency_id} | cached.get(dependency_id, frozenset())
+        closure = dict(cached)
+        for node, deps in cached.items():
+            if mod_id in deps and not added <= deps:
+                closure[node] = deps | added
+        closure[mod_id] = closure.get(mod_id, frozenset()) | added
+        return closure
+
+    _closure.patch(add_edge, db=db)
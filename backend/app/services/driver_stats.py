@@ -0,0 +1,172 @@
+"""
+Driver Stats - Incremental rollup behind the pilot profile ("Racing Passport").
+Each session upload folds its laps into per-driver totals: lap counts, laps per
+car, best valid lap per track, a running mean/variance of valid lap times per
+track (Welford's algorithm, so no lap history is re-read; tracks are combined
+when scoring, since lap times on different tracks aren't comparable) and a
+distinct active-days counter. Drivers with history from before the rollup
+existed are rebuilt from the raw tables the first time they are touched. The
+driver row is created with an on-conflict insert and then locked, so concurrent
+first uploads of a driver serialize instead of failing on its primary key.
+"""
+import logging
+import math
+from datetime import date, datetime, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from .. import models
+
+logger = logging.getLogger(__name__)
+
+
+def _utc_day(value: Optional[datetime]) -> date:
+    value = value or datetime.now(timezone.utc)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+def _add_lap_time(track: models.DriverTrackStats, lap_time: int) -> None:
+    """Welford update of the track's valid-lap mean and sum of squared deviations."""
+    track.valid_laps = (track.valid_laps or 0) + 1
+    mean = track.lap_mean or 0.0
+    delta = lap_time - mean
+    mean += delta / track.valid_laps
+    track.lap_m2 = (track.lap_m2 or 0.0) + delta * (lap_time - mean)
+    track.lap_mean = mean
+
+
+def _insert_ignore(db: Session, model):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
+def _fold_session(db: Session, stats: models.DriverStats, session: models.SessionResult, laps) -> None:
+    driver = stats.driver_name
+    day = _utc_day(session.date)
+    if db.get(models.DriverActiveDay, (driver, day)) is None:
+        db.add(models.DriverActiveDay(driver_name=driver, day=day))
+        db.flush()
+        stats.active_days = (stats.active_days or 0) + 1
+
+    laps = [lap for lap in laps if lap.time]
+    if not laps:
+        return
+    stats.total_laps = (stats.total_laps or 0) + len(laps)
+
+    car_key = session.car_model or "Unknown"
+    car = db.get(models.DriverCarStats, (driver, car_key))
+    if car is None:
+        car = models.DriverCarStats(driver_name=driver, car_model=car_key, laps=0)
+        db.add(car)
+    car.laps = (car.laps or 0) + len(laps)
+
+    track_key = session.track_name or "Unknown"
+    track = db.get(models.DriverTrackStats, (driver, track_key))
+    if track is None:
+        track = models.DriverTrackStats(driver_name=driver, track_name=track_key, laps=0,
+                                        valid_laps=0, lap_mean=0.0, lap_m2=0.0)
+        db.add(track)
+    track.laps = (track.laps or 0) + len(laps)
+
+    for lap in laps:
+        if not lap.valid:
+            continue
+        stats.valid_laps = (stats.valid_laps or 0) + 1
+        _add_lap_time(track, lap.time)
+        if track.best_lap is None or lap.time < track.best_lap:
+            track.best_lap = lap.time
+            track.best_car = session.car_model
+            track.best_date = session.date
+    db.flush()
+
+
+def clear_driver(db: Session, driver_name: str) -> None:
+    for model in (models.DriverCarStats, models.DriverTrackStats, models.DriverActiveDay, models.DriverStats):
+        db.query(model).filter(model.driver_name == driver_name).delete()
+
+
+def rebuild_driver(db: Session, driver_name: str) -> Optional[models.DriverStats]:
+    """Recomputes a driver's rollup from the raw sessions and laps (None when they have no sessions)."""
+    sessions = db.query(models.SessionResult).filter(
+        models.SessionResult.driver_name == driver_name
+    ).order_by(models.SessionResult.date, models.SessionResult.id).all()
+    if not sessions:
+        clear_driver(db, driver_name)
+        db.flush()
+        return None
+
+    # A concurrent rebuild may be creating the same row: wait for it, then start over from it
+    db.execute(_insert_ignore(db, models.DriverStats).values(driver_name=driver_name).on_conflict_do_nothing(
+        index_elements=["driver_name"]
+    ))
+    stats = db.query(models.DriverStats).filter(
+        models.DriverStats.driver_name == driver_name
+    ).with_for_update().populate_existing().one()
+    for model in (models.DriverCarStats, models.DriverTrackStats, models.DriverActiveDay):
+        db.query(model).filter(model.driver_name == driver_name).delete()
+    stats.total_laps, stats.valid_laps, stats.active_days = 0, 0, 0
+    db.flush()
+
+    laps_by_session = {}
+    for lap in db.query(models.LapTime).filter(
+        models.LapTime.session_id.in_([s.id for s in sessions])
+    ).order_by(models.LapTime.id).all():
+        laps_by_session.setdefault(lap.session_id, []).append(lap)
+
+    for session in sessions:
+        _fold_session(db, stats, session, laps_by_session.get(session.id, []))
+    db.flush()
+    return stats
+
+
+def record_session(db: Session, session: models.SessionResult, laps: Iterable) -> Optional[models.DriverStats]:
+    """
+    Folds a newly added session and its laps into the driver's rollup, in the
+    caller's transaction (the caller commits). `laps` need `time` and `valid`.
+    """
+    if not session.driver_name:
+        return None
+    db.flush()
+    stats = db.query(models.DriverStats).filter(
+        models.DriverStats.driver_name == session.driver_name
+    ).with_for_update().first()
+    if stats is None:
+        # First session seen for this driver since the rollup exists: the rebuild includes this one
+        return rebuild_driver(db, session.driver_name)
+    _fold_session(db, stats, session, laps)
+    return stats
+
+
+def get_stats(db: Session, driver_name: str) -> Optional[models.DriverStats]:
+    stats = db.get(models.DriverStats, driver_name)
+    if stats is None:
+        stats = rebuild_driver(db, driver_name)
+        db.commit()
+    return stats
+
+
+def reset(db: Session) -> None:
+    """Drops every rollup row (after a restore); drivers are rebuilt lazily on their next read."""
+    for model in (models.DriverCarStats, models.DriverTrackStats, models.DriverActiveDay, models.DriverStats):
+        db.query(model).delete()
+
+
+def consistency_score(tracks: Iterable[models.DriverTrackStats]) -> float:
+    """
+    0-100 from the standard deviation of valid lap times (1 point per 100 ms), pooled
+    over the driver's tracks: each track's deviations are taken from its own mean.
+    """
+    laps, m2 = 0, 0.0
+    for track in tracks:
+        laps += track.valid_laps or 0
+        m2 += max(track.lap_m2 or 0.0, 0.0)
+    if laps < 2:
+        return 100.0
+    std_dev = math.sqrt(m2 / laps)
+    return max(0.0, min(100.0, 100 - (std_dev / 100)))
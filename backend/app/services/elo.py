@@ -1,4 +1,6 @@
-from typing import List, Dict, Optional
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
 from sqlalchemy.orm import Session
 from ..models import Driver
 
@@ -45,49 +47,42 @@ def calculate_race_elo_changes(results: List[Dict], k_factor=32) -> Dict[int, fl
     
     Algorithm: Treat race as N*(N-1)/2 individual 1v1 matches.
     Scale K-factor by (N-1) to prevent inflation in large grids.
+    All pairings are evaluated at once as N x N matrices (actual minus expected
+    score, summed per row); the diagonal is 0.5 - 0.5 and adds nothing.
     """
     n = len(results)
     if n < 2:
         return {r['driver_id']: 0.0 for r in results}
 
     match_k = k_factor / (n - 1)
-    
-    # Store changes
-    rating_changes = {r['driver_id']: 0.0 for r in results}
+    ratings = np.array([float(r['rating']) for r in results])
+    positions = np.array([r['position'] for r in results])
 
-    for i in range(n):
-        for j in range(i + 1, n):
-            driver_a = results[i]
-            driver_b = results[j]
-            
-            id_a = driver_a['driver_id']
-            id_b = driver_b['driver_id']
-            
-            # Determine actual outcome
-            # Lower position is better (1st < 2nd)
-            if driver_a['position'] < driver_b['position']:
-                score_a = 1.0
-                score_b = 0.0
-            elif driver_a['position'] > driver_b['position']:
-                score_a = 0.0
-                score_b = 1.0
-            else:
-                score_a = 0.5
-                score_b = 0.5
-                
-            # Expected outcome
-            expected_a = calculate_expected_score(driver_a['rating'], driver_b['rating'])
-            expected_b = calculate_expected_score(driver_b['rating'], driver_a['rating'])
-            
-            # Change
-            change_a = match_k * (score_a - expected_a)
-            change_b = match_k * (score_b - expected_b)
-            
-            rating_changes[id_a] += change_a
-            rating_changes[id_b] += change_b
+    # Lower position is better (1st < 2nd); a tie scores half
+    actual = (positions[:, None] < positions[None, :]) + 0.5 * (positions[:, None] == positions[None, :])
+    expected = 1.0 / (1.0 + 10.0 ** ((ratings[None, :] - ratings[:, None]) / 400.0))
+    changes = match_k * (actual - expected).sum(axis=1)
 
+    rating_changes = {r['driver_id']: 0.0 for r in results}
+    for r, change in zip(results, changes):
+        rating_changes[r['driver_id']] += float(change)
     return rating_changes
 
+
+def get_or_create_drivers(db: Session, names: Iterable[str]) -> Dict[str, Driver]:
+    """Drivers by name, loaded with one query; missing ones are added and flushed together (no commit)."""
+    names = list(dict.fromkeys(name for name in names if name))
+    drivers = {d.name: d for d in db.query(Driver).filter(Driver.name.in_(names)).all()} if names else {}
+    missing = [
+        Driver(name=name, elo_rating=DEFAULT_RATING, total_races=0, total_wins=0, total_podiums=0)
+        for name in names if name not in drivers
+    ]
+    if missing:
+        db.add_all(missing)
+        db.flush()
+        drivers.update((d.name, d) for d in missing)
+    return drivers
+
 def update_driver_elo(db: Session, driver_id: int, new_rating: float):
     """Update a driver's ELO in the database."""
     driver = db.query(Driver).filter(Driver.id == driver_id).first()
@@ -0,0 +1,77 @@
+"""
+ELO Ranking - In-memory order-statistics index over driver ratings.
+Ranked drivers (at least one race) are kept as a sorted list of ratings plus a
+rating per driver, so a rank is a binary search (O(log n)) instead of counting
+the drivers table on every profile view. Event processing patches the index
+after committing; it is rebuilt with one query when first used, after restores
+and every REFRESH_SECONDS as a safety net for writes made elsewhere
+(services/cached_index.py).
+"""
+import bisect
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .. import models
+from .cached_index import CachedIndex
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = 600
+
+
+class RankIndex:
+    def __init__(self, ratings: Optional[Dict[int, float]] = None):
+        self._ratings: Dict[int, float] = dict(ratings or {})
+        self._sorted: List[float] = sorted(self._ratings.values())
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    def set(self, driver_id: int, rating: float) -> None:
+        old = self._ratings.get(driver_id)
+        if old is not None:
+            del self._sorted[bisect.bisect_left(self._sorted, old)]
+        self._ratings[driver_id] = rating
+        bisect.insort(self._sorted, rating)
+
+    def rank(self, rating: float) -> int:
+        """1 + the number of ranked drivers rated strictly higher."""
+        return len(self._sorted) - bisect.bisect_right(self._sorted, rating) + 1
+
+
+def _build(db: Session) -> RankIndex:
+    rows = db.query(models.Driver.id, models.Driver.elo_rating).filter(
+        models.Driver.total_races > 0,
+        models.Driver.elo_rating.isnot(None)
+    ).all()
+    return RankIndex({driver_id: float(rating) for driver_id, rating in rows})
+
+
+_index: CachedIndex[RankIndex] = CachedIndex("elo rank index", _build, REFRESH_SECONDS)
+
+
+def get_index(db: Session) -> RankIndex:
+    return _index.get(db)
+
+
+def rank_of(db: Session, rating: float) -> int:
+    index = get_index(db)
+    with _index.lock:
+        return index.rank(rating)
+
+
+def update(ratings: Iterable[Tuple[int, float]]) -> None:
+    """Applies committed rating changes of ranked drivers (no-op before the index is built)."""
+    ratings = list(ratings)
+
+    def apply(index: RankIndex) -> None:
+        for driver_id, rating in ratings:
+            index.set(driver_id, float(rating))
+
+    _index.patch(apply)
+
+
+def invalidate() -> None:
+    _index.invalidate()
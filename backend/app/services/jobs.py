@@ -0,0 +1,258 @@
+"""
+Job Runner - Persistent background jobs for heavy mod/content operations.
+Jobs are stored in the `jobs` table and executed on a bounded worker pool
+(JOB_WORKERS, default 2). Handlers report progress and honour cancellation
+through the JobContext they receive. Every uvicorn worker runs its own pool,
+so a job is claimed with a conditional UPDATE (queued -> running) and only the
+worker whose update hit the row runs it. The running worker refreshes
+heartbeat_at; jobs whose heartbeat is older than JOB_LEASE_SECONDS were left by
+a dead worker and are re-queued (up to JOB_MAX_ATTEMPTS runs) at startup and
+periodically by the scheduler.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import func as sa_func, or_
+from sqlalchemy.orm import Session
+
+from .. import database, models
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = max(1, int(os.getenv("JOB_WORKERS", "2")))
+JOB_MAX_ATTEMPTS = max(1, int(os.getenv("JOB_MAX_ATTEMPTS", "3")))
+JOB_LEASE_SECONDS = max(10, int(os.getenv("JOB_LEASE_SECONDS", "120")))
+HEARTBEAT_SECONDS = JOB_LEASE_SECONDS / 4
+# Progress writes are throttled so chatty handlers don't hammer the DB
+PROGRESS_INTERVAL = 0.5
+
+FINISHED_STATUSES = {"completed", "failed", "cancelled"}
+
+_handlers: Dict[str, Callable] = {}
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobContext:
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self._last_write = 0.0
+
+    def report(self, stage: str, done: int = 0, total: int = 0, force: bool = False) -> None:
+        """Records progress; raises JobCancelled if cancellation was requested meanwhile."""
+        now = time.monotonic()
+        if not force and now - self._last_write < PROGRESS_INTERVAL:
+            return
+        self._last_write = now
+        db = database.SessionLocal()
+        try:
+            job = db.query(models.Job).filter(models.Job.id == self.job_id).first()
+            if not job:
+                return
+            if job.cancel_requested:
+                raise JobCancelled()
+            job.stage = stage
+            if total:
+                job.progress = round(min(done / total, 1.0), 4)
+            db.commit()
+        finally:
+            db.close()
+
+    def check_cancelled(self) -> None:
+        db = database.SessionLocal()
+        try:
+            cancel = db.query(models.Job.cancel_requested).filter(models.Job.id == self.job_id).scalar()
+        finally:
+            db.close()
+        if cancel:
+            raise JobCancelled()
+
+
+def handler(kind: str):
+    """Registers `func(ctx, payload, db) -> result` as the handler for a job kind."""
+    def decorator(func: Callable):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+        return _executor
+
+
+def enqueue(db: Session, kind: str, payload: Optional[Dict[str, Any]] = None, created_by: Optional[str] = None) -> models.Job:
+    if kind not in _handlers:
+        raise ValueError(f"No handler registered for job kind '{kind}'")
+    job = models.Job(kind=kind, payload=payload or {}, status="queued", created_by=created_by)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    _get_executor().submit(_run, job.id)
+    return job
+
+
+def cancel(db: Session, job: models.Job) -> models.Job:
+    """Queued jobs are cancelled right away; running ones stop at their next progress report."""
+    if job.status in FINISHED_STATUSES:
+        return job
+    job.cancel_requested = True
+    if job.status == "queued":
+        job.status = "cancelled"
+        job.finished_at = datetime.now(timezone.utc)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def _finish(job_id: int, status: str, result: Any = None, error: Optional[str] = None) -> None:
+    db = database.SessionLocal()
+    try:
+        job = db.query(models.Job).filter(models.Job.id == job_id).first()
+        if not job:
+            return
+        job.status = status
+        job.result = result
+        job.error = error
+        if status == "completed":
+            job.progress = 1.0
+            job.stage = "done"
+        job.finished_at = datetime.now(timezone.utc)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _claim(db: Session, job_id: int) -> bool:
+    """Atomically moves a queued job to running; False when another worker got it first."""
+    now = datetime.now(timezone.utc)
+    claimed = db.query(models.Job).filter(
+        models.Job.id == job_id, models.Job.status == "queued"
+    ).update({
+        models.Job.status: "running",
+        models.Job.stage: "starting",
+        models.Job.attempts: sa_func.coalesce(models.Job.attempts, 0) + 1,
+        models.Job.started_at: now,
+        models.Job.heartbeat_at: now,
+    }, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+
+def _heartbeat(job_id: int, stop: threading.Event) -> None:
+    while not stop.wait(HEARTBEAT_SECONDS):
+        db = database.SessionLocal()
+        try:
+            db.query(models.Job).filter(models.Job.id == job_id, models.Job.status == "running").update(
+                {models.Job.heartbeat_at: datetime.now(timezone.utc)}, synchronize_session=False
+            )
+            db.commit()
+        except Exception as e:
+            logger.warning(f"Job {job_id} heartbeat failed: {e}")
+        finally:
+            db.close()
+
+
+def _run(job_id: int) -> None:
+    db = database.SessionLocal()
+    try:
+        if not _claim(db, job_id):
+            return
+        job = db.query(models.Job).filter(models.Job.id == job_id).first()
+        payload = dict(job.payload or {})
+        kind = job.kind
+        cancel_requested = job.cancel_requested
+    finally:
+        db.close()
+
+    if cancel_requested:
+        _finish(job_id, "cancelled")
+        return
+    func = _handlers.get(kind)
+    if not func:
+        _finish(job_id, "failed", error=f"No handler registered for job kind '{kind}'")
+        return
+
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, stop), name=f"job-{job_id}-heartbeat", daemon=True).start()
+    db = database.SessionLocal()
+    try:
+        result = func(JobContext(job_id), payload, db)
+        _finish(job_id, "completed", result=result)
+    except JobCancelled:
+        db.rollback()
+        logger.info(f"Job {job_id} ({kind}) cancelled")
+        _finish(job_id, "cancelled")
+    except Exception as e:
+        db.rollback()
+        detail = getattr(e, "detail", None) or str(e)
+        logger.error(f"Job {job_id} ({kind}) failed: {detail}")
+        _finish(job_id, "failed", error=str(detail))
+    finally:
+        stop.set()
+        db.close()
+
+
+def recover_jobs() -> int:
+    """
+    Called at startup and by the scheduler. Running jobs whose lease expired (their
+    worker crashed or restarted) are re-queued, or failed once they used up their
+    attempts, and every queued job is handed to the worker pool; claims are atomic,
+    so several workers recovering at once still run each job once.
+    """
+    now = datetime.now(timezone.utc)
+    expired = or_(
+        models.Job.heartbeat_at.is_(None),
+        models.Job.heartbeat_at < now - timedelta(seconds=JOB_LEASE_SECONDS)
+    )
+    db = database.SessionLocal()
+    try:
+        interrupted = db.query(models.Job).filter(models.Job.status == "running", expired).all()
+        for job in interrupted:
+            if job.cancel_requested:
+                values = {models.Job.status: "cancelled", models.Job.finished_at: now}
+            elif (job.attempts or 0) >= JOB_MAX_ATTEMPTS:
+                values = {
+                    models.Job.status: "failed",
+                    models.Job.error: "Interrupted by server restart",
+                    models.Job.finished_at: now,
+                }
+            else:
+                values = {models.Job.status: "queued", models.Job.stage: "requeued"}
+            # Re-checked in the UPDATE: a heartbeat landing meanwhile keeps the job with its worker
+            db.query(models.Job).filter(models.Job.id == job.id, models.Job.status == "running", expired).update(
+                values, synchronize_session=False
+            )
+        db.commit()
+        queued_ids = [
+            job_id for (job_id,) in
+            db.query(models.Job.id).filter(models.Job.status == "queued").order_by(models.Job.id).all()
+        ]
+    finally:
+        db.close()
+
+    for job_id in queued_ids:
+        _get_executor().submit(_run, job_id)
+    if queued_ids:
+        logger.info(f"Recovered {len(queued_ids)} queued job(s)")
+    return len(queued_ids)
+
+
+def shutdown(wait: bool = False) -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait, cancel_futures=True)
+            _executor = None
@@ -0,0 +1,123 @@
+"""
+Mod Ingest - Streaming ingestion of uploaded mod archives.
+Zip archives are identified from their central directory (no extraction needed),
+then every member is extracted, hashed and chunked in a single pass. Uploads run
+as 'mod_upload' jobs (see services/jobs.py) so the HTTP request returns right away.
+"""
+import json
+import logging
+import zipfile
+from pathlib import Path, PurePath, PurePosixPath
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from . import chunk_store
+
+logger = logging.getLogger(__name__)
+
+UI_FILES = {"ui_car.json": "car", "ui_track.json": "track"}
+
+
+def detect_zip_content(zip_ref: zipfile.ZipFile) -> Optional[Dict]:
+    """
+    Finds the ui_car.json / ui_track.json closest to the archive root and reads it
+    straight from the archive. Returns {'type', 'ui_member', 'data'} or None.
+    """
+    candidates = []
+    for member in zip_ref.infolist():
+        if member.is_dir():
+            continue
+        path = PurePosixPath(member.filename)
+        content_type = UI_FILES.get(path.name)
+        if content_type:
+            # Same preference as a top-down walk: shallowest folder, cars before tracks
+            candidates.append((len(path.parts), path.name != "ui_car.json", member.filename, content_type))
+    if not candidates:
+        return None
+    _, _, ui_member, content_type = min(candidates)
+    data = {}
+    try:
+        data = json.loads(zip_ref.read(ui_member).decode("utf-8-sig"))
+    except Exception as e:
+        logger.error(f"Error reading {ui_member}: {e}")
+    return {"type": content_type, "ui_member": ui_member, "data": data if isinstance(data, dict) else {}}
+
+
+def content_folder(ui_file: PurePath) -> PurePath:
+    """
+    The car/track folder a ui_*.json belongs to: the one holding its ui/ directory.
+    Multi-layout tracks keep it one level deeper ('<track>/ui/<layout>/ui_track.json').
+    """
+    for parent in ui_file.parents:
+        if parent.name == "ui":
+            return parent.parent
+    return ui_file.parent.parent
+
+
+def restructure_prefix(detected: Dict, names: Iterable[str]) -> Optional[Tuple[str, str]]:
+    """
+    Smart detection for zips: a loose '<folder>/ui/ui_car.json' (or ui_track.json)
+    outside content/ and cars|tracks/ belongs in content/cars/<folder>, like
+    mods._handle_smart_detection does after extracting RAR/7z archives.
+    Returns the (source, target) member prefixes to remap, or None.
+    """
+    content_dir = content_folder(PurePosixPath(detected["ui_member"]))
+    folder = detected["type"] + "s"
+    if not content_dir.parts or "content" in content_dir.parts or folder in content_dir.parts:
+        return None
+    target = f"content/{folder}/{content_dir.name}/"
+    if any(name.startswith(target) for name in names):
+        return None
+    return f"{content_dir}/", target
+
+
+def extract_zip_with_manifest(
+    zip_ref: zipfile.ZipFile,
+    extract_dir: Path,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    chunk_root: Optional[Path] = None,
+    remap: Optional[Tuple[str, str]] = None,
+    **chunk_params
+) -> Dict[str, Dict]:
+    """
+    Extracts every member while hashing (and chunking large files) as bytes go by.
+    Members under remap[0] are written under remap[1] instead (see restructure_prefix).
+    Returns the manifest, same shape as chunk_store.build_chunked_manifest().
+    Raises ValueError on path traversal attempts.
+    """
+    extract_root = extract_dir.resolve()
+    min_size = chunk_params.get("min_size", chunk_store.hashing.CHUNK_MIN_SIZE)
+    members = [m for m in zip_ref.infolist() if not m.is_dir()]
+
+    def destination(filename: str) -> Path:
+        if remap and filename.startswith(remap[0]):
+            filename = remap[1] + filename[len(remap[0]):]
+        return extract_root / filename
+
+    for member in zip_ref.infolist():
+        member_path = destination(member.filename).resolve()
+        if not str(member_path).startswith(str(extract_root)):
+            raise ValueError("Invalid archive contents")
+
+    total = sum(m.file_size for m in members)
+    done = 0
+
+    def on_bytes(count):
+        nonlocal done
+        done += count
+        if on_progress:
+            on_progress(done, total)
+
+    manifest = {}
+    for member in members:
+        dest_path = destination(member.filename)
+        relative_path = str(dest_path.relative_to(extract_root)).replace("\\", "/")
+        with zip_ref.open(member) as source:
+            manifest[relative_path] = chunk_store.extract_stream(
+                source,
+                dest_path,
+                chunked=member.file_size > min_size,
+                root=chunk_root,
+                on_bytes=on_bytes,
+                **chunk_params
+            )
+    return manifest
@@ -0,0 +1,280 @@
+"""
+Mod Search - In-process inverted index over the mod library.
+Each mod is tokenized from its name, tags, type and UI metadata (brand, class,
+country, author, ui tags; from the indexed ui json for stored mods and from
+station scans for auto-detected ones). Lookups are exact, then prefix (the word
+being typed), then infix (like the old ILIKE '%term%', so "rari" finds Ferrari),
+then one-edit typo matches via a deletion index, and results are ranked by where
+the words matched. The index is built on first use and patched on mod
+create/update/delete, so search never scans the mods table. To pick up changes
+made by other workers it is rebuilt every REFRESH_SECONDS on a background
+thread (services/cached_index.py), while searches keep using the previous index.
+"""
+import bisect
+import json
+import logging
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from .. import models
+from . import asset_index
+from .cached_index import CachedIndex
+
+logger = logging.getLogger(__name__)
+
+# Field weights: a hit in the name outranks a hit in the metadata
+WEIGHTS = {"name": 4.0, "brand": 3.0, "tag": 2.0, "type": 1.0, "meta": 1.0}
+PREFIX_FACTOR = 0.6
+INFIX_FACTOR = 0.45
+TYPO_FACTOR = 0.3
+# Words shorter than this never match inside another word
+INFIX_MIN_LENGTH = 3
+# Words shorter than this never match with a typo (too many false positives)
+TYPO_MIN_LENGTH = 4
+UI_META_FIELDS = ("brand", "class", "country", "city", "author")
+MAX_UI_JSON_BYTES = 256 * 1024
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    folded = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode().lower()
+    return _TOKEN_RE.findall(folded)
+
+
+def _deletes(token: str) -> Set[str]:
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+class SearchIndex:
+    def __init__(self):
+        self.docs: Dict[int, dict] = {}
+        self.postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._vocab: Optional[List[str]] = None
+        self._delete_map: Optional[Dict[str, Set[str]]] = None
+
+    def add(self, mod_id: int, fields: Dict[str, Iterable[str]], info: dict) -> None:
+        self.remove(mod_id)
+        weights: Dict[str, float] = {}
+        for field, values in fields.items():
+            for value in values:
+                for token in tokenize(value):
+                    weights[token] = max(weights.get(token, 0.0), WEIGHTS[field])
+        for token, weight in weights.items():
+            self.postings[token][mod_id] = weight
+        self.docs[mod_id] = {**info, "tokens": set(weights)}
+        self._vocab = self._delete_map = None
+
+    def remove(self, mod_id: int) -> None:
+        doc = self.docs.pop(mod_id, None)
+        if not doc:
+            return
+        for token in doc["tokens"]:
+            posting = self.postings.get(token)
+            if posting is not None:
+                posting.pop(mod_id, None)
+                if not posting:
+                    del self.postings[token]
+        self._vocab = self._delete_map = None
+
+    def _vocabulary(self) -> List[str]:
+        if self._vocab is None:
+            self._vocab = sorted(self.postings)
+        return self._vocab
+
+    def _typo_candidates(self, token: str) -> Set[str]:
+        if self._delete_map is None:
+            delete_map: Dict[str, Set[str]] = defaultdict(set)
+            for word in self.postings:
+                if len(word) >= TYPO_MIN_LENGTH - 1:
+                    delete_map[word].add(word)
+                    for deleted in _deletes(word):
+                        delete_map[deleted].add(word)
+            self._delete_map = delete_map
+        # Words within one insertion, deletion, substitution or adjacent swap
+        candidates = set(self._delete_map.get(token, ()))
+        for deleted in _deletes(token):
+            candidates |= self._delete_map.get(deleted, set())
+        return candidates
+
+    def _match(self, token: str, allow_prefix: bool) -> Dict[int, float]:
+        scores: Dict[int, float] = dict(self.postings.get(token, {}))
+        if allow_prefix:
+            vocab = self._vocabulary()
+            for position in range(bisect.bisect_left(vocab, token), len(vocab)):
+                word = vocab[position]
+                if not word.startswith(token):
+                    break
+                if word != token:
+                    for mod_id, weight in self.postings[word].items():
+                        scores[mod_id] = max(scores.get(mod_id, 0.0), weight * PREFIX_FACTOR)
+        if len(token) >= INFIX_MIN_LENGTH:
+            for word in self._vocabulary():
+                if token in word and not word.startswith(token):
+                    for mod_id, weight in self.postings[word].items():
+                        scores[mod_id] = max(scores.get(mod_id, 0.0), weight * INFIX_FACTOR)
+        if len(token) >= TYPO_MIN_LENGTH:
+            for word in self._typo_candidates(token):
+                if word == token:
+                    continue
+                for mod_id, weight in self.postings[word].items():
+                    scores[mod_id] = max(scores.get(mod_id, 0.0), weight * TYPO_FACTOR)
+        return scores
+
+    def search(self, query: str) -> List[int]:
+        """Ids of the mods matching every word of `query`, best first."""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        # Words of one or two letters only prefix-match while still being typed (last word, no trailing space)
+        typing = query.rstrip() == query
+        totals: Optional[Dict[int, float]] = None
+        for i, token in enumerate(tokens):
+            scores = self._match(token, allow_prefix=len(token) >= 3 or (typing and i == len(tokens) - 1))
+            if totals is None:
+                totals = scores
+            else:
+                totals = {mod_id: total + scores[mod_id] for mod_id, total in totals.items() if mod_id in scores}
+            if not totals:
+                return []
+        return sorted(totals, key=lambda mod_id: (-totals[mod_id], self.docs[mod_id]["name"].lower(), mod_id))
+
+
+REFRESH_SECONDS = 300
+
+
+def _read_ui_meta(rel_path: Optional[str]) -> List[str]:
+    path = asset_index.absolute_path(rel_path)
+    try:
+        if not path or path.stat().st_size > MAX_UI_JSON_BYTES:
+            return []
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            data = json.loads(f.read(), strict=False)
+    except (OSError, ValueError):
+        return []
+    if not isinstance(data, dict):
+        return []
+    values = [str(data[field]) for field in UI_META_FIELDS if isinstance(data.get(field), (str, int))]
+    tags = data.get("tags")
+    if isinstance(tags, list):
+        values.extend(str(tag) for tag in tags if isinstance(tag, (str, int)))
+    return values
+
+
+def _scanned_brands(db: Session) -> Dict[str, str]:
+    """Brand per scanned car id, from the stations' content caches (auto-detected mods have no files here)."""
+    brands = {}
+    for (cache,) in db.query(models.Station.content_cache).filter(models.Station.content_cache.isnot(None)).all():
+        if isinstance(cache, str):
+            try:
+                cache = json.loads(cache)
+            except ValueError:
+                continue
+        for car in (cache or {}).get("cars", []) if isinstance(cache, dict) else []:
+            if isinstance(car, dict) and car.get("id") and car.get("brand"):
+                brands.setdefault(str(car["id"]), str(car["brand"]))
+    return brands
+
+
+def _load_docs(db: Session, mod_ids: Optional[List[int]] = None) -> List[Tuple[int, dict, dict]]:
+    mods_query = db.query(models.Mod.id, models.Mod.name, models.Mod.type, models.Mod.source_path)
+    tags_query = db.query(models.mod_tags.c.mod_id, models.Tag.name).join(
+        models.Tag, models.Tag.id == models.mod_tags.c.tag_id
+    )
+    ui_query = db.query(models.ModAsset.mod_id, models.ModAsset.rel_path).filter(
+        models.ModAsset.kind == "ui_json", models.ModAsset.layout.is_(None)
+    ).order_by(models.ModAsset.id)
+    if mod_ids is not None:
+        mods_query = mods_query.filter(models.Mod.id.in_(mod_ids))
+        tags_query = tags_query.filter(models.mod_tags.c.mod_id.in_(mod_ids))
+        ui_query = ui_query.filter(models.ModAsset.mod_id.in_(mod_ids))
+
+    tags: Dict[int, List[str]] = defaultdict(list)
+    for mod_id, tag_name in tags_query.all():
+        tags[mod_id].append(tag_name)
+    ui_files: Dict[int, str] = {}
+    for mod_id, rel_path in ui_query.all():
+        ui_files.setdefault(mod_id, rel_path)
+    mods = mods_query.all()
+    brands = _scanned_brands(db) if any((m.source_path or "").startswith("auto_scan::") for m in mods) else {}
+
+    docs = []
+    for mod_id, name, mod_type, source_path in mods:
+        scan_id = source_path[len("auto_scan::"):] if (source_path or "").startswith("auto_scan::") else None
+        fields = {
+            "name": [name],
+            "type": [mod_type],
+            "tag": tags.get(mod_id, []),
+            "brand": [brands[scan_id]] if scan_id in brands else [],
+            # The folder id often differs from the display name (ks_ferrari_f40 vs "Ferrari F40")
+            "meta": _read_ui_meta(ui_files.get(mod_id)) + ([scan_id] if scan_id else []),
+        }
+        docs.append((mod_id, fields, {"name": name or "", "type": mod_type, "tags": set(tags.get(mod_id, []))}))
+    return docs
+
+
+def _build(db: Session) -> SearchIndex:
+    index = SearchIndex()
+    for mod_id, fields, info in _load_docs(db):
+        index.add(mod_id, fields, info)
+    logger.info(f"Built mod search index: {len(index.docs)} mods, {len(index.postings)} terms")
+    return index
+
+
+_index: CachedIndex[SearchIndex] = CachedIndex("mod search index", _build, REFRESH_SECONDS, background=True)
+
+
+def get_index(db: Session) -> SearchIndex:
+    """The index; built on first use, then refreshed in the background once it is REFRESH_SECONDS old."""
+    return _index.get(db)
+
+
+def refresh_mods(db: Session, mod_ids: Iterable[int]) -> None:
+    """Re-indexes the given mods after they were created or changed (deleted ones drop out)."""
+    mod_ids = list(mod_ids)
+    if _index.peek() is None or not mod_ids:
+        return
+    docs = _load_docs(db, mod_ids)
+
+    def reindex(index: SearchIndex) -> None:
+        found = set()
+        for mod_id, fields, info in docs:
+            index.add(mod_id, fields, info)
+            found.add(mod_id)
+        for mod_id in mod_ids:
+            if mod_id not in found:
+                index.remove(mod_id)
+
+    _index.patch(reindex)
+
+
+def remove_mods(mod_ids: Iterable[int]) -> None:
+    def remove(index: SearchIndex) -> None:
+        for mod_id in mod_ids:
+            index.remove(mod_id)
+
+    _index.patch(remove)
+
+
+def invalidate() -> None:
+    _index.invalidate()
+
+
+def search(db: Session, query: str, mod_type: Optional[str] = None, tag: Optional[str] = None) -> List[int]:
+    """Ranked ids of mods matching `query`, optionally of one type and carrying a tag."""
+    index = get_index(db)
+    with _index.lock:
+        ranked = index.search(query)
+        if mod_type or tag:
+            ranked = [
+                mod_id for mod_id in ranked
+                if (not mod_type or index.docs[mod_id]["type"] == mod_type)
+                and (not tag or tag in index.docs[mod_id]["tags"])
+            ]
+    return ranked
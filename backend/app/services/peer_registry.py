@@ -0,0 +1,76 @@
+"""
+Peer Registry - Tracks which stations hold which content chunks so agents can
+pull chunks from sibling rigs on the LAN instead of all hitting the server.
+The server stays the coordinator and the fallback seed; this is in-memory only,
+agents re-announce their cache periodically so a restart just loses a few minutes
+of peer hints.
+"""
+import random
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+# How many peer URLs to hand out per chunk; the agent tries them in random order
+MAX_PEERS_PER_CHUNK = 3
+
+_lock = threading.Lock()
+_station_urls: Dict[int, str] = {}
+_station_chunks: Dict[int, Set[str]] = {}
+_chunk_holders: Dict[str, Set[int]] = {}
+
+
+def announce(station_id: int, base_url: str, hashes: Iterable[str], replace: bool = False) -> int:
+    """Records chunks a station can serve. With replace=True the previous set is dropped."""
+    hashes = set(hashes)
+    with _lock:
+        _station_urls[station_id] = base_url
+        if replace:
+            _drop_chunks(station_id)
+        held = _station_chunks.setdefault(station_id, set())
+        for chunk_hash in hashes - held:
+            _chunk_holders.setdefault(chunk_hash, set()).add(station_id)
+        held |= hashes
+        return len(held)
+
+
+def forget(station_id: int) -> None:
+    """Called when a station goes offline; it can no longer serve anything."""
+    with _lock:
+        _drop_chunks(station_id)
+        _station_chunks.pop(station_id, None)
+        _station_urls.pop(station_id, None)
+
+
+def lookup(hashes: Iterable[str], exclude_station_id: Optional[int] = None) -> Dict[str, List[str]]:
+    """Returns {chunk_hash: [peer base URLs]} for chunks held by at least one other station."""
+    result = {}
+    with _lock:
+        for chunk_hash in hashes:
+            holders = [
+                station_id for station_id in _chunk_holders.get(chunk_hash, ())
+                if station_id != exclude_station_id and station_id in _station_urls
+            ]
+            if not holders:
+                continue
+            if len(holders) > MAX_PEERS_PER_CHUNK:
+                holders = random.sample(holders, MAX_PEERS_PER_CHUNK)
+            result[chunk_hash] = [_station_urls[station_id] for station_id in holders]
+    return result
+
+
+def clear() -> None:
+    with _lock:
+        _station_urls.clear()
+        _station_chunks.clear()
+        _chunk_holders.clear()
+
+
+def _drop_chunks(station_id: int) -> None:
+    for chunk_hash in _station_chunks.get(station_id, ()):
+        holders = _chunk_holders.get(chunk_hash)
+        if holders is None:
+            continue
+        holders.discard(station_id)
+        if not holders:
+            del _chunk_holders[chunk_hash]
+    if station_id in _station_chunks:
+        _station_chunks[station_id] = set()
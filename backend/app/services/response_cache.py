@@ -0,0 +1,290 @@
+"""
+Response Cache - Shared cache for the read endpoints every TV, kiosk and
+dashboard polls (leaderboards, hall of fame, ticker stats, active ads, analytics).
+Entries are keyed by endpoint and query parameters, expire after a TTL and carry
+tags; writes invalidate the tags they touch ("laps", "ads", "drivers",
+"analytics"), so N screens polling cost about one computation per change.
+Concurrent misses on the same key compute once per process (a per-key lock for
+sync endpoints, a shared in-flight future for async ones). Values live in an
+in-process LRU, and values and tag versions are also kept in a directory every
+worker process on the host shares (storage/response_cache, or RESPONSE_CACHE_DIR;
+set it empty for a process-local cache), so a write through one worker
+invalidates the others at once instead of after the TTL. Shared files are removed
+when read back expired or stale, and the oldest are pruned once there are more
+than SHARED_MAX_FILES.
+"""
+import asyncio
+import functools
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from ..paths import STORAGE_DIR
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+DEFAULT_TTL = 300.0
+ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+SHARED_DIR = os.getenv("RESPONSE_CACHE_DIR", str(STORAGE_DIR / "response_cache")) or None
+SHARED_MAX_FILES = int(os.getenv("RESPONSE_CACHE_MAX_FILES", str(MAX_ENTRIES * 4)))
+# Writes between two checks of the shared file count
+PRUNE_EVERY = 64
+
+_MISSING = object()
+
+
+class _SharedStore:
+    """Pickled values plus one version file per tag in a directory all workers can see."""
+
+    def __init__(self, directory: str, max_files: int = SHARED_MAX_FILES):
+        self.root = Path(directory)
+        self.max_files = max_files
+        self._writes = 0
+        (self.root / "tags").mkdir(parents=True, exist_ok=True)
+        (self.root / "values").mkdir(parents=True, exist_ok=True)
+
+    def _write(self, path: Path, data: bytes) -> None:
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def tag_version(self, tag: str) -> str:
+        try:
+            return (self.root / "tags" / tag).read_text()
+        except OSError:
+            return ""
+
+    def bump(self, tag: str) -> None:
+        self._write(self.root / "tags" / tag, uuid.uuid4().hex.encode())
+
+    def _value_path(self, key: Hashable) -> Path:
+        return self.root / "values" / hashlib.sha1(repr(key).encode()).hexdigest()
+
+    def get(self, key: Hashable):
+        try:
+            return pickle.loads(self._value_path(key).read_bytes())
+        except (OSError, pickle.PickleError, EOFError, AttributeError, ValueError):
+            return None
+
+    def set(self, key: Hashable, entry: tuple) -> None:
+        try:
+            self._write(self._value_path(key), pickle.dumps(entry))
+        except (OSError, pickle.PickleError, TypeError, AttributeError) as e:
+            logger.warning(f"Response cache could not share {key!r}: {e}")
+        self._writes += 1
+        if self._writes % PRUNE_EVERY == 0:
+            self.prune()
+
+    def discard(self, key: Hashable) -> None:
+        self._value_path(key).unlink(missing_ok=True)
+
+    def prune(self) -> None:
+        """Removes the least recently written values beyond max_files (keys never read again pile up otherwise)."""
+        files = []
+        for entry in os.scandir(self.root / "values"):
+            try:
+                files.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                continue
+        if len(files) <= self.max_files:
+            return
+        files.sort()
+        for _, path in files[:len(files) - self.max_files]:
+            Path(path).unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        for path in (self.root / "values").iterdir():
+            path.unlink(missing_ok=True)
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES, shared_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        # key -> (expires_at wall clock, tag versions, value)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Tuple, Any]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self._shared = _SharedStore(shared_dir) if shared_dir else None
+        self.hits = 0
+        self.misses = 0
+
+    def _tag_versions(self, tags: Iterable[str]) -> Tuple:
+        if self._shared:
+            return tuple(self._shared.tag_version(tag) for tag in tags)
+        with self._lock:
+            return tuple(self._versions.get(tag, 0) for tag in tags)
+
+    def _lookup(self, key: Hashable, tags: Tuple[str, ...]):
+        with self._lock:
+            entry = self._entries.get(key)
+        shared = entry is None and self._shared is not None
+        if shared:
+            entry = self._shared.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, versions, value = entry
+        if expires_at < time.time() or versions != self._tag_versions(tags):
+            if shared:
+                self._shared.discard(key)
+            return _MISSING
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._evict()
+        return value
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        if len(self._key_locks) > self.max_entries * 4:
+            self._key_locks.clear()
+
+    def _store(self, key: Hashable, tags: Tuple[str, ...], ttl: float, versions: Tuple, value: Any) -> None:
+        entry = (time.time() + ttl, versions, value)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._evict()
+        if self._shared:
+            self._shared.set(key, entry)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], tags: Iterable[str] = (), ttl: float = DEFAULT_TTL):
+        tags = tuple(tags)
+        value = self._lookup(key, tags)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another request may have filled it while we waited
+            value = self._lookup(key, tags)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            self.misses += 1
+            # Versions read before computing: a write landing mid-computation leaves the entry stale
+            versions = self._tag_versions(tags)
+            value = compute()
+            self._store(key, tags, ttl, versions, value)
+        return value
+
+    async def get_or_compute_async(self, key: Hashable, compute: Callable, tags: Iterable[str] = (), ttl: float = DEFAULT_TTL):
+        tags = tuple(tags)
+        value = self._lookup(key, tags)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            pending = self._in_flight.get(key)
+            if pending is None or pending.get_loop() is not loop:
+                pending = None
+                future = self._in_flight[key] = loop.create_future()
+        if pending is not None:
+            # Another request on this loop is computing it: share its result
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        try:
+            versions = self._tag_versions(tags)
+            value = await compute()
+            self._store(key, tags, ttl, versions, value)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # retrieved: waiters may not exist
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            with self._lock:
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
+
+    def invalidate(self, *tags: str) -> None:
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+        if self._shared:
+            for tag in tags:
+                self._shared.bump(tag)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._key_locks.clear()
+            self._in_flight.clear()
+        if self._shared:
+            self._shared.clear()
+
+
+_cache = ResponseCache(shared_dir=SHARED_DIR)
+
+
+def get_cache() -> ResponseCache:
+    return _cache
+
+
+def invalidate(*tags: str) -> None:
+    """Drops every cached response carrying one of `tags` (call after committing the write)."""
+    _cache.invalidate(*tags)
+
+
+def clear() -> None:
+    _cache.clear()
+
+
+def _cache_key(func: Callable, signature: inspect.Signature, args, kwargs) -> Hashable:
+    bound = signature.bind_partial(*args, **kwargs)
+    # Request-scoped dependencies (the db session, the current user) are not part of the key
+    params = tuple(
+        (name, value) for name, value in sorted(bound.arguments.items())
+        if name not in ("db", "current_user") and isinstance(value, (str, int, float, bool, type(None)))
+    )
+    return (func.__module__, func.__qualname__, params)
+
+
+def cached(tags: Iterable[str] = (), ttl: float = DEFAULT_TTL):
+    """
+    Caches an endpoint's return value per query parameters. Works for sync endpoints
+    (which FastAPI runs in the thread pool) and async ones; the wrapper keeps the
+    endpoint's signature so dependency injection is unchanged.
+    """
+    tags = tuple(tags)
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not ENABLED:
+                    return await func(*args, **kwargs)
+                key = _cache_key(func, signature, args, kwargs)
+                return await _cache.get_or_compute_async(key, lambda: func(*args, **kwargs), tags, ttl)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            key = _cache_key(func, signature, args, kwargs)
+            return _cache.get_or_compute(key, lambda: func(*args, **kwargs), tags, ttl)
+        return wrapper
+
+    return decorator
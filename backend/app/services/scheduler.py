@@ -243,6 +243,46 @@ def archive_ghost_stations():
     finally:
         db.close()
 
+def queue_disk_reconcile():
+    """Nightly check that recorded mod sizes still match what is on disk."""
+    from . import jobs
+    db = database.SessionLocal()
+    try:
+        pending = db.query(models.Job).filter(
+            models.Job.kind == "mod_disk_reconcile",
+            models.Job.status.in_(["queued", "running"])
+        ).first()
+        if not pending:
+            jobs.enqueue(db, "mod_disk_reconcile", created_by="scheduler")
+    except Exception as e:
+        logger.error(f"Failed to queue disk usage reconcile: {e}")
+    finally:
+        db.close()
+
+
+def recover_stale_jobs():
+    """Re-queues jobs whose worker stopped heartbeating (crashed or restarted worker process)."""
+    from . import jobs
+    try:
+        jobs.recover_jobs()
+    except Exception as e:
+        logger.error(f"Failed to recover stale jobs: {e}")
+
+
+def refresh_analytics_rollups(nightly: bool = False):
+    """Rebuilds the recent analytics rollup buckets (the nightly run covers a longer window)."""
+    from . import analytics_rollup
+    db = database.SessionLocal()
+    try:
+        days = analytics_rollup.NIGHTLY_DAYS if nightly else analytics_rollup.REFRESH_DAYS
+        analytics_rollup.refresh(db, days=days)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to refresh analytics rollups: {e}")
+    finally:
+        db.close()
+
+
 def start_scheduler():
     """Initialize and start the scheduler"""
     # Run reminder check every day at 18:00 (6 PM)
@@ -271,9 +311,46 @@ def start_scheduler():
         id="archive_ghost_stations",
         replace_existing=True
     )
+
+    # Reconcile mod disk usage nightly (disable with DISK_RECONCILE_ENABLED=false)
+    if os.getenv("DISK_RECONCILE_ENABLED", "true").lower() in {"1", "true", "yes"}:
+        scheduler.add_job(
+            queue_disk_reconcile,
+            CronTrigger(hour=4, minute=30),
+            id="mod_disk_reconcile",
+            replace_existing=True
+        )
+
+    # Jobs left behind by a worker process that died while running them
+    scheduler.add_job(
+        recover_stale_jobs,
+        'interval',
+        minutes=2,
+        id="job_recovery",
+        replace_existing=True
+    )
+
+    # Analytics rollups: recent buckets every 5 minutes, a wider catch-up nightly.
+    # The first run is at startup so a fresh install gets its backfill here,
+    # never on a dashboard request.
+    scheduler.add_job(
+        refresh_analytics_rollups,
+        'interval',
+        minutes=5,
+        next_run_time=datetime.now(),
+        id="analytics_rollup_refresh",
+        replace_existing=True
+    )
+    scheduler.add_job(
+        refresh_analytics_rollups,
+        CronTrigger(hour=4, minute=45),
+        kwargs={"nightly": True},
+        id="analytics_rollup_nightly",
+        replace_existing=True
+    )
     
     scheduler.start()
-    logger.info("Scheduler started - Booking reminders (18:00), Content Sync (Hourly), Ghost Archive (Configured)")
+    logger.info("Scheduler started - Booking reminders (18:00), Content Sync (Hourly), Ghost Archive (Configured), Disk Reconcile (04:30)")
 
 
 def stop_scheduler():
@@ -0,0 +1,37 @@
+"""
+Thumbnails - Resized WebP copies of mod preview images.
+Rendering, the fixed widths and the cache layout live in shared/thumbnails.py
+(the station agents' image proxy uses the same module); this keeps the server's
+copies under STORAGE_DIR/thumbnails. Without Pillow callers fall back to the
+original image.
+"""
+import logging
+import sys
+from pathlib import Path
+from typing import Optional
+
+from ..paths import STORAGE_DIR, REPO_ROOT
+
+sys.path.append(str(REPO_ROOT / "shared"))
+import thumbnails as shared_thumbnails
+
+logger = logging.getLogger(__name__)
+
+THUMBS_DIR = STORAGE_DIR / "thumbnails"
+THUMB_SIZES = shared_thumbnails.THUMB_SIZES
+
+
+def get_thumbnail(source: Path, size: int, root: Optional[Path] = None) -> Optional[Path]:
+    """Returns the WebP thumbnail for `source` at `size` px wide, rendering it on first use."""
+    if not source or not Path(source).is_file():
+        return None
+    try:
+        return shared_thumbnails.make_thumbnail(source, size, root or THUMBS_DIR)
+    except Exception as e:
+        logger.warning(f"Thumbnail failed for {source}: {e}")
+        return None
+
+
+def pregenerate(source: Path, root: Optional[Path] = None) -> int:
+    """Renders every fixed size up front (used at ingest so the first page load is warm)."""
+    return sum(1 for size in THUMB_SIZES if get_thumbnail(source, size, root))
@@ -0,0 +1,243 @@
+"""
+Track Geometry - Distance along the racing line for any world position.
+Built once per fast_lane.ai version from its points: cumulative distance,
+heading, a uniform grid index for nearest-point lookups and a corner/straight
+segmentation from the smoothed curvature. The live map, the coach and the mock
+telemetry generator all snap x/z positions through it instead of each
+re-deriving the line on their own.
+"""
+import logging
+import math
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .track_outline import load_fast_lane
+
+logger = logging.getLogger(__name__)
+
+# A stretch is a corner when its radius is below this (rad/m = 1 / radius)
+CORNER_CURVATURE = 1 / 400
+# Curvature is averaged over this many metres so AI-line jitter doesn't split corners
+CURVATURE_WINDOW = 30.0
+# Shorter runs are folded into the previous segment
+MIN_SEGMENT_LENGTH = 40.0
+# Grid rings searched around a position before falling back to a scan of the whole line
+MAX_RINGS = 2
+
+_memo: Dict[Tuple[str, int, int], "TrackGeometry"] = {}
+_memo_lock = threading.Lock()
+
+
+def _wrap_angle(angles: np.ndarray) -> np.ndarray:
+    return (angles + np.pi) % (2 * np.pi) - np.pi
+
+
+class TrackGeometry:
+    """
+    Racing line as a polyline on the x/z plane. Distances are metres from the first
+    point; on a closed line the last point connects back to the first.
+    """
+
+    def __init__(self, points: np.ndarray, closed: bool = True):
+        points = np.asarray(points, dtype=np.float64)
+        # Accept x, y, z rows (fast_lane.ai) as well as bare x, z pairs
+        xz = points[:, [0, 2]] if points.ndim == 2 and points.shape[1] == 3 else points.reshape(-1, 2)
+        if len(xz) > 1:
+            # Consecutive duplicates would give zero-length segments
+            keep = np.ones(len(xz), dtype=bool)
+            keep[1:] = np.any(np.diff(xz, axis=0) != 0, axis=1)
+            xz = xz[keep]
+        if len(xz) < 2:
+            raise ValueError("Track geometry needs at least two distinct points")
+
+        self.xz = xz
+        self.closed = closed
+        ends = np.vstack([xz[1:], xz[:1]]) if closed else xz[1:]
+        deltas = ends - xz[:len(ends)]
+        self.segment_lengths = np.hypot(deltas[:, 0], deltas[:, 1])
+        self.distance = np.concatenate([[0.0], np.cumsum(self.segment_lengths)])[:len(xz)]
+        self.length = float(self.segment_lengths.sum())
+        # Same convention as the telemetry `rot`: x += sin(rot), z += cos(rot)
+        heading = np.arctan2(deltas[:, 0], deltas[:, 1])
+        self.heading = heading if closed else np.append(heading, heading[-1])
+        self.curvature = self._curvature()
+        self.segments = self._segment()
+        self._build_index()
+
+    @classmethod
+    def from_file(cls, ai_file: Path) -> "TrackGeometry":
+        return cls(load_fast_lane(ai_file), closed=True)
+
+    # --- Shape -----------------------------------------------------------
+
+    def _curvature(self) -> np.ndarray:
+        """Signed heading change per metre at each point, averaged over CURVATURE_WINDOW."""
+        n = len(self.xz)
+        turns = np.zeros(n)
+        if self.closed:
+            turns = _wrap_angle(self.heading - np.roll(self.heading, 1))
+        else:
+            turns[1:-1] = _wrap_angle(np.diff(self.heading[:-1]))
+        spacing = self.length / max(len(self.segment_lengths), 1)
+        width = max(1, min(n, int(round(CURVATURE_WINDOW / spacing)) if spacing > 0 else 1))
+        kernel = np.ones(width)
+        if self.closed:
+            padded = np.concatenate([turns[-width:], turns, turns[:width]])
+            summed = np.convolve(padded, kernel, mode="same")[width:width + n]
+        else:
+            summed = np.convolve(turns, kernel, mode="same")
+        return summed / (width * spacing) if spacing > 0 else summed
+
+    def _segment(self) -> List[dict]:
+        corner = np.abs(self.curvature) > CORNER_CURVATURE
+        starts = np.concatenate([[0], np.flatnonzero(corner[1:] != corner[:-1]) + 1])
+        bounds = np.append(self.distance[starts], self.length)
+
+        runs = []
+        for i, start in enumerate(starts):
+            run = {"type": "corner" if corner[start] else "straight", "start": float(bounds[i]), "end": float(bounds[i + 1])}
+            if runs and (run["end"] - run["start"] < MIN_SEGMENT_LENGTH or runs[-1]["type"] == run["type"]):
+                runs[-1]["end"] = run["end"]
+            else:
+                runs.append(run)
+        # A short opening run can't be merged backwards; fold it into the next one
+        if len(runs) > 1 and runs[0]["end"] - runs[0]["start"] < MIN_SEGMENT_LENGTH:
+            opening = runs.pop(0)
+            runs[0]["start"] = opening["start"]
+
+        for segment in runs:
+            mask = (self.distance >= segment["start"]) & (self.distance < segment["end"])
+            if segment["type"] == "corner" and mask.any():
+                idx = np.flatnonzero(mask)
+                apex = idx[np.argmax(np.abs(self.curvature[idx]))]
+                segment["apex"] = float(self.distance[apex])
+                # Total direction change through the corner; the sign gives the turn side
+                segment["angle"] = round(math.degrees(float(np.sum(self.curvature[idx] * self._spacing(idx)))), 1)
+            segment["length"] = segment["end"] - segment["start"]
+        return runs
+
+    def _spacing(self, idx: np.ndarray) -> np.ndarray:
+        lengths = np.append(self.segment_lengths, self.segment_lengths[-1])
+        return lengths[idx]
+
+    # --- Nearest-point index --------------------------------------------
+
+    def _build_index(self) -> None:
+        # Cells a few points wide: a lookup touches a handful of cells, not the whole line
+        spacing = self.length / max(len(self.segment_lengths), 1)
+        self.cell_size = max(spacing * 4, 1.0)
+        self.origin = self.xz.min(axis=0)
+        cells = np.floor((self.xz - self.origin) / self.cell_size).astype(np.int64)
+        self.grid_shape = cells.max(axis=0) + 1
+        keys = cells[:, 0] * self.grid_shape[1] + cells[:, 1]
+        order = np.argsort(keys, kind="stable")
+        unique, first = np.unique(keys[order], return_index=True)
+        self._cells = dict(zip(unique.tolist(), np.split(order, first[1:])))
+
+    def nearest_index(self, x: float, z: float) -> int:
+        """Index of the line point closest to (x, z)."""
+        cx, cz = np.floor((np.array([x, z]) - self.origin) / self.cell_size).astype(np.int64)
+        if not (0 <= cx < self.grid_shape[0] and 0 <= cz < self.grid_shape[1]):
+            # Off the grid (pit exit, garage, bad sample): a plain scan is cheaper than growing rings
+            return int(np.argmin(np.hypot(self.xz[:, 0] - x, self.xz[:, 1] - z)))
+        best, best_dist = -1, math.inf
+        for ring in range(min(MAX_RINGS, int(self.grid_shape.max())) + 1):
+            for ix in range(cx - ring, cx + ring + 1):
+                edge = ix in (cx - ring, cx + ring)
+                for iz in (range(cz - ring, cz + ring + 1) if edge else (cz - ring, cz + ring)):
+                    if not (0 <= ix < self.grid_shape[0] and 0 <= iz < self.grid_shape[1]):
+                        continue
+                    idx = self._cells.get(int(ix * self.grid_shape[1] + iz))
+                    if idx is None:
+                        continue
+                    d = np.hypot(self.xz[idx, 0] - x, self.xz[idx, 1] - z)
+                    i = int(np.argmin(d))
+                    if d[i] < best_dist:
+                        best, best_dist = int(idx[i]), float(d[i])
+            # Anything in a further ring is at least ring * cell_size away
+            if best >= 0 and best_dist <= ring * self.cell_size:
+                return best
+        # Far from the line (infield, run-off): one vectorized pass beats ever wider rings
+        return int(np.argmin(np.hypot(self.xz[:, 0] - x, self.xz[:, 1] - z)))
+
+    def project(self, x: float, z: float) -> Tuple[float, float]:
+        """(distance along the line, lateral offset) of the point closest to (x, z)."""
+        i = self.nearest_index(x, z)
+        n = len(self.xz)
+        best = (float(self.distance[i]), math.hypot(self.xz[i, 0] - x, self.xz[i, 1] - z))
+        # Refine onto the two line segments meeting at the nearest point
+        for a in (i - 1, i):
+            if not self.closed and not 0 <= a < n - 1:
+                continue
+            a %= n
+            b = (a + 1) % n
+            ab = self.xz[b] - self.xz[a]
+            seg_len = self.segment_lengths[a]
+            t = min(max(((x - self.xz[a, 0]) * ab[0] + (z - self.xz[a, 1]) * ab[1]) / (seg_len * seg_len), 0.0), 1.0)
+            px, pz = self.xz[a] + t * ab
+            offset = math.hypot(px - x, pz - z)
+            if offset < best[1]:
+                distance = float(self.distance[a]) + t * seg_len
+                best = (distance % self.length if self.closed else distance, offset)
+        return best
+
+    def progress(self, x: float, z: float) -> float:
+        """Normalised lap position (0..1) of (x, z), like the telemetry `n`."""
+        return self.project(x, z)[0] / self.length if self.length else 0.0
+
+    # --- Lookups by distance --------------------------------------------
+
+    def position_at(self, distance: float) -> Tuple[float, float, float]:
+        """(x, z, heading) on the line `distance` metres from the start."""
+        d = distance % self.length if self.closed else min(max(distance, 0.0), self.length)
+        if self.closed:
+            dist = np.append(self.distance, self.length)
+            xz = np.vstack([self.xz, self.xz[:1]])
+        else:
+            dist, xz = self.distance, self.xz
+        i = int(min(max(np.searchsorted(dist, d, side="right") - 1, 0), len(dist) - 2))
+        t = (d - dist[i]) / (dist[i + 1] - dist[i])
+        x, z = xz[i] + t * (xz[i + 1] - xz[i])
+        return float(x), float(z), float(self.heading[min(i, len(self.heading) - 1)])
+
+    def segment_at(self, distance: float) -> Optional[dict]:
+        d = distance % self.length if self.closed else distance
+        for segment in self.segments:
+            if segment["start"] <= d < segment["end"]:
+                return segment
+        return self.segments[-1] if self.segments else None
+
+    def sector_at(self, distance: float, sectors: int = 3) -> int:
+        """Equal-length sector index (0-based) for a distance."""
+        return min(int((distance % self.length) / self.length * sectors), sectors - 1)
+
+    def summary(self) -> dict:
+        return {
+            "length": round(self.length, 1),
+            "pointCount": len(self.xz),
+            "closed": self.closed,
+            "segments": [
+                {k: round(v, 1) if isinstance(v, float) else v for k, v in segment.items()}
+                for segment in self.segments
+            ],
+        }
+
+
+def get_track_geometry(ai_file: Path) -> TrackGeometry:
+    """Geometry for `ai_file`, built once per file version."""
+    ai_file = Path(ai_file)
+    stat = ai_file.stat()
+    key = (str(ai_file.resolve()), stat.st_mtime_ns, stat.st_size)
+    with _memo_lock:
+        geometry = _memo.get(key)
+    if geometry is None:
+        geometry = TrackGeometry.from_file(ai_file)
+        with _memo_lock:
+            # Drop older versions of the same file
+            for stale in [k for k in _memo if k[0] == key[0]]:
+                del _memo[stale]
+            _memo[key] = geometry
+    return geometry
@@ -0,0 +1,208 @@
+"""
+Track Outline - SVG outlines from Assetto Corsa fast_lane.ai files.
+The AI line is decoded with a single numpy.frombuffer over a memory-mapped
+file, simplified with Douglas-Peucker in screen space (so detail is kept
+where the track bends, not thrown away by fixed-stride sampling) and cached
+on disk per file mtime, with a few viewport sizes precomputed. Cache files are
+named <path key>-<version key>.json, so writing a new version of a file's
+outline removes the ones of its earlier versions.
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from ..paths import STORAGE_DIR
+
+logger = logging.getLogger(__name__)
+
+OUTLINE_CACHE_DIR = STORAGE_DIR / "track_outlines"
+# Live map, track cards and list thumbnails
+PRESET_SIZES = ((1000, 800), (400, 320), (200, 160))
+PADDING = 50
+# Max deviation from the full-resolution line, in output pixels
+SIMPLIFY_TOLERANCE = 0.5
+CACHE_FORMAT = 1
+
+MAX_POINTS = 50000
+MAX_RAW_FLOATS = 30000
+COORD_LIMIT = 100000
+
+# fast_lane.ai: int32 point count, then 48-byte records starting with x, y, z float32
+_HEADER_SIZE = 4
+_RECORD_DTYPE = np.dtype([("xyz", "<f4", (3,)), ("rest", "V36")])
+
+_memo: Dict[Tuple[str, int, int], Dict[str, Any]] = {}
+_memo_lock = threading.Lock()
+
+
+def load_fast_lane(file_path: Path) -> np.ndarray:
+    """Returns the AI line as an (N, 3) float array of x, y, z (invalid points dropped)."""
+    file_path = Path(file_path)
+    size = file_path.stat().st_size
+    if size < _HEADER_SIZE:
+        return np.empty((0, 3), dtype=np.float32)
+
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        count = int(np.frombuffer(mm, dtype="<i4", count=1)[0])
+        if 1 <= count <= MAX_POINTS:
+            body = size - _HEADER_SIZE
+            full = min(count, body // _RECORD_DTYPE.itemsize)
+            xyz = np.frombuffer(mm, dtype=_RECORD_DTYPE, count=full, offset=_HEADER_SIZE)["xyz"].copy()
+            # A truncated last record still carries its coordinates
+            tail = _HEADER_SIZE + full * _RECORD_DTYPE.itemsize
+            if full < count and size - tail >= 12:
+                xyz = np.vstack([xyz, np.frombuffer(mm, dtype="<f4", count=3, offset=tail)])
+        else:
+            # Unknown layout: treat the file as packed x, y, z float triplets
+            n_floats = min(size // 4, MAX_RAW_FLOATS)
+            n_floats -= n_floats % 3
+            xyz = np.frombuffer(mm, dtype="<f4", count=n_floats).reshape(-1, 3).copy()
+
+    with np.errstate(invalid="ignore"):
+        valid = (np.abs(xyz[:, 0]) < COORD_LIMIT) & (np.abs(xyz[:, 2]) < COORD_LIMIT)
+    return xyz[valid].astype(np.float64)
+
+
+def douglas_peucker(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Indices of the points kept by Douglas-Peucker simplification of a 2D polyline."""
+    n = len(points)
+    if n < 3:
+        return np.arange(n)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = points[start + 1:end]
+        a, b = points[start], points[end]
+        ab = b - a
+        length = np.hypot(ab[0], ab[1])
+        if length == 0:
+            dists = np.hypot(segment[:, 0] - a[0], segment[:, 1] - a[1])
+        else:
+            dists = np.abs(ab[0] * (segment[:, 1] - a[1]) - ab[1] * (segment[:, 0] - a[0])) / length
+        index = int(np.argmax(dists))
+        if dists[index] > tolerance:
+            split = start + 1 + index
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return np.flatnonzero(keep)
+
+
+def _project(points: np.ndarray, width: int, height: int) -> np.ndarray:
+    # X and Z are the horizontal plane; Z becomes the SVG y axis
+    xz = points[:, [0, 2]]
+    mins = xz.min(axis=0)
+    ranges = xz.max(axis=0) - mins
+    ranges[ranges == 0] = 1
+    scale = min((width - 2 * PADDING) / ranges[0], (height - 2 * PADDING) / ranges[1])
+    offset = PADDING + (np.array([width, height]) - 2 * PADDING - ranges * scale) / 2
+    return (xz - mins) * scale + offset
+
+
+def outline_svg(points: np.ndarray, width: int = 1000, height: int = 800) -> Dict[str, Any]:
+    """SVG path for the AI line fitted into a width x height viewBox."""
+    if len(points) < 3:
+        return {"path": "", "viewBox": f"0 0 {width} {height}", "pointCount": len(points), "error": "Not enough points"}
+
+    screen = _project(points, width, height)
+    simplified = screen[douglas_peucker(screen, SIMPLIFY_TOLERANCE)]
+    coords = [f"{x:.1f},{y:.1f}" for x, y in simplified]
+    return {
+        "path": "M " + " L ".join(coords) + " Z",
+        "viewBox": f"0 0 {width} {height}",
+        "pointCount": len(points),
+        "sampledCount": len(simplified)
+    }
+
+
+def _path_key(ai_file: Path) -> str:
+    return hashlib.sha1(str(ai_file.resolve()).encode()).hexdigest()
+
+
+def _cache_file(ai_file: Path, stat: os.stat_result, cache_dir: Path) -> Path:
+    version = hashlib.sha1(f"{stat.st_mtime_ns}|{stat.st_size}".encode()).hexdigest()[:16]
+    return cache_dir / f"{_path_key(ai_file)}-{version}.json"
+
+
+def _prune_versions(ai_file: Path, current: Path, memo_key: Tuple[str, int, int]) -> None:
+    """Drops the cached outlines of earlier versions of `ai_file` (on disk and in memory)."""
+    for path in current.parent.glob(f"{_path_key(ai_file)}-*.json"):
+        if path != current:
+            path.unlink(missing_ok=True)
+    with _memo_lock:
+        for key in [key for key in _memo if key[0] == memo_key[0] and key != memo_key]:
+            del _memo[key]
+
+
+def _write_json(path: Path, data: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def get_outline(ai_file: Path, width: int = 1000, height: int = 800, cache_dir: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    Cached outline of `ai_file` at width x height. The first request for a file parses it
+    once and stores every PRESET_SIZES outline; other sizes are added to the cache as asked.
+    """
+    ai_file = Path(ai_file)
+    cache_dir = Path(cache_dir or OUTLINE_CACHE_DIR)
+    stat = ai_file.stat()
+    memo_key = (str(ai_file.resolve()), stat.st_mtime_ns, stat.st_size)
+    size_key = f"{width}x{height}"
+
+    with _memo_lock:
+        entry = _memo.get(memo_key)
+    if entry is None:
+        cache_path = _cache_file(ai_file, stat, cache_dir)
+        try:
+            with open(cache_path) as f:
+                entry = json.load(f)
+            if entry.get("format") != CACHE_FORMAT:
+                entry = None
+        except (OSError, ValueError):
+            entry = None
+        if entry is None:
+            points = load_fast_lane(ai_file)
+            entry = {
+                "format": CACHE_FORMAT,
+                "sizes": {f"{w}x{h}": outline_svg(points, w, h) for w, h in PRESET_SIZES},
+            }
+            try:
+                _write_json(cache_path, entry)
+                _prune_versions(ai_file, cache_path, memo_key)
+            except OSError as e:
+                logger.warning(f"Could not write outline cache for {ai_file}: {e}")
+        with _memo_lock:
+            _memo[memo_key] = entry
+
+    outline = entry["sizes"].get(size_key)
+    if outline is None:
+        outline = outline_svg(load_fast_lane(ai_file), width, height)
+        with _memo_lock:
+            entry["sizes"][size_key] = outline
+            snapshot = {"format": CACHE_FORMAT, "sizes": dict(entry["sizes"])}
+        try:
+            _write_json(_cache_file(ai_file, stat, cache_dir), snapshot)
+        except OSError as e:
+            logger.warning(f"Could not update outline cache for {ai_file}: {e}")
+    return dict(outline)
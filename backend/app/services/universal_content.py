@@ -0,0 +1,155 @@
+"""
+Universal Content - Cars/tracks installed on every online station.
+Agent scan results are normalized into the `station_content` table so the
+kiosk picker resolves to an indexed GROUP BY instead of intersecting every
+station's content_cache JSON. The computed set is memoized per (online
+station set, content version): it is recomputed when a station goes online
+or offline, or when any station reports a new scan.
+"""
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from .. import models
+
+logger = logging.getLogger(__name__)
+
+ITEM_TYPES = {"cars": "car", "tracks": "track"}
+
+_lock = threading.Lock()
+_version = 0
+_cache: Optional[Tuple[Tuple[Tuple[int, ...], int], List[str]]] = None
+
+
+def _item_keys(content_data: Optional[dict]) -> Set[Tuple[str, str]]:
+    keys = set()
+    for section, item_type in ITEM_TYPES.items():
+        for item in (content_data or {}).get(section, []) or []:
+            if not isinstance(item, dict):
+                continue
+            item_id = item.get("id") or item.get("name")
+            if item_id:
+                keys.add((item_type, str(item_id)))
+    return keys
+
+
+def invalidate() -> None:
+    global _version, _cache
+    with _lock:
+        _version += 1
+        _cache = None
+
+
+def replace_station_content(db: Session, station_id: int, content_data: Optional[dict]) -> Dict[str, int]:
+    """Syncs a station's rows with its latest scan, touching only what changed."""
+    wanted = _item_keys(content_data)
+    rows = db.query(models.StationContent).filter(models.StationContent.station_id == station_id).all()
+    current = {(row.item_type, row.item_id): row for row in rows}
+
+    removed = [row for key, row in current.items() if key not in wanted]
+    added = [key for key in wanted if key not in current]
+    for row in removed:
+        db.delete(row)
+    db.add_all(
+        models.StationContent(station_id=station_id, item_type=item_type, item_id=item_id)
+        for item_type, item_id in added
+    )
+    db.commit()
+    if added or removed:
+        invalidate()
+    return {"added": len(added), "removed": len(removed)}
+
+
+def apply_scan_diff(content_cache: Optional[dict], diff: dict) -> Optional[dict]:
+    """
+    Applies an agent scan diff on top of the cached scan it was computed against.
+    Returns None when the cache isn't at the diff's base version (full rescan needed).
+    """
+    base_version = diff.get("base_version")
+    if not content_cache or base_version is None or content_cache.get("scan_version") != base_version:
+        return None
+
+    updated = dict(content_cache)
+    updated["scan_version"] = diff.get("version")
+    for section in ITEM_TYPES:
+        changes = diff.get(section) or {}
+        removed = set(changes.get("removed") or [])
+        replaced = {
+            item.get("id"): item
+            for item in (changes.get("changed") or []) + (changes.get("added") or [])
+            if isinstance(item, dict)
+        }
+        items = []
+        for item in content_cache.get(section, []) or []:
+            item_id = item.get("id") if isinstance(item, dict) else None
+            if item_id in removed:
+                continue
+            items.append(replaced.pop(item_id, item))
+        items.extend(replaced.values())
+        updated[section] = items
+    return updated
+
+
+def backfill_from_cache(db: Session) -> int:
+    """Seeds station_content for stations scanned before the table existed."""
+    seeded = set(station_id for (station_id,) in db.query(models.StationContent.station_id).distinct())
+    stations = db.query(models.Station).filter(models.Station.content_cache.isnot(None)).all()
+    count = 0
+    for station in stations:
+        if station.id in seeded:
+            continue
+        replace_station_content(db, station.id, station.content_cache)
+        count += 1
+    if count:
+        logger.info(f"Backfilled station_content for {count} station(s)")
+    return count
+
+
+def _eligible_station_ids(db: Session) -> Tuple[int, ...]:
+    # Mirrors the old JSON path: stations that never reported a scan are ignored
+    rows = db.query(models.Station.id).filter(
+        models.Station.is_active == True,
+        models.Station.is_online == True,
+        models.Station.status != "archived",
+        models.Station.content_cache_updated.isnot(None)
+    ).order_by(models.Station.id).all()
+    return tuple(station_id for (station_id,) in rows)
+
+
+def get_universal_ids(db: Session) -> List[str]:
+    """Item ids present on every eligible online station (cars and tracks intersected separately)."""
+    global _cache
+    station_ids = _eligible_station_ids(db)
+    with _lock:
+        key = (station_ids, _version)
+        if _cache is not None and _cache[0] == key:
+            return _cache[1]
+
+    ids: List[str] = []
+    if station_ids:
+        rows = db.query(models.StationContent.item_id).filter(
+            models.StationContent.station_id.in_(station_ids)
+        ).group_by(
+            models.StationContent.item_type, models.StationContent.item_id
+        ).having(
+            func.count(func.distinct(models.StationContent.station_id)) == len(station_ids)
+        ).all()
+        ids = sorted({item_id for (item_id,) in rows})
+
+    with _lock:
+        # Don't overwrite a newer invalidation that raced with the query
+        if key[1] == _version:
+            _cache = (key, ids)
+    return ids
+
+
+def mod_filter(ids: Iterable[str]):
+    """Matches library mods by name or by the auto_scan::<id> source path."""
+    ids = list(ids)
+    return or_(
+        models.Mod.name.in_(ids),
+        models.Mod.source_path.in_([f"auto_scan::{item_id}" for item_id in ids])
+    )
@@ -0,0 +1,52 @@
+import sys
+import os
+import json
+from pathlib import Path
+from sqlalchemy import text
+
+# Add current directory to path so we can import app
+sys.path.append(os.getcwd())
+
+from app.database import engine, SessionLocal
+from app import models
+
+def migrate():
+    print("Connecting to database via app.database engine...")
+
+    # 1. Widen mods.size_bytes (multi-GB track packs overflow a 32-bit INTEGER)
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            try:
+                conn.execute(text("ALTER TABLE mods ALTER COLUMN size_bytes TYPE BIGINT"))
+                conn.commit()
+                print("mods.size_bytes is now BIGINT")
+            except Exception as e:
+                print(f"Could not alter mods.size_bytes: {e}")
+
+    # 2. Backfill sizes for mods ingested before sizes were recorded
+    db = SessionLocal()
+    try:
+        updated = 0
+        for mod in db.query(models.Mod).filter((models.Mod.size_bytes == None) | (models.Mod.size_bytes == 0)).all():
+            if not mod.manifest or not mod.source_path or mod.source_path.startswith("auto_scan::"):
+                continue
+            try:
+                manifest = json.loads(mod.manifest) if isinstance(mod.manifest, str) else mod.manifest
+            except ValueError:
+                continue
+            size = sum(int(info.get("size") or 0) for info in manifest.values() if isinstance(info, dict))
+            # Archive kept next to the extracted content
+            mod_dir = Path(mod.source_path).parent
+            if mod_dir.exists():
+                for entry in mod_dir.iterdir():
+                    if entry.is_file():
+                        size += entry.stat().st_size
+            mod.size_bytes = size
+            updated += 1
+        db.commit()
+        print(f"Backfilled size_bytes for {updated} mods")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -4,20 +4,26 @@ Pytest configuration and fixtures
 import os
 import tempfile
 import uuid
+from contextlib import contextmanager
 from pathlib import Path
 
 # Force a unique SQLite file DB per test session
 os.environ["ENVIRONMENT"] = "test"
 TEST_DB_PATH = Path(tempfile.gettempdir()) / f"ac_manager_test_{uuid.uuid4().hex}.db"
 os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH}"
+# Shared response cache of this test session only (the default lives under storage/)
+os.environ["RESPONSE_CACHE_DIR"] = tempfile.mkdtemp(prefix="ac_manager_cache_")
+# Background jobs (e.g. the startup rollup refresh) would race with the tests' own writes
+os.environ["ENABLE_SCHEDULER"] = "false"
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from app.main import app
-from app.database import Base, get_db
+from app.database import Base, get_db, engine as app_engine
 from app import models
+from app.services import response_cache
 
 # Use file-based SQLite for tests
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{TEST_DB_PATH}"
@@ -63,10 +69,34 @@ def setup_database():
         pass
 
 
+@pytest.fixture
+def count_statements():
+    """
+    Collects the (statement, parameters) an engine executes (the app's by default):
+    `with count_statements() as statements: ...`
+    """
+    @contextmanager
+    def counting(bind=None):
+        bind = app_engine if bind is None else bind
+        statements = []
+
+        def listener(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        event.listen(bind, "before_cursor_execute", listener)
+        try:
+            yield statements
+        finally:
+            event.remove(bind, "before_cursor_execute", listener)
+
+    return counting
+
+
 @pytest.fixture
 def client():
     """Create test client with overridden dependencies"""
     app.dependency_overrides[get_db] = override_get_db
+    response_cache.clear()
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
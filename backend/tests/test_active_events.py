@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta, timezone
+
+from app import models, schemas
+from app.database import SessionLocal
+from app.routers.events import get_active_event
+from app.routers.telemetry import upload_session_result
+from app.services import active_events, content_catalog
+
+
+def _upload(db, track, when):
+    lap = {"driver_name": "AE Driver", "car_model": "ae_car", "track_name": track, "lap_time": 95000,
+           "sectors": [95000], "is_valid": True, "timestamp": when}
+    payload = schemas.SessionResultCreate(track_name=track, car_model="ae_car", driver_name="AE Driver",
+                                          session_type="practice", date=when, best_lap=95000, laps=[lap])
+    upload_session_result(payload, db=db)
+    return db.query(models.SessionResult).order_by(models.SessionResult.id.desc()).first()
+
+
+def test_track_id_is_linked_on_write():
+    db = SessionLocal()
+    event = models.Event(name="AE Key", track_name="  KS_Nordschleife ")
+    db.add(event)
+    db.commit()
+    assert event.track_id == content_catalog.resolve(db, "track", "ks_nordschleife", create=False)
+    event.track_name = None
+    db.commit()
+    assert event.track_id is None
+    db.close()
+
+
+def test_uploads_auto_link_without_querying_events(count_statements):
+    db = SessionLocal()
+    start = datetime(2026, 5, 1, 18, 0, tzinfo=timezone.utc)
+    champ = models.Championship(name="AE Cup", is_active=True)
+    db.add(champ)
+    db.commit()
+    event = models.Event(name="AE Round", track_name="AE_Monza", championship_id=champ.id,
+                         start_date=start, end_date=start + timedelta(hours=3))
+    db.add(event)
+    db.commit()
+    active_events.invalidate(db)
+
+    _upload(db, "ae_monza", start + timedelta(hours=1))  # warm the index
+    with count_statements() as statements:
+        linked = _upload(db, "AE_MONZA", start + timedelta(hours=2))
+    assert linked.event_id == event.id
+    assert not any("FROM events" in s for s, _ in statements)
+
+    assert _upload(db, "ae_monza", start + timedelta(hours=4)).event_id is None  # outside the window
+    assert _upload(db, "ae_spa", start + timedelta(hours=1)).event_id is None  # other track
+    db.close()
+
+
+def test_active_event_follows_invalidation():
+    db = SessionLocal()
+    active_events.invalidate(db)
+    before = get_active_event(db=db)
+    event = models.Event(name="AE Live", status="active", is_active=True, start_date=datetime(2099, 6, 1))
+    db.add(event)
+    db.commit()
+    assert get_active_event(db=db) == before  # snapshot is stale until invalidated
+    active_events.invalidate(db)
+    assert get_active_event(db=db).id == event.id
+    db.close()
+
+
+def test_snapshot_follows_other_workers():
+    db = SessionLocal()
+    get_active_event(db=db)
+    event = models.Event(name="AE Elsewhere", status="active", is_active=True, start_date=datetime(2099, 7, 1))
+    db.add(event)
+    db.commit()
+    # Another worker's invalidate(): only the settings token changes, this worker's snapshot is kept
+    db.merge(models.GlobalSettings(key=active_events.VERSION_SETTING, value="other-worker"))
+    db.commit()
+    assert active_events._snapshot.peek() is not None
+    assert get_active_event(db=db).id == event.id
+    db.close()
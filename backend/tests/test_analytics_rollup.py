@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app import models
+from app.database import SessionLocal
+from app.routers.analytics import get_analytics_overview
+from app.services import analytics_rollup
+
+
+def _session(db, when, price, is_paid=True, method="rollup-test"):
+    db.add(models.Session(start_time=when, price=price, is_paid=is_paid, payment_method=method,
+                          duration_minutes=20, status="completed"))
+
+
+def _method(client, range_days, method="rollup-test"):
+    rows = client.get("/analytics/payment-methods", params={"range_days": range_days}).json()
+    return next((row for row in rows if row["method"] == method), None)
+
+
+def test_dashboards_read_the_rollups(client):
+    db = SessionLocal()
+    now = datetime.now(timezone.utc)
+    # Start of the current hour: always today, whatever time the test runs
+    _session(db, now.replace(minute=0, second=0, microsecond=0), 20.0)
+    _session(db, now - timedelta(days=3), 10.0)
+    _session(db, now - timedelta(days=3), 99.0, is_paid=False)
+    _session(db, now - timedelta(days=100), 5.0)
+    for lap in (91000, 88000, 90000):
+        db.add(models.SessionResult(driver_name="Rollup Driver", track_name="Rollup Ring",
+                                    car_model="rollup_car", best_lap=lap, date=now - timedelta(days=2)))
+    db.commit()
+    analytics_rollup.backfill(db)
+
+    assert _method(client, 30) == {"method": "rollup-test", "revenue": 30.0, "count": 2}
+    assert _method(client, 365) == {"method": "rollup-test", "revenue": 35.0, "count": 3}
+
+    revenue = client.get("/analytics/revenue", params={"range_days": 7}).json()
+    assert len(revenue) == 7
+    assert revenue[-1]["date"] == now.strftime("%Y-%m-%d")
+    assert revenue[-1]["revenue"] >= 20.0
+
+    overview = client.get("/analytics/overview", params={"range_days": 30}).json()
+    driver = next(d for d in overview["top_drivers"] if d["name"] == "Rollup Driver")
+    assert driver == {"name": "Rollup Driver", "sessions": 3, "best_lap": 88000}
+    assert {"name": "Rollup Ring", "sessions": 3} in overview["popular_tracks"]
+    assert len(overview["sessions_per_day"]) == 30
+    assert sum(h["bookings"] for h in overview["peak_hours"]) >= 3
+
+    # A session that arrives (or gets paid) later lands in the next refresh
+    _session(db, now - timedelta(minutes=5), 7.5)
+    db.commit()
+    analytics_rollup.refresh(db)
+    assert _method(client, 30) == {"method": "rollup-test", "revenue": 37.5, "count": 3}
+    db.close()
+
+
+def test_refresh_only_rewrites_the_trailing_window():
+    db = SessionLocal()
+    now = datetime.now(timezone.utc)
+    analytics_rollup.backfill(db)
+    old_bucket = analytics_rollup.range_start(60, now)
+    # Rows outside the refresh window are left alone, even if the raw data changed
+    _session(db, old_bucket.replace(tzinfo=timezone.utc), 1.0, method="rollup-window")
+    db.commit()
+    analytics_rollup.refresh(db, days=2)
+    assert db.query(models.AnalyticsHourly).filter(models.AnalyticsHourly.payment_method == "rollup-window").count() == 0
+    analytics_rollup.refresh(db, days=analytics_rollup.NIGHTLY_DAYS + 30)
+    assert db.query(models.AnalyticsHourly).filter(models.AnalyticsHourly.payment_method == "rollup-window").count() == 1
+    db.close()
+
+
+def test_rebuilds_never_duplicate_a_bucket():
+    db = SessionLocal()
+    now = datetime.now(timezone.utc)
+    _session(db, now.replace(minute=0, second=0, microsecond=0), 3.0, method="rollup-key")
+    db.commit()
+    analytics_rollup.backfill(db)
+    analytics_rollup.refresh(db)
+    analytics_rollup.backfill(db)
+    hourly = db.query(models.AnalyticsHourly).all()
+    assert len({row.bucket_key for row in hourly}) == len(hourly)
+    assert db.query(models.GlobalSettings).filter(
+        models.GlobalSettings.key == analytics_rollup.BACKFILL_SETTING).count() == 1
+
+    # A second copy of a bucket (a rebuild racing another worker's) is rejected, NULL station included
+    row = next(row for row in hourly if row.payment_method == "rollup-key")
+    db.add(models.AnalyticsHourly(bucket_key=row.bucket_key, bucket_start=row.bucket_start, day=row.day,
+                                  hour=row.hour, payment_method=row.payment_method, is_paid=row.is_paid, sessions=1))
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+    db.close()
+
+
+def test_dashboard_reads_never_backfill(monkeypatch):
+    db = SessionLocal()
+    db.query(models.GlobalSettings).filter(models.GlobalSettings.key == analytics_rollup.BACKFILL_SETTING).delete()
+    db.commit()
+    monkeypatch.setattr(analytics_rollup, "_last_refresh", 0.0)
+    monkeypatch.setattr(analytics_rollup, "_rebuild", lambda *args, **kwargs: pytest.fail("rebuilt on a read"))
+    analytics_rollup.ensure_fresh(db)
+    db.close()
+
+
+def test_overview_runs_a_fixed_number_of_queries(count_statements):
+    db = SessionLocal()
+    now = datetime.now(timezone.utc)
+    for i in range(40):
+        _session(db, now - timedelta(hours=i * 7), 10.0)
+        db.add(models.SessionResult(driver_name=f"Count Driver {i % 9}", track_name=f"Count Track {i % 4}",
+                                    car_model="count_car", best_lap=90000 + i, date=now - timedelta(hours=i * 7)))
+    db.add(models.Booking(customer_name="Count", num_players=1, date=now, time_slot="18:00-19:00",
+                          status="pending"))
+    db.commit()
+    analytics_rollup.refresh(db, days=analytics_rollup.NIGHTLY_DAYS)
+
+    with count_statements() as statements:
+        overview = get_analytics_overview(range_days=30, db=db)
+
+    # sessions, bookings, drivers by tier, redemptions, popularity, sessions per day, peak hours
+    assert len(statements) <= 7
+    assert overview["summary"]["sessions_today"] >= 1
+    assert overview["bookings"]["pending"] >= 1
+    assert len(overview["top_drivers"]) == 5
+    assert sum(1 for t in overview["popular_tracks"] if t["name"].startswith("Count Track")) == 4
+    db.close()
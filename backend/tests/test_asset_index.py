@@ -0,0 +1,113 @@
+import io
+import json
+import os
+
+import pytest
+
+from app import models
+from app.database import SessionLocal
+from app.services import asset_index, thumbnails
+
+
+def _png(path, size=(640, 360)):
+    Image = pytest.importorskip("PIL.Image")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (10, 120, 200)).save(buffer, "PNG")
+    path.write_bytes(buffer.getvalue())
+
+
+def _touch(path, data="x"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(data)
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(asset_index, "STORAGE_DIR", tmp_path)
+    monkeypatch.setattr(thumbnails, "THUMBS_DIR", tmp_path / "thumbnails")
+    return tmp_path
+
+
+def test_scan_assets_finds_car_and_track_layout_assets(storage):
+    content = storage / "mods" / "pack" / "content"
+    car = content / "cars" / "ks_f40"
+    _touch(car / "ui" / "ui_car.json", json.dumps({"name": "F40"}))
+    _touch(car / "ui" / "badge.png")
+    _touch(car / "skins" / "b_blue" / "preview.jpg")
+    _touch(car / "skins" / "a_red" / "livery.png")
+    _touch(car / "logo.png")
+    track = content / "tracks" / "monza"
+    _touch(track / "ui" / "ui_track.json", "{}")
+    _touch(track / "ui" / "outline.png")
+    _touch(track / "ui" / "junior" / "ui_track.json", "{}")
+    _touch(track / "ui" / "junior" / "outline.png")
+    _touch(track / "junior" / "map.png")
+
+    records = asset_index.scan_assets(content)
+    by_key = {(r["item_key"], r["layout"], r["kind"]): r for r in records}
+    # First skin has no preview.jpg, so the car falls back to its logo
+    assert by_key[("ks_f40", None, "preview")]["path"] == car / "logo.png"
+    assert by_key[("ks_f40", None, "badge")]["item_type"] == "car"
+    assert by_key[("monza", None, "outline")]["item_type"] == "track"
+    assert by_key[("monza", "junior", "map")]["path"] == track / "junior" / "map.png"
+    assert asset_index.preview_url(records) == "/static/mods/pack/content/cars/ks_f40/logo.png"
+
+
+def test_metadata_thumbnail_and_track_map_use_the_index(client, storage):
+    content = storage / "mods" / "spa_pack" / "content"
+    track = content / "tracks" / "spa"
+    _touch(track / "ui" / "ui_track.json", json.dumps({"name": "Spa-Francorchamps", "length": "7004"}))
+    _png(track / "ui" / "preview.png")
+    _touch(track / "ui" / "map.png", "map")
+
+    db = SessionLocal()
+    mod = models.Mod(name="Spa Pack", type="track", version="1.0", source_path=str(content))
+    db.add(mod)
+    db.commit()
+    # Mods ingested before the index existed are indexed on first access
+    metadata = client.get(f"/mods/{mod.id}/metadata").json()
+    assert metadata["name"] == "Spa-Francorchamps"
+    assert metadata["image_url"] == "/static/mods/spa_pack/content/tracks/spa/ui/preview.png"
+    assert metadata["map_url"] == "/static/mods/spa_pack/content/tracks/spa/ui/map.png"
+
+    resp = client.get(f"/mods/{mod.id}/thumbnail", params={"size": 200})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "image/webp"
+    assert "max-age" in resp.headers["cache-control"]
+    assert len(list((storage / "thumbnails").rglob("*.webp"))) == 1
+
+    resp = client.get("/telemetry/map/SPA")
+    assert resp.status_code == 200
+    assert resp.content == b"map"
+    assert client.get("/telemetry/map/nurburgring").status_code == 404
+
+    db.delete(mod)
+    db.commit()
+    assert db.query(models.ModAsset).filter(models.ModAsset.mod_id == mod.id).count() == 0
+    db.close()
+
+
+def test_track_lookup_is_literal_and_lazy_index_retries_changed_mods(storage):
+    content = storage / "mods" / "ai_pack" / "content"
+    content.mkdir(parents=True)
+    db = SessionLocal()
+    mod = models.Mod(name="AI Pack", type="track", version="1.0", source_path=str(content))
+    db.add(mod)
+    db.commit()
+    asset_index.ensure_indexed(db, mod)
+    assert asset_index.get_mod_assets(db, mod.id) == {}
+
+    # Files added later (new mtime) are picked up on the next access
+    _touch(content / "tracks" / "aixtrack" / "ui" / "map.png", "map")
+    _touch(content / "tracks" / "aixtrack" / "ui" / "ui_track.json", "{}")
+    os.utime(content, ns=(1, 1))
+    asset_index.ensure_indexed(db, mod)
+    assert asset_index.find_track_asset(db, "aixtr") is not None
+    # `_` is a literal underscore, not LIKE's any-character wildcard
+    assert asset_index.find_track_asset(db, "ai_tr") is None
+    assert asset_index.find_track_asset(db, "%track") is None
+
+    db.delete(mod)
+    db.commit()
+    db.close()
@@ -0,0 +1,69 @@
+import time
+
+from app import models
+from app.database import SessionLocal
+from app.routers.websockets import _ensure_library_mods
+from app.services import auto_library
+
+
+def _tag_names(db, name):
+    mod = db.query(models.Mod).filter(models.Mod.name == name).one()
+    return sorted(tag.name for tag in mod.tags)
+
+
+def test_scan_adds_missing_mods_once_with_tags(client):
+    db = SessionLocal()
+    db.add(models.Mod(name="AL Ferrari F40", type="car", version="1.0", source_path="/library/f40"))
+    db.commit()
+
+    cars = [
+        {"id": "al_f40", "name": "AL Ferrari F40"},
+        {"id": "al_gt3", "name": "AL Porsche GT3"},
+        {"id": "al_gt3_dup", "name": "AL Porsche GT3"},
+        {"id": "al_nameless"},
+    ]
+    tracks = [{"id": "al_monza", "name": "AL Monza"}, {"name": ""}]
+    _ensure_library_mods(db, cars, tracks)
+
+    added = db.query(models.Mod).filter(models.Mod.status == "detected", models.Mod.name.like("AL%") | models.Mod.name.like("al_%")).all()
+    assert sorted((m.name, m.type, m.source_path) for m in added) == [
+        ("AL Monza", "track", "auto_scan::al_monza"),
+        ("AL Porsche GT3", "car", "auto_scan::al_gt3"),
+        ("al_nameless", "car", "auto_scan::al_nameless"),
+    ]
+    assert _tag_names(db, "AL Porsche GT3") == ["Car", "GT3", "Porsche"]
+    assert _tag_names(db, "AL Monza") == ["Track"]
+    # Library mods that already existed are left alone
+    assert _tag_names(db, "AL Ferrari F40") == []
+
+    # Re-tagging is idempotent
+    mod = db.query(models.Mod).filter(models.Mod.name == "AL Porsche GT3").one()
+    assert auto_library.apply_auto_tags(db, [(mod.id, "car", mod.name)]) == 0
+    db.close()
+
+
+def test_large_scan_is_batched(count_statements):
+    db = SessionLocal()
+    brands = ["Ferrari", "BMW", "Nissan", "Audi", "Generic"]
+    cars = [{"id": f"bench_car_{i}", "name": f"Bench {brands[i % 5]} {i}"} for i in range(600)]
+    tracks = [{"id": f"bench_track_{i}", "name": f"Bench Track {i}"} for i in range(150)]
+    # A slice of the scan is already in the library
+    db.add_all(models.Mod(name=car["name"], type="car", version="1.0") for car in cars[:100])
+    db.commit()
+
+    with count_statements() as statements:
+        start = time.perf_counter()
+        _ensure_library_mods(db, cars, tracks)
+        elapsed = time.perf_counter() - start
+
+    assert db.query(models.Mod).filter(models.Mod.source_path.like("auto_scan::bench_%")).count() == 650
+    assert _tag_names(db, "Bench Ferrari 105") == ["Car", "Ferrari"]
+    # The per-item version ran several statements per missing mod (> 2500 here)
+    assert len(statements) < 40, len(statements)
+    assert elapsed < 5.0
+
+    # A rescan of the same content only reads
+    with count_statements() as statements:
+        _ensure_library_mods(db, cars, tracks)
+    assert len(statements) <= 2
+    db.close()
@@ -0,0 +1,64 @@
+from app import models
+from app.database import SessionLocal
+from app.services import elo_ranking
+from app.services.cached_index import CachedIndex
+
+
+def test_build_that_raced_with_a_patch_is_not_installed():
+    builds = []
+
+    def build(db):
+        builds.append(1)
+        if len(builds) == 1:
+            # A committed write patches the cache while this build is still reading
+            cache.patch(lambda value: value.append("patched"))
+        return ["built"]
+
+    cache = CachedIndex("test index", build, refresh_seconds=300)
+    db = SessionLocal()
+    assert cache.get(db) == ["built"]
+    assert cache.peek() is None
+    assert cache.get(db) == ["built"]
+    assert cache.peek() == ["built"] and len(builds) == 2
+    db.close()
+
+
+def test_other_workers_tokens_trigger_a_rebuild():
+    db = SessionLocal()
+    builds = []
+    cache = CachedIndex("test versioned", lambda db: builds.append(1) or len(builds), 300, version_key="test_cached_index")
+    other = CachedIndex("test versioned", lambda db: 0, 300, version_key="test_cached_index")
+    assert cache.get(db) == 1
+    assert cache.get(db) == 1
+
+    # Our own patch adopts the token it published; another worker's invalidate() doesn't
+    cache.patch(lambda value: value + 10, db=db)
+    assert cache.get(db) == 11
+    other.invalidate(db)
+    assert cache.get(db) == 2
+    db.close()
+
+
+def test_rank_index_keeps_updates_made_during_a_rebuild(monkeypatch):
+    db = SessionLocal()
+    driver = models.Driver(name="CI Racer", elo_rating=1500.0, total_races=1)
+    db.add(driver)
+    db.commit()
+    elo_ranking.invalidate()
+    build = elo_ranking._index.build
+
+    def racing_build(db):
+        index = build(db)
+        # Event processing commits a new rating before the rebuild installs its index
+        elo_ranking.update([(driver.id, 2500.0)])
+        return index
+
+    monkeypatch.setattr(elo_ranking._index, "build", racing_build)
+    elo_ranking.get_index(db)
+    # The rebuild missed the update, so it isn't kept; the next read rebuilds
+    assert elo_ranking._index.peek() is None
+    monkeypatch.setattr(elo_ranking._index, "build", build)
+    driver.elo_rating = 2500.0
+    db.commit()
+    assert elo_ranking.get_index(db)._ratings[driver.id] == 2500.0
+    db.close()
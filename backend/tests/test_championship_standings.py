@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+
+from app import models
+from app.database import SessionLocal
+from app.routers.championships import get_championship_standings, link_session_to_event
+
+
+def _result(db, event, driver, best_lap):
+    result = models.SessionResult(event_id=event.id if event else None, driver_name=driver, best_lap=best_lap,
+                                  track_name="cs_track", car_model="cs_car", date=datetime.now(timezone.utc))
+    db.add(result)
+    db.commit()
+    return result
+
+
+def test_standings_rank_every_round_in_one_query():
+    db = SessionLocal()
+    champ = models.Championship(name="CS Season", scoring_rules={"1": 10, "2": 6, "3": 4})
+    db.add(champ)
+    db.commit()
+    rounds = [models.Event(name=f"CS Round {i}", championship_id=champ.id) for i in range(3)]
+    db.add_all(rounds)
+    db.commit()
+
+    # Round 0: A wins (best of two sessions), B second, C third
+    _result(db, rounds[0], "A", 91000)
+    _result(db, rounds[0], "A", 90000)
+    _result(db, rounds[0], "B", 90500)
+    _result(db, rounds[0], "C", 92000)
+    # Round 1: B wins, D scores nothing (4th)
+    _result(db, rounds[1], "B", 80000)
+    _result(db, rounds[1], "A", 80100)
+    _result(db, rounds[1], "C", 80200)
+    _result(db, rounds[1], "D", 80300)
+    # Round 2: C alone
+    _result(db, rounds[2], "C", 70000)
+
+    standings = get_championship_standings(champ.id, db=db)
+    assert [(s["driver_name"], s["total_points"]) for s in standings] == [("C", 18), ("A", 16), ("B", 16), ("D", 0)]
+    by_driver = {s["driver_name"]: s for s in standings}
+    assert by_driver["A"] == {"driver_name": "A", "total_points": 16, "events_participated": 2, "wins": 1,
+                              "podiums": 2, "best_lap_ever": 80100}
+    assert by_driver["C"]["wins"] == 1 and by_driver["C"]["podiums"] == 3
+    assert by_driver["D"]["events_participated"] == 1
+
+    # Served from the cache until a linked result changes
+    late = _result(db, None, "D", 69000)
+    assert get_championship_standings(champ.id, db=db) == standings
+    link_session_to_event(champ.id, rounds[2].id, late.id, db=db)
+    updated = {s["driver_name"]: s["total_points"] for s in get_championship_standings(champ.id, db=db)}
+    assert updated["D"] == 10 and updated["C"] == 14
+    db.close()
@@ -0,0 +1,111 @@
+import io
+import json
+import os
+import random
+import time
+
+from app.services import chunk_store
+from app.services.chunk_store import hashing
+
+# Small parameters so the tests stay fast
+PARAMS = {"min_size": 512, "avg_bits": 10, "max_size": 8192}
+
+
+def _random_bytes(size, seed=1):
+    rng = random.Random(seed)
+    return bytes(rng.getrandbits(8) for _ in range(size))
+
+
+def _chunks(data):
+    return list(hashing.iter_chunks(io.BytesIO(data), **PARAMS))
+
+
+def test_chunks_reassemble_and_are_deterministic():
+    data = _random_bytes(100_000)
+    first = _chunks(data)
+    assert b"".join(first) == data
+    assert first == _chunks(data)
+    assert all(len(c) <= PARAMS["max_size"] for c in first)
+
+
+def test_insertion_only_changes_nearby_chunks():
+    data = _random_bytes(100_000)
+    edited = data[:50_000] + b"new bytes in the middle" + data[50_000:]
+    before = set(_chunks(data))
+    after = _chunks(edited)
+    reused = sum(1 for c in after if c in before)
+    # Boundaries resync after the edit, so almost every chunk is shared
+    assert reused >= len(after) - 3
+
+
+def test_vectorized_cut_points_match_the_byte_loop(monkeypatch):
+    data = _random_bytes(60_000, seed=4) + bytes(20_000) + _random_bytes(60_000, seed=5)
+    fast = _chunks(data)
+    monkeypatch.setattr(hashing, "_GEAR_NP", None)
+    assert _chunks(data) == fast
+
+
+def test_build_chunked_manifest_dedups_chunks(tmp_path):
+    content = tmp_path / "content"
+    content.mkdir()
+    data = _random_bytes(40_000)
+    (content / "a.kn5").write_bytes(data)
+    (content / "b.kn5").write_bytes(data)
+    (content / "ui.json").write_bytes(b"{}")
+    store = tmp_path / "chunks"
+
+    manifest = chunk_store.build_chunked_manifest(str(content), root=store, **PARAMS)
+
+    assert "chunks" not in manifest["ui.json"]
+    assert manifest["a.kn5"]["chunks"] == manifest["b.kn5"]["chunks"]
+    assert manifest["a.kn5"]["hash"] == hashing.calculate_file_hash(str(content / "a.kn5"))
+    stored = [p for p in store.rglob("*") if p.is_file()]
+    assert len(stored) == len(manifest["a.kn5"]["chunks"])
+    rebuilt = b"".join(
+        chunk_store.chunk_path(c["hash"], store).read_bytes() for c in manifest["a.kn5"]["chunks"]
+    )
+    assert rebuilt == data
+
+
+def test_deleted_mods_release_unshared_chunks(tmp_path, monkeypatch):
+    from app import models
+    from app.database import SessionLocal
+    from app.routers import mods as mods_router
+
+    store = tmp_path / "chunks"
+    monkeypatch.setattr(chunk_store, "CHUNKS_DIR", store)
+    monkeypatch.setattr(mods_router, "MODS_DIR", tmp_path)
+    shared, own = _random_bytes(20_000, seed=6), _random_bytes(20_000, seed=7)
+    manifests = []
+    for name, files in (("cs_keep", {"shared.kn5": shared}), ("cs_drop", {"shared.kn5": shared, "own.kn5": own})):
+        content = tmp_path / name / "content"
+        content.mkdir(parents=True)
+        for file_name, data in files.items():
+            (content / file_name).write_bytes(data)
+        manifests.append(chunk_store.build_chunked_manifest(str(content), **PARAMS))
+    # Past the grace period that protects chunks of ingests still running
+    old = time.time() - chunk_store.GC_GRACE_SECONDS - 60
+    for path in store.rglob("*"):
+        if path.is_file():
+            os.utime(path, (old, old))
+
+    db = SessionLocal()
+    keep, drop = (models.Mod(name=name, type="car", source_path=str(tmp_path / name / "content"),
+                             manifest=json.dumps(manifest))
+                  for name, manifest in zip(("cs_keep", "cs_drop"), manifests))
+    db.add_all([keep, drop])
+    db.commit()
+    mods_router.delete_mod(drop.id, db=db, current_user=None)
+
+    shared_hashes = chunk_store.manifest_chunks(manifests[0])
+    own_hashes = chunk_store.manifest_chunks({"own.kn5": manifests[1]["own.kn5"]})
+    assert all(chunk_store.chunk_path(h, store).exists() for h in shared_hashes)
+    assert not any(chunk_store.chunk_path(h, store).exists() for h in own_hashes)
+    db.delete(keep)
+    db.commit()
+    db.close()
+
+
+def test_get_chunk_endpoint_validates_hash(client):
+    assert client.get("/mods/chunks/not-a-hash").status_code == 400
+    assert client.get(f"/mods/chunks/{'0' * 64}").status_code == 404
@@ -0,0 +1,93 @@
+import time
+from datetime import datetime, timezone
+
+from app import models, schemas
+from app.database import SessionLocal
+from app.routers.telemetry import get_leaderboard, get_recent_sessions, upload_session_result
+from app.services import content_catalog, response_cache
+
+
+def _upload(db, driver, track, car, lap_time):
+    lap = {"driver_name": driver, "car_model": car, "track_name": track, "lap_time": lap_time,
+           "sectors": [lap_time], "is_valid": True, "timestamp": datetime.now(timezone.utc)}
+    payload = schemas.SessionResultCreate(track_name=track, car_model=car, driver_name=driver, session_type="practice",
+                                          date=datetime.now(timezone.utc), best_lap=lap_time, laps=[lap])
+    upload_session_result(payload, db=db)
+    return db.query(models.SessionResult).order_by(models.SessionResult.id.desc()).first()
+
+
+def test_spellings_share_one_identity():
+    db = SessionLocal()
+    first = _upload(db, "CC One", "CC_Imola", "cc_gt3", 100000)
+    second = _upload(db, "CC Two", " cc_imola ", "CC_GT3", 99000)
+    assert first.track_id is not None and first.track_id == second.track_id
+    assert first.car_id == second.car_id
+    assert db.query(models.Track).filter(models.Track.key == "cc_imola").count() == 1
+
+    response_cache.clear()
+    board = get_leaderboard(track_name="CC_IMOLA", car_model="cc_gt3", db=db)
+    assert [entry.driver_name for entry in board] == ["CC Two", "CC One"]
+    assert get_leaderboard(track_name="cc_unknown", db=db) == []
+    assert {s.driver_name for s in get_recent_sessions(track_name="imol", db=db)} >= {"CC One", "CC Two"}
+    db.close()
+
+
+def test_alias_merges_history():
+    db = SessionLocal()
+    canonical = _upload(db, "CC Three", "cc_ks_spa", "cc_car", 140000)
+    legacy = _upload(db, "CC Four", "CC Spa", "cc_car", 141000)
+    assert canonical.track_id != legacy.track_id
+    old_id = legacy.track_id
+
+    merged = content_catalog.add_alias(db, "track", "CC Spa", "cc_ks_spa")
+    db.refresh(legacy)
+    assert merged == canonical.track_id == legacy.track_id
+    assert db.get(models.Track, old_id).merged_into_id == merged
+    assert old_id not in {entry["id"] for entry in content_catalog.list_entries(db, "track")}
+    # New uploads under the alias land on the canonical identity
+    assert _upload(db, "CC Five", "cc spa", "cc_car", 139000).track_id == merged
+    db.close()
+
+
+def test_stale_cache_after_a_merge(monkeypatch):
+    db = SessionLocal()
+    canonical = _upload(db, "CC Seven", "cc_ks_zandvoort", "cc_car", 100000)
+    old_id = _upload(db, "CC Eight", "CC Zandvoort", "cc_car", 101000).track_id
+    content_catalog.resolve(db, "track", "cc_ks_zandvoort")
+    stale = {kind: dict(aliases) for kind, aliases in content_catalog._catalog.peek().aliases.items()}
+    content_catalog.add_alias(db, "track", "CC Zandvoort", "cc_ks_zandvoort")
+
+    # Another worker still caches the merged id: its upload commits against the tombstone
+    monkeypatch.setattr(content_catalog._catalog, "_value", content_catalog.Catalog(stale, {"track": {}, "car": {}}))
+    monkeypatch.setattr(content_catalog._catalog, "_built_at", time.monotonic())
+    straggler = _upload(db, "CC Nine", "cc zandvoort", "cc_car", 99000)
+    assert straggler.track_id == old_id
+
+    # Once caches reload, reads count it for the canonical track and backfill relinks it
+    content_catalog.invalidate()
+    response_cache.clear()
+    board = get_leaderboard(track_name="cc zandvoort", db=db)
+    assert [entry.driver_name for entry in board][:1] == ["CC Nine"]
+    assert content_catalog.backfill(db) >= 1
+    db.refresh(straggler)
+    assert straggler.track_id == canonical.track_id
+    db.close()
+
+
+def test_backfill_and_rollback():
+    db = SessionLocal()
+    row = _upload(db, "CC Six", "cc_legacy_track", "cc_legacy_car", 90000)
+    db.query(models.SessionResult).filter(models.SessionResult.id == row.id).update(
+        {models.SessionResult.track_id: None, models.SessionResult.car_id: None}, synchronize_session=False
+    )
+    db.commit()
+    assert content_catalog.backfill(db) >= 2
+    db.refresh(row)
+    assert row.track_id == content_catalog.resolve(db, "track", "cc_legacy_track", create=False)
+    assert row.car_id is not None
+
+    # An identity created in a rolled-back transaction is never served from the cache
+    content_catalog.resolve(db, "track", "cc_rolled_back")
+    db.rollback()
+    assert content_catalog.resolve(db, "track", "cc_rolled_back", create=False) is None
+    db.close()
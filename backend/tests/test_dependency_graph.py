@@ -0,0 +1,109 @@
+import pytest
+from fastapi import HTTPException
+
+from app import models, schemas
+from app.database import SessionLocal
+from app.routers.mods import add_mod_dependency
+from app.routers.profiles import create_profile
+from app.routers.stations import get_target_manifest
+from app.services import dependency_graph
+
+
+def test_closure_handles_chains_and_cycles():
+    closure = dependency_graph.compute_closure({
+        1: {2},
+        2: {3, 4},
+        3: {4},
+        # 5 <-> 6 is a cycle that also needs 1
+        5: {6},
+        6: {5, 1},
+    })
+    assert closure[1] == {2, 3, 4}
+    assert closure[3] == {4}
+    assert closure[4] == set()
+    assert closure[5] == closure[6] == {1, 2, 3, 4, 5, 6}
+
+
+def test_deep_chain_does_not_recurse():
+    edges = {i: {i + 1} for i in range(5000)}
+    closure = dependency_graph.compute_closure(edges)
+    assert len(closure[0]) == 5000
+    assert closure[4999] == {5000}
+
+
+def _mod(db, name, manifest=None, source_path=None):
+    mod = models.Mod(name=name, type="app", version="1.0", manifest=manifest, source_path=source_path)
+    db.add(mod)
+    db.commit()
+    return mod
+
+
+def test_profiles_and_manifests_use_the_closure(client, tmp_path, monkeypatch):
+    from app.routers import stations
+
+    monkeypatch.setattr(stations, "STORAGE_DIR", tmp_path)
+    db = SessionLocal()
+    dependency_graph.invalidate()
+    base = _mod(db, "dg-base", {"apps/base.py": {"hash": "b"}}, str(tmp_path / "base"))
+    lib = _mod(db, "dg-lib", {"apps/lib.py": {"hash": "l"}}, str(tmp_path / "lib"))
+    app_mod = _mod(db, "dg-app", {"apps/app.py": {"hash": "a"}}, str(tmp_path / "app"))
+    extra = _mod(db, "dg-extra", {"apps/extra.py": {"hash": "e"}}, str(tmp_path / "extra"))
+
+    add_mod_dependency(app_mod.id, [lib.id], db=db, current_user=None)
+    add_mod_dependency(lib.id, [base.id], db=db, current_user=None)
+    assert dependency_graph.dependencies_of(db, app_mod.id) == {lib.id, base.id}
+
+    # base -> app would close app -> lib -> base
+    with pytest.raises(HTTPException) as exc:
+        add_mod_dependency(base.id, [app_mod.id], db=db, current_user=None)
+    assert exc.value.status_code == 400
+
+    profile = create_profile(schemas.ProfileCreate(name="dg-profile", mod_ids=[app_mod.id]), db=db)
+    assert sorted(m.id for m in profile.mods) == sorted([app_mod.id, lib.id, base.id])
+
+    station = models.Station(name="dg-station", mac_address="dg-mac", active_profile_id=profile.id)
+    db.add(station)
+    db.commit()
+    # A dependency added after the profile was created still reaches the manifest
+    add_mod_dependency(base.id, [extra.id], db=db, current_user=None)
+    manifest = get_target_manifest(station.id, db=db)
+    assert sorted(manifest) == ["apps/app.py", "apps/base.py", "apps/extra.py", "apps/lib.py"]
+    assert manifest["apps/extra.py"]["url"] == "/static/extra/apps/extra.py"
+
+    # The incrementally maintained closure matches a rebuild from the table
+    cached = {k: v for k, v in dependency_graph.get_closure(db).items() if v}
+    dependency_graph.invalidate()
+    assert {k: v for k, v in dependency_graph.get_closure(db).items() if v} == cached
+    db.close()
+
+
+def test_edges_written_by_another_worker_are_seen(monkeypatch):
+    db = SessionLocal()
+    first = _mod(db, "dg-worker-a")
+    second = _mod(db, "dg-worker-b")
+    dependency_graph.invalidate()
+    assert dependency_graph.dependencies_of(db, first.id) == frozenset()
+
+    # While the cache is current, cycle checks never reload the edge table
+    loads = []
+    load_edges = dependency_graph._load_edges
+    monkeypatch.setattr(dependency_graph, "_load_edges", lambda db: loads.append(1) or load_edges(db))
+    dependency_graph.check_new_dependency(db, first.id, second.id)
+    assert loads == []
+
+    # Committed by another worker, which publishes a new generation token
+    db.execute(models.mod_dependencies.insert().values(parent_mod_id=first.id, child_mod_id=second.id))
+    db.commit()
+    dependency_graph._closure.publish(db)
+    with pytest.raises(dependency_graph.DependencyCycleError):
+        dependency_graph.check_new_dependency(db, second.id, first.id)
+    assert loads == [1]
+    assert dependency_graph.dependencies_of(db, first.id) == {second.id}
+
+    # A write that skipped the token is still picked up by the periodic refresh
+    db.execute(models.mod_dependencies.delete().where(models.mod_dependencies.c.parent_mod_id == first.id))
+    db.commit()
+    assert dependency_graph.dependencies_of(db, first.id) == {second.id}
+    monkeypatch.setattr(dependency_graph._closure, "refresh_seconds", 0)
+    assert dependency_graph.dependencies_of(db, first.id) == frozenset()
+    db.close()
@@ -0,0 +1,92 @@
+import statistics
+from datetime import datetime, timedelta, timezone
+
+from app import models, schemas
+from app.database import SessionLocal
+from app.routers.telemetry import get_pilot_profile, upload_session_result
+from app.services import driver_stats
+
+
+def _upload(db, driver, track, car, when, times, invalid=()):
+    laps = [
+        {"driver_name": driver, "car_model": car, "track_name": track, "lap_time": t, "sectors": [t],
+         "is_valid": t not in invalid, "timestamp": when}
+        for t in times
+    ]
+    payload = schemas.SessionResultCreate(track_name=track, car_model=car, driver_name=driver, session_type="practice",
+                                          date=when, best_lap=min(times), laps=laps)
+    return upload_session_result(payload, db=db)
+
+
+def test_profile_is_maintained_on_upload():
+    db = SessionLocal()
+    driver = "DS Welford"
+    day = datetime(2026, 3, 1, 18, 0, tzinfo=timezone.utc)
+    _upload(db, driver, "ds_monza", "ds_f40", day, [101000, 99500, 100200])
+    _upload(db, driver, "ds_monza", "ds_gt3", day + timedelta(hours=2), [98000, 97000], invalid=(97000,))
+    _upload(db, driver, "ds_spa", "ds_gt3", day + timedelta(days=3), [140000, 141500, 139900])
+
+    profile = get_pilot_profile(driver, db=db)
+    # Uploads only store valid laps: the 97000 is neither counted nor a record
+    assert profile.total_laps == 7
+    assert profile.active_days == 2
+    assert profile.favorite_car == "ds_gt3"
+    records = {r.track_name: (r.best_lap, r.car_model) for r in profile.records}
+    assert records == {"ds_monza": (98000, "ds_gt3"), "ds_spa": (139900, "ds_gt3")}
+
+    # Deviations are measured per track: Spa's longer laps don't count as inconsistency
+    valid = {"ds_monza": [101000, 99500, 100200, 98000], "ds_spa": [140000, 141500, 139900]}
+    pooled = sum(statistics.pvariance(times) * len(times) for times in valid.values()) / 7
+    expected = max(0.0, min(100.0, 100 - pooled ** 0.5 / 100))
+    assert profile.avg_consistency == round(expected, 1)
+    assert db.get(models.DriverStats, driver).valid_laps == 7
+    for track_name, times in valid.items():
+        track = db.get(models.DriverTrackStats, (driver, track_name))
+        assert abs(track.lap_mean - statistics.mean(times)) < 1e-6
+        assert abs(track.lap_m2 / track.valid_laps - statistics.pvariance(times)) < 1e-3
+
+    # Reading a profile no longer creates a Driver row as a side effect
+    assert db.query(models.Driver).filter(models.Driver.name == driver).count() == 0
+    db.close()
+
+
+def test_rebuild_matches_incremental_updates():
+    db = SessionLocal()
+    driver = "DS Legacy"
+    start = datetime(2026, 4, 1, 10, 0, tzinfo=timezone.utc)
+    for i in range(6):
+        _upload(db, driver, f"ds_track_{i % 2}", f"ds_car_{i % 3}", start + timedelta(days=i // 2), [90000 + i * 100, 91000 - i * 50])
+
+    incremental = db.get(models.DriverStats, driver)
+    snapshot = (incremental.total_laps, incremental.valid_laps, incremental.active_days)
+    tracks = sorted((t.track_name, t.laps, t.best_lap, t.valid_laps, round(t.lap_mean, 6), round(t.lap_m2, 3)) for t in
+                    db.query(models.DriverTrackStats).filter(models.DriverTrackStats.driver_name == driver))
+
+    # History from before the rollup existed: the first read rebuilds from the raw tables
+    driver_stats.clear_driver(db, driver)
+    db.commit()
+    rebuilt = driver_stats.get_stats(db, driver)
+    assert (rebuilt.total_laps, rebuilt.valid_laps, rebuilt.active_days) == snapshot
+    assert sorted((t.track_name, t.laps, t.best_lap, t.valid_laps, round(t.lap_mean, 6), round(t.lap_m2, 3)) for t in
+                  db.query(models.DriverTrackStats).filter(models.DriverTrackStats.driver_name == driver)) == tracks
+    assert snapshot[0] == 12 and snapshot[2] == 3
+    db.close()
+
+
+def test_rebuild_takes_over_a_row_created_concurrently():
+    db = SessionLocal()
+    driver = "DS Race"
+    start = datetime(2026, 5, 1, 10, 0, tzinfo=timezone.utc)
+    _upload(db, driver, "ds_race_track", "ds_car", start, [90000, 90500])
+    expected = db.get(models.DriverStats, driver).total_laps
+
+    # Another worker's first upload of this driver committed its row meanwhile
+    other = SessionLocal()
+    other.query(models.DriverStats).filter(models.DriverStats.driver_name == driver).update({"total_laps": 999})
+    other.commit()
+    other.close()
+    rebuilt = driver_stats.rebuild_driver(db, driver)
+    db.commit()
+    assert rebuilt.total_laps == expected
+    assert db.query(models.DriverStats).filter(models.DriverStats.driver_name == driver).count() == 1
+    db.close()
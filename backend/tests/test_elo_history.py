@@ -0,0 +1,67 @@
+import random
+
+from app import models
+from app.database import SessionLocal
+from app.routers.elo import get_driver_elo, get_driver_elo_history
+from app.routers.events import process_event_results
+from app.services import elo_ranking
+
+
+def _race(db, name, drivers):
+    event = models.Event(name=name, status="active")
+    db.add(event)
+    db.commit()
+    for position, driver in enumerate(drivers):
+        db.add(models.SessionResult(event_id=event.id, driver_name=driver, best_lap=80000 + position * 100,
+                                    track_name="eh_track", car_model="eh_car"))
+    db.commit()
+    return event
+
+
+def test_processing_appends_to_the_ledger():
+    db = SessionLocal()
+    first = _race(db, "EH Race 1", ["EH Ana", "EH Ben", "EH Cid"])
+    second = _race(db, "EH Race 2", ["EH Cid", "EH Ana"])
+    process_event_results(first.id, db=db, current_user=None)
+    process_event_results(second.id, db=db, current_user=None)
+
+    history = get_driver_elo_history("EH Ana", db=db)
+    assert [h["event_id"] for h in history] == [first.id, second.id]
+    assert [h["position"] for h in history] == [1, 2]
+    assert history[0]["rating_before"] == 1200.0
+    assert history[1]["rating_before"] == history[0]["elo_rating"]
+    ana = db.query(models.Driver).filter(models.Driver.name == "EH Ana").one()
+    assert history[-1]["elo_rating"] == round(ana.elo_rating, 1)
+
+    assert len(get_driver_elo_history("EH Ana", limit=1, db=db)) == 1
+    assert get_driver_elo_history("EH Ben", db=db)[0]["field_size"] == 3
+    db.close()
+
+
+def test_rank_index_matches_counting():
+    rng = random.Random(3)
+    ratings = {i: round(rng.uniform(800, 2000)) for i in range(200)}
+    index = elo_ranking.RankIndex(ratings)
+    for _ in range(100):
+        driver_id = rng.randrange(250)
+        ratings[driver_id] = round(rng.uniform(800, 2000))
+        index.set(driver_id, ratings[driver_id])
+    assert len(index) == len(ratings)
+    for probe in list(ratings.values())[:50] + [0, 5000]:
+        assert index.rank(probe) == sum(1 for r in ratings.values() if r > probe) + 1
+
+
+def test_driver_rank_follows_processed_events():
+    db = SessionLocal()
+    elo_ranking.invalidate()
+    event = _race(db, "EH Rank Race", ["EH Rank Top", "EH Rank Low"])
+    elo_ranking.get_index(db)  # built before the race: processing must patch it
+    process_event_results(event.id, db=db, current_user=None)
+
+    for name in ("EH Rank Top", "EH Rank Low"):
+        driver = db.query(models.Driver).filter(models.Driver.name == name).one()
+        expected = db.query(models.Driver).filter(
+            models.Driver.elo_rating > driver.elo_rating, models.Driver.total_races > 0
+        ).count() + 1
+        assert get_driver_elo(name, db=db)["rank"] == expected
+    db.close()
@@ -0,0 +1,82 @@
+import random
+import time
+
+from app import models
+from app.database import SessionLocal
+from app.routers.events import process_event_results, process_event_results_batch
+from app.services.elo import calculate_expected_score, calculate_race_elo_changes
+
+
+def _pairwise_reference(results, k_factor=32):
+    n = len(results)
+    changes = {r["driver_id"]: 0.0 for r in results}
+    for i in range(n):
+        for j in range(i + 1, n):
+            a, b = results[i], results[j]
+            score_a = 1.0 if a["position"] < b["position"] else 0.0 if a["position"] > b["position"] else 0.5
+            changes[a["driver_id"]] += k_factor / (n - 1) * (score_a - calculate_expected_score(a["rating"], b["rating"]))
+            changes[b["driver_id"]] += k_factor / (n - 1) * ((1 - score_a) - calculate_expected_score(b["rating"], a["rating"]))
+    return changes
+
+
+def test_matrix_elo_matches_pairwise_loop():
+    rng = random.Random(7)
+    results = [{"driver_id": i, "rating": rng.uniform(900, 2100), "position": i + 1} for i in range(30)]
+    results[5]["position"] = results[4]["position"]  # a dead heat
+    vectorized = calculate_race_elo_changes(results)
+    reference = _pairwise_reference(results)
+    assert vectorized.keys() == reference.keys()
+    assert all(abs(vectorized[k] - reference[k]) < 1e-9 for k in reference)
+    assert abs(sum(vectorized.values())) < 1e-9  # zero-sum
+    assert calculate_race_elo_changes(results[:1]) == {0: 0.0}
+
+
+def _event_with_grid(db, name, drivers):
+    event = models.Event(name=name, status="active")
+    db.add(event)
+    db.commit()
+    for position, driver in enumerate(drivers):
+        db.add(models.SessionResult(event_id=event.id, driver_name=driver, best_lap=90000 + position * 100,
+                                    track_name="elo_track", car_model="elo_car"))
+    db.commit()
+    return event
+
+
+def test_thirty_car_grid_processes_in_a_few_statements(count_statements):
+    db = SessionLocal()
+    names = [f"ELO Grid {i:02d}" for i in range(30)]
+    db.add(models.Driver(name=names[0], elo_rating=1500.0, total_races=3, total_wins=1, total_podiums=2))
+    db.commit()
+    event = _event_with_grid(db, "ELO Grid Race", names)
+
+    with count_statements() as statements:
+        start = time.perf_counter()
+        response = process_event_results(event.id, db=db, current_user=None)
+        elapsed = time.perf_counter() - start
+
+    assert response["participants"] == 30
+    # Event, finishing order, drivers, one batched insert, updates: not one round-trip per driver
+    assert sum(1 for s, _ in statements if s.lstrip().upper().startswith("SELECT")) <= 4
+    assert elapsed < 1.0
+
+    winner = db.query(models.Driver).filter(models.Driver.name == names[0]).one()
+    assert (winner.total_races, winner.total_wins, winner.total_podiums) == (4, 2, 3)
+    last = db.query(models.Driver).filter(models.Driver.name == names[-1]).one()
+    assert last.elo_rating < 1200.0 and last.total_races == 1
+    db.refresh(event)
+    assert event.status == "completed"
+    db.close()
+
+
+def test_league_night_batch_chains_ratings():
+    db = SessionLocal()
+    first = _event_with_grid(db, "ELO Night 1", ["ELO Night A", "ELO Night B"])
+    second = _event_with_grid(db, "ELO Night 2", ["ELO Night A", "ELO Night B"])
+    response = process_event_results_batch([second.id, first.id], db=db, current_user=None)
+    assert [e["participants"] for e in response["events"]] == [2, 2]
+
+    a = db.query(models.Driver).filter(models.Driver.name == "ELO Night A").one()
+    # Two wins against an equal then a weaker opponent: +16, then a bit less
+    assert 1200 + 16 < a.elo_rating < 1200 + 32
+    assert a.total_wins == 2
+    db.close()
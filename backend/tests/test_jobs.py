@@ -0,0 +1,122 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from app import models
+from app.services import jobs
+from app.database import SessionLocal
+
+
+@jobs.handler("test_echo")
+def _echo(ctx, payload, db):
+    ctx.report("working", 1, 2, force=True)
+    return {"echo": payload.get("value")}
+
+
+@jobs.handler("test_wait_for_cancel")
+def _wait_for_cancel(ctx, payload, db):
+    for _ in range(500):
+        ctx.report("waiting", force=True)
+        time.sleep(0.01)
+    return {"finished": True}
+
+
+def _wait_finished(job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        db = SessionLocal()
+        job = db.query(models.Job).filter(models.Job.id == job_id).first()
+        db.close()
+        if job.status in jobs.FINISHED_STATUSES:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_enqueue_runs_handler_and_stores_result():
+    db = SessionLocal()
+    job = jobs.enqueue(db, "test_echo", {"value": 7})
+    db.close()
+    done = _wait_finished(job.id)
+    assert done.status == "completed"
+    assert done.result == {"echo": 7}
+    assert done.progress == 1.0
+    assert done.attempts == 1
+
+
+def test_cancel_running_job():
+    db = SessionLocal()
+    job = jobs.enqueue(db, "test_wait_for_cancel")
+    time.sleep(0.1)
+    db.refresh(job)
+    jobs.cancel(db, job)
+    db.close()
+    assert _wait_finished(job.id).status == "cancelled"
+
+
+def test_recover_requeues_interrupted_jobs():
+    db = SessionLocal()
+    interrupted = models.Job(kind="test_echo", status="running", attempts=1, payload={"value": "again"})
+    exhausted = models.Job(kind="test_echo", status="running", attempts=jobs.JOB_MAX_ATTEMPTS, payload={})
+    db.add_all([interrupted, exhausted])
+    db.commit()
+    interrupted_id, exhausted_id = interrupted.id, exhausted.id
+    db.close()
+
+    jobs.recover_jobs()
+
+    recovered = _wait_finished(interrupted_id)
+    assert recovered.status == "completed"
+    assert recovered.result == {"echo": "again"}
+    assert recovered.attempts == 2
+    failed = _wait_finished(exhausted_id)
+    assert failed.status == "failed"
+
+
+def test_each_job_is_claimed_once(monkeypatch):
+    calls = []
+    barrier = threading.Barrier(4)
+
+    @jobs.handler("test_count_runs")
+    def _count(ctx, payload, db):
+        calls.append(1)
+        return {}
+
+    original_claim = jobs._claim
+
+    def racing_claim(db, job_id):
+        barrier.wait()  # every "worker" reads the job as queued before any claims it
+        return original_claim(db, job_id)
+
+    monkeypatch.setattr(jobs, "_claim", racing_claim)
+    db = SessionLocal()
+    job = models.Job(kind="test_count_runs", status="queued", payload={})
+    db.add(job)
+    db.commit()
+    job_id = job.id
+    db.close()
+
+    threads = [threading.Thread(target=jobs._run, args=(job_id,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert _wait_finished(job_id).attempts == 1
+
+
+def test_recover_leaves_jobs_with_a_live_heartbeat_alone():
+    db = SessionLocal()
+    live = models.Job(kind="test_echo", status="running", attempts=1, payload={},
+                      heartbeat_at=datetime.now(timezone.utc))
+    db.add(live)
+    db.commit()
+    jobs.recover_jobs()
+    db.refresh(live)
+    assert live.status == "running"
+
+    live.heartbeat_at = datetime.now(timezone.utc) - timedelta(seconds=jobs.JOB_LEASE_SECONDS + 5)
+    db.commit()
+    jobs.recover_jobs()
+    assert _wait_finished(live.id).status == "completed"
+    db.close()
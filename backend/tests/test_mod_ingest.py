@@ -0,0 +1,180 @@
+import json
+import random
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from app.services import chunk_store, mod_ingest
+
+PARAMS = {"min_size": 512, "avg_bits": 10, "max_size": 8192}
+
+
+def _make_zip(path):
+    rng = random.Random(3)
+    big = bytes(rng.getrandbits(8) for _ in range(30_000))
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("pack/readme.txt", "hello")
+        zf.writestr("pack/ferrari_f40/data.acd", big)
+        zf.writestr("pack/ferrari_f40/ui/ui_car.json", json.dumps({"name": "Ferrari F40", "version": "2.1"}))
+        zf.writestr("pack/ferrari_f40/extra/deep/ui_track.json", json.dumps({"name": "Not this one"}))
+    return path
+
+
+def test_detect_zip_content_reads_central_directory(tmp_path):
+    with zipfile.ZipFile(_make_zip(tmp_path / "mod.zip")) as zf:
+        detected = mod_ingest.detect_zip_content(zf)
+    assert detected["type"] == "car"
+    assert detected["data"]["name"] == "Ferrari F40"
+    assert detected["data"]["version"] == "2.1"
+
+
+def test_streaming_extract_matches_two_pass_manifest(tmp_path):
+    progress = []
+    with zipfile.ZipFile(_make_zip(tmp_path / "mod.zip")) as zf:
+        manifest = mod_ingest.extract_zip_with_manifest(
+            zf, tmp_path / "streamed", on_progress=lambda done, total: progress.append((done, total)),
+            chunk_root=tmp_path / "chunks", **PARAMS
+        )
+        zf.extractall(tmp_path / "classic")
+
+    expected = chunk_store.build_chunked_manifest(str(tmp_path / "classic"), root=tmp_path / "chunks2", **PARAMS)
+    assert set(manifest) == set(expected)
+    for path, entry in manifest.items():
+        assert entry["hash"] == expected[path]["hash"]
+        assert entry["size"] == expected[path]["size"]
+        assert entry.get("chunks") == expected[path].get("chunks")
+    assert progress[-1][0] == progress[-1][1]
+
+
+def test_streaming_extract_rejects_path_traversal(tmp_path):
+    with zipfile.ZipFile(tmp_path / "evil.zip", "w") as zf:
+        zf.writestr("../escape.txt", "nope")
+    with zipfile.ZipFile(tmp_path / "evil.zip") as zf:
+        with pytest.raises(ValueError):
+            mod_ingest.extract_zip_with_manifest(zf, tmp_path / "out")
+    assert not (tmp_path / "escape.txt").exists()
+
+
+class _Ctx:
+    def report(self, *args, **kwargs):
+        pass
+
+
+def test_disk_usage_sums_recorded_sizes_and_reconcile_fixes_drift(client, tmp_path, monkeypatch):
+    from app import models
+    from app.database import SessionLocal
+    from app.routers import mods as mods_router
+
+    monkeypatch.setattr(mods_router, "MODS_DIR", tmp_path)
+    monkeypatch.setattr(mods_router.chunk_store, "CHUNKS_DIR", tmp_path.parent / f"{tmp_path.name}_chunks")
+    mods_router.chunk_store.CHUNKS_DIR.mkdir()
+    (mods_router.chunk_store.CHUNKS_DIR / "ab").mkdir()
+    (mods_router.chunk_store.CHUNKS_DIR / "ab" / ("ab" * 32)).write_bytes(b"c" * 300)
+    mod_dir = tmp_path / "f40"
+    (mod_dir / "content").mkdir(parents=True)
+    (mod_dir / "content" / "data.acd").write_bytes(b"x" * 1000)
+    (mod_dir / "f40.zip").write_bytes(b"z" * 200)
+    (tmp_path / "temp_uploads").mkdir()
+    (tmp_path / "temp_uploads" / "stale.zip").write_bytes(b"t" * 50)
+
+    db = SessionLocal()
+    before = client.get("/mods/disk_usage").json()["mods_size_bytes"]
+    mod = models.Mod(name="F40", type="car", source_path=str(mod_dir / "content"), size_bytes=500)
+    db.add(mod)
+    db.commit()
+    assert client.get("/mods/disk_usage").json()["mods_size_bytes"] == before + 500
+
+    result = mods_router._disk_reconcile_job(_Ctx(), {}, db)
+    assert result["mods_corrected"] >= 1
+    assert result["orphan_bytes"] == 50
+    assert result["chunk_store_bytes"] == 300
+    usage = client.get("/mods/disk_usage").json()
+    assert usage["mods_size_bytes"] == before + 1200
+    assert usage["total_size_bytes"] == before + 1200 + 300
+
+    db.delete(mod)
+    db.commit()
+    db.close()
+
+
+def test_loose_car_folder_is_moved_under_content_cars(client, tmp_path, monkeypatch):
+    from app import models
+    from app.database import SessionLocal
+    from app.routers import mods as mods_router
+
+    monkeypatch.setattr(mods_router, "MODS_DIR", tmp_path)
+    archive = tmp_path / "upload.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("mi_loose_car/data.acd", b"acd")
+        zf.writestr("mi_loose_car/ui/ui_car.json", json.dumps({"name": "MI Loose Car"}))
+        zf.writestr("readme.txt", "hello")
+
+    db = SessionLocal()
+    mod = mods_router.process_mod_file(archive, "upload.zip", db)
+    content = Path(mod.source_path)
+    manifest = json.loads(mod.manifest)
+    assert mod.type == "car" and mod.name == "MI Loose Car"
+    assert set(manifest) == {"content/cars/mi_loose_car/data.acd", "content/cars/mi_loose_car/ui/ui_car.json", "readme.txt"}
+    assert (content / "content" / "cars" / "mi_loose_car" / "ui" / "ui_car.json").exists()
+    assert not (content / "mi_loose_car").exists()
+    # Only the extracted files are kept, not the uploaded archive next to them
+    assert [p.name for p in content.parent.iterdir()] == ["content"]
+
+    db.delete(mod)
+    db.commit()
+    db.close()
+
+
+def test_restructure_prefix_leaves_installed_layouts_alone():
+    def prefix(member):
+        return mod_ingest.restructure_prefix({"type": "track", "ui_member": member}, [member])
+
+    assert prefix("pack/spa/ui/ui_track.json") == ("pack/spa/", "content/tracks/spa/")
+    # Multi-layout track: the layout folder sits under ui/
+    assert prefix("spa/ui/gp/ui_track.json") == ("spa/", "content/tracks/spa/")
+    assert prefix("content/tracks/spa/ui/gp/ui_track.json") is None
+    assert prefix("ui/gp/ui_track.json") is None
+    assert prefix("content/tracks/spa/ui/ui_track.json") is None
+    assert prefix("ui/ui_track.json") is None
+
+
+def test_post_commit_failures_keep_the_mod_and_its_files(client, tmp_path, monkeypatch):
+    from app import models
+    from app.database import SessionLocal
+    from app.routers import mods as mods_router
+    from app.services import asset_index, jobs
+
+    monkeypatch.setattr(mods_router, "MODS_DIR", tmp_path)
+    monkeypatch.setattr(asset_index, "STORAGE_DIR", tmp_path)
+
+    def boom(*args, **kwargs):
+        raise RuntimeError("search down")
+
+    monkeypatch.setattr(mods_router.mod_search, "refresh_mods", boom)
+    archive = tmp_path / "kept.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("content/cars/mi_kept/ui/ui_car.json", json.dumps({"name": "MI Kept"}))
+
+    db = SessionLocal()
+    mod = mods_router.process_mod_file(archive, "kept.zip", db)
+    assert Path(mod.source_path, "content", "cars", "mi_kept", "ui", "ui_car.json").exists()
+    assert db.query(models.ModAsset).filter(models.ModAsset.mod_id == mod.id).count() > 0
+
+    # Cancelled at the last check: nothing is committed and the files go
+    def cancel(stage, *args, **kwargs):
+        if stage == "registering":
+            raise jobs.JobCancelled()
+
+    archive = tmp_path / "cancelled.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("content/cars/mi_cancelled/ui/ui_car.json", json.dumps({"name": "MI Cancelled"}))
+    with pytest.raises(jobs.JobCancelled):
+        mods_router.process_mod_file(archive, "cancelled.zip", db, report=cancel)
+    db.rollback()
+    assert db.query(models.Mod).filter(models.Mod.name == "MI Cancelled").count() == 0
+    assert not any(tmp_path.glob("*cancelled*/content"))
+
+    db.delete(mod)
+    db.commit()
+    db.close()
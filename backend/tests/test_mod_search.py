@@ -0,0 +1,100 @@
+import time
+
+from app import models
+from app.database import SessionLocal
+from app.routers.mods import add_tag_to_mod
+from app.services import auto_library, mod_search
+
+
+def _index(*docs):
+    index = mod_search.SearchIndex()
+    for mod_id, name, extra in docs:
+        index.add(mod_id, {"name": [name], **extra}, {"name": name, "type": "car", "tags": set()})
+    return index
+
+
+def test_prefix_typo_and_ranking():
+    index = _index(
+        (1, "Ferrari 458 Italia", {"brand": ["Ferrari"]}),
+        (2, "Porsche 911 GT3 RS", {"brand": ["Porsche"], "tag": ["GT3"]}),
+        (3, "Nürburgring Nordschleife", {}),
+        (4, "Formula Hybrid", {"meta": ["Ferrari"]}),
+    )
+    assert index.search("ferrari") == [1, 4]  # name hit ranks above a metadata hit
+    assert index.search("fer") == [1, 4]
+    assert index.search("f") == [1, 4]  # single letter while typing
+    assert index.search("ferari") == [1, 4]  # one missing letter
+    assert index.search("porshe gt3") == [2]
+    assert index.search("nurbur") == [3]  # accents are folded
+    assert index.search("911 xyz") == []
+    assert index.search("rari") == [1, 4]  # inside a word, like ILIKE '%rari%'
+    assert index.search("schleife") == [3]
+
+    index.remove(1)
+    assert index.search("ferrari") == [4]
+
+
+def test_list_mods_search_follows_library_changes(client):
+    db = SessionLocal()
+    db.add(models.Mod(name="MS Lamborghini Huracan GT3", type="car", version="1.0"))
+    db.add(models.Mod(name="MS Imola", type="track", version="1.0"))
+    db.commit()
+    mod_search.invalidate()
+
+    names = lambda **params: [m["name"] for m in client.get("/mods/", params=params).json()]
+    assert names(search="huracn") == ["MS Lamborghini Huracan GT3"]
+    assert names(search="ms", type="track") == ["MS Imola"]
+
+    # Auto-detected mods are indexed as they're created, with their scan id and brand
+    auto_library.ensure_library_mods(db, [{"id": "ms_bmw_m4", "name": "MS M4 Coupe"}], [])
+    assert names(search="ms_bmw") == ["MS M4 Coupe"]
+
+    tag = models.Tag(name="MS Endurance", color="#000000")
+    db.add(tag)
+    db.commit()
+    imola = db.query(models.Mod).filter(models.Mod.name == "MS Imola").one()
+    add_tag_to_mod(imola.id, tag.id, db=db, current_user=None)
+    assert names(search="endurance") == ["MS Imola"]
+    assert names(search="ms", tag="MS Endurance") == ["MS Imola"]
+    db.close()
+
+
+def test_index_is_rebuilt_for_changes_from_other_workers(monkeypatch):
+    db = SessionLocal()
+    mod_search.invalidate()
+    mod_search.get_index(db)
+    # Written by another process: nothing patched this worker's index
+    mod = models.Mod(name="MS Zonda Cinque", type="car", version="1.0")
+    db.add(mod)
+    db.commit()
+    assert mod.id not in mod_search.search(db, "zonda")
+
+    monkeypatch.setattr(mod_search._index, "refresh_seconds", 0)
+    # The stale index still answers while the rebuild runs in the background
+    stale = mod_search.get_index(db)
+    rebuild = mod_search._index._rebuild_thread
+    assert stale.docs and mod.id not in stale.docs
+    if rebuild is not None:
+        rebuild.join(timeout=10)
+    assert mod_search._index._rebuild_thread is None
+    monkeypatch.setattr(mod_search._index, "refresh_seconds", 300)
+    assert mod_search.search(db, "zonda") == [mod.id]
+    db.close()
+
+
+def test_keystroke_latency_on_a_large_library():
+    brands = ["Ferrari", "Porsche", "BMW", "Audi", "Nissan", "Toyota", "Mazda", "Ford"]
+    index = mod_search.SearchIndex()
+    for i in range(5000):
+        name = f"{brands[i % len(brands)]} Model{i} Series{i % 37}"
+        index.add(i, {"name": [name], "brand": [brands[i % len(brands)]], "tag": ["GT3" if i % 3 else "Drift"]},
+                  {"name": name, "type": "car", "tags": set()})
+
+    start = time.perf_counter()
+    query = "porsche model12"
+    for end in range(1, len(query) + 1):
+        results = index.search(query[:end])
+    per_keystroke = (time.perf_counter() - start) / len(query)
+    # Prefix hits (Model12x) rank above one-edit neighbours (Model13x)
+    assert all(index.docs[mod_id]["name"].startswith("Porsche Model12") for mod_id in results[:5])
+    assert per_keystroke < 0.05
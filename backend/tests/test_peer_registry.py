@@ -0,0 +1,17 @@
+from app.services import peer_registry
+
+
+def test_peer_registry_tracks_holders():
+    peer_registry.clear()
+    peer_registry.announce(1, "http://10.0.0.1:8081", ["aa", "bb"])
+    peer_registry.announce(2, "http://10.0.0.2:8081", ["bb"])
+
+    peers = peer_registry.lookup(["aa", "bb", "cc"], exclude_station_id=2)
+    assert peers == {"aa": ["http://10.0.0.1:8081"], "bb": ["http://10.0.0.1:8081"]}
+
+    peer_registry.announce(1, "http://10.0.0.1:8081", ["cc"], replace=True)
+    assert set(peer_registry.lookup(["aa", "bb", "cc"])) == {"bb", "cc"}
+
+    peer_registry.forget(2)
+    assert peer_registry.lookup(["bb"]) == {}
+    peer_registry.clear()
@@ -0,0 +1,157 @@
+"""
+Query plan regression suite: hot endpoints run against a seeded SQLite database
+and every SELECT they issue is checked with EXPLAIN QUERY PLAN, so a dropped or
+unusable index shows up as a full scan of a large table.
+"""
+import asyncio
+import random
+import re
+import tempfile
+import uuid
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, insert, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app import database, models
+from app.database import Base, ensure_model_indexes
+from app.routers import bookings, championships, events, leaderboard, telemetry
+from app.services import content_catalog, response_cache
+
+LARGE_TABLES = ("session_results", "laptimes", "bookings", "events")
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    path = Path(tempfile.gettempdir()) / f"ac_manager_plans_{uuid.uuid4().hex}.db"
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    rng = random.Random(50)
+    content_catalog.invalidate()
+
+    tracks = [content_catalog.resolve(db, "track", f"qp_track_{i}") for i in range(40)]
+    cars = [content_catalog.resolve(db, "car", f"qp_car_{i}") for i in range(30)]
+    champs = [models.Championship(name=f"QP Season {i}") for i in range(20)]
+    db.add_all(champs)
+    db.commit()
+    db.execute(insert(models.Event), [
+        {"id": i, "name": f"QP Round {i}", "championship_id": champs[i % 20].id, "status": "completed"}
+        for i in range(1, 201)
+    ])
+
+    start = datetime(2025, 1, 1)
+    sessions, laps = [], []
+    for session_id in range(1, 10001):
+        t, c = rng.randrange(40), rng.randrange(30)
+        driver = rng.randrange(400)
+        if session_id <= 5:
+            t, driver = 3, 7  # the driver the per-driver endpoints look up
+        sessions.append({
+            "id": session_id, "driver_name": f"QP Driver {driver}",
+            "track_name": f"qp_track_{t}", "track_id": tracks[t],
+            "car_model": f"qp_car_{c}", "car_id": cars[c], "best_lap": 90000 + rng.randrange(20000),
+            "date": start + timedelta(minutes=session_id * 7),
+            "event_id": rng.randrange(1, 201) if session_id % 10 == 0 else None,
+        })
+        for n in range(3):
+            laps.append({"session_id": session_id, "lap_number": n + 1, "time": 90000 + rng.randrange(20000),
+                         "valid": rng.random() > 0.2})
+    db.execute(insert(models.SessionResult), sessions)
+    db.execute(insert(models.LapTime), laps)
+    db.execute(insert(models.Booking), [
+        {"customer_name": f"QP {i}", "date": start + timedelta(hours=i * 3), "time_slot": "18:00-19:00",
+         "status": rng.choice(["pending", "confirmed", "cancelled", "completed"])}
+        for i in range(5000)
+    ])
+    db.commit()
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+    yield engine, db, champs[3].id
+    db.close()
+    engine.dispose()
+    content_catalog.invalidate()
+    response_cache.clear()
+    path.unlink(missing_ok=True)
+
+
+def _plans(engine, call, count_statements):
+    """Runs the endpoint and returns the query plan lines of every SELECT it issued."""
+    response_cache.clear()
+    with count_statements(engine) as executed:
+        call()
+    statements = [(s, p) for s, p in executed if s.lstrip().upper().startswith("SELECT")]
+    assert statements
+
+    with engine.connect() as conn:
+        return [row[-1] for statement, parameters in statements
+                for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+
+
+HOT_ENDPOINTS = [
+    ("leaderboard_track_car", lambda db, champ: telemetry.get_leaderboard(track_name="qp_track_3", car_model="qp_car_4", db=db), ()),
+    ("leaderboard_track", lambda db, champ: telemetry.get_leaderboard(track_name="qp_track_3", db=db), ()),
+    ("top_times", lambda db, champ: asyncio.run(leaderboard.get_top_times(track="qp_track_3", car="qp_car_4", db=db)), ()),
+    ("driver_details", lambda db, champ: telemetry.get_driver_details(track_name="qp_track_3", driver_name="QP Driver 7", db=db), ()),
+    ("driver_history", lambda db, champ: telemetry.get_driver_history("QP Driver 7", db=db), ()),
+    # Newest-first with a LIMIT: walking the date index backwards is the intended plan
+    ("recent_sessions", lambda db, champ: telemetry.get_recent_sessions(track_name="qp_track_3", limit=20, db=db),
+     ("USING INDEX ix_session_results_date",)),
+    ("event_leaderboard", lambda db, champ: events.get_event_leaderboard(5, db=db), ()),
+    ("championship_standings", lambda db, champ: championships.get_championship_standings(champ, db=db), ()),
+    ("available_slots", lambda db, champ: asyncio.run(bookings.get_available_slots(target_date=date(2025, 3, 3), db=db)), ()),
+    ("bookings_by_status", lambda db, champ: asyncio.run(bookings.list_bookings(
+        status="pending", date_from=date(2025, 3, 1), date_to=date(2025, 3, 9), db=db)), ()),
+]
+
+
+@pytest.mark.parametrize("call,allowed", [(c, a) for _, c, a in HOT_ENDPOINTS], ids=[n for n, _, _ in HOT_ENDPOINTS])
+def test_hot_endpoint_avoids_full_scans(seeded, call, allowed, count_statements):
+    engine, db, champ = seeded
+    plan = _plans(engine, lambda: call(db, champ), count_statements)
+    scans = [
+        line for line in plan
+        if (m := re.match(r"SCAN (\w+)", line)) and m.group(1) in LARGE_TABLES
+        and not any(a in line for a in allowed)
+    ]
+    assert not scans, "\n".join(plan)
+
+
+def test_missing_indexes_are_created_on_existing_tables(monkeypatch):
+    path = Path(tempfile.gettempdir()) / f"ac_manager_indexes_{uuid.uuid4().hex}.db"
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE laptimes (id INTEGER PRIMARY KEY, session_id INTEGER, lap_number INTEGER, "
+                          "time INTEGER, splits JSON, score INTEGER, telemetry_data JSON, valid BOOLEAN)"))
+        conn.execute(text("CREATE INDEX idx_session_valid ON laptimes (session_id, valid)"))
+        conn.execute(text("CREATE TABLE session_results (id INTEGER PRIMARY KEY, driver_name VARCHAR, car_model VARCHAR, "
+                          "track_name VARCHAR, track_id INTEGER, car_id INTEGER, best_lap INTEGER, date DATETIME, "
+                          "event_id INTEGER)"))
+        conn.execute(text("CREATE INDEX ix_session_results_driver_name ON session_results (driver_name)"))
+        conn.execute(text("CREATE INDEX idx_track_car_date ON session_results (track_name, car_model, date)"))
+    try:
+        ensure_model_indexes(engine)
+        ensure_model_indexes(engine)  # idempotent
+        names = {index["name"] for index in inspect(engine).get_indexes("laptimes")}
+        assert {"idx_laptime_session_valid_time", "idx_valid_time"} <= names
+        assert "idx_session_valid" not in names
+        names = {index["name"] for index in inspect(engine).get_indexes("session_results")}
+        assert {"idx_session_driver_date", "idx_session_track_car_date"} <= names
+        assert not names & {"ix_session_results_driver_name", "idx_track_car_date"}
+
+        # Another worker starting up created the indexes after this one inspected the tables
+        real_inspect = database.inspect
+
+        def stale_inspect(bind):
+            inspector = real_inspect(bind)
+            monkeypatch.setattr(inspector, "get_indexes", lambda table_name: [])
+            return inspector
+
+        monkeypatch.setattr(database, "inspect", stale_inspect)
+        ensure_model_indexes(engine)
+    finally:
+        engine.dispose()
+        path.unlink(missing_ok=True)
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+
+from app import models, schemas
+from app.database import SessionLocal
+from app.routers.ads import toggle_ad
+from app.routers.events import update_event
+from app.services import response_cache
+
+
+def test_concurrent_pollers_compute_once():
+    cache = response_cache.ResponseCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return {"value": len(calls)}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("stats", compute, tags=("laps",))))
+        for _ in range(15)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [{"value": 1}] * 15
+
+    cache.invalidate("laps")
+    assert cache.get_or_compute("stats", compute, tags=("laps",)) == {"value": 2}
+    # Other tags are untouched
+    cache.invalidate("ads")
+    assert cache.get_or_compute("stats", compute, tags=("laps",)) == {"value": 2}
+
+
+def test_ttl_and_lru_bounds():
+    cache = response_cache.ResponseCache(max_entries=2)
+    counter = iter(range(100))
+    compute = lambda: next(counter)
+    assert cache.get_or_compute("a", compute, ttl=0) == 0
+    assert cache.get_or_compute("a", compute, ttl=60) == 1  # expired straight away
+    cache.get_or_compute("b", compute)
+    cache.get_or_compute("c", compute)
+    assert len(cache._entries) == 2
+    assert cache.get_or_compute("a", compute) == 4  # evicted as least recently used
+
+
+def test_shared_backend_spans_processes(tmp_path):
+    first = response_cache.ResponseCache(shared_dir=str(tmp_path))
+    second = response_cache.ResponseCache(shared_dir=str(tmp_path))
+    assert first.get_or_compute("hof", lambda: ["computed once"], tags=("laps",)) == ["computed once"]
+    assert second.get_or_compute("hof", lambda: ["again"], tags=("laps",)) == ["computed once"]
+
+    second.invalidate("laps")
+    assert first.get_or_compute("hof", lambda: ["after write"], tags=("laps",)) == ["after write"]
+
+
+def test_workers_share_the_cache_by_default():
+    assert response_cache.get_cache()._shared is not None
+
+
+def test_event_updates_invalidate_event_leaderboards(monkeypatch):
+    db = SessionLocal()
+    event = models.Event(name="RC Event", track_name="rc_track")
+    db.add(event)
+    db.commit()
+    invalidated = []
+    monkeypatch.setattr(response_cache, "invalidate", lambda *tags: invalidated.extend(tags))
+    when = datetime(2026, 6, 1, tzinfo=timezone.utc)
+    update_event(event.id, schemas.EventCreate(name="RC Event", track_name="rc_track_2", start_date=when,
+                                               end_date=when), db=db, current_user=None)
+    assert "events" in invalidated
+    db.close()
+
+
+def test_shared_files_are_evicted(tmp_path):
+    cache = response_cache.ResponseCache(shared_dir=str(tmp_path))
+    values = tmp_path / "values"
+    cache.get_or_compute("short", lambda: 1, ttl=0)
+    assert len(list(values.iterdir())) == 1
+    # A fresh process reads it back expired and removes it
+    assert response_cache.ResponseCache(shared_dir=str(tmp_path))._lookup("short", ()) is response_cache._MISSING
+    assert list(values.iterdir()) == []
+
+    cache._shared.max_files, cache._shared._writes = 10, 0
+    for i in range(response_cache.PRUNE_EVERY):
+        cache.get_or_compute(("board", i), lambda: i)
+    assert len(list(values.iterdir())) == 10
+
+
+def test_concurrent_async_misses_compute_once():
+    cache = response_cache.ResponseCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def poll():
+        return await asyncio.gather(*(cache.get_or_compute_async("top", compute, ("laps",)) for _ in range(10)))
+
+    assert asyncio.run(poll()) == [1] * 10
+    assert cache._in_flight == {}
+
+    async def failing():
+        raise RuntimeError("boom")
+
+    async def poll_failing():
+        return await asyncio.gather(*(cache.get_or_compute_async("bad", failing) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(poll_failing()))
+    assert cache._in_flight == {}
+
+
+def test_active_ads_follow_toggles(client):
+    db = SessionLocal()
+    ad = models.AdCampaign(title="RC Promo", image_path="ads/rc.png", is_active=True, display_duration=10)
+    db.add(ad)
+    db.commit()
+
+    titles = lambda: [a["title"] for a in client.get("/ads/active").json()]
+    assert "RC Promo" in titles()
+
+    # Writes outside the API are not seen until the TTL or an invalidation
+    db.add(models.AdCampaign(title="RC Hidden", image_path="ads/h.png", is_active=True, display_duration=10))
+    db.commit()
+    assert "RC Hidden" not in titles()
+
+    toggle_ad(ad.id, db=db)
+    assert "RC Promo" not in titles()
+    assert "RC Hidden" in titles()
+    db.close()
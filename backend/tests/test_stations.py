@@ -0,0 +1,24 @@
+from datetime import datetime, timedelta, timezone
+
+from app import models
+from app.database import SessionLocal
+from app.routers.stations import ArchiveGhostsRequest, archive_ghost_stations
+
+
+def test_archive_ghosts_accepts_its_options():
+    db = SessionLocal()
+    ghost = models.Station(name="cs-ghost", mac_address="cs-ghost-mac", is_active=True, is_online=False,
+                           last_seen=datetime.now(timezone.utc) - timedelta(days=3))
+    db.add(ghost)
+    db.commit()
+
+    preview = archive_ghost_stations(ArchiveGhostsRequest(include_never_seen=False, dry_run=True), db=db)
+    assert preview["dry_run"] is True and ghost.id in preview["archived_ids"]
+    db.refresh(ghost)
+    assert ghost.is_active
+
+    result = archive_ghost_stations(ArchiveGhostsRequest(include_never_seen=False), db=db)
+    assert ghost.id in result["archived_ids"]
+    db.refresh(ghost)
+    assert not ghost.is_active and ghost.status == "archived"
+    db.close()
@@ -0,0 +1,96 @@
+import math
+import struct
+import time
+
+import numpy as np
+import pytest
+
+from app.routers import tracks as tracks_router
+from app.services import track_geometry
+
+
+def _stadium(step=2.0, straight=500, radius=100):
+    """Two straights joined by two 180 degree corners, driven from (0, 0) towards +z."""
+    points = [(0.0, i * step) for i in range(int(straight / step))]
+    arc = int(math.pi * radius / step)
+    points += [(radius - radius * math.cos(i * step / radius), straight + radius * math.sin(i * step / radius)) for i in range(arc)]
+    points += [(2 * radius, straight - i * step) for i in range(int(straight / step))]
+    points += [(radius + radius * math.cos(i * step / radius), -radius * math.sin(i * step / radius)) for i in range(arc)]
+    return np.array(points)
+
+
+def test_length_and_segments_of_a_stadium():
+    geometry = track_geometry.TrackGeometry(_stadium())
+    assert geometry.length == pytest.approx(1000 + 2 * math.pi * 100, rel=1e-3)
+    assert [s["type"] for s in geometry.segments] == ["straight", "corner", "straight", "corner"]
+    first_corner = geometry.segments[1]
+    # Curvature smoothing blurs the boundaries by about half a window
+    assert first_corner["start"] == pytest.approx(500, abs=track_geometry.CURVATURE_WINDOW)
+    assert abs(first_corner["angle"]) == pytest.approx(180, abs=10)
+    assert first_corner["start"] < first_corner["apex"] < first_corner["end"]
+
+
+def test_projection_matches_brute_force_and_snaps_between_points():
+    geometry = track_geometry.TrackGeometry(_stadium())
+    rng = np.random.default_rng(7)
+    for x, z in rng.uniform(-150, 350, size=(300, 2)):
+        brute = np.min(np.hypot(geometry.xz[:, 0] - x, geometry.xz[:, 1] - z))
+        i = geometry.nearest_index(x, z)
+        assert math.hypot(geometry.xz[i, 0] - x, geometry.xz[i, 1] - z) == pytest.approx(brute)
+
+    # Between two samples of the back straight, 5 m off the line
+    distance, offset = geometry.project(205.0, 249.0)
+    assert distance == pytest.approx(500 + math.pi * 100 + 251, abs=1.5)
+    assert offset == pytest.approx(5.0)
+    assert geometry.progress(3.0, 0.5) == pytest.approx(0.5 / geometry.length, abs=1e-3)
+    # Far off the track still resolves to the closest point
+    assert geometry.project(5000.0, 250.0)[1] == pytest.approx(4800.0)
+
+
+def test_infield_positions_stay_cheap():
+    geometry = track_geometry.TrackGeometry(_stadium())
+    # The /project endpoint's batch limit, all well inside the infield
+    positions = np.random.default_rng(11).uniform(40, 160, size=(5000, 2))
+    start = time.perf_counter()
+    nearest = [geometry.nearest_index(x, z) for x, z in positions]
+    assert time.perf_counter() - start < 2.0
+    for (x, z), i in zip(positions[:200], nearest):
+        assert i == int(np.argmin(np.hypot(geometry.xz[:, 0] - x, geometry.xz[:, 1] - z)))
+
+
+def test_position_at_and_sectors_wrap_on_closed_lines():
+    geometry = track_geometry.TrackGeometry(_stadium())
+    x, z, rot = geometry.position_at(250)
+    assert (x, z, rot) == pytest.approx((0.0, 250.0, 0.0))
+    assert geometry.position_at(geometry.length + 250)[:2] == pytest.approx((0.0, 250.0))
+    assert geometry.sector_at(0) == 0
+    assert geometry.sector_at(geometry.length * 0.99) == 2
+    assert geometry.segment_at(250)["type"] == "straight"
+
+
+def _write_fast_lane(path, xz):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = struct.pack("<i", len(xz))
+    for x, z in xz:
+        data += struct.pack("<fff", x, 0.0, z) + bytes(36)
+    path.write_bytes(data)
+
+
+def test_geometry_endpoints_use_the_cached_ai_line(client, tmp_path, monkeypatch):
+    tracks_root = tmp_path / "tracks"
+    monkeypatch.setattr(tracks_router, "AC_TRACKS_PATH", tracks_root)
+    _write_fast_lane(tracks_root / "oval" / "ai" / "fast_lane.ai", _stadium())
+
+    resp = client.get("/tracks/oval/geometry")
+    assert resp.status_code == 200
+    assert [s["type"] for s in resp.json()["segments"]] == ["straight", "corner", "straight", "corner"]
+    assert client.get("/tracks/missing/geometry").status_code == 404
+
+    # Built once per file version
+    monkeypatch.setattr(track_geometry, "load_fast_lane", lambda path: pytest.fail("rebuilt cached geometry"))
+    resp = client.post("/tracks/oval/project", json=[[0.0, 250.0], [200.0, 250.0]])
+    assert resp.status_code == 200
+    first, second = resp.json()
+    assert first["segment"] == "straight" and first["sector"] == 0
+    assert first["distance"] == pytest.approx(250, abs=0.5)
+    assert second["n"] == pytest.approx((500 + math.pi * 100 + 250) / (1000 + 2 * math.pi * 100), abs=1e-3)
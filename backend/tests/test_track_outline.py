@@ -0,0 +1,84 @@
+import math
+import struct
+
+import numpy as np
+import pytest
+
+from app.routers import tracks as tracks_router
+from app.services import track_outline
+
+
+def _write_fast_lane(path, points, truncate=0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = struct.pack("<i", len(points))
+    for x, y, z in points:
+        data += struct.pack("<fff", x, y, z) + bytes(36)
+    path.write_bytes(data[:len(data) - truncate] if truncate else data)
+    return path
+
+
+def _oval(n=4000):
+    return [(600 * math.cos(2 * math.pi * i / n), 1.5, 250 * math.sin(2 * math.pi * i / n)) for i in range(n)]
+
+
+def test_load_matches_record_layout_and_drops_invalid_points(tmp_path):
+    points = [(1.0, 2.0, 3.0), (float("nan"), 0.0, 0.0), (4.0, 5.0, 6.0), (7.0, 8.0, 9.0)]
+    # Last record cut after its coordinates, like the old reader tolerated
+    ai_file = _write_fast_lane(tmp_path / "fast_lane.ai", points, truncate=30)
+    loaded = track_outline.load_fast_lane(ai_file)
+    assert loaded.tolist() == [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0], [7.0, 8.0, 9.0]]
+
+
+def test_douglas_peucker_keeps_shape_within_tolerance():
+    xs = np.linspace(0, 100, 1001)
+    line = np.column_stack([xs, np.where(xs < 50, 0.0, xs - 50)])
+    kept = track_outline.douglas_peucker(line, 0.5)
+    assert kept.tolist() == [0, 500, 1000]
+
+
+def test_outline_is_simplified_and_cached_per_mtime(tmp_path, monkeypatch):
+    ai_file = _write_fast_lane(tmp_path / "monza" / "ai" / "fast_lane.ai", _oval())
+    cache_dir = tmp_path / "cache"
+    outline = track_outline.get_outline(ai_file, 1000, 800, cache_dir=cache_dir)
+    assert outline["pointCount"] == 4000
+    assert 20 < outline["sampledCount"] < 400
+    assert outline["path"].startswith("M ") and outline["path"].endswith(" Z")
+    assert len(list(cache_dir.glob("*.json"))) == 1
+
+    # Presets and the per-process memo mean no further parsing
+    track_outline._memo.clear()
+    monkeypatch.setattr(track_outline, "load_fast_lane", lambda path: pytest.fail("re-parsed a cached outline"))
+    assert track_outline.get_outline(ai_file, 200, 160, cache_dir=cache_dir)["viewBox"] == "0 0 200 160"
+    assert track_outline.get_outline(ai_file, 1000, 800, cache_dir=cache_dir) == outline
+
+
+def test_new_version_prunes_earlier_cache_files(tmp_path):
+    ai_file = _write_fast_lane(tmp_path / "spa" / "ai" / "fast_lane.ai", _oval())
+    other = _write_fast_lane(tmp_path / "imola" / "ai" / "fast_lane.ai", _oval(500))
+    cache_dir = tmp_path / "cache"
+    track_outline.get_outline(ai_file, cache_dir=cache_dir)
+    track_outline.get_outline(other, cache_dir=cache_dir)
+
+    # The AI line is re-recorded: only its newest outline stays cached
+    _write_fast_lane(ai_file, _oval(3000))
+    assert track_outline.get_outline(ai_file, cache_dir=cache_dir)["pointCount"] == 3000
+    assert len(list(cache_dir.glob("*.json"))) == 2
+    assert sum(1 for key in track_outline._memo if key[0] == str(ai_file.resolve())) == 1
+
+
+def test_outline_endpoint_and_list_with_outlines(client, tmp_path, monkeypatch):
+    tracks_root = tmp_path / "tracks"
+    monkeypatch.setattr(tracks_router, "AC_TRACKS_PATH", tracks_root)
+    monkeypatch.setattr(track_outline, "OUTLINE_CACHE_DIR", tmp_path / "cache")
+    _write_fast_lane(tracks_root / "spa" / "gp" / "ai" / "fast_lane.ai", _oval(1500))
+    _write_fast_lane(tracks_root / "monza" / "ai" / "fast_lane.ai", _oval(900))
+
+    resp = client.get("/tracks/spa/outline", params={"layout": "gp", "width": 400, "height": 320})
+    assert resp.status_code == 200
+    assert resp.json()["trackName"] == "Spa"
+    assert resp.json()["viewBox"] == "0 0 400 320"
+    assert client.get("/tracks/nope/outline").status_code == 404
+
+    listed = {t["id"]: t for t in client.get("/tracks/list", params={"include_outlines": True}).json()}
+    assert listed["monza"]["outline"]["viewBox"] == "0 0 200 160"
+    assert "outline" not in listed["spa"]
@@ -0,0 +1,83 @@
+from datetime import datetime, timezone
+
+from app import models
+from app.database import SessionLocal
+from app.services import universal_content
+
+
+def _station(db, name, online=True):
+    station = models.Station(
+        name=name, mac_address=f"mac-{name}", is_active=True, is_online=online,
+        status="online" if online else "offline", content_cache_updated=datetime.now(timezone.utc)
+    )
+    db.add(station)
+    db.commit()
+    return station
+
+
+def test_universal_ids_follow_scans_and_online_state(client):
+    db = SessionLocal()
+    db.query(models.Station).update({models.Station.is_online: False})
+    db.commit()
+    a = _station(db, "uc-a")
+    b = _station(db, "uc-b")
+    universal_content.replace_station_content(db, a.id, {
+        "cars": [{"id": "ks_f40", "name": "Ferrari F40"}, {"id": "ks_m3"}],
+        "tracks": [{"id": "monza"}],
+    })
+    universal_content.replace_station_content(db, b.id, {
+        "cars": [{"id": "ks_f40"}],
+        "tracks": [{"id": "monza"}, {"id": "spa"}],
+    })
+    assert universal_content.get_universal_ids(db) == ["ks_f40", "monza"]
+
+    # Rescan only touches the changed rows
+    assert universal_content.replace_station_content(db, b.id, {
+        "cars": [{"id": "ks_f40"}, {"id": "ks_m3"}],
+        "tracks": [{"id": "monza"}, {"id": "spa"}],
+    }) == {"added": 1, "removed": 0}
+    assert universal_content.get_universal_ids(db) == ["ks_f40", "ks_m3", "monza"]
+
+    # Station going offline widens the set without any explicit invalidation
+    b.is_online = False
+    db.commit()
+    assert universal_content.get_universal_ids(db) == ["ks_f40", "ks_m3", "monza"]
+    a.is_online = False
+    b.is_online = True
+    db.commit()
+    assert universal_content.get_universal_ids(db) == ["ks_f40", "ks_m3", "monza", "spa"]
+
+    db.add_all([
+        models.Mod(name="Spa", type="track", version="1.0", source_path="auto_scan::spa"),
+        models.Mod(name="Imola", type="track", version="1.0", source_path="auto_scan::imola"),
+    ])
+    db.commit()
+    names = {m["name"] for m in client.get("/mods/", params={"only_universal": True}).json()}
+    assert "Spa" in names
+    assert "Imola" not in names
+
+    db.query(models.Mod).filter(models.Mod.name.in_(["Spa", "Imola"])).delete(synchronize_session=False)
+    db.query(models.StationContent).filter(models.StationContent.station_id.in_([a.id, b.id])).delete(synchronize_session=False)
+    db.query(models.Station).filter(models.Station.id.in_([a.id, b.id])).delete(synchronize_session=False)
+    db.commit()
+    db.close()
+
+
+def test_apply_scan_diff_requires_matching_base_version():
+    cache = {
+        "scan_version": 3,
+        "cars": [{"id": "ks_f40", "name": "F40"}, {"id": "ks_m3", "name": "M3"}],
+        "tracks": [{"id": "monza"}],
+    }
+    diff = {
+        "base_version": 3, "version": 4,
+        "cars": {"added": [{"id": "ks_gt3"}], "changed": [{"id": "ks_m3", "name": "M3 E30"}], "removed": ["ks_f40"]},
+        "tracks": {"added": [], "changed": [], "removed": []},
+    }
+    updated = universal_content.apply_scan_diff(cache, diff)
+    assert updated["scan_version"] == 4
+    assert updated["cars"] == [{"id": "ks_m3", "name": "M3 E30"}, {"id": "ks_gt3"}]
+    assert updated["tracks"] == [{"id": "monza"}]
+
+    assert universal_content.apply_scan_diff(cache, dict(diff, base_version=2)) is None
+    assert universal_content.apply_scan_diff(None, diff) is None
@@ -0,0 +1,43 @@
+import axios from 'axios';
+import { API_URL } from '../config';
+
+export interface Job<T = any> {
+    id: number;
+    kind: string;
+    status: 'queued' | 'running' | 'completed' | 'failed' | 'cancelled';
+    stage: string | null;
+    progress: number; // 0-1
+    result: T | null;
+    error: string | null;
+    cancel_requested: boolean;
+    attempts: number;
+    created_at: string;
+    started_at: string | null;
+    finished_at: string | null;
+}
+
+export const getJob = async <T = any>(jobId: number): Promise<Job<T>> => {
+    const response = await axios.get(`${API_URL}/jobs/${jobId}`);
+    return response.data;
+};
+
+export const cancelJob = async (jobId: number): Promise<Job> => {
+    const response = await axios.post(`${API_URL}/jobs/${jobId}/cancel`);
+    return response.data;
+};
+
+// Polls a background job until it finishes; resolves with its result
+export const waitForJob = async <T = any>(
+    jobId: number,
+    onProgress?: (job: Job<T>) => void,
+    intervalMs = 1000
+): Promise<T> => {
+    while (true) {
+        const job = await getJob<T>(jobId);
+        onProgress?.(job);
+        if (job.status === 'completed') return job.result as T;
+        if (job.status === 'failed') throw new Error(job.error || 'Error en la tarea');
+        if (job.status === 'cancelled') throw new Error('Tarea cancelada');
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+};
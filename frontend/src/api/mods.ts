@@ -1,5 +1,7 @@
 import axios from 'axios';
 import { API_URL } from '../config';
+import { waitForJob } from './jobs';
+import type { Job } from './jobs';
 
 export interface Mod {
     id: number;
@@ -42,7 +44,19 @@ export const getModMetadata = async (modId: number): Promise<ModMetadata> => {
     return response.data;
 };
 
-export const uploadMod = async (file: File, metadata: { name: string; type: string; version: string }) => {
+export interface ModUploadResult {
+    mod_id: number;
+    name: string;
+    type: string;
+    version: string;
+}
+
+// The server processes uploads as a background job; poll until it finishes
+export const uploadMod = async (
+    file: File,
+    metadata: { name: string; type: string; version: string },
+    onProgress?: (job: Job<ModUploadResult>) => void
+): Promise<ModUploadResult> => {
     const formData = new FormData();
     formData.append('file', file);
     formData.append('name', metadata.name);
@@ -54,7 +68,8 @@ export const uploadMod = async (file: File, metadata: { name: string; type: stri
             'Content-Type': 'multipart/form-data',
         },
     });
-    return response.data;
+
+    return waitForJob<ModUploadResult>(response.data.id, onProgress);
 };
 
 export const deleteMod = async (modId: number): Promise<void> => {
@@ -63,7 +78,8 @@ export const deleteMod = async (modId: number): Promise<void> => {
 
 export const bulkDeleteMods = async (modIds: number[]): Promise<{ deleted: number }> => {
     const response = await axios.post(`${API_URL}/mods/bulk/delete`, modIds);
-    return response.data;
+    const result = await waitForJob<{ deleted: number[]; failed: { id: number; error: string }[] }>(response.data.id);
+    return { deleted: result.deleted.length };
 };
 
 export const toggleMod = async (modId: number): Promise<Mod> => {
@@ -16,7 +16,7 @@ import { motion, AnimatePresence } from 'framer-motion';
 import axios from 'axios';
 import { API_URL } from '../config';
 import { getStations, massLaunch } from '../api/stations';
-import { cn } from '../lib/utils';
+import { cn, thumbnailUrl } from '../lib/utils';
 
 interface MassLaunchModalProps {
     onClose: () => void;
@@ -181,7 +181,7 @@ export default function MassLaunchModal({ onClose, initialCar, initialTrack, ini
                                                     )}
                                                 >
                                                     <div className="w-12 h-12 bg-gray-900 rounded-xl overflow-hidden flex-shrink-0">
-                                                        <img src={car.image_url} alt="" className="w-full h-full object-cover opacity-80" />
+                                                        <img src={thumbnailUrl(car.image_url, 96)} alt="" className="w-full h-full object-cover opacity-80" />
                                                     </div>
                                                     <div>
                                                         <div className="font-bold text-sm leading-tight">{car.name}</div>
@@ -210,7 +210,7 @@ export default function MassLaunchModal({ onClose, initialCar, initialTrack, ini
                                                     )}
                                                 >
                                                     <div className="w-12 h-12 bg-gray-900 rounded-xl overflow-hidden flex-shrink-0">
-                                                        <img src={track.image_url} alt="" className="w-full h-full object-cover opacity-80" />
+                                                        <img src={thumbnailUrl(track.image_url, 96)} alt="" className="w-full h-full object-cover opacity-80" />
                                                     </div>
                                                     <div>
                                                         <div className="font-bold text-sm leading-tight">{track.name}</div>
@@ -12,3 +12,9 @@ export const resolveAssetUrl = (url?: string | null) => {
     if (url.startsWith('/')) return `${API_URL}${url}`;
     return `${API_URL}/${url}`;
 };
+
+// Station image proxy (agent, port 8081) serves cached WebP thumbnails for ?w=<px>
+export const thumbnailUrl = (url: string | null | undefined, width: number) => {
+    if (!url || !/^https?:\/\/[^/]+:8081\//i.test(url)) return url ?? undefined;
+    return `${url}${url.includes('?') ? '&' : '?'}w=${width}`;
+};
@@ -15,7 +15,7 @@ import {
     Tooltip, ResponsiveContainer
 } from 'recharts';
 import { API_URL } from '../config';
-import { cn } from '../lib/utils';
+import { cn, thumbnailUrl } from '../lib/utils';
 import type { Scenario } from '../api/scenarios';
 import { getPaymentStatus, createPaymentCheckout } from '../api/payments';
 import type { PaymentProvider } from '../api/payments';
@@ -411,8 +411,8 @@ export const DifficultyStep: React.FC<DifficultyStepProps> = ({
         };
     };
     const specs = selectedCarObj?.specs?.bhp ? selectedCarObj.specs : getMockSpecs(selectedCarObj?.id);
-    const carImageUrl = resolveAssetUrl(selectedCarObj?.image_url);
-    const trackImageUrl = resolveAssetUrl(selectedTrackObj?.image_url);
+    const carImageUrl = resolveAssetUrl(thumbnailUrl(selectedCarObj?.image_url, 384));
+    const trackImageUrl = resolveAssetUrl(thumbnailUrl(selectedTrackObj?.image_url, 384));
     const mapUrl = resolveAssetUrl(selectedTrackObj?.map_url)
         || "https://upload.wikimedia.org/wikipedia/commons/thumb/6/67/Circuit_de_Spa-Francorchamps_trace.svg/1200px-Circuit_de_Spa-Francorchamps_trace.svg.png";
 
@@ -101,10 +101,14 @@ export default function ModsLibrary() {
     const uploadMutation = useMutation({
         mutationFn: () => {
             if (!uploadForm.file) throw new Error("No archivo seleccionado");
+            setUploadStatus('Subiendo...');
             return uploadMod(uploadForm.file, {
                 name: uploadForm.name,
                 version: uploadForm.version,
                 type: uploadForm.type
+            }, (job) => {
+                setUploadStatus(job.status === 'queued' ? 'En cola...' : 'Procesando mod...');
+                setUploadProgress(job.progress * 100);
             });
         },
         onSuccess: () => {
@@ -2,7 +2,7 @@ import { useState, useRef, useEffect, useMemo } from 'react';
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { useSearchParams } from 'react-router-dom';
 import axios from 'axios';
-import { cn } from '../lib/utils';
+import { cn, thumbnailUrl } from '../lib/utils';
 import { API_URL } from '../config';
 import { getStations, updateStation, type Station } from '../api/stations';
 import { QRCodeCanvas } from 'qrcode.react';
@@ -2048,7 +2048,7 @@ export default function SettingsPage() {
                                         {stationContent?.cars?.length ? (
                                             <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
                                                 {stationContent.cars.map((car: any) => {
-                                                    const imageUrl = resolveContentUrl(car.image_url);
+                                                    const imageUrl = resolveContentUrl(thumbnailUrl(car.image_url, 96));
                                                     return (
                                                         <div key={car.id} className="bg-gray-800/60 border border-gray-700 rounded-2xl p-4 flex gap-3">
                                                             {imageUrl && (
@@ -2078,8 +2078,8 @@ export default function SettingsPage() {
                                         {stationContent?.tracks?.length ? (
                                             <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
                                                 {stationContent.tracks.map((track: any) => {
-                                                    const imageUrl = resolveContentUrl(track.image_url);
-                                                    const mapUrl = resolveContentUrl(track.map_url);
+                                                    const imageUrl = resolveContentUrl(thumbnailUrl(track.image_url, 96));
+                                                    const mapUrl = resolveContentUrl(thumbnailUrl(track.map_url, 96));
                                                     return (
                                                         <div key={track.id} className="bg-gray-800/60 border border-gray-700 rounded-2xl p-4 flex gap-3">
                                                             {(imageUrl || mapUrl) && (
@@ -0,0 +1,75 @@
+"""
+Thumbnails - Resized WebP copies of preview images, shared by the server and
+the station agents so both render the same fixed widths with the same cache
+layout (<root>/<key[:2]>/<key>.webp). The key covers the source path, mtime and
+size, so a changed image gets a new file and stale ones are never served.
+Pillow is optional: without it callers fall back to the original image.
+"""
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Fixed widths so the cache stays bounded (list rows, kiosk grid, detail cards)
+THUMB_SIZES = (96, 192, 384)
+THUMB_QUALITY = 80
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def snap_size(size: int) -> int:
+    """Nearest fixed width at or above the request (largest if it's bigger than all)."""
+    return next((s for s in THUMB_SIZES if s >= size), THUMB_SIZES[-1])
+
+
+def thumbnail_path(source, size: int, root) -> Path:
+    stat = os.stat(source)
+    key = hashlib.sha1(f"{os.path.abspath(source)}|{stat.st_mtime_ns}|{stat.st_size}|{size}".encode()).hexdigest()
+    return Path(root) / key[:2] / f"{key}.webp"
+
+
+def make_thumbnail(source, size: int, root) -> Optional[Path]:
+    """
+    Returns the cached WebP of `source` at the fixed width nearest `size` (never
+    upscaled), rendering it on first use; None without Pillow. Render errors raise.
+    """
+    if Image is None:
+        return None
+    size = snap_size(size)
+    path = thumbnail_path(source, size, root)
+    if path.exists():
+        return path
+
+    # One render per thumbnail even when the whole grid asks for it at once
+    with _locks_guard:
+        lock = _locks.setdefault(str(path), threading.Lock())
+    with lock:
+        try:
+            if path.exists():
+                return path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            try:
+                with Image.open(source) as img:
+                    img.draft("RGB", (size, size))  # cheap JPEG downscale while decoding
+                    if img.width > size:
+                        img.thumbnail((size, max(1, round(img.height * size / img.width))))
+                    if img.mode not in ("RGB", "RGBA"):
+                        img = img.convert("RGBA")
+                    img.save(tmp_path, "WEBP", quality=THUMB_QUALITY, method=4)
+                os.replace(tmp_path, path)
+            except Exception:
+                # Don't leave a half-written render in the cache folder
+                tmp_path.unlink(missing_ok=True)
+                raise
+        finally:
+            with _locks_guard:
+                _locks.pop(str(path), None)
+    return path